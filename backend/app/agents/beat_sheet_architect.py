@@ -23,6 +23,7 @@ from enum import Enum
 import json
 
 from app.services.ai_service import get_ai_service, ModelTier
+from app.prompts.story_prefix import with_story_prefix
 
 logger = logging.getLogger(__name__)
 
@@ -130,6 +131,8 @@ class BeatSheet:
     scene_stakes: str
     forbidden_elements: List[str]
     required_progress: str  # Co MUSI się zmienić do końca sceny
+    cost: float = 0.0
+    tokens_used: Dict[str, int] = field(default_factory=dict)
 
 
 @dataclass
@@ -168,7 +171,8 @@ class BeatSheetArchitect:
         current_location: str,
         scene_goal: str,
         forbidden_tropes: List[str],
-        tier: ModelTier = ModelTier.TIER_2
+        tier: ModelTier = ModelTier.TIER_2,
+        story_prefix: str = ""
     ) -> BeatSheet:
         """
         Tworzy Beat Sheet dla sceny metodą Chain of Thought.
@@ -184,6 +188,7 @@ class BeatSheetArchitect:
             current_location: Aktualna lokalizacja
             scene_goal: Cel fabularny sceny
             forbidden_tropes: Lista zakazanych tropów/klisz
+            story_prefix: Stały blok świata i obsady (cache'owany prefiks promptu)
 
         Returns:
             BeatSheet z 5 punktami zwrotnymi
@@ -213,7 +218,7 @@ class BeatSheetArchitect:
             forbidden_tropes=forbidden_tropes
         )
 
-        system_prompt = self._build_architect_system_prompt()
+        system_prompt = with_story_prefix(self._build_architect_system_prompt(), story_prefix)
 
         try:
             response = await self.ai_service.generate(
@@ -224,6 +229,7 @@ class BeatSheetArchitect:
                 max_tokens=2000,
                 json_mode=True,
                 prefer_anthropic=False,
+                enable_cache=True,
                 metadata={
                     "agent": self.name,
                     "task": "beat_sheet_creation",
@@ -243,6 +249,8 @@ class BeatSheetArchitect:
                 scene_goal=scene_goal,
                 forbidden_tropes=forbidden_tropes
             )
+            beat_sheet.cost = response.cost
+            beat_sheet.tokens_used = response.tokens_used
 
             # Waliduj Beat Sheet
             validation = self._validate_beat_sheet(beat_sheet)
@@ -9,12 +9,15 @@ Uses advanced character development techniques:
 - Relationship dynamics
 """
 
+import asyncio
 import json
 import logging
-from typing import Dict, Any, List
+import re
+import unicodedata
+from typing import Dict, Any, List, Set
 
 from app.services.ai_service import get_ai_service, ModelTier
-from app.config import genre_config
+from app.config import genre_config, settings
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +33,59 @@ PROTAGONIST_ARCHETYPES = {
     "mystery": ["The Detective", "The Amateur Sleuth", "The Witness", "The Victim"]
 }
 
+# Supporting role slots, assigned by creation index
+SUPPORTING_ROLES = ["mentor", "ally", "love_interest", "comic_relief", "wildcard"]
+
+
+def _name_keys(name: str) -> Set[str]:
+    """Normalized full name and first name (accents and case ignored)"""
+    folded = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().casefold()
+    words = re.findall(r"[a-z]+", folded)
+    if not words:
+        return set()
+    return {" ".join(words), words[0]}
+
+
+def _rename_in(value: Any, old_name: str, new_name: str, shared: Set[str] = frozenset()) -> Any:
+    """
+    Copy of a character field with every whole-word mention of old_name replaced.
+
+    The first and last name alone are replaced too, unless another character
+    goes by them (shared: _name_keys of the rest of the cast).
+    """
+    old_words, new_words = old_name.split(), new_name.split()
+    replacements = [(old_name, new_name)]
+    if len(old_words) > 1 and new_words:
+        replacements += [
+            (old, new) for old, new in ((old_words[0], new_words[0]), (old_words[-1], new_words[-1]))
+            if not _name_keys(old) & shared
+        ]
+
+    def rename(text: str) -> str:
+        for old, new in replacements:
+            text = re.sub(rf"(?<!\w){re.escape(old)}(?!\w)", new, text)
+        return text
+
+    if isinstance(value, str):
+        return rename(value)
+    if isinstance(value, dict):
+        return {
+            (rename(key) if isinstance(key, str) else key): _rename_in(item, old_name, new_name, shared)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_rename_in(item, old_name, new_name, shared) for item in value]
+    return value
+
+
+def _word_overlap(a: str, b: str) -> float:
+    """Jaccard overlap of the words of two descriptions"""
+    words_a = set(re.findall(r"\w{4,}", (a or "").lower()))
+    words_b = set(re.findall(r"\w{4,}", (b or "").lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
 
 class CharacterCreatorAgent:
     """
@@ -92,11 +148,26 @@ class CharacterCreatorAgent:
         characters.append(antagonist)
 
         # Create supporting characters
-        for i in range(character_count['main'] - 2):  # -2 for protag + antag
-            supporting = await self._create_supporting_character(
-                genre, project_name, world_bible, characters, i, themes
+        supporting_count = character_count['main'] - 2  # -2 for protag + antag
+        if settings.CONCURRENT_SUPPORTING_CHARACTERS and supporting_count > 1:
+            # All at once - each only needs protagonist + antagonist for de-duplication;
+            # collisions between them are fixed in one post-pass
+            main_characters = list(characters)
+            supporting_cast = await asyncio.gather(*[
+                self._create_supporting_character(
+                    genre, project_name, world_bible, main_characters, i, themes
+                )
+                for i in range(supporting_count)
+            ])
+            characters.extend(
+                await self._resolve_cast_collisions(list(supporting_cast), main_characters, genre, project_name)
             )
-            characters.append(supporting)
+        else:
+            for i in range(supporting_count):
+                supporting = await self._create_supporting_character(
+                    genre, project_name, world_bible, characters, i, themes
+                )
+                characters.append(supporting)
 
         logger.info(f"✅ {self.name}: Created {len(characters)} characters")
         return characters
@@ -522,8 +593,7 @@ Output JSON with same structure as protagonist.
     ) -> Dict[str, Any]:
         """Create a supporting character"""
 
-        roles = ["mentor", "ally", "love_interest", "comic_relief", "wildcard"]
-        role = roles[index % len(roles)]
+        role = SUPPORTING_ROLES[index % len(SUPPORTING_ROLES)]
 
         existing_names = [c['name'] for c in existing_characters]
 
@@ -602,6 +672,103 @@ Create a MEMORABLE character - not a cardboard cutout!"""
         logger.info(f"✅ Created supporting character: {character.get('name', 'Unknown')} ({role})")
         return character
 
+    async def _resolve_cast_collisions(
+        self,
+        supporting: List[Dict[str, Any]],
+        main_characters: List[Dict[str, Any]],
+        genre: str,
+        project_name: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Post-pass for supporting characters created concurrently.
+
+        They were written without seeing each other, so two of them may share
+        a name (or first name) with each other or the leads, and two of them
+        may fill the same function. One cheap call gives the colliding
+        characters new names (also replaced in their other fields) /
+        distinct relationships.
+        """
+        taken: Set[str] = set()
+        for character in main_characters:
+            taken |= _name_keys(character.get('name', ''))
+
+        collisions: Dict[int, Set[str]] = {}
+        for i, character in enumerate(supporting):
+            keys = _name_keys(character.get('name', ''))
+            if keys & taken:
+                collisions.setdefault(i, set()).add("name")
+            taken |= keys
+
+        # Every supporting character shares the "supporting" role - compare all pairs
+        for i, character in enumerate(supporting):
+            for j in range(i + 1, len(supporting)):
+                if _word_overlap(
+                    character.get('relationship_to_protagonist', ''),
+                    supporting[j].get('relationship_to_protagonist', '')
+                ) >= 0.5:
+                    collisions.setdefault(j, set()).add("role")
+
+        if not collisions:
+            return supporting
+
+        logger.info(f"🔀 {self.name}: resolving {len(collisions)} cast collisions")
+        cast_names = [c.get('name', '') for c in main_characters + supporting]
+        conflicts = "\n".join(
+            f"- index {i}: \"{supporting[i].get('name', '')}\" "
+            f"({SUPPORTING_ROLES[i % len(SUPPORTING_ROLES)]}; "
+            f"relationship: {supporting[i].get('relationship_to_protagonist', '')}) - "
+            f"{' + '.join(sorted(kinds))} collision"
+            for i, kinds in sorted(collisions.items())
+        )
+        prompt = f"""Cast of "{project_name}" ({genre}): {', '.join(cast_names)}
+
+These supporting characters collide with others in the cast:
+{conflicts}
+
+For a "name" collision give a NEW unique Polish name (different first name from everyone in the cast).
+For a "role" collision rewrite relationship_to_protagonist so the character fills a clearly different function.
+
+Return JSON: {{"fixes": [{{"index": <index>, "name": "...", "relationship_to_protagonist": "..."}}]}}"""
+
+        try:
+            response = await self.ai_service.generate(
+                prompt=prompt,
+                system_prompt=self._get_character_system_prompt(),
+                tier=ModelTier.TIER_1,
+                temperature=0.7,
+                max_tokens=800,
+                json_mode=True,
+                metadata={"agent": self.name, "task": "cast_collision_resolution"}
+            )
+            fixes = json.loads(response.content).get("fixes", [])
+        except Exception as e:
+            logger.warning(f"⚠️ Cast collision resolution failed, keeping names: {e}")
+            return supporting
+
+        for fix in fixes:
+            index = fix.get("index")
+            if not isinstance(index, int) or index not in collisions:
+                continue
+            character = supporting[index]
+            old_name = character.get('name', '')
+            new_name = (fix.get("name") or "").strip()
+            if "name" in collisions[index] and new_name:
+                # The new name must not collide either (leads and the rest of the cast as named now)
+                others: Set[str] = set()
+                for other in main_characters + supporting:
+                    if other is not character:
+                        others |= _name_keys(other.get('name', ''))
+                if _name_keys(new_name) & others:
+                    logger.warning(f"⚠️ Proposed name {new_name} for {old_name} is taken too, keeping it")
+                else:
+                    # Profile, backstory, arc and relationships were written for the old name
+                    supporting[index] = character = _rename_in(character, old_name, new_name, others)
+                    character['name'] = new_name
+                    logger.info(f"🔀 Renamed supporting character: {old_name} → {new_name}")
+            if "role" in collisions[index] and fix.get("relationship_to_protagonist"):
+                character['relationship_to_protagonist'] = fix["relationship_to_protagonist"]
+        return supporting
+
     def _get_character_system_prompt(self) -> str:
         """System prompt for character creation"""
         return """You are a MASTER CHARACTER ARCHITECT - the creator behind bestselling fiction's most memorable characters.
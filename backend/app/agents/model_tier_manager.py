@@ -5,9 +5,8 @@ Automatically selects appropriate OpenAI model based on task complexity
 
 from typing import Literal, Dict, Any, Optional
 import logging
-from openai import AsyncOpenAI
-
 from app.config import settings, model_tier_config
+from app.services.llm_clients import get_openai_client, PURPOSE_GENERATION
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +23,7 @@ class ModelTierManager:
     """
     
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, timeout=300.0)
+        self.client = get_openai_client(PURPOSE_GENERATION)  # shared pooled client
         self.tier_models = {
             1: settings.GPT_4O_MINI,
             2: settings.GPT_4O,
@@ -15,11 +15,18 @@ ROZWIĄZANE PROBLEMY:
 Bazuje na analizie "Algorytmiczna Architektura Narracji".
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
+import re
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from dataclasses import asdict, dataclass, field
 
+from app.config import settings
 from app.services.ai_service import get_ai_service, ModelTier
+from app.services.generation_stream import StreamPublisher
+from app.services.budget_scheduler import ScenePlan
+from app.services.repetition_index import RepetitionIndex
 from app.models.chapter import ChapterStatus
 from app.agents.beat_sheet_architect import (
     BeatSheetArchitect,
@@ -41,6 +48,7 @@ from app.prompts.genre_excellence_prompts import (
     get_genre_excellence_prompt,
     GenreType
 )
+from app.prompts.story_prefix import build_story_prefix, with_story_prefix
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +61,7 @@ class SceneResult:
     word_count: int
     cost: float
     model_used: str
+    timings: Dict[str, float] = field(default_factory=dict)  # seconds per stage
 
 
 @dataclass
@@ -66,6 +75,56 @@ class ChapterResult:
     qa_scores: Dict[str, float]
     total_cost: float
     repair_count: int
+    prompt_cache: Dict[str, int] = field(default_factory=dict)
+    scene_timings: List[Dict[str, float]] = field(default_factory=list)
+
+
+@dataclass
+class _BeatSheetPrefetch:
+    """Beat Sheet następnej sceny planowany z planu (nie z prozy) bieżącej sceny"""
+    planned_from: BeatSheet
+    task: "asyncio.Future[BeatSheet]"
+
+
+# Static critique rubric (system prompt) - scene-specific data goes to the user prompt
+# so the system prompt + story prefix stay byte-stable across the whole book.
+CRITIC_SYSTEM_PROMPT = """Jesteś BEZLITOSNYM redaktorem literackim. Oceniasz sceny powieści.
+
+## OCEŃ KRYTYCZNIE (0-100 za każdy aspekt):
+
+1. **SHOW DON'T TELL** (0-100): Czy emocje są POKAZANE przez ciało, działanie, percepcję?
+   - Szukaj: "czuł", "poczuła", "był smutny" = TELL (złe)
+   - Szukaj: "ścisnęło go w żołądku", "zacisnął pięści" = SHOW (dobre)
+
+2. **GŁĘBIA EMOCJONALNA** (0-100): Czy scena DOTYKA czytelnika?
+   - Czy jest autentyczna? Czy postacie reagują jak prawdziwi ludzie?
+
+3. **GŁOS POSTACI** (0-100): Czy narracja brzmi jak postać POV?
+   - Czy słownictwo pasuje? Czy sposób myślenia jest spójny?
+
+4. **RYTM PROZY** (0-100): Czy zdania mają ZMIENNĄ długość?
+   - Krótkie zdania (1-3 słowa) budują napięcie
+   - Długie zdania budują atmosferę
+   - Monotonny rytm = nuda
+
+5. **LOGIKA I SPÓJNOŚĆ** (0-100): Czy scena ma sens?
+
+Odpowiedz TYLKO w JSON:
+{
+    "score": <średnia 0-100>,
+    "show_dont_tell": <0-100>,
+    "emotional_depth": <0-100>,
+    "character_voice": <0-100>,
+    "prose_rhythm": <0-100>,
+    "logic": <0-100>,
+    "critical_issues": ["najważniejszy problem 1", "problem 2", "problem 3"],
+    "feedback": "Szczegółowe uwagi co poprawić (2-3 zdania)"
+}"""
+
+REWRITER_SYSTEM_PROMPT = """Jesteś redaktorem literackim, który UDOSKONALA tekst.
+NIE zmieniasz fabuły. NIE dodajesz nowych wydarzeń.
+POPRAWIASZ: styl, głębię emocjonalną, show don't tell, rytm prozy.
+Piszesz w 100% po polsku. Dialogi z PAUZĄ (—)."""
 
 
 class SceneWriterAgent:
@@ -127,6 +186,18 @@ class SceneWriterAgent:
             self.QUALITY_PREMIUM: 2
         }
 
+        # Writer system prompts by (genre, story prefix) - built once per book
+        self._writer_system_prompts: Dict[tuple, str] = {}
+
+        # Provider prompt-cache usage of the chapter being written
+        self._prompt_cache_usage: Dict[str, int] = {}
+
+        # Beat Sheet sceny N+1 powstaje równolegle z prozą sceny N
+        self.prefetch_beat_sheets = use_beat_sheet and settings.BEAT_SHEET_PREFETCH_ENABLED
+
+        # Krytyka AI równolegle z walidacją + jedno wspólne przepisanie sceny
+        self.merged_review = settings.SCENE_MERGED_REVIEW_ENABLED
+
     async def write_chapter(
         self,
         chapter_number: int,
@@ -139,7 +210,12 @@ class SceneWriterAgent:
         tier: ModelTier = ModelTier.TIER_2,  # Default to GPT-4o for quality
         on_scene_complete: Optional[callable] = None,
         all_characters: Optional[List[Dict[str, Any]]] = None,
-        world_bible: Optional[Dict[str, Any]] = None
+        world_bible: Optional[Dict[str, Any]] = None,
+        stream_publisher: Optional[StreamPublisher] = None,
+        completed_scenes: Optional[List[Dict[str, Any]]] = None,
+        on_scene_checkpoint: Optional[callable] = None,
+        repetition_index: Optional[RepetitionIndex] = None,
+        scene_planner: Optional[Callable[[int, ScenePlan], ScenePlan]] = None
     ) -> ChapterResult:
         """
         Generuj rozdział z architekturą Beat Sheet (Chain of Thought).
@@ -148,6 +224,29 @@ class SceneWriterAgent:
         1. Dla każdej sceny: ARCHITEKT tworzy Beat Sheet
         2. WIRTUOZ PIÓRA generuje prozę realizującą Beat Sheet
         3. WALIDATOR sprawdza anty-wzorce (opcjonalnie)
+
+        Jeśli podano stream_publisher, proza scen jest streamowana token po
+        tokenie do klientów (SSE) w trakcie generowania.
+
+        Prompty wszystkich etapów mają stały prefiks (system + biblia świata
+        + obsada), dzięki czemu dostawca serwuje go z prompt cache.
+
+        Przy BEAT_SHEET_PREFETCH_ENABLED Beat Sheet sceny N+1 powstaje w tle,
+        gdy pisana jest proza sceny N - na podstawie planu sceny N. Jeśli
+        gotowa proza odbiegła od planu, Beat Sheet jest tworzony ponownie.
+
+        Każda ukończona scena jest przekazywana do on_scene_checkpoint
+        (treść, koszt, Beat Sheet, lokalizacja); completed_scenes z przerwanego
+        przebiegu nie są generowane ponownie - pisanie wznawia się od pierwszej
+        nieukończonej sceny.
+
+        Z repetition_index walidator porównuje każdą scenę z całą dotychczasową
+        książką - powtórzone zdania i metafory wracają do pisarza jako
+        wskazówki naprawy.
+
+        scene_planner(scene_num, plan) może przed każdą sceną obniżyć tier,
+        liczbę przebiegów krytyki i powtórzeń walidacji (BudgetScheduler) -
+        domyślny plan to tier rozdziału, tryb jakości i 2 powtórzenia.
         """
         logger.info(f"✍️ {self.name}: Generating Chapter {chapter_number} (~{target_word_count} words)")
         if self.use_beat_sheet:
@@ -164,6 +263,10 @@ class SceneWriterAgent:
         # Extract context for prompt
         context_text = self._format_context(context_pack, pov_character)
 
+        # Byte-stable world + cast block shared by every call of this book
+        story_prefix = build_story_prefix(world_bible, all_characters)
+        self._prompt_cache_usage = {"input": 0, "cache_read": 0, "cache_creation": 0}
+
         # Prepare active characters list
         active_characters = self._prepare_active_characters(
             pov_character, all_characters, chapter_outline
@@ -177,182 +280,312 @@ class SceneWriterAgent:
         previous_scene_summary = ""
         used_metaphors: List[str] = []  # Track metaphors to prevent cross-scene repetition
 
-        for scene_num in range(1, num_scenes + 1):
-            logger.info(f"🎬 Processing scene {scene_num}/{num_scenes}...")
+        # Resume: scenes checkpointed by an interrupted run are not regenerated
+        for checkpoint in completed_scenes or []:
+            scene_result = SceneResult(
+                scene_number=checkpoint["scene_num"],
+                content=checkpoint["content"],
+                word_count=checkpoint.get("word_count") or len(checkpoint["content"].split()),
+                cost=checkpoint.get("cost", 0.0),
+                model_used=checkpoint.get("model_used", ""),
+                timings=checkpoint.get("timings") or {}
+            )
+            scene_results.append(scene_result)
+            total_cost += scene_result.cost
+            if checkpoint.get("qa_score") is not None:
+                validation_scores.append(checkpoint["qa_score"])
+            used_metaphors.extend(self._extract_metaphors(scene_result.content))
+            current_location = checkpoint.get("location") or current_location
+            previous_content = scene_result.content[-500:]
+            previous_scene_summary = self._summarize_scene(scene_result.content)
+        if scene_results:
+            logger.info(
+                f"♻️ Resuming chapter {chapter_number} at scene {len(scene_results) + 1}/{num_scenes} "
+                f"({len(scene_results)} scenes restored from checkpoint)"
+            )
+
+        beat_sheet_kwargs = dict(
+            total_scenes=num_scenes,
+            chapter_number=chapter_number,
+            chapter_outline=chapter_outline,
+            pov_character=pov_character,
+            active_characters=active_characters,
+            scene_goal=chapter_outline.get('goal', 'Rozwinąć fabułę'),
+            forbidden_tropes=self.default_forbidden_tropes,
+            tier=ModelTier.TIER_1,  # Beat Sheet can use cheaper model
+            story_prefix=story_prefix
+        )
 
-            # KROK 1: ARCHITEKT - stwórz Beat Sheet (jeśli włączony)
-            beat_sheet = None
-            beat_sheet_text = ""
-            architect_cost = 0.0
+        # Beat sheet of the next scene, planned while this scene's prose is written
+        prefetch: Optional[_BeatSheetPrefetch] = None
 
-            if self.use_beat_sheet and self.beat_sheet_architect:
-                logger.info(f"📐 Creating Beat Sheet for scene {scene_num}...")
-                beat_sheet = await self.beat_sheet_architect.create_beat_sheet(
+        try:
+            for scene_num in range(len(scene_results) + 1, num_scenes + 1):
+                logger.info(f"🎬 Processing scene {scene_num}/{num_scenes}...")
+                scene_cost_start = total_cost
+                scores_before = len(validation_scores)
+                scene_start = time.monotonic()
+                timings: Dict[str, float] = {}
+
+                # Tier i przebiegi jakości tej sceny (budżet projektu, jeśli jest planista)
+                scene_plan = ScenePlan(tier, self._critique_passes.get(self.quality_mode, 0), 2)
+                if scene_planner:
+                    scene_plan = scene_planner(scene_num, scene_plan)
+                scene_tier = scene_plan.tier
+
+                # KROK 1: ARCHITEKT - stwórz Beat Sheet (jeśli włączony)
+                beat_sheet = None
+                beat_sheet_text = ""
+                architect_cost = 0.0
+
+                if self.use_beat_sheet and self.beat_sheet_architect:
+                    if prefetch is not None:
+                        beat_sheet, architect_cost = await self._take_prefetched_beat_sheet(
+                            prefetch, scene_results[-1].content
+                        )
+                        prefetch = None
+
+                    if beat_sheet is None:
+                        logger.info(f"📐 Creating Beat Sheet for scene {scene_num}...")
+                        beat_sheet = await self.beat_sheet_architect.create_beat_sheet(
+                            scene_number=scene_num,
+                            previous_scene_summary=previous_scene_summary,
+                            current_location=current_location,
+                            **beat_sheet_kwargs
+                        )
+                    architect_cost += beat_sheet.cost
+                    timings["beat_sheet"] = time.monotonic() - scene_start
+                    self._track_prompt_cache(beat_sheet.tokens_used)
+                    beat_sheet_text = self.beat_sheet_architect.format_beat_sheet_for_writer(beat_sheet)
+                    logger.info(f"✅ Beat Sheet created: {beat_sheet.total_beats} beats")
+
+                    # Plan the next scene from this scene's plan while its prose is written
+                    if self.prefetch_beat_sheets and scene_num < num_scenes:
+                        prefetch = _BeatSheetPrefetch(
+                            planned_from=beat_sheet,
+                            task=asyncio.ensure_future(
+                                self.beat_sheet_architect.create_beat_sheet(
+                                    scene_number=scene_num + 1,
+                                    previous_scene_summary=self._planned_scene_summary(beat_sheet),
+                                    current_location=self._planned_location(beat_sheet, current_location),
+                                    **beat_sheet_kwargs
+                                )
+                            )
+                        )
+
+                # KROK 2: WIRTUOZ PIÓRA - generuj scenę
+                # Inject used metaphors ban into context to prevent repetition
+                enhanced_context = context_text
+                if used_metaphors:
+                    metaphor_ban = "\n\n## ZAKAZ POWTÓRZEŃ - te metafory/porównania BYŁY JUŻ UŻYTE (NIE POWTARZAJ!):\n"
+                    metaphor_ban += "\n".join(f"- ❌ \"{m}\"" for m in used_metaphors[-15:])  # Last 15
+                    metaphor_ban += "\nStwórz CAŁKOWICIE NOWE, ORYGINALNE metafory!"
+                    enhanced_context += metaphor_ban
+
+                stage_start = time.monotonic()
+                scene_result = await self._generate_scene_with_divine_prompt(
+                    chapter_number=chapter_number,
                     scene_number=scene_num,
                     total_scenes=num_scenes,
-                    chapter_number=chapter_number,
-                    chapter_outline=chapter_outline,
+                    genre=genre,
                     pov_character=pov_character,
+                    book_title=book_title,
+                    target_words=words_per_scene,
+                    context_text=enhanced_context,
+                    previous_content=previous_content,
+                    chapter_outline=chapter_outline,
+                    beat_sheet_text=beat_sheet_text,
                     active_characters=active_characters,
-                    previous_scene_summary=previous_scene_summary,
-                    current_location=current_location,
-                    scene_goal=chapter_outline.get('goal', 'Rozwinąć fabułę'),
-                    forbidden_tropes=self.default_forbidden_tropes,
-                    tier=ModelTier.TIER_1  # Beat Sheet can use cheaper model
+                    tier=scene_tier,
+                    story_prefix=story_prefix,
+                    stream_publisher=stream_publisher
                 )
-                beat_sheet_text = self.beat_sheet_architect.format_beat_sheet_for_writer(beat_sheet)
-                logger.info(f"✅ Beat Sheet created: {beat_sheet.total_beats} beats")
-
-            # KROK 2: WIRTUOZ PIÓRA - generuj scenę
-            # Inject used metaphors ban into context to prevent repetition
-            enhanced_context = context_text
-            if used_metaphors:
-                metaphor_ban = "\n\n## ZAKAZ POWTÓRZEŃ - te metafory/porównania BYŁY JUŻ UŻYTE (NIE POWTARZAJ!):\n"
-                metaphor_ban += "\n".join(f"- ❌ \"{m}\"" for m in used_metaphors[-15:])  # Last 15
-                metaphor_ban += "\nStwórz CAŁKOWICIE NOWE, ORYGINALNE metafory!"
-                enhanced_context += metaphor_ban
-
-            scene_result = await self._generate_scene_with_divine_prompt(
-                chapter_number=chapter_number,
-                scene_number=scene_num,
-                total_scenes=num_scenes,
-                genre=genre,
-                pov_character=pov_character,
-                book_title=book_title,
-                target_words=words_per_scene,
-                context_text=enhanced_context,
-                previous_content=previous_content,
-                chapter_outline=chapter_outline,
-                beat_sheet_text=beat_sheet_text,
-                active_characters=active_characters,
-                tier=tier
-            )
-
-            # KROK 3: WALIDATOR - sprawdź anty-wzorce i REGENERUJ jeśli zbyt niski score
-            max_retries = 2
-            if self.validate_output and self.anti_pattern_validator:
-                for attempt in range(max_retries + 1):
-                    validation = self.anti_pattern_validator.validate(scene_result.content)
-
-                    if validation['passed'] or attempt == max_retries:
-                        validation_scores.append(validation['score'])
-                        if not validation['passed']:
-                            logger.warning(
-                                f"⚠️ Scene {scene_num} accepted after {max_retries} retries: "
-                                f"{validation['score']}/100, {validation['critical_count']} critical"
-                            )
-                        else:
-                            logger.info(f"✅ Scene {scene_num} validated: {validation['score']}/100"
-                                        f"{' (retry ' + str(attempt) + ')' if attempt > 0 else ''}")
-                        break
+                timings["prose"] = time.monotonic() - stage_start
 
-                    # Regenerate scene with explicit anti-pattern feedback
-                    repair_hints = self.anti_pattern_validator.get_repair_suggestions(validation['issues'])
-                    logger.warning(
-                        f"🔄 Scene {scene_num} FAILED validation ({validation['score']}/100), "
-                        f"retrying ({attempt + 1}/{max_retries})... Issues: {repair_hints[:3]}"
-                    )
-                    # Append repair hints to context to guide regeneration
-                    enhanced_previous = previous_content + (
-                        f"\n\n## REDAKTOR: POPRAW te problemy w tej scenie:\n"
-                        + "\n".join(f"- {h}" for h in repair_hints[:5])
-                    )
-                    scene_result = await self._generate_scene_with_divine_prompt(
+                # KROK 3+4 (tryb scalony): krytyka AI równolegle z walidacją, jedno przepisanie
+                if self.merged_review:
+                    scene_result, validation_score = await self._review_scene_merged(
+                        scene_result=scene_result,
+                        scene_num=scene_num,
                         chapter_number=chapter_number,
-                        scene_number=scene_num,
-                        total_scenes=num_scenes,
                         genre=genre,
                         pov_character=pov_character,
-                        book_title=book_title,
                         target_words=words_per_scene,
-                        context_text=context_text,
-                        previous_content=enhanced_previous,
-                        chapter_outline=chapter_outline,
-                        beat_sheet_text=beat_sheet_text,
-                        active_characters=active_characters,
-                        tier=tier
+                        tier=scene_tier,
+                        story_prefix=story_prefix,
+                        timings=timings,
+                        repetition_index=repetition_index,
+                        critique_passes=scene_plan.critique_passes
+                    )
+                    if validation_score is not None:
+                        validation_scores.append(validation_score)
+
+                # KROK 3: WALIDATOR - sprawdź anty-wzorce i REGENERUJ jeśli zbyt niski score
+                max_retries = scene_plan.max_retries
+                stage_start = time.monotonic()
+                if self.validate_output and self.anti_pattern_validator and not self.merged_review:
+                    for attempt in range(max_retries + 1):
+                        validation = self._validate_scene(
+                            scene_result.content, chapter_number, scene_num, repetition_index
+                        )
+
+                        if validation['passed'] or attempt == max_retries:
+                            validation_scores.append(validation['score'])
+                            if not validation['passed']:
+                                logger.warning(
+                                    f"⚠️ Scene {scene_num} accepted after {max_retries} retries: "
+                                    f"{validation['score']}/100, {validation['critical_count']} critical"
+                                )
+                            else:
+                                logger.info(f"✅ Scene {scene_num} validated: {validation['score']}/100"
+                                            f"{' (retry ' + str(attempt) + ')' if attempt > 0 else ''}")
+                            break
+
+                        # Regenerate scene with explicit anti-pattern feedback
+                        repair_hints = self.anti_pattern_validator.get_repair_suggestions(validation['issues'])
+                        logger.warning(
+                            f"🔄 Scene {scene_num} FAILED validation ({validation['score']}/100), "
+                            f"retrying ({attempt + 1}/{max_retries})... Issues: {repair_hints[:3]}"
+                        )
+                        # Append repair hints to context to guide regeneration
+                        enhanced_previous = previous_content + (
+                            f"\n\n## REDAKTOR: POPRAW te problemy w tej scenie:\n"
+                            + "\n".join(f"- {h}" for h in repair_hints[:5])
+                        )
+                        retry_result = await self._generate_scene_with_divine_prompt(
+                            chapter_number=chapter_number,
+                            scene_number=scene_num,
+                            total_scenes=num_scenes,
+                            genre=genre,
+                            pov_character=pov_character,
+                            book_title=book_title,
+                            target_words=words_per_scene,
+                            context_text=context_text,
+                            previous_content=enhanced_previous,
+                            chapter_outline=chapter_outline,
+                            beat_sheet_text=beat_sheet_text,
+                            active_characters=active_characters,
+                            tier=scene_tier,
+                            story_prefix=story_prefix,
+                            stream_publisher=stream_publisher,
+                            attempt=attempt + 1
+                        )
+                        # Odrzucona wersja też kosztowała - koszt sceny liczy każde wywołanie raz
+                        retry_result.cost += scene_result.cost
+                        scene_result = retry_result
+                    timings["validation"] = time.monotonic() - stage_start
+
+                # KROK 4: KRYTYK AI - pętla Draft→Critique→Rewrite (Project 100x)
+                critique_passes = 0 if self.merged_review else scene_plan.critique_passes
+                for critique_round in range(critique_passes):
+                    logger.info(
+                        f"🔍 AI Critique pass {critique_round + 1}/{critique_passes} "
+                        f"for scene {scene_num}..."
                     )
-                    total_cost += scene_result.cost
-
-            # KROK 4: KRYTYK AI - pętla Draft→Critique→Rewrite (Project 100x)
-            critique_passes = self._critique_passes.get(self.quality_mode, 0)
-            for critique_round in range(critique_passes):
-                logger.info(
-                    f"🔍 AI Critique pass {critique_round + 1}/{critique_passes} "
-                    f"for scene {scene_num}..."
-                )
 
-                # 4a. CRITIQUE - AI analizuje tekst
-                critique = await self._ai_critique_scene(
-                    scene_content=scene_result.content,
-                    genre=genre,
-                    pov_character=pov_character,
-                    scene_number=scene_num,
-                    chapter_number=chapter_number
-                )
-                total_cost += critique.get("cost", 0.0)
+                    # 4a. CRITIQUE - AI analizuje tekst
+                    stage_start = time.monotonic()
+                    critique = await self._ai_critique_scene(
+                        scene_content=scene_result.content,
+                        genre=genre,
+                        pov_character=pov_character,
+                        scene_number=scene_num,
+                        chapter_number=chapter_number,
+                        story_prefix=story_prefix
+                    )
+                    total_cost += critique.get("cost", 0.0)
+                    timings["critique"] = timings.get("critique", 0.0) + time.monotonic() - stage_start
+
+                    # Skip rewrite if critique score is high enough
+                    critique_score = critique.get("score", 100)
+                    if critique_score >= 85:
+                        logger.info(
+                            f"✅ Scene {scene_num} passed critique "
+                            f"({critique_score}/100) - no rewrite needed"
+                        )
+                        break
 
-                # Skip rewrite if critique score is high enough
-                critique_score = critique.get("score", 100)
-                if critique_score >= 85:
+                    # 4b. REWRITE - AI przepisuje tekst uwzględniając uwagi
                     logger.info(
-                        f"✅ Scene {scene_num} passed critique "
-                        f"({critique_score}/100) - no rewrite needed"
+                        f"✏️ Rewriting scene {scene_num} based on critique "
+                        f"({critique_score}/100)..."
+                    )
+                    stage_start = time.monotonic()
+                    rewritten = await self._ai_rewrite_scene(
+                        original_content=scene_result.content,
+                        critique_feedback=critique.get("feedback", ""),
+                        genre=genre,
+                        pov_character=pov_character,
+                        target_words=words_per_scene,
+                        tier=scene_tier,
+                        story_prefix=story_prefix
                     )
-                    break
+                    timings["rewrite"] = timings.get("rewrite", 0.0) + time.monotonic() - stage_start
 
-                # 4b. REWRITE - AI przepisuje tekst uwzględniając uwagi
-                logger.info(
-                    f"✏️ Rewriting scene {scene_num} based on critique "
-                    f"({critique_score}/100)..."
-                )
-                rewritten = await self._ai_rewrite_scene(
-                    original_content=scene_result.content,
-                    critique_feedback=critique.get("feedback", ""),
-                    genre=genre,
-                    pov_character=pov_character,
-                    target_words=words_per_scene,
-                    tier=tier
-                )
+                    # Replace scene content with rewritten version
+                    scene_result = SceneResult(
+                        scene_number=scene_num,
+                        content=rewritten["content"],
+                        word_count=len(rewritten["content"].split()),
+                        cost=scene_result.cost + rewritten.get("cost", 0.0),
+                        model_used=scene_result.model_used
+                    )
 
-                # Replace scene content with rewritten version
-                scene_result = SceneResult(
-                    scene_number=scene_num,
-                    content=rewritten["content"],
-                    word_count=len(rewritten["content"].split()),
-                    cost=scene_result.cost + rewritten.get("cost", 0.0),
-                    model_used=scene_result.model_used
-                )
-                total_cost += rewritten.get("cost", 0.0)
+                    logger.info(
+                        f"✅ Scene {scene_num} rewritten: "
+                        f"{scene_result.word_count} words (critique: {critique_score}/100)"
+                    )
 
+                timings["total"] = time.monotonic() - scene_start
+                scene_result.timings = {stage: round(seconds, 2) for stage, seconds in timings.items()}
                 logger.info(
-                    f"✅ Scene {scene_num} rewritten: "
-                    f"{scene_result.word_count} words (critique: {critique_score}/100)"
+                    f"⏱️ Scene {scene_num} latency: "
+                    + " | ".join(f"{stage} {seconds:.1f}s" for stage, seconds in scene_result.timings.items())
                 )
 
-            scene_results.append(scene_result)
-            total_cost += scene_result.cost + architect_cost
-            previous_content = scene_result.content[-500:]  # Last 500 chars for continuity
-            previous_scene_summary = self._summarize_scene(scene_result.content)
-
-            # Extract and track metaphors/similes to prevent cross-scene repetition
-            new_metaphors = self._extract_metaphors(scene_result.content)
-            used_metaphors.extend(new_metaphors)
-
-            # Update location if beat_sheet indicates change
-            if beat_sheet and beat_sheet.beats:
-                for beat in beat_sheet.beats:
-                    if beat.change_type == "location":
-                        current_location = beat.change_description
-
-            logger.info(f"✅ Scene {scene_num}: {scene_result.word_count} words, ${scene_result.cost:.4f}")
-
-            # Progress callback
-            if on_scene_complete:
-                try:
-                    await on_scene_complete(scene_num, num_scenes, scene_result)
-                except:
-                    pass  # Don't let callback errors break generation
+                scene_results.append(scene_result)
+                total_cost += scene_result.cost + architect_cost
+                previous_content = scene_result.content[-500:]  # Last 500 chars for continuity
+                previous_scene_summary = self._summarize_scene(scene_result.content)
+
+                # Extract and track metaphors/similes to prevent cross-scene repetition
+                new_metaphors = self._extract_metaphors(scene_result.content)
+                used_metaphors.extend(new_metaphors)
+
+                # Update location if beat_sheet indicates change
+                if beat_sheet:
+                    current_location = self._planned_location(beat_sheet, current_location)
+
+                # Persist the finished scene before starting the next one
+                if on_scene_checkpoint:
+                    await on_scene_checkpoint({
+                        "scene_num": scene_num,
+                        "content": scene_result.content,
+                        "word_count": scene_result.word_count,
+                        "cost": round(total_cost - scene_cost_start, 6),
+                        "model_used": scene_result.model_used,
+                        "qa_score": validation_scores[-1] if len(validation_scores) > scores_before else None,
+                        "location": current_location,
+                        "beat_sheet": self._beat_sheet_to_dict(beat_sheet) if beat_sheet else None,
+                        "timings": scene_result.timings,
+                        "plan": scene_plan.to_dict(),
+                        "status": "finalized"
+                    })
+
+                logger.info(f"✅ Scene {scene_num}: {scene_result.word_count} words, ${scene_result.cost:.4f}")
+
+                if stream_publisher:
+                    stream_publisher.scene_complete(chapter_number, scene_num, scene_result.content)
+
+                # Progress callback
+                if on_scene_complete:
+                    try:
+                        await on_scene_complete(scene_num, num_scenes, scene_result)
+                    except:
+                        pass  # Don't let callback errors break generation
+        finally:
+            if prefetch is not None and not prefetch.task.done():
+                prefetch.task.cancel()
 
         # Assemble full chapter
         full_content = self._assemble_chapter(chapter_number, scene_results)
@@ -362,6 +595,11 @@ class SceneWriterAgent:
         avg_validation = sum(validation_scores) / len(validation_scores) if validation_scores else 85.0
 
         logger.info(f"✅ Chapter {chapter_number} COMPLETE: {total_words} words, ${total_cost:.4f}")
+        if self._prompt_cache_usage.get("cache_read"):
+            logger.info(
+                f"🗄️ Prompt cache: {self._prompt_cache_usage['cache_read']} of "
+                f"{self._prompt_cache_usage['input']} input tokens served from cache"
+            )
         if validation_scores:
             logger.info(f"📊 Average validation score: {avg_validation:.1f}/100")
 
@@ -377,9 +615,53 @@ class SceneWriterAgent:
                 "beat_sheet_used": self.use_beat_sheet
             },
             total_cost=total_cost,
-            repair_count=0
+            repair_count=0,
+            prompt_cache=dict(self._prompt_cache_usage),
+            scene_timings=[{"scene": s.scene_number, **s.timings} for s in scene_results]
         )
 
+    def _track_prompt_cache(self, tokens_used: Optional[Dict[str, int]]) -> None:
+        """Accumulate provider prompt-cache usage for the current chapter"""
+        if not tokens_used:
+            return
+        for key in ("input", "cache_read", "cache_creation"):
+            self._prompt_cache_usage[key] = self._prompt_cache_usage.get(key, 0) + tokens_used.get(key, 0)
+
+    def _get_writer_system_prompt(self, genre: str, story_prefix: str) -> str:
+        """
+        System prompt Wirtuoza Pióra: styl + standardy gatunku + stały kontekst książki.
+
+        Budowany raz na (gatunek, prefiks) - identyczne bajty dla każdej sceny,
+        więc cały blok jest cache'owany przez dostawcę.
+        """
+        key = (genre.lower(), story_prefix)
+        cached = self._writer_system_prompts.get(key)
+        if cached is not None:
+            return cached
+
+        system_prompt = get_writer_system_prompt(genre)
+
+        # Inject genre excellence standards (CRITICAL for genre-specific content)
+        genre_type_map = {
+            "fantasy": GenreType.FANTASY,
+            "sci-fi": GenreType.SCI_FI,
+            "thriller": GenreType.THRILLER,
+            "horror": GenreType.HORROR,
+            "romance": GenreType.ROMANCE,
+            "drama": GenreType.DRAMA,
+            "comedy": GenreType.COMEDY,
+            "mystery": GenreType.MYSTERY,
+            "religious": GenreType.RELIGIOUS,
+        }
+        genre_enum = genre_type_map.get(genre.lower())
+        if genre_enum:
+            genre_excellence = get_genre_excellence_prompt(genre_enum)
+            system_prompt += f"\n\n## STANDARDY DOSKONAŁOŚCI GATUNKOWEJ ({genre.upper()})\n\n{genre_excellence}"
+
+        system_prompt = with_story_prefix(system_prompt, story_prefix)
+        self._writer_system_prompts[key] = system_prompt
+        return system_prompt
+
     def _prepare_active_characters(
         self,
         pov_character: Dict[str, Any],
@@ -413,6 +695,88 @@ class SceneWriterAgent:
             return chapter_outline.get('setting', 'Nieznana lokalizacja')
         return "Nieznana lokalizacja"
 
+    async def _take_prefetched_beat_sheet(
+        self,
+        prefetch: _BeatSheetPrefetch,
+        previous_scene_content: str
+    ) -> Tuple[Optional[BeatSheet], float]:
+        """
+        Odbierz Beat Sheet zaplanowany z wyprzedzeniem.
+
+        Został zbudowany na planowanym streszczeniu poprzedniej sceny - jeśli
+        gotowa proza odeszła od planu (rewrite, regeneracja), plan jest
+        nieaktualny: zwraca (None, koszt odrzuconego planu) i wywołujący
+        tworzy Beat Sheet od nowa z prawdziwego streszczenia.
+        """
+        coverage = self._plan_coverage(prefetch.planned_from, previous_scene_content)
+        if coverage < settings.BEAT_SHEET_PREFETCH_MIN_COVERAGE:
+            logger.info(
+                f"♻️ Prefetched Beat Sheet for scene {prefetch.planned_from.scene_number + 1} is stale "
+                f"(plan coverage {coverage:.0%}) - replanning"
+            )
+            wasted = 0.0
+            if prefetch.task.done():
+                if not prefetch.task.cancelled() and prefetch.task.exception() is None:
+                    wasted = prefetch.task.result().cost
+            else:
+                prefetch.task.cancel()
+            return None, wasted
+
+        try:
+            return await prefetch.task, 0.0
+        except Exception as e:
+            logger.warning(f"⚠️ Prefetched Beat Sheet failed, planning sequentially: {e}")
+            return None, 0.0
+
+    @staticmethod
+    def _beat_sheet_to_dict(beat_sheet: BeatSheet) -> Dict[str, Any]:
+        """Beat Sheet w postaci JSON (checkpoint sceny)"""
+        data = asdict(beat_sheet)
+        for beat in data.get("beats", []):
+            beat["beat_type"] = beat["beat_type"].value
+        return data
+
+    @staticmethod
+    def _planned_scene_summary(beat_sheet: BeatSheet) -> str:
+        """Streszczenie sceny wyprowadzone z jej Beat Sheet (zanim powstanie proza)"""
+        lines = [f"(Plan sceny) {beat_sheet.setting}"]
+        for beat in beat_sheet.beats:
+            line = f"- {beat.description}"
+            if beat.change_description:
+                line += f" → {beat.change_description}"
+            lines.append(line)
+        if beat_sheet.required_progress:
+            lines.append(f"Postęp: {beat_sheet.required_progress}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _planned_location(beat_sheet: BeatSheet, current_location: str) -> str:
+        """Lokalizacja po scenie - ostatnia zmiana lokalizacji z Beat Sheet"""
+        for beat in beat_sheet.beats:
+            if beat.change_type == "location":
+                current_location = beat.change_description
+        return current_location
+
+    @staticmethod
+    def _plan_coverage(beat_sheet: BeatSheet, content: str) -> float:
+        """
+        Jaka część kluczowych słów planu (postacie, zmiany stanu, wymagany
+        postęp) występuje w gotowej prozie. Porównanie po 6-literowych
+        rdzeniach - wystarcza na polską fleksję.
+        """
+        def stems(text: str) -> set:
+            return {w[:6] for w in re.findall(r"\w{6,}", text.lower())}
+
+        plan_text = " ".join(
+            [beat_sheet.required_progress or ""]
+            + [beat.change_description or "" for beat in beat_sheet.beats]
+            + [name for beat in beat_sheet.beats for name in beat.characters_involved]
+        )
+        planned = stems(plan_text)
+        if not planned:
+            return 1.0
+        return len(planned & stems(content)) / len(planned)
+
     def _summarize_scene(self, content: str) -> str:
         """Tworzy krótkie streszczenie sceny dla kontekstu następnej"""
         # Simple extraction - last 200 words
@@ -460,7 +824,10 @@ class SceneWriterAgent:
         chapter_outline: Dict[str, Any],
         beat_sheet_text: str,
         active_characters: List[Dict[str, Any]],
-        tier: ModelTier
+        tier: ModelTier,
+        story_prefix: str = "",
+        stream_publisher: Optional[StreamPublisher] = None,
+        attempt: int = 0
     ) -> SceneResult:
         """Generuje scenę używając Divine Prompt System"""
 
@@ -472,25 +839,8 @@ class SceneWriterAgent:
         # Get active character names for Character Lock
         char_names = [c.get('name', 'Unknown') for c in active_characters]
 
-        # Build Divine Prompt with genre-specific excellence standards
-        system_prompt = get_writer_system_prompt(genre)
-
-        # Inject genre excellence standards (CRITICAL for genre-specific content)
-        genre_type_map = {
-            "fantasy": GenreType.FANTASY,
-            "sci-fi": GenreType.SCI_FI,
-            "thriller": GenreType.THRILLER,
-            "horror": GenreType.HORROR,
-            "romance": GenreType.ROMANCE,
-            "drama": GenreType.DRAMA,
-            "comedy": GenreType.COMEDY,
-            "mystery": GenreType.MYSTERY,
-            "religious": GenreType.RELIGIOUS,
-        }
-        genre_enum = genre_type_map.get(genre.lower())
-        if genre_enum:
-            genre_excellence = get_genre_excellence_prompt(genre_enum)
-            system_prompt += f"\n\n## STANDARDY DOSKONAŁOŚCI GATUNKOWEJ ({genre.upper()})\n\n{genre_excellence}"
+        # Build Divine Prompt: stable prefix (style + genre + world + cast)
+        system_prompt = self._get_writer_system_prompt(genre, story_prefix)
 
         # If no beat sheet, create a simple structure
         if not beat_sheet_text:
@@ -515,24 +865,40 @@ class SceneWriterAgent:
             active_characters=char_names
         )
 
+        generation_kwargs = dict(
+            prompt=prompt,
+            system_prompt=system_prompt,
+            tier=tier,
+            temperature=0.85,
+            max_tokens=target_words * 2,  # Ceiling - AIService tightens it to learned usage
+            prefer_anthropic=False,
+            enable_cache=True,
+            metadata={
+                "agent": self.name,
+                "task": "scene_generation_divine",
+                "chapter": chapter_number,
+                "scene": scene_number,
+                "beat_sheet_used": bool(beat_sheet_text)
+            }
+        )
+
         try:
-            response = await self.ai_service.generate(
-                prompt=prompt,
-                system_prompt=system_prompt,
-                tier=tier,
-                temperature=0.85,
-                max_tokens=target_words * 2,  # Double for safety
-                json_mode=False,
-                prefer_anthropic=False,
-                metadata={
-                    "agent": self.name,
-                    "task": "scene_generation_divine",
-                    "chapter": chapter_number,
-                    "scene": scene_number,
-                    "beat_sheet_used": bool(beat_sheet_text)
-                }
-            )
+            if stream_publisher:
+                # Stream tokens to connected clients while the scene is written
+                stream_publisher.scene_start(chapter_number, scene_number, attempt)
+                response = None
+                async for chunk in self.ai_service.generate_stream(**generation_kwargs):
+                    if chunk.done:
+                        response = chunk.response
+                    else:
+                        stream_publisher.delta(chapter_number, scene_number, chunk.delta)
+                stream_publisher.scene_end(
+                    chapter_number, scene_number, len(response.content.split())
+                )
+            else:
+                response = await self.ai_service.generate(json_mode=False, **generation_kwargs)
 
+            self._track_prompt_cache(response.tokens_used)
             content = response.content.strip()
             word_count = len(content.split())
 
@@ -670,7 +1036,7 @@ FORMAT:
                 system_prompt=system_prompt,
                 tier=tier,
                 temperature=0.85,
-                max_tokens=target_words * 2,  # Double for safety
+                max_tokens=target_words * 2,  # Ceiling - AIService tightens it to learned usage
                 json_mode=False,
                 prefer_anthropic=False,
                 metadata={
@@ -697,13 +1063,124 @@ FORMAT:
             # NIGDY nie zwracaj pustego contentu - rzuć wyjątek!
             raise RuntimeError(f"Scene {scene_number} generation failed: {e}")
 
+    def _validate_scene(
+        self,
+        content: str,
+        chapter_number: int,
+        scene_num: int,
+        repetition_index: Optional[RepetitionIndex] = None
+    ) -> Dict[str, Any]:
+        """Walidacja anty-wzorców, z powtórzeniami z całej książki gdy jest indeks"""
+        repetition_hits = None
+        if repetition_index is not None:
+            repetition_hits = repetition_index.check(content, chapter_number, scene_num)
+            if repetition_hits:
+                logger.info(
+                    f"🔁 Scene {chapter_number}.{scene_num}: {len(repetition_hits)} repetitions of earlier scenes"
+                )
+        return self.anti_pattern_validator.validate(content, repetition_hits=repetition_hits)
+
+    async def _review_scene_merged(
+        self,
+        scene_result: SceneResult,
+        scene_num: int,
+        chapter_number: int,
+        genre: str,
+        pov_character: Dict[str, Any],
+        target_words: int,
+        tier: ModelTier,
+        story_prefix: str,
+        timings: Dict[str, float],
+        repetition_index: Optional[RepetitionIndex] = None,
+        critique_passes: Optional[int] = None
+    ) -> Tuple[SceneResult, Optional[float]]:
+        """
+        Recenzja sceny w jednym przebiegu (SCENE_MERGED_REVIEW_ENABLED).
+
+        Krytyka AI leci równolegle z lokalną walidacją anty-wzorców (w wątku),
+        a uwagi krytyka i wskazówki walidatora trafiają do JEDNEGO przepisania -
+        zamiast do 2 regeneracji + 2 przepisań. Zwraca scenę i końcowy wynik walidacji.
+        """
+        validator = self.anti_pattern_validator if self.validate_output else None
+        if critique_passes is None:
+            critique_passes = self._critique_passes.get(self.quality_mode, 0)
+        with_critique = critique_passes > 0
+
+        async def no_critique() -> Dict[str, Any]:
+            return {}
+
+        stage_start = time.monotonic()
+        critique, validation = await asyncio.gather(
+            self._ai_critique_scene(
+                scene_content=scene_result.content,
+                genre=genre,
+                pov_character=pov_character,
+                scene_number=scene_num,
+                chapter_number=chapter_number,
+                story_prefix=story_prefix
+            ) if with_critique else no_critique(),
+            asyncio.to_thread(
+                self._validate_scene, scene_result.content, chapter_number, scene_num, repetition_index
+            ) if validator else no_critique()
+        )
+        timings["review"] = time.monotonic() - stage_start
+        review_cost = critique.get("cost", 0.0)
+
+        feedback_parts = []
+        critique_score = critique.get("score", 100)
+        if with_critique and critique_score < 85:
+            feedback_parts.append(critique.get("feedback", ""))
+        if validation and not validation['passed']:
+            repair_hints = validator.get_repair_suggestions(validation['issues'])
+            feedback_parts.append(
+                "## ANTY-WZORCE (walidator) - POPRAW:\n" + "\n".join(f"- {h}" for h in repair_hints[:5])
+            )
+
+        if not feedback_parts:
+            logger.info(
+                f"✅ Scene {scene_num} passed review (critique {critique_score}/100"
+                f"{', validation ' + str(validation['score']) + '/100' if validation else ''})"
+            )
+            scene_result.cost += review_cost
+            return scene_result, validation['score'] if validation else None
+
+        logger.info(f"✏️ Rewriting scene {scene_num} once with merged critique + validation feedback...")
+        stage_start = time.monotonic()
+        rewritten = await self._ai_rewrite_scene(
+            original_content=scene_result.content,
+            critique_feedback="\n\n".join(p for p in feedback_parts if p),
+            genre=genre,
+            pov_character=pov_character,
+            target_words=target_words,
+            tier=tier,
+            story_prefix=story_prefix
+        )
+        timings["rewrite"] = time.monotonic() - stage_start
+
+        scene_result = SceneResult(
+            scene_number=scene_num,
+            content=rewritten["content"],
+            word_count=len(rewritten["content"].split()),
+            cost=scene_result.cost + review_cost + rewritten.get("cost", 0.0),
+            model_used=scene_result.model_used
+        )
+        final_score = self._validate_scene(
+            scene_result.content, chapter_number, scene_num, repetition_index
+        )['score'] if validator else None
+        logger.info(
+            f"✅ Scene {scene_num} rewritten: {scene_result.word_count} words "
+            f"(critique: {critique_score}/100{', validation: ' + str(final_score) + '/100' if validator else ''})"
+        )
+        return scene_result, final_score
+
     async def _ai_critique_scene(
         self,
         scene_content: str,
         genre: str,
         pov_character: Dict[str, Any],
         scene_number: int,
-        chapter_number: int
+        chapter_number: int,
+        story_prefix: str = ""
     ) -> Dict[str, Any]:
         """
         AI Critique - analizuje jakość sceny i zwraca szczegółowe uwagi.
@@ -717,50 +1194,23 @@ FORMAT:
         """
         char_name = pov_character.get('name', 'protagonist')
 
-        prompt = f"""Jesteś BEZLITOSNYM redaktorem literackim. Oceń tę scenę z rozdziału {chapter_number}:
+        prompt = f"""Oceń tę scenę z rozdziału {chapter_number}:
 
 ## SCENA {scene_number} (gatunek: {genre}, POV: {char_name})
 
 {scene_content[:4000]}
 
-## OCEŃ KRYTYCZNIE (0-100 za każdy aspekt):
-
-1. **SHOW DON'T TELL** (0-100): Czy emocje są POKAZANE przez ciało, działanie, percepcję?
-   - Szukaj: "czuł", "poczuła", "był smutny" = TELL (złe)
-   - Szukaj: "ścisnęło go w żołądku", "zacisnął pięści" = SHOW (dobre)
-
-2. **GŁĘBIA EMOCJONALNA** (0-100): Czy scena DOTYKA czytelnika?
-   - Czy jest autentyczna? Czy postacie reagują jak prawdziwi ludzie?
-
-3. **GŁOS POSTACI** (0-100): Czy narracja brzmi jak {char_name}?
-   - Czy słownictwo pasuje? Czy sposób myślenia jest spójny?
-
-4. **RYTM PROZY** (0-100): Czy zdania mają ZMIENNĄ długość?
-   - Krótkie zdania (1-3 słowa) budują napięcie
-   - Długie zdania budują atmosferę
-   - Monotonny rytm = nuda
-
-5. **LOGIKA I SPÓJNOŚĆ** (0-100): Czy scena ma sens?
-
-Odpowiedz TYLKO w JSON:
-{{
-    "score": <średnia 0-100>,
-    "show_dont_tell": <0-100>,
-    "emotional_depth": <0-100>,
-    "character_voice": <0-100>,
-    "prose_rhythm": <0-100>,
-    "logic": <0-100>,
-    "critical_issues": ["najważniejszy problem 1", "problem 2", "problem 3"],
-    "feedback": "Szczegółowe uwagi co poprawić (2-3 zdania)"
-}}"""
+Głos postaci oceniaj względem: {char_name}. Odpowiedz TYLKO w JSON zgodnym z systemem."""
 
         try:
             response = await self.ai_service.generate(
                 prompt=prompt,
+                system_prompt=with_story_prefix(CRITIC_SYSTEM_PROMPT, story_prefix),
                 tier=ModelTier.TIER_1,  # Cheap model for critique
                 temperature=0.2,  # Analytical
                 max_tokens=800,
                 json_mode=True,
+                enable_cache=True,
                 metadata={
                     "agent": self.name,
                     "task": "ai_critique",
@@ -768,6 +1218,7 @@ Odpowiedz TYLKO w JSON:
                     "scene": scene_number
                 }
             )
+            self._track_prompt_cache(response.tokens_used)
 
             import json
             try:
@@ -789,7 +1240,8 @@ Odpowiedz TYLKO w JSON:
         genre: str,
         pov_character: Dict[str, Any],
         target_words: int,
-        tier: ModelTier
+        tier: ModelTier,
+        story_prefix: str = ""
     ) -> Dict[str, Any]:
         """
         AI Rewrite - przepisuje scenę uwzględniając uwagi krytyka.
@@ -821,25 +1273,22 @@ Odpowiedz TYLKO w JSON:
 
 Przepisz scenę. Zachowaj fabułę, popraw jakość prozy."""
 
-        system_prompt = f"""Jesteś redaktorem literackim, który UDOSKONALA tekst.
-NIE zmieniasz fabuły. NIE dodajesz nowych wydarzeń.
-POPRAWIASZ: styl, głębię emocjonalną, show don't tell, rytm prozy.
-Piszesz w 100% po polsku. Dialogi z PAUZĄ (—)."""
-
         try:
             response = await self.ai_service.generate(
                 prompt=prompt,
-                system_prompt=system_prompt,
+                system_prompt=with_story_prefix(REWRITER_SYSTEM_PROMPT, story_prefix),
                 tier=tier,
                 temperature=0.75,  # Slightly lower than draft for focused rewrite
                 max_tokens=target_words * 2,
                 json_mode=False,
                 prefer_anthropic=False,
+                enable_cache=True,
                 metadata={
                     "agent": self.name,
                     "task": "ai_rewrite",
                 }
             )
+            self._track_prompt_cache(response.tokens_used)
 
             return {
                 "content": response.content.strip(),
@@ -859,7 +1308,10 @@ Piszesz w 100% po polsku. Dialogi z PAUZĄ (—)."""
             # Try to use context_pack's format method if available
             if hasattr(context_pack, 'previous_chapter_summary'):
                 parts = []
-                if context_pack.previous_chapter_summary:
+                if settings.COMPACTION_ENABLED and getattr(context_pack, 'recap', None):
+                    # Skompaktowana historia (story_compactor) - zawiera też poprzedni rozdział
+                    parts.append(f"Dotychczas:\n{context_pack.recap}")
+                elif context_pack.previous_chapter_summary:
                     parts.append(f"Poprzednio: {context_pack.previous_chapter_summary[:300]}")
                 if hasattr(context_pack, 'plot_context') and context_pack.plot_context:
                     pc = context_pack.plot_context
@@ -3,6 +3,8 @@ Cache Layer API - NarraForge 3.0 Phase 5
 Endpoints for cache management and monitoring
 """
 
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
@@ -14,6 +16,12 @@ from app.services.cache_layer import (
     EvictionPolicy,
     CACHE_PATTERNS
 )
+from app.services.llm_response_cache import get_response_cache
+from app.services.single_flight import get_single_flight
+from app.services.latency_router import get_latency_router
+from app.services.llm_cassette import BACKEND_LIVE, backend_mode, get_cassette
+from app.services.token_budget import get_token_budget_predictor
+from app.services.telemetry_ledger import get_telemetry_ledger
 
 router = APIRouter(prefix="/cache")
 
@@ -301,6 +309,44 @@ async def get_cache_stats(namespace: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/llm/stats")
+async def get_llm_cache_stats():
+    """Get AI response cache and request coalescing statistics"""
+    try:
+        single_flight = get_single_flight()
+        return {
+            "success": True,
+            "stats": await asyncio.to_thread(get_response_cache().get_stats),
+            "single_flight": {
+                **single_flight.stats.to_dict(),
+                "in_flight": single_flight.in_flight()
+            },
+            "latency": get_latency_router().get_stats(),
+            "token_budget": get_token_budget_predictor().get_stats(),
+            "ledger": get_telemetry_ledger().get_stats(),
+            "backend": backend_mode(),
+            "cassette": get_cassette().get_stats() if backend_mode() != BACKEND_LIVE else None
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/llm/clear")
+async def clear_llm_cache():
+    """Drop all cached AI responses"""
+    try:
+        count = await asyncio.to_thread(get_response_cache().clear)
+        return {
+            "success": True,
+            "cleared_count": count,
+            "message": f"Cleared {count} cached AI responses"
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/patterns")
 async def get_cache_patterns():
     """Get predefined cache key patterns"""
@@ -3,10 +3,13 @@ Projects API endpoints
 Main endpoints for project creation, management, and generation
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+import json
 import logging
+from contextlib import aclosing
 
 from app.database import get_db
 from app.schemas.project import (
@@ -21,7 +24,11 @@ from app.schemas.character import CharacterListResponse
 from app.schemas.plot import PlotStructureResponse
 from app.schemas.chapter import ChapterListResponse, ChapterContentResponse
 from app.schemas.common import SuccessResponse
+from app.models.project import ProjectStatus
 from app.services import project_service
+from app.services.generation_stream import get_stream_hub, read_progress_snapshot
+from app.services.telemetry_ledger import summarize_project
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -68,6 +75,20 @@ async def list_projects(
     return ProjectListResponse(projects=projects, total=total)
 
 
+@router.get("/generation-capacity")
+async def get_generation_capacity(
+    genre: Optional[str] = None,
+    chapter_count: int = 25,
+    db: Session = Depends(get_db)
+):
+    """
+    Forecast of the generation queue: time left for every running book and
+    when a new book (of the given genre and size) would start and finish.
+    Based on step and scene durations learned from finished runs.
+    """
+    return project_service.get_generation_capacity(db, genre=genre, chapter_count=chapter_count)
+
+
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(
     project_id: int,
@@ -166,7 +187,14 @@ async def get_project_status(
     - Current activity description
     - Cost tracking
     - ETA
+
+    While a project is generating this is answered from the live progress
+    snapshot in Redis - no database query. Prefer /stream or /ws to polling.
     """
+    snapshot = await read_progress_snapshot(project_id)
+    if snapshot and snapshot.get("status") == ProjectStatus.GENERATING.value:
+        return snapshot
+
     project = project_service.get_project(db, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -175,6 +203,170 @@ async def get_project_status(
     return status
 
 
+@router.get("/{project_id}/telemetry")
+async def get_project_telemetry(
+    project_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Per-step AI telemetry of a project
+
+    Returns calls, tokens, cost and summed AI latency per pipeline step and
+    per (step, agent, task), sorted so the most time-consuming work is first.
+    """
+    project = project_service.get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    return summarize_project(db, project_id)
+
+
+@router.get("/{project_id}/stream")
+async def stream_project_generation(
+    project_id: int,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Live scene prose as it is generated (Server-Sent Events)
+
+    Event types (SSE `event:` field, JSON `data:`):
+    - scene_start: a scene draft begins (reset the scene buffer)
+    - delta: next fragment of scene text
+    - scene_end: draft finished (word count)
+    - scene_complete: final scene text after validation/critique
+    - progress: step, chapter/scene, cost and ETA (same fields as /status)
+
+    Replaces /status polling; text starts arriving ~1s after a scene starts.
+    All watchers of a project share one Redis subscription.
+    """
+    project = project_service.get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    initial = await read_progress_snapshot(project_id) or {
+        "project_id": project_id,
+        "status": getattr(project.status, "value", project.status)
+    }
+
+    async def event_source():
+        yield f"event: status\ndata: {json.dumps(initial, ensure_ascii=False)}\n\n"
+        # aclosing: a departed client leaves the shared subscription right away
+        try:
+            async with aclosing(get_stream_hub().watch(
+                project_id, heartbeat_seconds=settings.GENERATION_STREAM_HEARTBEAT
+            )) as events:
+                async for event in events:
+                    if await request.is_disconnected():
+                        break
+                    if event is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error(f"Generation stream for project {project_id} failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'stream unavailable'})}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+        }
+    )
+
+
+@router.websocket("/{project_id}/ws")
+async def watch_project_generation(websocket: WebSocket, project_id: int):
+    """
+    Live generation events over WebSocket - same events as /stream
+
+    The first message is the current state ({"type": "status", ...}); after
+    that every event is sent as a JSON message, with {"type": "ping"} on
+    idle connections.
+    """
+    await websocket.accept()
+    snapshot = await read_progress_snapshot(project_id)
+    await websocket.send_json({"type": "status", **(snapshot or {"project_id": project_id})})
+    try:
+        async with aclosing(get_stream_hub().watch(
+            project_id, heartbeat_seconds=settings.GENERATION_STREAM_HEARTBEAT
+        )) as events:
+            async for event in events:
+                await websocket.send_json(event if event is not None else {"type": "ping"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Generation websocket for project {project_id} failed: {e}")
+        await websocket.close(code=1011)
+
+
+@router.get("/{project_id}/staleness")
+async def get_project_staleness(
+    project_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Which chapters are out of date after edits (no AI calls)
+
+    Compares the content fingerprints recorded when each chapter was written
+    with the current world bible, characters, plot and outlines. Kinds:
+    fresh, untracked, opening (reconcile only), scenes (rewrite from
+    from_scene), chapter (full rewrite), unwritten.
+    """
+    project = project_service.get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    # Import here - the orchestrator pulls in every agent
+    from app.services.agent_orchestrator import AgentOrchestrator
+
+    try:
+        chapters = AgentOrchestrator(db, project, resume=True).staleness_report()
+    except RuntimeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "project_id": project_id,
+        "stale_chapters": [c["number"] for c in chapters if c["kind"] not in ("fresh", "untracked")],
+        "chapters": chapters,
+    }
+
+
+@router.post("/{project_id}/regenerate-stale", response_model=SuccessResponse)
+async def regenerate_stale_chapters(
+    project_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Rebuild only what edits invalidated
+
+    Rewrites stale chapters (or just their stale scenes) and reconciles the
+    openings of chapters whose predecessor changed. Runs in background via
+    Celery; see /staleness for what will be rebuilt.
+    """
+    project = project_service.get_project(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if project.status not in (ProjectStatus.COMPLETED, ProjectStatus.FAILED):
+        raise HTTPException(
+            status_code=400,
+            detail="Project must be 'completed' or 'failed' to regenerate stale chapters."
+        )
+
+    try:
+        task_id = project_service.start_stale_regeneration_task(project_id)
+
+        return SuccessResponse(
+            message="Stale regeneration started successfully",
+            data={"project_id": project_id, "task_id": task_id}
+        )
+    except Exception as e:
+        logger.error(f"Failed to start stale regeneration: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{project_id}/world", response_model=WorldBibleResponse)
 async def get_world_bible(
     project_id: int,
@@ -10,6 +10,13 @@ Time limits updated for Beat Sheet Architecture:
 from celery import Celery
 from app.config import settings
 
+# Longest a generation task may run (hard kill): a whole book, or a fan-out chapter batch
+TASK_TIME_LIMIT = 21600
+LONGEST_TASK_SECONDS = max(
+    TASK_TIME_LIMIT,
+    settings.GENERATION_CHAPTER_TASK_TIME_LIMIT * max(1, settings.GENERATION_FANOUT_BATCH_SIZE) + 300,
+)
+
 # Create Celery app
 celery_app = Celery(
     "narraforge",
@@ -28,7 +35,7 @@ celery_app.conf.update(
     task_track_started=True,
     # Increased limits for Beat Sheet Architecture (scene-by-scene generation)
     # Full novel: ~165 scenes × ~2 min = ~5.5 hours max
-    task_time_limit=21600,       # 6 hours max per task (hard kill)
+    task_time_limit=TASK_TIME_LIMIT,  # 6 hours max per task (hard kill)
     task_soft_time_limit=21000,  # 5h 50min soft limit (warning before hard kill)
     worker_prefetch_multiplier=1,
 
@@ -37,6 +44,12 @@ celery_app.conf.update(
     # crashes mid-task, the message returns to the queue for retry.
     task_acks_late=True,
     task_reject_on_worker_lost=True,
+    # Redis redelivers a message not acknowledged within visibility_timeout
+    # (default 1 hour) - to another worker, while the first one may still be
+    # running it. It must outlast the longest task. A worker process killed
+    # mid-task is requeued at once (reject_on_worker_lost); only a lost whole
+    # worker waits for this timeout.
+    broker_transport_options={"visibility_timeout": LONGEST_TASK_SECONDS + 3600},
 
     # --- Result expiry ---
     # Clean up completed task results after 48 hours
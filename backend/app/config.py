@@ -5,7 +5,7 @@ Loads environment variables and provides configuration classes
 
 from pydantic_settings import BaseSettings
 from pydantic import model_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from functools import lru_cache
 
 
@@ -61,6 +61,141 @@ class Settings(BaseSettings):
     TIER2_OUTPUT_COST: float = 10.0
     TIER3_INPUT_COST: float = 10.0   # gpt-4-turbo pricing per 1M tokens
     TIER3_OUTPUT_COST: float = 30.0  # gpt-4-turbo pricing per 1M tokens
+
+    # LLM Rate Governor (RPM/TPM token buckets per model, shared via Redis)
+    LLM_RATE_GOVERNOR_ENABLED: bool = True
+    LLM_RATE_GOVERNOR_MAX_WAIT: float = 120.0  # seconds before letting a call through anyway
+    LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {
+        "gpt-4o-mini": {"rpm": 5000, "tpm": 2000000},
+        "gpt-4o": {"rpm": 5000, "tpm": 800000},
+        "gpt-4-turbo": {"rpm": 5000, "tpm": 600000},
+        "claude-sonnet-4-5-20250929": {"rpm": 4000, "tpm": 400000},
+        "claude-opus-4-5-20251101": {"rpm": 4000, "tpm": 400000},
+    }
+
+    # LLM Response Cache (opt-in per call, for deterministic analysis prompts)
+    LLM_RESPONSE_CACHE_ENABLED: bool = True
+    LLM_RESPONSE_CACHE_BACKEND: str = "redis"  # "redis" or "disk"
+    LLM_RESPONSE_CACHE_PATH: str = "/app/output/.cache/llm_responses.sqlite3"
+    LLM_RESPONSE_CACHE_TTL: int = 604800  # 7 days
+    LLM_RESPONSE_CACHE_MAX_ENTRIES: int = 50000
+    LLM_RESPONSE_CACHE_MAX_TEMPERATURE: float = 0.5  # higher-temperature calls are never cached
+
+    # Single-flight coalescing of identical concurrent AI requests
+    LLM_SINGLE_FLIGHT_ENABLED: bool = True
+    LLM_SINGLE_FLIGHT_MAX_TEMPERATURE: float = 0.5  # creative calls never share results
+
+    # Shared HTTP transport for all OpenAI/Anthropic clients (app/services/llm_clients.py)
+    LLM_HTTP_MAX_CONNECTIONS: int = 100  # process-wide cap on concurrent provider connections
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_HTTP_CONNECT_TIMEOUT: float = 10.0
+    LLM_HTTP2: bool = True  # used when the h2 package is installed
+    LLM_CLIENT_TIMEOUTS: Dict[str, float] = {
+        "generation": 600.0,  # long completions (plot structure needs 5+ min)
+        "streaming": 120.0,   # max silence between streamed chunks
+        "embedding": 30.0,
+    }
+
+    # Latency-aware routing between tier-equivalent models (needs both API keys)
+    LLM_LATENCY_ROUTING_ENABLED: bool = True
+    LLM_LATENCY_WINDOW: int = 200  # samples kept per (provider, model, size class)
+    LLM_LATENCY_MIN_SAMPLES: int = 20  # before a window influences routing/hedging
+    # Hedged requests: duplicate a short call that outlives its p95 latency
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_MAX_TOKENS: int = 1000  # only calls up to this max_tokens hedge automatically
+
+    # Adaptive max_tokens learned per (agent, task, tier) from completed calls
+    TOKEN_BUDGET_ENABLED: bool = True
+    TOKEN_BUDGET_WINDOW: int = 200  # samples kept per key (global and per project)
+    TOKEN_BUDGET_MIN_SAMPLES: int = 20  # before a key tightens budgets
+    TOKEN_BUDGET_MARGIN: float = 1.15  # multiplier on the p95 usage ratio
+    TOKEN_BUDGET_FLOOR: int = 256  # never suggest fewer tokens than this
+
+    # Per-call AI telemetry ledger (generation_logs), written in bulk off the hot path
+    AI_LEDGER_ENABLED: bool = True
+    AI_LEDGER_BATCH_SIZE: int = 200
+    AI_LEDGER_FLUSH_INTERVAL: float = 5.0  # seconds
+    AI_LEDGER_MAX_BUFFER: int = 20000  # oldest rows dropped beyond this while the DB is down
+
+    # LLM backend: live | record (live + write cassette) | replay (offline, no API keys)
+    LLM_BACKEND: str = "live"
+    LLM_CASSETTE_PATH: str = "/app/output/.cache/llm_cassette.jsonl"
+    LLM_CASSETTE_MISS_POLICY: str = "nearest"  # nearest | error
+    # Replay latency: recorded | none | fixed:S | lognormal:MEDIAN,SIGMA | per_token:BASE,MS
+    LLM_CASSETTE_LATENCY: str = "recorded"
+    LLM_CASSETTE_LATENCY_SCALE: float = 1.0
+    LLM_CASSETTE_SEED: Optional[int] = None
+
+    # Supporting characters are created concurrently after protagonist and antagonist;
+    # a post-pass resolves name/role collisions between them
+    CONCURRENT_SUPPORTING_CHARACTERS: bool = True
+
+    # Chapters written concurrently (1 = strictly sequential). In parallel mode a
+    # chapter whose predecessor is not written yet gets its planned summary, and
+    # its opening is reconciled with the real predecessor afterwards.
+    CHAPTER_CONCURRENCY: int = 1
+    CHAPTER_RECONCILIATION_ENABLED: bool = True
+
+    # Beat sheet of scene N+1 is planned while scene N's prose is generated. The
+    # prefetched sheet is replanned when fewer than MIN_COVERAGE of the planned
+    # key words (characters, state changes, progress) appear in the written scene.
+    BEAT_SHEET_PREFETCH_ENABLED: bool = True
+    BEAT_SHEET_PREFETCH_MIN_COVERAGE: float = 0.35
+
+    # Scene review in one pass: AI critique runs concurrently with anti-pattern
+    # validation and both feed a single rewrite (instead of up to 2 regenerations
+    # + 2 rewrites). Per-scene stage latencies land in chapter generation_meta.
+    SCENE_MERGED_REVIEW_ENABLED: bool = False
+
+    # A redelivered generation task resumes a GENERATING project (from its scene
+    # checkpoints) when the broker flags the redelivery or the project has shown
+    # no progress for this long; otherwise it is treated as a duplicate and skipped.
+    GENERATION_RESUME_STALE_SECONDS: int = 900
+
+    # Fan-out execution: the book head (world, characters, plot) runs as one task,
+    # chapters as batches of GENERATION_FANOUT_BATCH_SIZE on the generation queue,
+    # joined by a chord that validates and finalizes. Time limit is per chapter.
+    GENERATION_FANOUT_ENABLED: bool = False
+    GENERATION_FANOUT_BATCH_SIZE: int = 1
+    GENERATION_CHAPTER_TASK_TIME_LIMIT: int = 3600
+
+    # Event loop hygiene in generation workers: session work runs on a single DB
+    # executor thread, project progress is written at most once per interval
+    # (step changes are written at once), and loop lag is sampled and logged per run
+    DB_EXECUTOR_ENABLED: bool = True
+    PROGRESS_WRITE_INTERVAL_SECONDS: float = 5.0
+    LOOP_LAG_MONITOR_ENABLED: bool = True
+    LOOP_LAG_SAMPLE_INTERVAL: float = 0.1
+
+    # Step and scene durations learned from finished runs (ETA, simulation, queue forecast)
+    DURATION_MODEL_WINDOW: int = 100  # samples kept per key
+    DURATION_MODEL_MIN_SAMPLES: int = 3  # before a key replaces the default durations
+    DURATION_PRIOR_WEIGHT: float = 5.0  # scenes after which a run's own pace outweighs history
+    GENERATION_WORKER_SLOTS: int = 4  # generation tasks running at once (worker --concurrency)
+
+    # Story memory compaction: scene digests -> chapter summaries -> act summaries;
+    # the recap in every chapter prompt stays within COMPACTION_RECAP_TOKENS (tiktoken)
+    COMPACTION_ENABLED: bool = True
+    COMPACTION_SCENE_DIGEST_TOKENS: int = 120
+    COMPACTION_CHAPTER_SUMMARY_TOKENS: int = 300
+    COMPACTION_ACT_SUMMARY_TOKENS: int = 400
+    COMPACTION_RECAP_TOKENS: int = 1500
+    COMPACTION_ACT_CHAPTERS: int = 8  # chapters per block when the plot has no usable acts
+
+    # Book-wide repetition index (MinHash over sentences and similes) feeding the scene validator
+    REPETITION_INDEX_ENABLED: bool = True
+    REPETITION_PASSAGE_THRESHOLD: float = 0.6  # estimated Jaccard similarity of a repeated sentence
+    REPETITION_METAPHOR_THRESHOLD: float = 0.7
+    REPETITION_INDEX_MAX_PROJECTS: int = 16  # project indexes kept in worker memory
+
+    # Per-scene tier / critique passes / retries planned against MAX_COST_PER_PROJECT
+    BUDGET_SCHEDULER_ENABLED: bool = True
+    BUDGET_SCHEDULER_RESERVE: float = 0.1  # budget share kept for continuity, genre audit and assembly
+
+    # Live token streaming of scene prose (Redis pub/sub -> SSE /projects/{id}/stream)
+    GENERATION_STREAM_ENABLED: bool = True
+    GENERATION_STREAM_HEARTBEAT: float = 15.0  # seconds between SSE keep-alive comments
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
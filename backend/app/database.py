@@ -28,6 +28,10 @@ engine = create_engine(
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Generation workers: objects stay readable after commit, so the event loop
+# never lazy-loads while the DB executor thread works on the session
+GenerationSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
 
 # Modern SQLAlchemy 2.0 declarative base
 class Base(DeclarativeBase):
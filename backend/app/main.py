@@ -11,6 +11,7 @@ import logging
 
 from app.config import settings
 from app.database import init_db
+from app.services.llm_clients import close_loop_http_pool, close_sync_http_client
 from app.api import projects, health
 from app.api import auth, payments, series, publishing
 from app.api import mirix  # MIRIX Memory System - NarraForge 3.0
@@ -67,6 +68,8 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown
     logger.info(f"Shutting down {settings.APP_NAME}")
+    await close_loop_http_pool()
+    close_sync_http_client()
 
 
 # Create FastAPI app
@@ -61,10 +61,14 @@ class Chapter(Base):
     # Scene-based generation tracking
     scenes_content = Column(JSONB, default=list)
     # [
-    #   {"scene_num": 1, "content": "...", "word_count": 500, "status": "finalized", "qa_score": 85},
+    #   {"scene_num": 1, "content": "...", "word_count": 500, "status": "finalized", "qa_score": 85,
+    #    "cost": 0.04, "model_used": "gpt-4o", "location": "...", "beat_sheet": {...},
+    #    "input_hash": "...", "content_hash": "...",  # see services/dependency_graph
+    #    "digest": "..."},  # compacted scene summary, see services/story_compactor
     #   {"scene_num": 2, "content": "...", "word_count": 600, "status": "repair_needed", "qa_score": 65},
     # ]
-    current_scene = Column(Integer, default=0)  # Which scene we're generating
+    # Committed scene by scene while DRAFTING - checkpoints a crashed run resumes from
+    current_scene = Column(Integer, default=0)  # Last scene checkpointed
 
     # Draft versions (for revisions)
     drafts = Column(JSONB, default=list)
@@ -103,7 +107,10 @@ class Chapter(Base):
     #   "duration_sec": 45,
     #   "retry_count": 0,
     #   "repair_count": 0,
-    #   "escalated_to_tier": null  # or "TIER_3" if escalated
+    #   "escalated_to_tier": null,  # or "TIER_3" if escalated
+    #   "dependencies": {"world": "...", "plot": "...", "outline": "...",
+    #                    "characters": {...}, "predecessor": "..."},  # input fingerprints
+    #   "summary": "..."  # compacted chapter summary (story_compactor)
     # }
 
     # Status (legacy - use 'status' enum instead)
@@ -20,7 +20,7 @@ class GenerationLog(Base):
     __tablename__ = "generation_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)  # NULL = call outside a project run
     
     # Pipeline step (1-15)
     step = Column(Integer, nullable=False)
@@ -28,14 +28,24 @@ class GenerationLog(Base):
     
     # Agent that performed the task
     agent_name = Column(String(100), nullable=True)  # "WORLD_ARCHITECT", "PROSE_WEAVER", etc.
+    task = Column(String(100), nullable=True)  # metadata["task"] of the AI call
+    chapter_number = Column(Integer, nullable=True)
+    scene_number = Column(Integer, nullable=True)
     
     # Model used
     model_tier = Column(Enum(ModelTier), nullable=False)
     model_name = Column(String(50), nullable=False)  # "gpt-4o-mini", "gpt-4o", etc.
+    provider = Column(String(20), nullable=True)  # "openai" / "anthropic"
     
     # Token usage
     tokens_in = Column(Integer, default=0)
     tokens_out = Column(Integer, default=0)
+    cache_read_tokens = Column(Integer, default=0)  # provider prompt cache
+    
+    # Served without an upstream call (response cache / single-flight follower)
+    cache_hit = Column(Integer, default=0)  # 1 = response cache hit
+    coalesced = Column(Integer, default=0)  # 1 = joined an in-flight identical request
+    streamed = Column(Integer, default=0)
     
     # Cost (in USD)
     cost = Column(Float, default=0.0)
@@ -58,6 +68,7 @@ class GenerationLog(Base):
     __table_args__ = (
         Index('idx_generation_logs_project_id', 'project_id'),
         Index('idx_generation_logs_project_step', 'project_id', 'step'),
+        Index('idx_generation_logs_timestamp', 'timestamp'),
     )
 
     def __repr__(self):
@@ -31,6 +31,10 @@ class PlotStructure(Base):
     #   "act_2b": {...},
     #   "act_3": {...}
     # }
+
+    # Rolling act summaries for chapter prompts (see services/story_compactor)
+    act_summaries = Column(JSONB, default=dict)
+    # {"Setup": {"summary": "...", "inputs": "<hash of the chapter summaries>"}, ...}
     
     # Main conflict
     main_conflict = Column(JSONB, default=dict)
@@ -18,7 +18,7 @@ Rozwiązania:
 - Burstiness Controls (kontrola zmienności stylu)
 """
 
-from typing import List, Dict, Set, Optional
+from typing import Any, List, Dict, Set, Optional
 from dataclasses import dataclass, field
 import re
 
@@ -421,10 +421,16 @@ class NarrativeAntiPatternValidator:
         )
         self.compiled_patterns = [re.compile(p, re.IGNORECASE) for p in self.forbidden_patterns]
 
-    def validate(self, text: str) -> Dict[str, any]:
+    def validate(self, text: str, repetition_hits: Optional[List[Any]] = None) -> Dict[str, any]:
         """
         Waliduje tekst pod kątem anty-wzorców.
 
+        Args:
+            text: Tekst sceny
+            repetition_hits: Powtórzenia wcześniejszych scen książki
+                (RepetitionIndex.check) - powtórzone zdanie jest krytyczne,
+                powtórzona metafora to ostrzeżenie
+
         Returns:
             Dict z wynikami walidacji:
             - passed: bool
@@ -433,6 +439,19 @@ class NarrativeAntiPatternValidator:
         """
         issues = []
 
+        # Powtórzenia z całej książki jako pierwsze - wskazują konkretne zdania do zmiany
+        for hit in repetition_hits or []:
+            issues.append({
+                "type": "repetition",
+                "kind": hit.kind,
+                "text": hit.text,
+                "earlier": hit.earlier,
+                "chapter": hit.chapter,
+                "scene": hit.scene,
+                "similarity": hit.similarity,
+                "severity": "critical" if hit.kind == "passage" else "warning"
+            })
+
         # Sprawdź zakazane wzorce
         for i, pattern in enumerate(self.compiled_patterns):
             matches = pattern.findall(text)
@@ -499,6 +518,13 @@ class NarrativeAntiPatternValidator:
                 suggestions.append(f"Unikaj tropu '{issue['trope']}': {issue['alternative']}")
             elif issue["type"] == "low_burstiness":
                 suggestions.append("Zróżnicuj długość zdań - przeplataj krótkie (3-5 słów) z długimi (20+)")
+            elif issue["type"] == "repetition":
+                what = "Zdanie" if issue["kind"] == "passage" else "Porównanie"
+                where = f"rozdział {issue['chapter']}" + (f", scenę {issue['scene']}" if issue["scene"] else "")
+                suggestions.append(
+                    f"{what} „{issue['text']}” powtarza {where} "
+                    f"(„{issue['earlier']}”) - napisz je zupełnie inaczej"
+                )
 
         return suggestions
 
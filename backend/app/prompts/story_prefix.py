@@ -0,0 +1,121 @@
+"""
+Story Prefix - byte-stable, cacheable context block for writer-path prompts
+
+Prompt caching (Anthropic cache_control, OpenAI automatic prefix caching)
+only pays off when the beginning of the prompt is byte-for-byte identical
+between calls. Every scene of a book shares the same world and cast, so this
+block is rendered once per book and appended to the role's system prompt:
+
+    [role system prompt] + [STORY PREFIX]   <- stable, cached
+    [user prompt: beat sheet, scene, previous content, ...]   <- varies
+
+Rules for anything rendered here:
+- no timestamps, counters, chapter/scene numbers or other per-call data
+- dicts serialized with sort_keys, characters in a fixed order
+- trimmed to fields the writer actually uses, so the prefix stays compact
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+
+# Fixed order of character roles in the cast block
+_ROLE_ORDER = {"protagonist": 0, "antagonist": 1, "supporting": 2, "minor": 3}
+
+# Upper bound for list-valued world sections (locations, cultures, ...)
+_MAX_ITEMS = 12
+
+
+def _dump(value: Any) -> str:
+    """Deterministic compact JSON"""
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ": "))
+
+
+def _trim_named_items(items: Any, fields: List[str]) -> List[Dict[str, Any]]:
+    if not isinstance(items, list):
+        return []
+    trimmed = []
+    for item in items[:_MAX_ITEMS]:
+        if isinstance(item, dict):
+            trimmed.append({k: item[k] for k in fields if item.get(k)})
+    return trimmed
+
+
+def _trim_world(world_bible: Dict[str, Any]) -> Dict[str, Any]:
+    geography = world_bible.get("geography") or {}
+    systems = world_bible.get("systems") or {}
+    cultures = world_bible.get("cultures") or {}
+    rules = world_bible.get("rules") or {}
+
+    world = {
+        "world_type": geography.get("world_type", ""),
+        "locations": _trim_named_items(geography.get("locations"), ["name", "type", "description"]),
+        "technology_level": systems.get("technology_level", ""),
+        "magic_system": systems.get("magic_system") or {},
+        "cultures": _trim_named_items(cultures.get("cultures"), ["name", "values", "customs"]),
+        "rules": {k: rules[k] for k in ("physics", "magic_rules", "limitations") if rules.get(k)},
+        "themes": world_bible.get("themes") or [],
+    }
+    return {k: v for k, v in world.items() if v}
+
+
+def _trim_cast_member(character: Dict[str, Any]) -> Dict[str, Any]:
+    profile = character.get("profile") or {}
+    psychology = profile.get("psychology") or {}
+    voice = character.get("voice_guide") or {}
+
+    member = {
+        "name": character.get("name", "Unknown"),
+        "role": character.get("role", "unknown"),
+        "wound": psychology.get("wound", psychology.get("ghost", "")),
+        "want": psychology.get("want", ""),
+        "need": psychology.get("need", ""),
+        "traits": (psychology.get("traits") or [])[:3],
+        "speechPatterns": voice.get("speechPatterns", ""),
+        "verbalTics": voice.get("verbalTics", ""),
+    }
+    return {k: v for k, v in member.items() if v}
+
+
+def build_story_prefix(
+    world_bible: Optional[Dict[str, Any]],
+    characters: Optional[List[Dict[str, Any]]]
+) -> str:
+    """
+    Render the stable world + cast block shared by all writer-path calls of a book.
+
+    Args:
+        world_bible: World bible dict (geography, systems, cultures, rules, themes)
+        characters: Full cast (name, role, profile, voice_guide)
+
+    Returns:
+        Prompt block; empty string when there is nothing to render
+    """
+    sections = []
+
+    if world_bible:
+        world = _trim_world(world_bible)
+        if world:
+            sections.append(f"## ŚWIAT (BIBLIA ŚWIATA)\n{_dump(world)}")
+
+    if characters:
+        cast = sorted(
+            (_trim_cast_member(c) for c in characters if isinstance(c, dict)),
+            key=lambda c: (_ROLE_ORDER.get(str(c.get("role", "")).lower(), 9), c.get("name", ""))
+        )
+        if cast:
+            sections.append(
+                "## OBSADA (JEDYNE ISTNIEJĄCE POSTACIE)\n"
+                + "\n".join(_dump(member) for member in cast)
+            )
+
+    if not sections:
+        return ""
+    return "# KONTEKST KSIĄŻKI (STAŁY)\n\n" + "\n\n".join(sections)
+
+
+def with_story_prefix(system_prompt: str, story_prefix: str) -> str:
+    """Append the stable story block after a role's system prompt"""
+    if not story_prefix:
+        return system_prompt
+    return f"{system_prompt}\n\n{story_prefix}"
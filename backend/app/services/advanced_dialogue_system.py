@@ -22,7 +22,7 @@ from enum import Enum
 import json
 import logging
 
-from app.services.ai_service import AIService
+from app.services.ai_service import AIService, ModelTier
 from app.models.project import GenreType
 
 logger = logging.getLogger(__name__)
@@ -865,13 +865,15 @@ Odpowiedz w JSON:
         try:
             response = await self.ai_service.generate(
                 prompt=prompt,
-                model_tier=1,
+                tier=ModelTier.TIER_1,
                 max_tokens=800,
-                temperature=0.3
+                temperature=0.3,
+                cache_response=True,
+                metadata={"agent": "AdvancedDialogueSystem", "task": "voice_validation"}
             )
 
             import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
             if json_match:
                 return json.loads(json_match.group(0))
 
@@ -18,8 +18,9 @@ Features:
 
 import logging
 import asyncio
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -35,6 +36,7 @@ from app.models.world_bible import WorldBible
 from app.models.character import Character, CharacterRole
 from app.models.plot_structure import PlotStructure
 from app.models.chapter import Chapter, ChapterStatus
+from app.models.continuity_fact import ContinuityFact
 from app.services.ai_service import get_ai_service, ModelTier
 from app.config import settings
 
@@ -48,33 +50,73 @@ from app.services.mirix_memory_system import (
 logger = logging.getLogger(__name__)
 
 # Import new pipeline components
+from app.services.budget_scheduler import BudgetScheduler
+from app.services.chapter_lease import ChapterLease, ChapterLeaseLost
 from app.services.chapter_pipeline import ChapterPipeline, PipelineConfig, get_chapter_pipeline
+from app.database import GenerationSessionLocal
 from app.services.context_pack_builder import get_context_pack_builder
+from app.services.generation_context import set_pipeline_step
+from app.services.db_executor import get_db_executor
+from app.services.generation_stream import StreamPublisher
+from app.services import dependency_graph
+from app.services.dependency_graph import ChapterStaleness
+from app.services.duration_model import (
+    PROSE_STEP,
+    SCENES_PER_CHAPTER,
+    DurationProfile,
+    get_duration_model,
+    prose_parallelism,
+)
 
 
-# Estimated duration for each step (in minutes)
-STEP_DURATIONS = {
-    1: 1,   # Inicjalizacja Projektu
-    2: 1,   # Parametryzacja
-    3: 1,   # World Bible
-    4: 3,   # Kreacja Postaci Głównych
-    5: 2,   # Kreacja Postaci Pobocznych
-    6: 2,   # Główna Oś Fabularna
-    7: 2,   # Wątki Poboczne
-    8: 2,   # Chapter Breakdown
-    9: 3,   # Scene Detailing
-    10: 1,  # Pre-Writing Validation
-    11: 20, # Prose Generation (LONGEST!)
-    12: 2,  # Continuity Check
-    13: 5,  # Style Polishing
-    14: 1,  # Genre Compliance
-    15: 1,  # Final Assembly
+# Parallel chapter mode: size of the opening rewritten by reconciliation, and
+# how much of the predecessor's ending it sees
+RECONCILE_OPENING_CHARS = 2500
+RECONCILE_PREVIOUS_CHARS = 2000
+
+# Canon facts of the world bible stored as ContinuityFact rows (one embedding request)
+MAX_CANON_FACTS = 300
+
+# Fan-out: how often a batch re-tries chapters claimed by another worker
+CHAPTER_LEASE_POLL_SECONDS = 30
+
+# Stable step keys for telemetry (generation_logs.step_name)
+STEP_NAMES = {
+    1: "initialization",
+    2: "parameters",
+    3: "world_building",
+    4: "main_characters",
+    5: "supporting_characters",
+    6: "main_plot",
+    7: "subplots",
+    8: "chapter_breakdown",
+    9: "scene_detailing",
+    10: "prewriting_validation",
+    11: "prose_generation",
+    12: "continuity_check",
+    13: "style_polishing",
+    14: "genre_compliance",
+    15: "final_assembly",
 }
 
 
 class GenerationProgress:
-    """Track generation progress"""
-    def __init__(self):
+    """
+    Track generation progress
+
+    Time estimates come from the duration model (learned from earlier runs,
+    see duration_model) and are corrected online: once scenes finish, the
+    pace of this run is blended with the learned scene duration
+    (DURATION_PRIOR_WEIGHT scenes' worth of history). Finished steps are
+    recorded for future runs (scenes by the chapter pipeline).
+    """
+    def __init__(self, profile: Optional[DurationProfile] = None, record: bool = True):
+        """
+        Args:
+            profile: What this run's durations depend on (genre, size, tier, ...)
+            record: Record step durations (off for resumed runs - reused
+                foundation steps finish instantly)
+        """
         self.total_steps = 15
         self.current_step = 0
         self.current_activity = ""
@@ -83,37 +125,89 @@ class GenerationProgress:
         self.warnings = []
         self.step_start_time = None
 
+        self.profile = profile or DurationProfile()
+        self.record = record
+        self.durations = get_duration_model()
+        self._step_clock: Optional[float] = None
+        self._prose_started_at: Optional[float] = None
+        self.scenes_planned = 0
+        self.scenes_left = 0
+        self.scenes_done = 0
+
     def update(self, step: int, activity: str, cost: float = 0.0):
         """Update progress"""
+        if step != self.current_step:
+            now = time.monotonic()
+            self._record_current_step(now)
+            self._step_clock = now
+            self.step_start_time = datetime.now()
+            if step == PROSE_STEP and self._prose_started_at is None:
+                self._prose_started_at = now
         self.current_step = step
         self.current_activity = activity
         self.total_cost += cost
-        self.step_start_time = datetime.now()
+
+    def finish(self):
+        """Record the last step of a finished run"""
+        self._record_current_step(time.monotonic())
+        self._step_clock = None
+
+    def _record_current_step(self, now: float):
+        if self.record and self.current_step and self._step_clock is not None:
+            self.durations.record_step(self.current_step, now - self._step_clock, self.profile)
+
+    def plan_prose(self, scenes: int, parallelism: Optional[int] = None):
+        """Scenes this run has to write (and how many chapters it writes at once)"""
+        if parallelism is not None:
+            self.profile.parallelism = max(1, parallelism)
+        self.scenes_planned = scenes
+        self.scenes_left = scenes
+        self.scenes_done = 0
+        self._prose_started_at = time.monotonic()
+
+    def scene_finished(self):
+        """A scene was written"""
+        self.scenes_done += 1
+        self.scenes_left = max(0, self.scenes_left - 1)
+
+    def skip_scenes(self, scenes: int):
+        """Planned scenes that turned out to be written already (resume)"""
+        self.scenes_left = max(0, self.scenes_left - scenes)
 
     def get_percentage(self) -> float:
         """Get completion percentage"""
         return (self.current_step / self.total_steps) * 100
 
+    def get_scene_pace(self) -> float:
+        """Wall-clock minutes per scene for the rest of this run"""
+        prior = self.durations.scene_minutes(self.profile) / max(1, self.profile.parallelism)
+        if not self.scenes_done or self._prose_started_at is None:
+            return prior
+        observed = (time.monotonic() - self._prose_started_at) / 60 / self.scenes_done
+        weight = settings.DURATION_PRIOR_WEIGHT
+        return (prior * weight + observed * self.scenes_done) / (weight + self.scenes_done)
+
     def get_estimated_time_remaining(self) -> int:
         """Get estimated time remaining in minutes"""
         if self.current_step >= self.total_steps:
             return 0
 
-        # Sum durations of remaining steps
-        remaining = sum(
-            STEP_DURATIONS[step]
-            for step in range(self.current_step + 1, self.total_steps + 1)
+        remaining = self.durations.remaining_minutes(
+            self.profile, self.current_step, self.scenes_left, self.get_scene_pace()
         )
 
-        # Add remaining time for current step
-        current_step_duration = STEP_DURATIONS.get(self.current_step, 1)
-        remaining += current_step_duration
+        # Add remaining time for current step (prose is counted per scene above)
+        if self.current_step != PROSE_STEP:
+            elapsed = (time.monotonic() - self._step_clock) / 60 if self._step_clock else 0.0
+            remaining += max(0.0, self.get_current_step_duration() - elapsed)
 
-        return remaining
+        return int(round(remaining))
 
     def get_current_step_duration(self) -> int:
         """Get estimated duration of current step in minutes"""
-        return STEP_DURATIONS.get(self.current_step, 1)
+        if self.current_step == PROSE_STEP and self.scenes_planned:
+            return max(1, int(round(self.scenes_planned * self.get_scene_pace())))
+        return max(1, int(round(self.durations.step_minutes(self.current_step, self.profile))))
 
 
 class AgentOrchestrator:
@@ -124,17 +218,44 @@ class AgentOrchestrator:
     Handles coordination, error recovery, progress tracking, and cost monitoring.
     """
 
-    def __init__(self, db: Session, project: Project):
+    def __init__(self, db: Session, project: Project, resume: bool = False, fanout: bool = False):
         """
         Initialize orchestrator
 
         Args:
             db: Database session
             project: Project to generate
+            resume: Continue an interrupted run - reuse the persisted world bible,
+                characters, plot and written chapters/scenes instead of regenerating
+            fanout: This orchestrator runs one part of a book split across Celery
+                tasks (see generation_tasks) - other workers spend on the same project
         """
         self.db = db
         self.project = project
-        self.progress = GenerationProgress()
+        self.resume = resume
+        self.fanout = fanout
+        self.budget_scheduler: Optional[BudgetScheduler] = None
+        params = project.parameters or {}
+        chapter_count = params.get('chapter_count', 25)
+        self.progress = GenerationProgress(
+            DurationProfile(
+                genre=project.genre.value,
+                chapter_count=chapter_count,
+                tier=self._chapter_pipeline_config().target_tier.name,
+                parallelism=prose_parallelism(chapter_count),
+            ),
+            record=not resume
+        )
+
+        # Session work of async code goes through the DB executor thread; progress
+        # writes are coalesced to one per PROGRESS_WRITE_INTERVAL_SECONDS
+        self.db_executor = get_db_executor()
+        self._progress_written_step: Optional[int] = None
+        self._progress_written_at = 0.0
+        self._pending_progress: Optional[Tuple[int, float, str]] = None
+        self._progress_lock = asyncio.Lock()
+        # Every progress update is pushed to watchers (Redis pub/sub), not only the coalesced writes
+        self.stream = StreamPublisher(project.id) if settings.GENERATION_STREAM_ENABLED else None
 
         # Initialize agents
         self.world_builder = WorldBuilderAgent()
@@ -146,7 +267,26 @@ class AgentOrchestrator:
         # AI service for metrics - use per-project metrics snapshot
         # DO NOT reset_metrics() on the singleton as it affects other running projects
         self.ai_service = get_ai_service()
-        self._cost_baseline = self.ai_service.get_metrics().total_cost
+        baseline_metrics = self.ai_service.get_metrics()
+        self._cost_baseline = baseline_metrics.total_cost
+        if resume and not fanout:
+            # actual_cost keeps growing from what the interrupted run already spent
+            self._cost_baseline -= project.actual_cost or 0.0
+        self._cost_synced = 0.0  # fan-out: spend already added to project.actual_cost
+        self._project_cost_seen = project.actual_cost or 0.0  # fan-out: last synced project total
+
+        # Scene tiers and quality passes are planned against the project budget
+        if settings.BUDGET_SCHEDULER_ENABLED:
+            self.budget_scheduler = BudgetScheduler(
+                settings.MAX_COST_PER_PROJECT,
+                chapter_count * SCENES_PER_CHAPTER,
+                spent=self._live_project_cost,
+                reserve=settings.BUDGET_SCHEDULER_RESERVE
+            )
+        self._prompt_cache_baseline = (
+            baseline_metrics.prompt_cache_read_tokens,
+            baseline_metrics.prompt_cache_creation_tokens
+        )
 
         # MIRIX Memory System - NarraForge 3.0
         self.mirix = get_mirix_system()
@@ -163,209 +303,739 @@ class AgentOrchestrator:
         logger.info(f"🚀 Starting FULL GENERATION for project {self.project.id}")
 
         try:
-            # Update project status
-            self.project.status = ProjectStatus.GENERATING
-            self.project.started_at = datetime.utcnow()
-            try:
-                self.db.commit()
-            except SQLAlchemyError as e:
-                self.db.rollback()
-                logger.error(f"Database commit failed: {e}", exc_info=True)
-                raise Exception(f"Nie udało się zaktualizować statusu projektu: {str(e)}")
+            world_bible, characters, plot_structure, params = await self._generate_foundation()
+            chapter_count = params.get('chapter_count', 25)
 
-            # Extract project parameters
-            params = self.project.parameters or {}
-            title_analysis = params.get('title_analysis', {})
+            # STEP 11: Generate ALL Chapters (THE BIG ONE!)
+            self.progress.plan_prose(chapter_count * SCENES_PER_CHAPTER)
+            await self._update_progress(11, f"Generowanie {chapter_count} rozdziałów (AI)")
+            chapters_data = await self._generate_all_chapters(
+                world_bible, characters, plot_structure, params
+            )
 
-            # STEP 1-2: Initialize (already done in simulation)
-            await self._update_progress(1, "Inicjalizacja projektu")
+            return await self._finish_book(chapters_data, world_bible, characters, plot_structure)
 
-            # Initialize MIRIX Memory System for this project
-            await self.mirix.initialize_project(str(self.project.id), self.project.genre)
-            logger.info(f"🧠 MIRIX Memory System initialized for project {self.project.id}")
+        except Exception as e:
+            return await self._fail_generation(e)
 
-            await asyncio.sleep(0.5)  # Brief pause
-            await self._update_progress(2, "Walidacja parametrów")
-            await asyncio.sleep(0.5)
+    # ---- Fan-out execution (one Celery task per chapter batch, see generation_tasks) ----
 
-            # STEP 3: Create World Bible
-            await self._update_progress(3, "Generowanie World Bible (AI)")
-            world_bible = await self._generate_world_bible(title_analysis, params)
+    async def generate_foundation(self) -> Dict[str, Any]:
+        """
+        Fan-out head: steps 1-10 and the chapter records.
 
-            # Store World Bible in MIRIX Memory
-            world_bible_dict = {
-                'geography': world_bible.geography,
-                'history': world_bible.history,
-                'systems': world_bible.systems,
-                'cultures': world_bible.cultures,
-                'rules': world_bible.rules,
-                'themes': params.get('title_analysis', {}).get('themes', [])
-            }
-            mirix_counts = await self.mirix.extract_and_store_from_world_bible(
-                str(self.project.id), world_bible_dict
-            )
-            logger.info(f"🧠 MIRIX: Stored {mirix_counts} from World Bible")
+        Chapters are then written by generate_chapter_batch() tasks and the
+        book is closed by finish_book() once every batch is done.
+        """
+        logger.info(f"🚀 Starting FAN-OUT GENERATION for project {self.project.id}")
 
-            # STEP 4-5: Create Characters
-            await self._update_progress(4, "Kreacja postaci głównych (AI)")
-            characters = await self._generate_characters(world_bible, title_analysis, params)
+        try:
+            world_bible, characters, plot_structure, params = await self._generate_foundation()
+            chapter_count = params.get('chapter_count', 25)
 
-            await self._update_progress(5, "Kreacja postaci pobocznych (AI)")
-            # (included in above - supporting characters)
+            pov_character = self._pov_character(characters)
+            for chapter_num in range(1, chapter_count + 1):
+                await self.db_executor.run(self._ensure_chapter_record, plot_structure, chapter_num, pov_character)
 
-            # Store Characters in MIRIX Memory
-            characters_data_for_mirix = [
+            self.progress.plan_prose(chapter_count * SCENES_PER_CHAPTER)
+            await self._update_progress(11, f"Generowanie {chapter_count} rozdziałów (AI)")
+            return {"success": True, "project_id": self.project.id, "chapter_count": chapter_count}
+
+        except Exception as e:
+            return await self._fail_generation(e)
+
+    async def generate_chapter_batch(self, chapter_numbers: List[int]) -> Dict[str, Any]:
+        """
+        Fan-out worker: write a batch of chapters in order.
+
+        A predecessor written by another task (or earlier in this batch) is
+        summarized from its prose, otherwise from the plot plan; chapters
+        written against a planned predecessor are marked for reconciliation
+        in finish_book().
+
+        Each chapter is claimed (ChapterLease) before it is written. A chapter
+        held by another live worker is left to it and checked again later.
+        """
+        try:
+            world_bible, characters, plot_structure = await self.db_executor.run(self._load_foundation)
+            params = self.project.parameters or {}
+            chapter_kwargs = self._chapter_kwargs(world_bible, characters, plot_structure, params)
+            chapter_pipeline = get_chapter_pipeline(self.db, self._chapter_pipeline_config())
+            set_pipeline_step(11, STEP_NAMES[11])
+            # This worker writes its batch one chapter at a time
+            self.progress.plan_prose(len(chapter_numbers) * SCENES_PER_CHAPTER, parallelism=1)
+
+            written = []
+            pending = sorted(chapter_numbers)
+            while pending:
+                held = []
+                for chapter_num in pending:
+                    await self.db_executor.run(self.db.refresh, self.project)
+                    if self.project.status != ProjectStatus.GENERATING:
+                        logger.warning(
+                            f"Project {self.project.id} is {self.project.status.value} - "
+                            f"stopping chapter batch {chapter_numbers}"
+                        )
+                        await self._flush_progress()
+                        return {"success": False, "aborted": True, "chapters": written}
+
+                    # One live writer per chapter (a redelivered batch may still be running elsewhere)
+                    lease = ChapterLease(self.project.id, chapter_num)
+                    if not await asyncio.to_thread(lease.acquire):
+                        logger.info(f"⏸️ Chapter {chapter_num} is being written by another worker - waiting")
+                        held.append(chapter_num)
+                        continue
+                    try:
+                        chapter_data = await self._write_batch_chapter(
+                            chapter_pipeline, plot_structure, chapter_num, chapter_kwargs, lease
+                        )
+                    except ChapterLeaseLost as e:
+                        logger.warning(f"⏸️ {e} - waiting for it")
+                        held.append(chapter_num)
+                        continue
+                    finally:
+                        await asyncio.to_thread(lease.release)
+
+                    written.append({"number": chapter_num, "word_count": chapter_data['word_count']})
+                    await self.db_executor.run(self._check_cost_limit, chapter_num)
+                    await self._update_progress(11, f"Pisanie rozdziałów: rozdział {chapter_num} zakończony (AI)")
+
+                # Held chapters are claimed once their holder finishes them (kept as
+                # written) or stops refreshing its lease (resumed from checkpoints)
+                if held:
+                    await asyncio.sleep(CHAPTER_LEASE_POLL_SECONDS)
+                pending = held
+
+            await self._flush_progress()
+            return {"success": True, "chapters": written}
+
+        except Exception as e:
+            return await self._fail_generation(e)
+
+    async def _write_batch_chapter(
+        self,
+        chapter_pipeline: ChapterPipeline,
+        plot_structure: PlotStructure,
+        chapter_num: int,
+        chapter_kwargs: Dict[str, Any],
+        lease: ChapterLease
+    ) -> Dict[str, Any]:
+        """Write one claimed chapter of a fan-out batch"""
+        chapter = await self.db_executor.run(self._load_chapter, chapter_num)
+        if chapter is None:
+            raise RuntimeError(f"Chapter {chapter_num} record missing - foundation task did not finish")
+
+        summaries, written_numbers = await self.db_executor.run(
+            self._fanout_chapter_summaries, plot_structure, chapter_num
+        )
+        planned_predecessor = chapter_num > 1 and chapter_num - 1 not in written_numbers
+        logger.info(
+            f"📝 Processing Chapter {chapter_num} through pipeline "
+            f"({'planned' if planned_predecessor else 'written'} predecessor)..."
+        )
+        chapter_data = await self._write_chapter(chapter_pipeline, chapter, summaries, chapter_kwargs, lease)
+
+        if planned_predecessor:
+            await self.db_executor.run(self._mark_planned_predecessor, chapter)
+        return chapter_data
+
+    async def finish_book(self, batch_results: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Fan-out join (chord callback): reconcile chapter openings, then steps 12-15.
+        """
+        try:
+            if any(not (result or {}).get("success") for result in batch_results or []):
+                await self.db_executor.run(self.db.refresh, self.project)
+                logger.error(f"Chapter batches of project {self.project.id} failed - not finalizing")
+                return {
+                    "success": False,
+                    "error": self.project.error_message or "Chapter generation failed",
+                    "project_id": self.project.id
+                }
+
+            world_bible, characters, plot_structure = await self.db_executor.run(self._load_foundation)
+            chapters = await self.db_executor.run(self._project_chapters)
+            unfinished = [c.number for c in chapters if c.status == ChapterStatus.DRAFTING or not c.content]
+            if unfinished:
+                raise RuntimeError(f"Chapters not written: {unfinished}")
+
+            chapters_data = [
                 {
-                    'name': c.name,
-                    'role': c.role.value,
-                    'profile': c.profile,
-                    'arc': c.arc,
-                    'archetype': c.profile.get('archetype', '') if c.profile else '',
-                    'relationships': c.relationships
+                    'number': c.number,
+                    'content': c.content,
+                    'word_count': c.word_count,
+                    'quality_score': c.get_qa_total() or 85.0,
                 }
-                for c in characters
+                for c in chapters
+            ]
+            by_number = {data['number']: data for data in chapters_data}
+
+            provisional = [
+                c for c in chapters
+                if (c.generation_meta or {}).get("planned_predecessor")
+                and not (c.generation_meta or {}).get("reconciled_opening")
+                and c.number - 1 in by_number
             ]
-            char_counts = await self.mirix.extract_and_store_from_characters(
-                str(self.project.id), characters_data_for_mirix
+            if provisional and settings.CHAPTER_RECONCILIATION_ENABLED:
+                await self._update_progress(11, f"Uzgadnianie początków {len(provisional)} rozdziałów (AI)")
+                semaphore = asyncio.Semaphore(max(1, settings.CHAPTER_CONCURRENCY))
+
+                async def reconcile(chapter: Chapter) -> None:
+                    async with semaphore:
+                        await self._reconcile_chapter_opening(
+                            chapter.id, by_number[chapter.number], by_number[chapter.number - 1]
+                        )
+
+                await self._gather_or_cancel([reconcile(c) for c in provisional])
+
+            return await self._finish_book(chapters_data, world_bible, characters, plot_structure)
+
+        except Exception as e:
+            return await self._fail_generation(e)
+
+    # ---- Incremental regeneration (content-hash dependency graph, see dependency_graph) ----
+
+    def staleness_report(self) -> List[Dict[str, Any]]:
+        """Verdict for every chapter of a generated book - no AI calls"""
+        world_bible, characters, plot_structure = self._load_foundation()
+        chapter_kwargs = self._chapter_kwargs(
+            world_bible, characters, plot_structure, self.project.parameters or {}
+        )
+        return [
+            self._diagnose_chapter(chapter, chapter_kwargs).to_dict()
+            for chapter in self._project_chapters()
+        ]
+
+    async def regenerate_stale(self) -> Dict[str, Any]:
+        """
+        Rebuild only what the user's edits invalidated.
+
+        Chapters are walked in order and re-diagnosed just before their turn,
+        because a rewritten chapter changes the ending its successor follows:
+        - hard input changed -> the chapter is rewritten from scene 1
+        - scene edited -> the scenes after it are rewritten, earlier ones kept
+        - predecessor ending changed -> only the opening is reconciled
+        Chapters written before fingerprints existed are stamped as they are.
+        """
+        logger.info(f"♻️ Regenerating stale parts of project {self.project.id}")
+        run_db = self.db_executor.run
+
+        try:
+            world_bible, characters, plot_structure = await run_db(self._load_foundation)
+            chapter_kwargs = self._chapter_kwargs(
+                world_bible, characters, plot_structure, self.project.parameters or {}
             )
-            logger.info(f"🧠 MIRIX: Stored {char_counts} from Characters")
+            chapter_pipeline = get_chapter_pipeline(self.db, self._chapter_pipeline_config())
+            chapters = await run_db(self._project_chapters)
 
-            # STEP 6-7: Create Plot Structure
-            await self._update_progress(6, "Projektowanie struktury fabuły (AI)")
-            plot_structure = await self._generate_plot_structure(
-                world_bible, characters, params
+            stale = [
+                c.number for c in chapters
+                if (await run_db(self._diagnose_chapter, c, chapter_kwargs)).needs_work
+            ]
+            await run_db(self._set_project_status, ProjectStatus.GENERATING)
+            self.progress.plan_prose(len(stale) * SCENES_PER_CHAPTER)
+            await self._update_progress(11, f"Regeneracja nieaktualnych rozdziałów: {len(stale)} (AI)")
+
+            rewritten: List[int] = []
+            reconciled: List[int] = []
+            previous: Optional[Chapter] = None
+            for chapter in chapters:
+                verdict = await run_db(self._diagnose_chapter, chapter, chapter_kwargs)
+
+                if verdict.kind == dependency_graph.UNTRACKED:
+                    await run_db(self._stamp_current_dependencies, chapter, chapter_kwargs)
+                elif verdict.kind in (dependency_graph.CHAPTER, dependency_graph.SCENES, dependency_graph.UNWRITTEN):
+                    logger.info(
+                        f"♻️ Chapter {chapter.number}: {verdict.kind} stale from scene {verdict.from_scene} "
+                        f"({', '.join(verdict.changed) or 'not written'})"
+                    )
+                    await self._rewrite_stale_chapter(chapter_pipeline, chapter, verdict, chapter_kwargs)
+                    rewritten.append(chapter.number)
+                    await run_db(self._check_cost_limit, chapter.number)
+                    await self._update_progress(11, f"Regeneracja: rozdział {chapter.number} przepisany (AI)")
+                    verdict = await run_db(self._diagnose_chapter, chapter, chapter_kwargs)
+
+                if (
+                    verdict.kind == dependency_graph.OPENING
+                    and previous is not None
+                    and settings.CHAPTER_RECONCILIATION_ENABLED
+                ):
+                    await self._reconcile_chapter_opening(
+                        chapter.id,
+                        {'number': chapter.number, 'content': chapter.content, 'word_count': chapter.word_count},
+                        {'number': previous.number, 'content': previous.content}
+                    )
+                    await run_db(self.db.refresh, chapter)
+                    verdict = await run_db(self._diagnose_chapter, chapter, chapter_kwargs)
+                    if verdict.kind == dependency_graph.FRESH:
+                        reconciled.append(chapter.number)
+
+                previous = chapter
+
+            project_cost = await run_db(self._mark_completed)
+
+            logger.info(
+                f"✅ Regeneration of project {self.project.id} complete: "
+                f"{len(rewritten)} chapters rewritten, {len(reconciled)} openings reconciled, "
+                f"{len(chapters) - len(rewritten) - len(reconciled)} kept"
             )
+            return {
+                "success": True,
+                "project_id": self.project.id,
+                "rewritten_chapters": rewritten,
+                "reconciled_chapters": reconciled,
+                "total_cost": project_cost
+            }
 
-            await self._update_progress(7, "Projektowanie wątków pobocznych (AI)")
-            # (included in plot structure - subplots)
-
-            # Store Plot themes in MIRIX Semantic Memory
-            if plot_structure.subplots:
-                for subplot in plot_structure.subplots:
-                    if isinstance(subplot, dict) and subplot.get('theme'):
-                        await self.mirix.store_concept(
-                            project_id=str(self.project.id),
-                            concept=subplot.get('theme', subplot.get('name', 'Subplot')),
-                            concept_type="subplot_theme",
-                            definition=subplot.get('description', '')
-                        )
-            logger.info(f"🧠 MIRIX: Stored semantic concepts from Plot Structure")
+        except Exception as e:
+            return await self._fail_generation(e)
 
-            # STEP 8-9: Chapter Planning
-            await self._update_progress(8, "Planowanie rozdziałów")
-            chapter_count = params.get('chapter_count', 25)
+    async def _rewrite_stale_chapter(
+        self,
+        chapter_pipeline: ChapterPipeline,
+        chapter: Chapter,
+        verdict: ChapterStaleness,
+        chapter_kwargs: Dict[str, Any]
+    ) -> None:
+        """Rewrite a chapter from its first stale scene, reusing the scene checkpoint resume"""
+        meta = chapter.generation_meta or {}
+        kept = [
+            scene for scene in chapter.scenes_content or []
+            if verdict.kind == dependency_graph.SCENES and scene.get("scene_num", 0) < verdict.from_scene
+        ]
+        # Kept scene 1 still follows the predecessor it was written against; a
+        # reconciled opening lives only in chapter.content and is lost on reassembly
+        keeps_opening = bool(kept) and not meta.get("reconciled_opening")
+        stored_predecessor = (meta.get("dependencies") or {}).get("predecessor")
+
+        chapter_summaries = await self.db_executor.run(self._reset_for_rewrite, chapter, kept)
+        await self._write_chapter(chapter_pipeline, chapter, chapter_summaries, chapter_kwargs)
+
+        if kept:
+            await self.db_executor.run(
+                self._stamp_dependencies,
+                self.db, chapter, chapter_kwargs, stored_predecessor if keeps_opening else None
+            )
 
-            await self._update_progress(9, "Szczegółowe plany scen")
-            # (will be done per-chapter)
+    def _reset_for_rewrite(self, chapter: Chapter, kept: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Drop the stale scene checkpoints; returns the predecessor summaries to write against"""
+        chapter.scenes_content = kept
+        chapter.current_scene = len(kept)
+        chapter.status = ChapterStatus.DRAFTING
+        self.db.commit()
 
-            # STEP 10: Pre-writing validation
-            await self._update_progress(10, "Walidacja przed pisaniem")
-            await asyncio.sleep(0.5)
+        return {
+            number: self._summarize_chapter_content(content)
+            for number, content in self.db.query(Chapter.number, Chapter.content).filter(
+                Chapter.project_id == self.project.id,
+                Chapter.number < chapter.number
+            )
+            if content
+        }
 
-            # STEP 11: Generate ALL Chapters (THE BIG ONE!)
-            await self._update_progress(11, f"Generowanie {chapter_count} rozdziałów (AI)")
-            chapters_data = await self._generate_all_chapters(
-                world_bible, characters, plot_structure, params
+    def _stamp_current_dependencies(self, chapter: Chapter, chapter_kwargs: Dict[str, Any]) -> None:
+        """Accept a chapter as it is (written before fingerprints were recorded)"""
+        self._stamp_dependencies(
+            self.db, chapter, chapter_kwargs, self._predecessor_fingerprint(self.db, chapter.number)
+        )
+
+    def _project_chapters(self) -> List[Chapter]:
+        return (
+            self.db.query(Chapter)
+            .filter(Chapter.project_id == self.project.id)
+            .order_by(Chapter.number)
+            .all()
+        )
+
+    def _load_chapter(self, chapter_num: int) -> Optional[Chapter]:
+        return self.db.query(Chapter).filter(
+            Chapter.project_id == self.project.id,
+            Chapter.number == chapter_num
+        ).first()
+
+    def _mark_planned_predecessor(self, chapter: Chapter) -> None:
+        """Flag a chapter written against a planned predecessor for reconciliation in finish_book()"""
+        if (chapter.generation_meta or {}).get("reconciled_opening"):
+            return
+        chapter.generation_meta = {**(chapter.generation_meta or {}), "planned_predecessor": True}
+        self.db.commit()
+
+    def _load_foundation(self) -> Tuple[WorldBible, List[Character], PlotStructure]:
+        """World bible, characters and plot persisted by the fan-out head task"""
+        world_bible = self._resumable_world_bible()
+        characters = self._resumable_characters()
+        plot_structure = self._resumable_plot_structure()
+        if world_bible is None or not characters or plot_structure is None:
+            raise RuntimeError(
+                f"Project {self.project.id}: world bible, characters or plot structure missing"
             )
+        return world_bible, characters, plot_structure
 
-            # STEP 12: Continuity Check
-            await self._update_progress(12, "Sprawdzanie spójności (AI)")
-            await self._validate_continuity(chapters_data, world_bible, characters, plot_structure)
+    def _fanout_chapter_summaries(
+        self,
+        plot_structure: PlotStructure,
+        chapter_num: int
+    ) -> Tuple[Dict[int, str], set]:
+        """Predecessor summaries from written chapters (any worker), planned ones otherwise"""
+        written = {
+            number: content
+            for number, content, status in self.db.query(Chapter.number, Chapter.content, Chapter.status).filter(
+                Chapter.project_id == self.project.id,
+                Chapter.number < chapter_num
+            )
+            if content and status not in (ChapterStatus.PLANNED, ChapterStatus.DRAFTING)
+        }
+        summaries = {
+            n: self._summarize_chapter_content(written[n]) if n in written
+            else self._planned_chapter_summary(plot_structure, n)
+            for n in range(1, chapter_num)
+        }
+        return summaries, set(written)
 
-            # STEP 13: Style Polishing
-            await self._update_progress(13, "Polerowanie stylu")
-            # (done during generation - QC agent)
+    async def _generate_foundation(self) -> Tuple[WorldBible, List[Character], PlotStructure, Dict[str, Any]]:
+        """Steps 1-10: world bible, characters and plot structure"""
+        # Update project status
+        await self.db_executor.run(self._mark_generating)
 
-            # STEP 14: Genre Compliance
-            await self._update_progress(14, "Audyt zgodności z gatunkiem (AI)")
-            await self._validate_genre_compliance(chapters_data)
+        # Extract project parameters
+        params = self.project.parameters or {}
+        title_analysis = params.get('title_analysis', {})
 
-            # STEP 15: Finalization
-            await self._update_progress(15, "Finalizacja i eksport")
-            await asyncio.sleep(0.5)
+        # STEP 1-2: Initialize (already done in simulation)
+        await self._update_progress(1, "Inicjalizacja projektu")
 
-            # Mark as completed
-            self.project.status = ProjectStatus.COMPLETED
-            self.project.progress_percentage = 100.0
-            self.project.current_step = 15
-            self.project.current_activity = "Zakończone ✅"
-            self.project.completed_at = datetime.utcnow()
+        # Initialize MIRIX Memory System for this project
+        await self.mirix.initialize_project(str(self.project.id), self.project.genre)
+        logger.info(f"🧠 MIRIX Memory System initialized for project {self.project.id}")
 
-            # Update actual cost (delta from baseline to avoid cross-project interference)
-            metrics = self.ai_service.get_metrics()
-            project_cost = metrics.total_cost - self._cost_baseline
-            self.project.actual_cost = project_cost
+        await asyncio.sleep(0.5)  # Brief pause
+        await self._update_progress(2, "Walidacja parametrów")
+        await asyncio.sleep(0.5)
 
-            try:
-                self.db.commit()
-            except SQLAlchemyError as e:
-                self.db.rollback()
-                logger.error(f"Failed to commit completion status: {e}", exc_info=True)
-                raise Exception(f"Nie udało się zapisać statusu zakończenia: {str(e)}")
+        # STEP 3: Create World Bible
+        await self._update_progress(3, "Generowanie World Bible (AI)")
+        world_bible = await self.db_executor.run(self._resumable_world_bible)
+        if world_bible is None:
+            world_bible = await self._generate_world_bible(title_analysis, params)
 
-            # Get MIRIX memory statistics
-            mirix_stats = self.mirix.get_memory_statistics(str(self.project.id))
+        # Store World Bible in MIRIX Memory
+        world_bible_dict = {
+            'geography': world_bible.geography,
+            'history': world_bible.history,
+            'systems': world_bible.systems,
+            'cultures': world_bible.cultures,
+            'rules': world_bible.rules,
+            'themes': params.get('title_analysis', {}).get('themes', [])
+        }
+        mirix_counts = await self.mirix.extract_and_store_from_world_bible(
+            str(self.project.id), world_bible_dict
+        )
+        logger.info(f"🧠 MIRIX: Stored {mirix_counts} from World Bible")
+        await self._store_canon_facts(world_bible_dict)
 
-            # Generate report
-            report = {
-                "success": True,
-                "project_id": self.project.id,
-                "project_name": self.project.name,
-                "statistics": {
-                    "world_bible": 1,
-                    "characters": len(characters),
-                    "plot_structure": 1,
-                    "chapters": len(chapters_data),
-                    "total_words": sum(ch['word_count'] for ch in chapters_data)
-                },
-                "ai_metrics": {
-                    "total_cost": project_cost,
-                    "total_tokens": metrics.total_tokens,
-                    "api_calls": metrics.calls_made,
-                    "errors": metrics.errors
-                },
-                "quality_scores": {
-                    "average_chapter_quality": sum(
-                        ch.get('quality_score', 0) for ch in chapters_data
-                    ) / len(chapters_data) if chapters_data else 0
-                },
-                "mirix_memory": {
-                    "total_memory_items": mirix_stats.get("total_items", 0),
-                    "layers": mirix_stats.get("layers", {})
-                }
+        # STEP 4-5: Create Characters
+        await self._update_progress(4, "Kreacja postaci głównych (AI)")
+        characters = await self.db_executor.run(self._resumable_characters)
+        if not characters:
+            characters = await self._generate_characters(world_bible, title_analysis, params)
+
+        await self._update_progress(5, "Kreacja postaci pobocznych (AI)")
+        # (included in above - supporting characters)
+
+        # Store Characters in MIRIX Memory
+        characters_data_for_mirix = [
+            {
+                'name': c.name,
+                'role': c.role.value,
+                'profile': c.profile,
+                'arc': c.arc,
+                'archetype': c.profile.get('archetype', '') if c.profile else '',
+                'relationships': c.relationships
             }
+            for c in characters
+        ]
+        char_counts = await self.mirix.extract_and_store_from_characters(
+            str(self.project.id), characters_data_for_mirix
+        )
+        logger.info(f"🧠 MIRIX: Stored {char_counts} from Characters")
 
-            logger.info(
-                f"✅ GENERATION COMPLETE! Project {self.project.id}\n"
-                f"   📊 Stats: {len(characters)} characters, {len(chapters_data)} chapters\n"
-                f"   💰 Cost: ${metrics.total_cost:.2f}\n"
-                f"   📝 Words: {report['statistics']['total_words']:,}\n"
-                f"   🧠 MIRIX Memory: {mirix_stats.get('total_items', 0)} items across 6 layers"
+        # STEP 6-7: Create Plot Structure
+        await self._update_progress(6, "Projektowanie struktury fabuły (AI)")
+        plot_structure = await self.db_executor.run(self._resumable_plot_structure)
+        if plot_structure is None:
+            plot_structure = await self._generate_plot_structure(
+                world_bible, characters, params
             )
 
-            return report
+        await self._update_progress(7, "Projektowanie wątków pobocznych (AI)")
+        # (included in plot structure - subplots)
 
-        except Exception as e:
-            error_details = f"{type(e).__name__}: {str(e)}"
-            logger.error(f"❌ Generation failed for project {self.project.id}: {error_details}", exc_info=True)
+        # Store Plot themes in MIRIX Semantic Memory
+        if plot_structure.subplots:
+            for subplot in plot_structure.subplots:
+                if isinstance(subplot, dict) and subplot.get('theme'):
+                    await self.mirix.store_concept(
+                        project_id=str(self.project.id),
+                        concept=subplot.get('theme', subplot.get('name', 'Subplot')),
+                        concept_type="subplot_theme",
+                        definition=subplot.get('description', '')
+                    )
+        logger.info(f"🧠 MIRIX: Stored semantic concepts from Plot Structure")
 
-            # Mark as failed with detailed error message
-            self.project.status = ProjectStatus.FAILED
-            self.project.current_activity = f"Błąd: {str(e)}"
-            self.project.error_message = error_details
-            try:
-                self.db.commit()
-            except SQLAlchemyError as commit_error:
-                self.db.rollback()
-                logger.error(f"Failed to commit error status: {commit_error}", exc_info=True)
-                # Don't raise here - we're already handling an error
+        # STEP 8-9: Chapter Planning
+        await self._update_progress(8, "Planowanie rozdziałów")
 
-            return {
-                "success": False,
-                "error": error_details,
-                "error_type": type(e).__name__,
-                "project_id": self.project.id
+        await self._update_progress(9, "Szczegółowe plany scen")
+        # (will be done per-chapter)
+
+        # STEP 10: Pre-writing validation
+        await self._update_progress(10, "Walidacja przed pisaniem")
+        await asyncio.sleep(0.5)
+
+        return world_bible, characters, plot_structure, params
+
+    async def _finish_book(
+        self,
+        chapters_data: List[Dict[str, Any]],
+        world_bible: WorldBible,
+        characters: List[Character],
+        plot_structure: PlotStructure
+    ) -> Dict[str, Any]:
+        """Steps 12-15: validation, finalization and the generation report"""
+        # STEP 12: Continuity Check
+        await self._update_progress(12, "Sprawdzanie spójności (AI)")
+        await self._validate_continuity(chapters_data, world_bible, characters, plot_structure)
+
+        # STEP 13: Style Polishing
+        await self._update_progress(13, "Polerowanie stylu")
+        # (done during generation - QC agent)
+
+        # STEP 14: Genre Compliance
+        await self._update_progress(14, "Audyt zgodności z gatunkiem (AI)")
+        await self._validate_genre_compliance(chapters_data)
+
+        # STEP 15: Finalization
+        await self._update_progress(15, "Finalizacja i eksport")
+        await asyncio.sleep(0.5)
+        await asyncio.to_thread(self.progress.finish)
+
+        # Mark as completed
+        metrics = self.ai_service.get_metrics()
+        project_cost = await self.db_executor.run(self._mark_completed)
+
+        # Get MIRIX memory statistics
+        mirix_stats = self.mirix.get_memory_statistics(str(self.project.id))
+
+        # Generate report
+        report = {
+            "success": True,
+            "project_id": self.project.id,
+            "project_name": self.project.name,
+            "statistics": {
+                "world_bible": 1,
+                "characters": len(characters),
+                "plot_structure": 1,
+                "chapters": len(chapters_data),
+                "total_words": sum(ch['word_count'] for ch in chapters_data)
+            },
+            "ai_metrics": {
+                "total_cost": project_cost,
+                "total_tokens": metrics.total_tokens,
+                "api_calls": metrics.calls_made,
+                "errors": metrics.errors,
+                "prompt_cache_read_tokens": metrics.prompt_cache_read_tokens - self._prompt_cache_baseline[0],
+                "prompt_cache_creation_tokens": metrics.prompt_cache_creation_tokens - self._prompt_cache_baseline[1]
+            },
+            "budget_scheduler": self.budget_scheduler.get_stats() if self.budget_scheduler else None,
+            "quality_scores": {
+                "average_chapter_quality": sum(
+                    ch.get('quality_score', 0) for ch in chapters_data
+                ) / len(chapters_data) if chapters_data else 0
+            },
+            "mirix_memory": {
+                "total_memory_items": mirix_stats.get("total_items", 0),
+                "layers": mirix_stats.get("layers", {})
             }
+        }
+
+        logger.info(
+            f"✅ GENERATION COMPLETE! Project {self.project.id}\n"
+            f"   📊 Stats: {len(characters)} characters, {len(chapters_data)} chapters\n"
+            f"   💰 Cost: ${metrics.total_cost:.2f}\n"
+            f"   📝 Words: {report['statistics']['total_words']:,}\n"
+            f"   🧠 MIRIX Memory: {mirix_stats.get('total_items', 0)} items across 6 layers"
+        )
+
+        return report
+
+    def _mark_completed(self) -> float:
+        """Mark the project COMPLETED with its final cost; returns the cost"""
+        self.project.status = ProjectStatus.COMPLETED
+        self.project.progress_percentage = 100.0
+        self.project.current_step = 15
+        self.project.current_activity = "Zakończone ✅"
+        self.project.completed_at = datetime.utcnow()
+
+        # Update actual cost (delta from baseline to avoid cross-project interference)
+        project_cost = self._sync_project_cost()
+
+        try:
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Failed to commit completion status: {e}", exc_info=True)
+            raise Exception(f"Nie udało się zapisać statusu zakończenia: {str(e)}")
+        self._publish_progress(eta_minutes=0)
+        return project_cost
+
+    def _set_project_status(self, status: ProjectStatus) -> None:
+        self.project.status = status
+        self.db.commit()
+
+    def _mark_generating(self) -> None:
+        """Project status GENERATING (start time kept on resume)"""
+        self.project.status = ProjectStatus.GENERATING
+        if not (self.resume and self.project.started_at):
+            self.project.started_at = datetime.utcnow()
+        try:
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Database commit failed: {e}", exc_info=True)
+            raise Exception(f"Nie udało się zaktualizować statusu projektu: {str(e)}")
+
+    async def _fail_generation(self, e: Exception) -> Dict[str, Any]:
+        """Mark the project as failed and build the error report"""
+        error_details = f"{type(e).__name__}: {str(e)}"
+        logger.error(f"❌ Generation failed for project {self.project.id}: {error_details}", exc_info=True)
+
+        try:
+            await self.db_executor.run(self._save_failure, str(e), error_details)
+        except Exception as save_error:
+            # Don't raise here - we're already handling an error
+            logger.error(f"Failed to save error status: {save_error}", exc_info=True)
+        self._publish_progress(error_message=error_details)
+
+        return {
+            "success": False,
+            "error": error_details,
+            "error_type": type(e).__name__,
+            "project_id": self.project.id
+        }
+
+    def _save_failure(self, error: str, error_details: str) -> None:
+        # Mark as failed with detailed error message
+        self.project.status = ProjectStatus.FAILED
+        self.project.current_activity = f"Błąd: {error}"
+        self.project.error_message = error_details
+        try:
+            self.db.commit()
+        except SQLAlchemyError as commit_error:
+            self.db.rollback()
+            logger.error(f"Failed to commit error status: {commit_error}", exc_info=True)
+
+    def _save_foundation_rows(self, rows: List[Any], label: str) -> None:
+        """Insert world bible / characters / plot rows and load their ids (DB executor thread)"""
+        self.db.add_all(rows)
+        try:
+            self.db.commit()
+            for row in rows:
+                self.db.refresh(row)
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Failed to save {label}: {e}", exc_info=True)
+            raise Exception(f"Nie udało się zapisać {label} do bazy: {str(e)}")
+
+    def _resumable_world_bible(self) -> Optional[WorldBible]:
+        """World bible saved by the interrupted run (resume only)"""
+        if not self.resume:
+            return None
+        world_bible = self.db.query(WorldBible).filter(WorldBible.project_id == self.project.id).first()
+        if world_bible:
+            logger.info(f"♻️ Resume: reusing world bible (ID: {world_bible.id})")
+        return world_bible
+
+    async def _store_canon_facts(self, world_bible_dict: Dict[str, Any]) -> None:
+        """World rules and places of the world bible as embedded ContinuityFact rows (RAG per chapter)"""
+        facts: List[Tuple[str, str, str]] = []
+        systems = world_bible_dict.get('systems')
+        for system_name, system_data in (systems.items() if isinstance(systems, dict) else []):
+            if isinstance(system_data, dict):
+                facts.extend((str(rule), "world_rule", system_name) for rule in system_data.get('rules') or [])
+        if isinstance(world_bible_dict.get('rules'), list):
+            facts.extend((str(rule), "world_rule", "") for rule in world_bible_dict['rules'])
+        if isinstance(world_bible_dict.get('geography'), dict):
+            facts.extend(
+                (f"{location}: {str(desc)[:200]}", "geography", location)
+                for location, desc in world_bible_dict['geography'].items()
+            )
+        facts = [fact for fact in facts if fact[0].strip()][:MAX_CANON_FACTS]
+        if not facts or await self.db_executor.run(self._has_continuity_facts):
+            return
+
+        try:
+            embeddings = await self.ai_service.embed(
+                [fact for fact, _, _ in facts], metadata={"agent": "AgentOrchestrator", "task": "canon_facts"}
+            )
+        except Exception as e:
+            logger.warning(f"Canon facts stored without embeddings (text match only): {e}")
+            embeddings = None
+        if not embeddings or len(embeddings) != len(facts):
+            embeddings = [None] * len(facts)
+
+        await self.db_executor.run(self._save_canon_facts, facts, embeddings)
+        logger.info(f"📌 Stored {len(facts)} canon facts for retrieval")
+
+    def _has_continuity_facts(self) -> bool:
+        """Facts already stored (resume)"""
+        return self.db.query(
+            self.db.query(ContinuityFact).filter(ContinuityFact.project_id == self.project.id).exists()
+        ).scalar()
+
+    def _save_canon_facts(
+        self,
+        facts: List[Tuple[str, str, str]],
+        embeddings: List[Optional[List[float]]]
+    ) -> None:
+        try:
+            self.db.add_all([
+                ContinuityFact(
+                    project_id=self.project.id,
+                    fact=fact,
+                    source_location="world_bible",
+                    fact_type=fact_type,
+                    related_entity=entity[:255] or None,
+                    embedding=embedding,
+                )
+                for (fact, fact_type, entity), embedding in zip(facts, embeddings)
+            ])
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.warning(f"Canon facts not stored (non-critical): {e}")
+
+    def _resumable_characters(self) -> List[Character]:
+        """Characters saved by the interrupted run (resume only)"""
+        if not self.resume:
+            return []
+        characters = (
+            self.db.query(Character)
+            .filter(Character.project_id == self.project.id)
+            .order_by(Character.id)
+            .all()
+        )
+        if characters:
+            logger.info(f"♻️ Resume: reusing {len(characters)} characters")
+        return characters
+
+    def _resumable_plot_structure(self) -> Optional[PlotStructure]:
+        """Plot structure saved by the interrupted run (resume only)"""
+        if not self.resume:
+            return None
+        plot_structure = self.db.query(PlotStructure).filter(PlotStructure.project_id == self.project.id).first()
+        if plot_structure:
+            logger.info(f"♻️ Resume: reusing plot structure (ID: {plot_structure.id})")
+        return plot_structure
 
     async def _generate_world_bible(
         self,
@@ -395,14 +1065,7 @@ class AgentOrchestrator:
             notes=world_data.get('notes', '')
         )
 
-        self.db.add(world_bible)
-        try:
-            self.db.commit()
-            self.db.refresh(world_bible)
-        except SQLAlchemyError as e:
-            self.db.rollback()
-            logger.error(f"Failed to save world bible: {e}", exc_info=True)
-            raise Exception(f"Nie udało się zapisać World Bible do bazy: {str(e)}")
+        await self.db_executor.run(self._save_foundation_rows, [world_bible], "World Bible")
 
         logger.info(f"✅ World bible created and saved (ID: {world_bible.id})")
         return world_bible
@@ -461,17 +1124,9 @@ class AgentOrchestrator:
                 relationships=char_data.get('relationships', {})
             )
 
-            self.db.add(character)
             characters.append(character)
 
-        try:
-            self.db.commit()
-            for char in characters:
-                self.db.refresh(char)
-        except SQLAlchemyError as e:
-            self.db.rollback()
-            logger.error(f"Failed to save characters: {e}", exc_info=True)
-            raise Exception(f"Nie udało się zapisać postaci do bazy: {str(e)}")
+        await self.db_executor.run(self._save_foundation_rows, characters, "postaci")
 
         logger.info(f"✅ {len(characters)} characters created and saved")
         return characters
@@ -531,14 +1186,7 @@ class AgentOrchestrator:
             foreshadowing=plot_data.get('foreshadowing', [])
         )
 
-        self.db.add(plot_structure)
-        try:
-            self.db.commit()
-            self.db.refresh(plot_structure)
-        except SQLAlchemyError as e:
-            self.db.rollback()
-            logger.error(f"Failed to save plot structure: {e}", exc_info=True)
-            raise Exception(f"Nie udało się zapisać struktury fabuły do bazy: {str(e)}")
+        await self.db_executor.run(self._save_foundation_rows, [plot_structure], "struktury fabuły")
 
         logger.info(f"✅ Plot structure created and saved (ID: {plot_structure.id})")
         return plot_structure
@@ -553,16 +1201,13 @@ class AgentOrchestrator:
         Raises:
             Exception: If cost limit is exceeded (100%)
         """
-        metrics = self.ai_service.get_metrics()
-        current_cost = metrics.total_cost - self._cost_baseline
+        # Update project's actual cost in real-time
+        current_cost = self._sync_project_cost()
         max_cost = settings.MAX_COST_PER_PROJECT
         alert_threshold = settings.COST_ALERT_THRESHOLD
 
         cost_percentage = (current_cost / max_cost) if max_cost > 0 else 0
 
-        # Update project's actual cost in real-time
-        self.project.actual_cost = current_cost
-
         context = f" (po rozdziale {chapter_num})" if chapter_num else ""
 
         # HARD STOP at 100% of limit
@@ -618,17 +1263,85 @@ class AgentOrchestrator:
         logger.info(f"✍️ Writing {chapter_count} chapters with Chapter Pipeline (~{words_per_chapter} words each)...")
 
         # Check cost limit before starting
-        self._check_cost_limit()
+        await self.db_executor.run(self._check_cost_limit)
 
         # Initialize Chapter Pipeline - SIMPLIFIED config
-        pipeline_config = PipelineConfig(
+        pipeline_config = self._chapter_pipeline_config()
+        chapter_pipeline = get_chapter_pipeline(self.db, pipeline_config)
+        chapter_kwargs = self._chapter_kwargs(world_bible, characters, plot_structure, params)
+
+        # Chapter records exist up front, so concurrent writers only update their own row
+        pov_character = self._pov_character(characters)
+        chapter_ids = {
+            chapter_num: (await self.db_executor.run(
+                self._ensure_chapter_record, plot_structure, chapter_num, pov_character
+            )).id
+            for chapter_num in range(1, chapter_count + 1)
+        }
+
+        concurrency = max(1, settings.CHAPTER_CONCURRENCY)
+        if concurrency == 1:
+            chapters_data = []
+            chapter_summaries = {}  # {chapter_num: summary}
+            for chapter_num in range(1, chapter_count + 1):
+                logger.info(f"📝 Processing Chapter {chapter_num}/{chapter_count} through pipeline...")
+                chapter = await self.db_executor.run(self.db.get, Chapter, chapter_ids[chapter_num])
+                chapter_data = await self._write_chapter(
+                    chapter_pipeline, chapter, chapter_summaries, chapter_kwargs
+                )
+                chapter_summaries[chapter_num] = self._summarize_chapter_content(chapter_data['content'])
+                chapters_data.append(chapter_data)
+
+                # Check cost limit
+                await self.db_executor.run(self._check_cost_limit, chapter_num)
+
+                # Update progress
+                await self._update_progress(
+                    11,
+                    f"Pisanie rozdziału {chapter_num}/{chapter_count} (AI) - zakończono"
+                )
+        else:
+            chapters_data = await self._generate_chapters_parallel(
+                chapter_ids, plot_structure, pipeline_config, chapter_kwargs, concurrency
+            )
+
+        # Final stats
+        successful = sum(1 for ch in chapters_data if ch.get('word_count', 0) > 500)
+        total_words = sum(ch.get('word_count', 0) for ch in chapters_data)
+
+        logger.info(
+            f"✅ All {chapter_count} chapters processed!\n"
+            f"   📊 Success: {successful}/{chapter_count}\n"
+            f"   📝 Total words: {total_words:,}"
+        )
+
+        return chapters_data
+
+    def _chapter_pipeline_config(self) -> PipelineConfig:
+        """Chapter Pipeline config - SIMPLIFIED"""
+        return PipelineConfig(
             target_tier=ModelTier.TIER_2,  # GPT-4o for quality
-            cost_limit_per_chapter=1.00  # USD - generous limit for long chapters
+            cost_limit_per_chapter=1.00,  # USD - generous limit for long chapters
+            budget_scheduler=self.budget_scheduler
         )
-        chapter_pipeline = get_chapter_pipeline(self.db, pipeline_config)
+
+    @staticmethod
+    def _pov_character(characters: List[Character]) -> Character:
+        return next((c for c in characters if c.role == CharacterRole.PROTAGONIST), characters[0])
+
+    def _chapter_kwargs(
+        self,
+        world_bible: WorldBible,
+        characters: List[Character],
+        plot_structure: PlotStructure,
+        params: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Book-level arguments of ChapterPipeline.process_chapter"""
+        chapter_count = params.get('chapter_count', 25)
+        words_per_chapter = params.get('target_word_count', 90000) // chapter_count
 
         # Prepare character dicts
-        pov_character = next((c for c in characters if c.role == CharacterRole.PROTAGONIST), characters[0])
+        pov_character = self._pov_character(characters)
         pov_char_dict = {
             'name': pov_character.name,
             'role': pov_character.role.value,
@@ -665,106 +1378,423 @@ class AgentOrchestrator:
             'foreshadowing': plot_structure.foreshadowing
         }
 
-        chapters_data = []
-        chapter_summaries = {}  # {chapter_num: summary}
-        canon_facts = []  # TODO: Load from ContinuityFact model
+        # ContinuityFact rows (canon facts stored with the world bible) are retrieved
+        # per chapter by ContextPackBuilder.retrieve_facts (pgvector)
+        canon_facts = []
 
-        for chapter_num in range(1, chapter_count + 1):
-            logger.info(f"📝 Processing Chapter {chapter_num}/{chapter_count} through pipeline...")
+        return dict(
+            genre=self.project.genre.value,
+            pov_character=pov_char_dict,
+            all_characters=characters_dict,
+            world_bible=world_bible_dict,
+            plot_structure=plot_structure_dict,
+            canon_facts=canon_facts,
+            target_word_count=words_per_chapter,
+            book_title=self.project.name,
+        )
 
-            # Get chapter outline
-            chapter_outline = self._get_chapter_outline(plot_structure, chapter_num)
+    def _ensure_chapter_record(
+        self,
+        plot_structure: PlotStructure,
+        chapter_num: int,
+        pov_character: Character
+    ) -> Chapter:
+        """Create or update the chapter row with its outline"""
+        chapter_outline = self._get_chapter_outline(plot_structure, chapter_num)
+
+        chapter = self.db.query(Chapter).filter(
+            Chapter.project_id == self.project.id,
+            Chapter.number == chapter_num
+        ).first()
+
+        if chapter:
+            chapter.outline = chapter_outline
+            if not self.resume:
+                # A fresh run must not pick up scene checkpoints of an older plot
+                chapter.status = ChapterStatus.PLANNED
+                chapter.scenes_content = []
+                chapter.current_scene = 0
+            self.db.commit()
+        else:
+            chapter = Chapter(
+                project_id=self.project.id,
+                number=chapter_num,
+                title=f"Rozdział {chapter_num}",
+                pov_character_id=pov_character.id,
+                outline=chapter_outline,
+                status=ChapterStatus.PLANNED
+            )
+            self.db.add(chapter)
+            self.db.commit()
+            self.db.refresh(chapter)
+        return chapter
 
-            # Create or get chapter record
-            existing_chapter = self.db.query(Chapter).filter(
-                Chapter.project_id == self.project.id,
-                Chapter.number == chapter_num
-            ).first()
-
-            if existing_chapter:
-                chapter = existing_chapter
-                chapter.outline = chapter_outline
-            else:
-                chapter = Chapter(
-                    project_id=self.project.id,
-                    number=chapter_num,
-                    title=f"Rozdział {chapter_num}",
-                    pov_character_id=pov_character.id,
-                    outline=chapter_outline,
-                    status=ChapterStatus.PLANNED
-                )
-                self.db.add(chapter)
-                self.db.commit()
-                self.db.refresh(chapter)
-
-            # Progress callback
-            async def on_scene_progress(scene_num, total_scenes, scene_result):
-                scene_progress = f"Rozdział {chapter_num}: scena {scene_num}/{total_scenes}"
-                await self._update_progress(11, scene_progress)
-
-            # Run chapter through pipeline - NO FALLBACKS, must work correctly
-            result = await chapter_pipeline.process_chapter(
-                chapter=chapter,
-                genre=self.project.genre.value,
-                pov_character=pov_char_dict,
-                all_characters=characters_dict,
-                world_bible=world_bible_dict,
-                plot_structure=plot_structure_dict,
-                canon_facts=canon_facts,
-                chapter_summaries=chapter_summaries,
-                target_word_count=words_per_chapter,
-                book_title=self.project.name,
-                on_progress=on_scene_progress
+    async def _write_chapter(
+        self,
+        chapter_pipeline: ChapterPipeline,
+        chapter: Chapter,
+        chapter_summaries: Dict[int, str],
+        chapter_kwargs: Dict[str, Any],
+        lease: Optional[ChapterLease] = None
+    ) -> Dict[str, Any]:
+        """Run one chapter through the pipeline and validate the result"""
+        chapter_num = chapter.number
+
+        # Resume: chapters finished before the crash are kept as they are
+        already_written = (
+            chapter.status != ChapterStatus.DRAFTING
+            and bool(chapter.content)
+            and (chapter.word_count or 0) >= 500
+        )
+        if self.resume and already_written:
+            logger.info(f"♻️ Resume: chapter {chapter_num} already written ({chapter.word_count} words)")
+            self.progress.skip_scenes(SCENES_PER_CHAPTER)
+            return {
+                'number': chapter_num,
+                'content': chapter.content,
+                'word_count': chapter.word_count,
+                'quality_score': chapter.get_qa_total() or 85.0,
+            }
+
+        # Ending of the predecessor this chapter follows (None = only the plot plan exists)
+        predecessor = await self.db_executor.run(self._predecessor_fingerprint, chapter_pipeline.db, chapter_num)
+
+        # Progress callback
+        async def on_scene_progress(scene_num, total_scenes, scene_result):
+            self.progress.scene_finished()
+            scene_progress = f"Rozdział {chapter_num}: scena {scene_num}/{total_scenes}"
+            await self._update_progress(11, scene_progress, chapter=chapter_num, scene=scene_num)
+
+        # Run chapter through pipeline - NO FALLBACKS, must work correctly
+        result = await chapter_pipeline.process_chapter(
+            chapter=chapter,
+            chapter_summaries=chapter_summaries,
+            on_progress=on_scene_progress,
+            lease=lease,
+            **chapter_kwargs
+        )
+
+        chapter_content = result.content
+        chapter_word_count = result.word_count
+        chapter_quality = result.qa_scores.get('total', 85.0)
+
+        logger.info(
+            f"✅ Chapter {chapter_num}: {result.word_count} words, "
+            f"${result.total_cost:.4f}, tier={result.tier_used}"
+        )
+
+        # Validate - pipeline MUST produce content
+        if not chapter_content or chapter_word_count < 500:
+            raise RuntimeError(
+                f"Chapter {chapter_num} generation failed: only {chapter_word_count} words produced. "
+                f"Pipeline must generate content, not return empty chapters!"
             )
 
-            chapter_content = result.content
-            chapter_word_count = result.word_count
-            chapter_quality = result.qa_scores.get('total', 85.0)
+        await self.db_executor.run(
+            self._stamp_dependencies, chapter_pipeline.db, chapter, chapter_kwargs, predecessor
+        )
+
+        return {
+            'number': chapter_num,
+            'content': chapter_content,
+            'word_count': chapter_word_count,
+            'quality_score': chapter_quality,
+        }
+
+    @staticmethod
+    def _summarize_chapter_content(content: str) -> str:
+        """Continuity summary of a written chapter (its opening)"""
+        return content[:500] + "..." if len(content) > 500 else content
+
+    @staticmethod
+    def _ending_fingerprint(content: str) -> str:
+        """Fingerprint of the chapter ending its successor's opening follows"""
+        return dependency_graph.content_hash((content or "")[-RECONCILE_PREVIOUS_CHARS:])
+
+    def _predecessor_fingerprint(self, db: Session, chapter_num: int) -> Optional[str]:
+        """Ending fingerprint of the written predecessor; None for chapter 1 or a predecessor not written yet"""
+        if chapter_num <= 1:
+            return None
+        row = db.query(Chapter.content, Chapter.status).filter(
+            Chapter.project_id == self.project.id,
+            Chapter.number == chapter_num - 1
+        ).first()
+        if not row or not row.content or row.status in (ChapterStatus.PLANNED, ChapterStatus.DRAFTING):
+            return None
+        return self._ending_fingerprint(row.content)
+
+    @staticmethod
+    def _current_dependencies(
+        chapter: Chapter,
+        chapter_kwargs: Dict[str, Any],
+        predecessor: Optional[str],
+        character_names: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Fingerprints of the inputs a chapter would be written from now.
 
-            logger.info(
-                f"✅ Chapter {chapter_num}: {result.word_count} words, "
-                f"${result.total_cost:.4f}, tier={result.tier_used}"
+        character_names pins the cast to the one recorded at generation, so a
+        name the user types into the prose does not make the chapter stale.
+        """
+        pov = chapter_kwargs['pov_character']
+        characters = [
+            pov if c['name'] == pov['name'] else c  # the POV entry carries the arc as well
+            for c in chapter_kwargs['all_characters']
+        ]
+        if character_names is None:
+            involved = dependency_graph.involved_characters(
+                characters, pov['name'], chapter.outline or {}, chapter.content or ""
             )
+        else:
+            involved = [c for c in characters if c['name'] in character_names or c['name'] == pov['name']]
+        return dependency_graph.chapter_dependencies(
+            world_bible=chapter_kwargs['world_bible'],
+            plot_inputs=dependency_graph.plot_slice(chapter_kwargs['plot_structure'], chapter.number),
+            outline=chapter.outline or {},
+            characters=involved,
+            predecessor=predecessor
+        )
+
+    def _stamp_dependencies(
+        self,
+        db: Session,
+        chapter: Chapter,
+        chapter_kwargs: Dict[str, Any],
+        predecessor: Optional[str]
+    ) -> None:
+        """Record what a written chapter and its scenes were generated from"""
+        dependencies = self._current_dependencies(chapter, chapter_kwargs, predecessor)
+        chapter.generation_meta = {**(chapter.generation_meta or {}), "dependencies": dependencies}
+        chapter.scenes_content = dependency_graph.stamp_scenes(chapter.scenes_content, dependencies)
+        try:
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"Dependency fingerprints of chapter {chapter.number} not saved: {e}")
+
+    def _diagnose_chapter(self, chapter: Chapter, chapter_kwargs: Dict[str, Any]) -> ChapterStaleness:
+        """Which part of a chapter is stale against the current world, cast, plot and predecessor"""
+        written = (
+            chapter.status not in (ChapterStatus.PLANNED, ChapterStatus.DRAFTING)
+            and bool(chapter.content)
+        )
+        stored = (chapter.generation_meta or {}).get("dependencies")
+        return dependency_graph.diagnose_chapter(
+            number=chapter.number,
+            written=written,
+            stored=stored,
+            current=self._current_dependencies(
+                chapter, chapter_kwargs, self._predecessor_fingerprint(self.db, chapter.number),
+                character_names=list(stored.get("characters") or {}) if stored else None
+            ),
+            scenes=chapter.scenes_content or []
+        )
+
+    def _planned_chapter_summary(self, plot_structure: PlotStructure, chapter_num: int) -> str:
+        """
+        Continuity summary of a chapter that is not written yet, built from the plot plan.
 
-            # Validate - pipeline MUST produce content
-            if not chapter_content or chapter_word_count < 500:
-                raise RuntimeError(
-                    f"Chapter {chapter_num} generation failed: only {chapter_word_count} words produced. "
-                    f"Pipeline must generate content, not return empty chapters!"
+        Used in parallel mode when a chapter starts before its predecessor is done.
+        """
+        outline = self._get_chapter_outline(plot_structure, chapter_num)
+        parts = [f"(PLAN) Rozdział {chapter_num}: {outline.get('goal', '')}"]
+
+        for entry in plot_structure.tension_graph or []:
+            if isinstance(entry, dict) and entry.get('chapter') == chapter_num:
+                emotion = entry.get('primary_emotion') or entry.get('emotion')
+                if emotion:
+                    parts.append(f"emocja: {emotion}")
+                if entry.get('justification'):
+                    parts.append(str(entry['justification']))
+                break
+
+        plot_points = plot_structure.plot_points if isinstance(plot_structure.plot_points, dict) else {}
+        for name, point in plot_points.items():
+            if isinstance(point, dict) and point.get('chapter') == chapter_num:
+                parts.append(f"{name}: {point.get('description', '')}")
+
+        for subplot in plot_structure.subplots or []:
+            if isinstance(subplot, dict) and chapter_num in (subplot.get('intersection_points') or []):
+                parts.append(f"wątek '{subplot.get('name', '')}': {subplot.get('description', '')}")
+
+        return "; ".join(p for p in parts if p)
+
+    async def _generate_chapters_parallel(
+        self,
+        chapter_ids: Dict[int, int],
+        plot_structure: PlotStructure,
+        pipeline_config: PipelineConfig,
+        chapter_kwargs: Dict[str, Any],
+        concurrency: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Write chapters as a DAG with bounded concurrency.
+
+        Chapter N softly depends on chapter N-1. Chapters start in order as
+        slots free up; if the predecessor is already written its real summary
+        is used, otherwise the planned summary from the plot structure. Each
+        chapter uses its own DB session and pipeline (scene writer state is
+        per chapter). Chapters written without their true predecessor get
+        their opening reconciled once every chapter exists.
+        """
+        chapter_count = len(chapter_ids)
+        logger.info(f"🧵 Parallel chapter generation: {chapter_count} chapters, concurrency={concurrency}")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        written_summaries: Dict[int, str] = {}
+        provisional: set = set()  # chapters written against a planned predecessor
+        results: Dict[int, Dict[str, Any]] = {}
+
+        async def run_chapter(chapter_num: int) -> None:
+            async with semaphore:
+                summaries = {
+                    n: written_summaries.get(n) or self._planned_chapter_summary(plot_structure, n)
+                    for n in range(1, chapter_num)
+                }
+                if chapter_num > 1 and chapter_num - 1 not in written_summaries:
+                    provisional.add(chapter_num)
+
+                logger.info(
+                    f"📝 Processing Chapter {chapter_num}/{chapter_count} through pipeline "
+                    f"({'planned' if chapter_num in provisional else 'written'} predecessor)..."
+                )
+                db = GenerationSessionLocal()
+                try:
+                    chapter = await self.db_executor.run(db.get, Chapter, chapter_ids[chapter_num])
+                    pipeline = get_chapter_pipeline(db, pipeline_config)
+                    chapter_data = await self._write_chapter(pipeline, chapter, summaries, chapter_kwargs)
+                finally:
+                    await self.db_executor.run(db.close)
+
+                results[chapter_num] = chapter_data
+                written_summaries[chapter_num] = self._summarize_chapter_content(chapter_data['content'])
+                await self.db_executor.run(self._check_cost_limit, chapter_num)
+                await self._update_progress(
+                    11,
+                    f"Pisanie rozdziałów: {len(results)}/{chapter_count} zakończono (AI)"
                 )
 
-            # Store summary for continuity
-            if chapter_content and len(chapter_content) > 100:
-                summary = chapter_content[:500] + "..." if len(chapter_content) > 500 else chapter_content
-                chapter_summaries[chapter_num] = summary
+        await self._gather_or_cancel(
+            [run_chapter(chapter_num) for chapter_num in range(1, chapter_count + 1)]
+        )
 
-            chapters_data.append({
-                'number': chapter_num,
-                'content': chapter_content,
-                'word_count': chapter_word_count,
-                'quality_score': chapter_quality,
-            })
-
-            # Check cost limit
-            self._check_cost_limit(chapter_num)
-
-            # Update progress
-            await self._update_progress(
-                11,
-                f"Pisanie rozdziału {chapter_num}/{chapter_count} (AI) - zakończono"
+        if provisional and settings.CHAPTER_RECONCILIATION_ENABLED:
+            await self._update_progress(11, f"Uzgadnianie początków {len(provisional)} rozdziałów (AI)")
+
+            async def reconcile(chapter_num: int) -> None:
+                async with semaphore:
+                    await self._reconcile_chapter_opening(
+                        chapter_ids[chapter_num], results[chapter_num], results[chapter_num - 1]
+                    )
+
+            await self._gather_or_cancel([reconcile(n) for n in sorted(provisional)])
+
+        return [results[n] for n in sorted(results)]
+
+    @staticmethod
+    async def _gather_or_cancel(coroutines: List[Any]) -> None:
+        """Run coroutines concurrently; the first failure cancels the rest and is raised"""
+        tasks = [asyncio.ensure_future(c) for c in coroutines]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _reconcile_chapter_opening(
+        self,
+        chapter_id: int,
+        chapter_data: Dict[str, Any],
+        previous_data: Dict[str, Any]
+    ) -> None:
+        """
+        Rewrite a chapter's opening so it follows the real ending of its predecessor.
+
+        Only the first paragraphs change; the rest of the chapter (and every
+        plot fact in it) stays as written.
+        """
+        content = chapter_data['content']
+        paragraphs = content.split("\n\n")
+        opening_paragraphs: List[str] = []
+        for paragraph in paragraphs:
+            if opening_paragraphs and len("\n\n".join(opening_paragraphs)) >= RECONCILE_OPENING_CHARS:
+                break
+            opening_paragraphs.append(paragraph)
+        opening = "\n\n".join(opening_paragraphs)
+        rest = content[len(opening):]
+        previous_ending = previous_data['content'][-RECONCILE_PREVIOUS_CHARS:]
+
+        prompt = f"""KONIEC POPRZEDNIEGO ROZDZIAŁU ({previous_data['number']}):
+{previous_ending}
+
+POCZĄTEK ROZDZIAŁU {chapter_data['number']} (napisany bez znajomości powyższego zakończenia):
+{opening}
+
+Przepisz POCZĄTEK rozdziału {chapter_data['number']} tak, aby płynnie i spójnie wynikał z zakończenia poprzedniego rozdziału:
+- zachowaj wszystkie wydarzenia, postacie i fakty z oryginalnego początku
+- usuń sprzeczności z zakończeniem poprzedniego rozdziału (miejsce, czas, stan postaci)
+- zachowaj styl, narrację i długość (±10%)
+- ostatnie zdanie musi prowadzić do dalszej części rozdziału tak jak w oryginale
+
+Zwróć WYŁĄCZNIE przepisany początek, bez komentarzy."""
+
+        try:
+            response = await self.ai_service.generate(
+                prompt=prompt,
+                system_prompt="Jesteś redaktorem prowadzącym powieści. Dbasz o ciągłość między rozdziałami.",
+                tier=ModelTier.TIER_2,
+                temperature=0.5,
+                max_tokens=max(1000, len(opening) // 2),
+                metadata={
+                    "agent": "AgentOrchestrator",
+                    "task": "chapter_reconciliation",
+                    "chapter": chapter_data['number']
+                }
             )
+        except Exception as e:
+            logger.warning(f"Reconciliation of chapter {chapter_data['number']} failed, keeping draft: {e}")
+            return
 
-        # Final stats
-        successful = sum(1 for ch in chapters_data if ch.get('word_count', 0) > 500)
-        total_words = sum(ch.get('word_count', 0) for ch in chapters_data)
+        new_opening = response.content.strip()
+        if len(new_opening) < len(opening) * 0.5:
+            logger.warning(f"Reconciliation of chapter {chapter_data['number']} too short, keeping draft")
+            return
 
-        logger.info(
-            f"✅ All {chapter_count} chapters processed!\n"
-            f"   📊 Success: {successful}/{chapter_count}\n"
-            f"   📝 Total words: {total_words:,}"
-        )
+        new_content = new_opening + rest
+        chapter_data['content'] = new_content
+        chapter_data['word_count'] = len(new_content.split())
 
-        return chapters_data
+        await self.db_executor.run(self._save_reconciled_opening, chapter_id, chapter_data, previous_data)
+
+        logger.info(f"🔗 Chapter {chapter_data['number']}: opening reconciled with chapter {previous_data['number']}")
+
+    def _save_reconciled_opening(
+        self,
+        chapter_id: int,
+        chapter_data: Dict[str, Any],
+        previous_data: Dict[str, Any]
+    ) -> None:
+        db = GenerationSessionLocal()
+        try:
+            chapter = db.get(Chapter, chapter_id)
+            chapter.content = chapter_data['content']
+            chapter.word_count = chapter_data['word_count']
+            meta = {**(chapter.generation_meta or {}), "reconciled_opening": True}
+            if meta.get("dependencies"):
+                # The opening now follows the real ending of the predecessor
+                meta["dependencies"] = {
+                    **meta["dependencies"],
+                    "predecessor": self._ending_fingerprint(previous_data['content'])
+                }
+            chapter.generation_meta = meta
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"Failed to save reconciled chapter {chapter_data['number']}: {e}")
+        finally:
+            db.close()
 
     def _get_chapter_outline(self, plot_structure: PlotStructure, chapter_num: int) -> Dict[str, Any]:
         """Get outline for specific chapter from plot structure"""
@@ -867,24 +1897,117 @@ class AgentOrchestrator:
                 f"{total_words:,} words fits {genre} expectations ({min_words:,}-{max_words:,})"
             )
 
-    async def _update_progress(self, step: int, activity: str):
-        """Update project progress in database"""
-        self.progress.update(step, activity)
+    def _sync_project_cost(self) -> float:
+        """
+        Write this run's AI spend to project.actual_cost; returns the project total.
 
-        # Get time estimates
-        current_step_duration = self.progress.get_current_step_duration()
-        time_remaining = self.progress.get_estimated_time_remaining()
+        In fan-out mode several workers spend on one project at once, so each
+        adds only its not yet synced spend with an atomic UPDATE.
+        """
+        spent = self.ai_service.get_metrics().total_cost - self._cost_baseline
+        if not self.fanout:
+            self.project.actual_cost = spent
+            return spent
+
+        delta = spent - self._cost_synced
+        if delta > 0:
+            try:
+                self.db.query(Project).filter(Project.id == self.project.id).update(
+                    {Project.actual_cost: Project.actual_cost + delta},
+                    synchronize_session=False
+                )
+                self.db.commit()
+                self._cost_synced = spent
+            except SQLAlchemyError as e:
+                self.db.rollback()
+                logger.warning(f"Failed to sync project cost (non-critical): {e}")
+        total = self.db.query(Project.actual_cost).filter(Project.id == self.project.id).scalar()
+        self._project_cost_seen = float(total or 0.0)
+        return self._project_cost_seen
+
+    def _live_project_cost(self) -> float:
+        """
+        Project spend so far without touching the database (budget scheduler).
+
+        Fan-out: the last synced project total plus this worker's spend since.
+        """
+        spent = self.ai_service.get_metrics().total_cost - self._cost_baseline
+        if not self.fanout:
+            return spent
+        return self._project_cost_seen + spent - self._cost_synced
+
+    async def _update_progress(
+        self,
+        step: int,
+        activity: str,
+        chapter: Optional[int] = None,
+        scene: Optional[int] = None
+    ):
+        """
+        Update project progress in database
+
+        Writes are coalesced: a new step is written at once, further activity
+        updates of the same step at most every PROGRESS_WRITE_INTERVAL_SECONDS
+        (the latest one wins). The write itself runs on the DB executor thread.
+        Watchers get every update as a progress event (see generation_stream).
+        """
+        # AI calls from here on are attributed to this step in the telemetry ledger
+        set_pipeline_step(step, STEP_NAMES.get(step, f"step_{step}"))
+
+        # Get time estimates (step durations are recorded/read in Redis - off the event loop,
+        # one update at a time as concurrent chapters share self.progress)
+        async with self._progress_lock:
+            current_step_duration, time_remaining = await asyncio.to_thread(
+                self._advance_progress, step, activity
+            )
 
         # Update activity with time info
         activity_with_time = f"{activity} [~{current_step_duration} min | Pozostało: ~{time_remaining} min]"
+        self._pending_progress = (step, self.progress.get_percentage(), activity_with_time)
+        self._publish_progress(
+            current_step=step,
+            progress_percentage=self.progress.get_percentage(),
+            current_activity=activity_with_time,
+            eta_minutes=time_remaining,
+            chapter=chapter,
+            scene=scene
+        )
 
+        metrics = self.ai_service.get_metrics()
+        logger.info(
+            f"📊 Progress: Step {step}/15 ({self.progress.get_percentage():.1f}%) - {activity} "
+            f"[Czas: ~{current_step_duration} min | Pozostało: ~{time_remaining} min | Koszt: ${metrics.total_cost:.2f}]"
+        )
+
+        if (
+            step == self._progress_written_step
+            and time.monotonic() - self._progress_written_at < settings.PROGRESS_WRITE_INTERVAL_SECONDS
+        ):
+            return
+        await self._flush_progress()
+
+    def _advance_progress(self, step: int, activity: str) -> Tuple[int, int]:
+        """Move progress to a step; returns (step duration, time remaining) in minutes"""
+        self.progress.update(step, activity)
+        return self.progress.get_current_step_duration(), self.progress.get_estimated_time_remaining()
+
+    async def _flush_progress(self) -> None:
+        """Write the latest coalesced progress update, if any"""
+        if self._pending_progress is None:
+            return
+        step, percentage, activity = self._pending_progress
+        self._pending_progress = None
+        self._progress_written_step = step
+        self._progress_written_at = time.monotonic()
+        await self.db_executor.run(self._write_progress, step, percentage, activity)
+
+    def _write_progress(self, step: int, percentage: float, activity: str) -> None:
         self.project.current_step = step
-        self.project.progress_percentage = self.progress.get_percentage()
-        self.project.current_activity = activity_with_time
+        self.project.progress_percentage = percentage
+        self.project.current_activity = activity
 
         # Update cost from AI service (delta from baseline)
-        metrics = self.ai_service.get_metrics()
-        self.project.actual_cost = metrics.total_cost - self._cost_baseline
+        self._sync_project_cost()
 
         try:
             self.db.commit()
@@ -893,7 +2016,30 @@ class AgentOrchestrator:
             logger.warning(f"Failed to update progress (non-critical): {e}")
             # Don't raise - progress updates are not critical
 
-        logger.info(
-            f"📊 Progress: Step {step}/15 ({self.progress.get_percentage():.1f}%) - {activity} "
-            f"[Czas: ~{current_step_duration} min | Pozostało: ~{time_remaining} min | Koszt: ${metrics.total_cost:.2f}]"
-        )
+    def _publish_progress(self, **fields: Any) -> None:
+        """Push the project's current state to live watchers (never fails generation)"""
+        if self.stream is None:
+            return
+        spent = self.ai_service.get_metrics().total_cost - self._cost_baseline
+        eta_minutes = fields.get('eta_minutes')
+        snapshot = {
+            "project_id": self.project.id,
+            "status": self.project.status.value,
+            "current_step": self.project.current_step,
+            "total_steps": self.progress.total_steps,
+            "progress_percentage": self.project.progress_percentage,
+            "current_activity": self.project.current_activity,
+            "estimated_cost": self.project.estimated_cost,
+            # Fan-out workers only know their own spend; the synced project total is used there
+            "actual_cost": self.project.actual_cost if self.fanout else spent,
+            "started_at": self.project.started_at.isoformat() if self.project.started_at else None,
+            "estimated_completion": (
+                (datetime.utcnow() + timedelta(minutes=eta_minutes)).isoformat()
+                if eta_minutes is not None else None
+            ),
+            **fields
+        }
+        try:
+            self.stream.progress(snapshot)
+        except Exception as e:
+            logger.warning(f"Progress event not published (non-critical): {e}")
@@ -5,9 +5,7 @@ with cost tracking, retry logic, and tier management
 """
 
 import openai
-from openai import AsyncOpenAI
 import anthropic
-from anthropic import AsyncAnthropic
 from anthropic import (
     RateLimitError as AnthropicRateLimit,
     APIConnectionError as AnthropicAPIConnectionError,
@@ -21,7 +19,7 @@ import time
 import asyncio
 import threading
 import json
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -33,6 +31,25 @@ except ImportError:
     _TIKTOKEN_AVAILABLE = False
 
 from app.config import settings
+from app.services.rate_governor import get_rate_governor
+from app.services.llm_response_cache import (
+    get_response_cache,
+    request_fingerprint,
+    CachedResponse,
+)
+from app.services.single_flight import get_single_flight
+from app.services.latency_router import get_latency_router
+from app.services.llm_cassette import BACKEND_REPLAY, backend_mode
+from app.services.token_budget import BudgetKey, budget_key, get_token_budget_predictor
+from app.services.generation_context import get_project_id
+from app.services.telemetry_ledger import get_telemetry_ledger
+from app.services.llm_clients import (
+    get_openai_client,
+    get_anthropic_client,
+    PURPOSE_EMBEDDING,
+    PURPOSE_GENERATION,
+    PURPOSE_STREAMING,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -60,6 +77,15 @@ MODEL_CONTEXT_LIMITS = {
     "claude-opus-4-5-20251101": 200000,
 }
 
+# finish_reason / stop_reason values meaning "hit max_tokens"
+TRUNCATED_FINISH_REASONS = ("length", "max_tokens")
+
+# Appended after the partial answer when a truncated text call is continued
+CONTINUATION_PROMPT = (
+    "Kontynuuj dokładnie od miejsca, w którym przerwałeś. "
+    "Nie powtarzaj już napisanego tekstu i nie dodawaj komentarzy."
+)
+
 
 @dataclass
 class AIResponse:
@@ -73,6 +99,19 @@ class AIResponse:
     metadata: Dict[str, Any]
 
 
+@dataclass
+class StreamChunk:
+    """
+    One item of a streamed generation.
+
+    Intermediate chunks carry a text delta; the final chunk has done=True,
+    an empty delta and the complete AIResponse (content, usage, cost).
+    """
+    delta: str
+    done: bool = False
+    response: Optional[AIResponse] = None
+
+
 @dataclass
 class GenerationMetrics:
     """Thread-safe generation metrics"""
@@ -80,6 +119,18 @@ class GenerationMetrics:
     total_cost: float = 0.0
     calls_made: int = 0
     errors: int = 0
+    throttled_calls: int = 0
+    throttle_wait_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    coalesced_calls: int = 0
+    prompt_cache_read_tokens: int = 0
+    prompt_cache_creation_tokens: int = 0
+    hedged_calls: int = 0
+    hedge_wins: int = 0
+    hedge_cancelled_cost: float = 0.0  # estimated bill of cancelled hedge requests
+    routed_calls: int = 0
+    budget_continuations: int = 0
     _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
 
 
@@ -91,6 +142,14 @@ class AIService:
     - OpenAI GPT-4o, GPT-4o-mini, GPT-4
     - Anthropic Claude Opus, Sonnet
     - Automatic retry with exponential backoff
+    - Cross-worker RPM/TPM rate governor (Redis token buckets)
+    - Shared pooled HTTP transport (keep-alive, HTTP/2) via llm_clients
+    - Latency-aware routing between tier-equivalent models + hedged short calls
+    - Opt-in content-addressed response cache for deterministic calls
+    - Single-flight coalescing of identical concurrent requests
+    - Token streaming (generate_stream) with usage/cost accounting at stream end
+    - Adaptive max_tokens per (agent, task, tier) with continuation on truncation
+    - Per-call telemetry ledger (generation_logs, buffered bulk writes)
     - Cost tracking per project
     - Tier-based model selection
     - Structured output support
@@ -99,38 +158,51 @@ class AIService:
 
     def __init__(self):
         """Initialize AI Service with API clients"""
-        # Validate OpenAI API key (required)
-        if not settings.OPENAI_API_KEY or settings.OPENAI_API_KEY == "sk-placeholder-add-your-key":
+        # Validate OpenAI API key (required unless replaying a recorded cassette)
+        replaying = backend_mode() == BACKEND_REPLAY
+        if replaying:
+            logger.info(f"▶️ LLM replay mode - responses served from {settings.LLM_CASSETTE_PATH}")
+        elif not settings.OPENAI_API_KEY or settings.OPENAI_API_KEY == "sk-placeholder-add-your-key":
             logger.error("❌ OPENAI_API_KEY not set or using placeholder!")
             raise ValueError(
                 "OPENAI_API_KEY is required. Please set it in .env file. "
                 "See backend/AI_SETUP.md for instructions."
             )
 
-        # Initialize OpenAI (Async client for non-blocking API calls)
+        # Shared pooled clients (no SDK retries - we handle retries ourselves in generate())
         logger.info("✅ Initializing AsyncOpenAI client")
-        self.openai_client = AsyncOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            timeout=600.0,  # 10 minute timeout for complex prompts (plot structure needs 5+ min)
-            max_retries=0,  # We handle retries ourselves in generate()
-        )
+        self.openai_client = get_openai_client(PURPOSE_GENERATION)
+        self.openai_stream_client = get_openai_client(PURPOSE_STREAMING)
 
-        # Initialize Anthropic (if key is available - Async client)
-        self.anthropic_client = None
-        anthropic_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
-        if anthropic_key and anthropic_key != "sk-placeholder-add-your-key":
+        # Anthropic is optional (None without API key)
+        self.anthropic_client = get_anthropic_client(PURPOSE_GENERATION)
+        self.anthropic_stream_client = get_anthropic_client(PURPOSE_STREAMING)
+        if self.anthropic_client:
             logger.info("✅ Initializing AsyncAnthropic client")
-            self.anthropic_client = AsyncAnthropic(
-                api_key=anthropic_key,
-                timeout=600.0,  # 10 minute timeout for complex prompts
-                max_retries=0,  # We handle retries ourselves in generate()
-            )
         else:
             logger.warning("⚠️ ANTHROPIC_API_KEY not set - Claude models will not be available")
 
         # Metrics tracking
         self.metrics = GenerationMetrics()
 
+        # Shared admission control (RPM/TPM per provider+model)
+        self.rate_governor = get_rate_governor()
+
+        # Content-addressed cache for deterministic analysis calls
+        self.response_cache = get_response_cache()
+
+        # Concurrent identical requests share one upstream call
+        self.single_flight = get_single_flight()
+
+        # Rolling p50/p95 per (provider, model) for routing and hedging
+        self.latency_router = get_latency_router()
+
+        # Learned output lengths per (agent, task, tier) for tight max_tokens
+        self.token_budget = get_token_budget_predictor()
+
+        # Per-call telemetry (buffered bulk inserts into generation_logs)
+        self.ledger = get_telemetry_ledger()
+
         logger.info("AI Service initialized")
 
     # ---- Accurate token counting via tiktoken ----
@@ -187,7 +259,53 @@ class AIService:
             # This prevents context overflow errors on long chapters
             return "gpt-4-turbo", ModelProvider.OPENAI
 
-    def _calculate_cost(self, tokens_in: int, tokens_out: int, model: str, provider: ModelProvider) -> float:
+    def _tier_candidates(
+        self,
+        tier: ModelTier,
+        prefer_anthropic: bool = False,
+        json_mode: bool = False
+    ) -> List[Tuple[str, ModelProvider]]:
+        """
+        Tier-equivalent (model, provider) pairs, static default first.
+
+        Alternatives exist only for TIER_2/TIER_3 with both providers configured.
+        json_mode depends on OpenAI's response_format, so it never crosses providers.
+        """
+        primary = self._get_model_for_tier(tier, prefer_anthropic)
+        candidates = [primary]
+        if tier == ModelTier.TIER_1 or json_mode or not self.anthropic_client:
+            return candidates
+        alternative = self._get_model_for_tier(tier, not prefer_anthropic)
+        if alternative != primary:
+            candidates.append(alternative)
+        return candidates
+
+    def _select_model(
+        self,
+        tier: ModelTier,
+        prefer_anthropic: bool,
+        json_mode: bool,
+        max_tokens: int
+    ) -> Tuple[str, ModelProvider]:
+        """Pick the model for a call: static tier mapping, or the faster equivalent"""
+        candidates = self._tier_candidates(tier, prefer_anthropic, json_mode)
+        if len(candidates) < 2 or not settings.LLM_LATENCY_ROUTING_ENABLED:
+            return candidates[0]
+        chosen = self.latency_router.choose(candidates, max_tokens)
+        if chosen != candidates[0]:
+            with self.metrics._lock:
+                self.metrics.routed_calls += 1
+        return chosen
+
+    def _calculate_cost(
+        self,
+        tokens_in: int,
+        tokens_out: int,
+        model: str,
+        provider: ModelProvider,
+        cache_read_tokens: int = 0,
+        cache_creation_tokens: int = 0
+    ) -> float:
         """
         Calculate cost based on token usage and actual model used
 
@@ -196,6 +314,8 @@ class AIService:
             tokens_out: Output tokens
             model: Actual model name used
             provider: Model provider (OpenAI or Anthropic)
+            cache_read_tokens: Prompt tokens served from the provider's prompt cache
+            cache_creation_tokens: Prompt tokens written to the cache (Anthropic only)
 
         Returns:
             Cost in USD
@@ -211,6 +331,9 @@ class AIService:
             # Anthropic models
             "claude-sonnet-4-5-20250929": (3.00, 15.00),
             "claude-opus-4-5-20251101": (15.00, 75.00),
+            # Embeddings (input only)
+            "text-embedding-3-small": (0.02, 0.0),
+            "text-embedding-3-large": (0.13, 0.0),
         }
 
         # Get pricing for this model, fallback to tier-based if unknown
@@ -226,9 +349,29 @@ class AIService:
             else:
                 input_cost, output_cost = settings.TIER3_INPUT_COST, settings.TIER3_OUTPUT_COST
 
-        cost = (tokens_in / 1_000_000) * input_cost + (tokens_out / 1_000_000) * output_cost
+        if provider == ModelProvider.ANTHROPIC:
+            # input_tokens excludes cached tokens; reads bill at 10%, writes at 125%
+            input_total = (
+                tokens_in * input_cost
+                + cache_read_tokens * input_cost * 0.1
+                + cache_creation_tokens * input_cost * 1.25
+            )
+        else:
+            # prompt_tokens includes cached tokens, which bill at 50%
+            cached = min(cache_read_tokens, tokens_in)
+            input_total = (tokens_in - cached) * input_cost + cached * input_cost * 0.5
+
+        cost = input_total / 1_000_000 + (tokens_out / 1_000_000) * output_cost
         return round(cost, 6)
 
+    def _record_prompt_cache(self, cache_read_tokens: int, cache_creation_tokens: int) -> None:
+        """Add provider prompt-cache usage to the global metrics"""
+        if not (cache_read_tokens or cache_creation_tokens):
+            return
+        with self.metrics._lock:
+            self.metrics.prompt_cache_read_tokens += cache_read_tokens
+            self.metrics.prompt_cache_creation_tokens += cache_creation_tokens
+
     def calculate_safe_max_tokens(
         self,
         model: str,
@@ -276,6 +419,19 @@ class AIService:
 
         return safe_max
 
+    async def _budgeted_max_tokens(
+        self,
+        ceiling_max_tokens: int,
+        requested_max_tokens: int,
+        key: Optional[BudgetKey],
+        project_id: Optional[int]
+    ) -> int:
+        """Context-safe ceiling tightened to the learned output length of key (see token_budget)"""
+        if key is None:
+            return ceiling_max_tokens
+        suggested = await asyncio.to_thread(self.token_budget.suggest, key, requested_max_tokens, project_id)
+        return min(ceiling_max_tokens, suggested)
+
     async def generate(
         self,
         prompt: str,
@@ -287,7 +443,10 @@ class AIService:
         prefer_anthropic: bool = False,
         retry_count: int = 3,
         metadata: Optional[Dict[str, Any]] = None,
-        enable_cache: bool = False
+        enable_cache: bool = False,
+        cache_response: bool = False,
+        coalesce: bool = True,
+        hedge: Optional[bool] = None
     ) -> AIResponse:
         """
         Generate content using AI
@@ -306,22 +465,187 @@ class AIService:
                 For Anthropic: uses cache_control with ephemeral type (~90% cost reduction on cached input).
                 For OpenAI: system prompt is automatically cached by the API.
                 Best used when system_prompt contains large, stable content (World Bible, style guides).
+            cache_response: Serve identical requests from the response cache.
+                Only for deterministic, low-temperature calls (analysis, extraction);
+                calls above LLM_RESPONSE_CACHE_MAX_TEMPERATURE are never cached.
+            coalesce: Share one upstream request between concurrent identical calls.
+                Applies only up to LLM_SINGLE_FLIGHT_MAX_TEMPERATURE - creative
+                calls that are meant to produce different variants never coalesce.
+            hedge: Fire a duplicate request if the call outlives the model's p95
+                latency and take whichever finishes first. None = automatic for
+                short calls (expected output <= LLM_HEDGE_MAX_TOKENS).
 
         Returns:
             AIResponse with generated content and metrics
         """
-        model, provider = self._get_model_for_tier(tier, prefer_anthropic)
+        started = time.time()
+        try:
+            response = await self._generate(
+                prompt=prompt,
+                tier=tier,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prompt=system_prompt,
+                json_mode=json_mode,
+                prefer_anthropic=prefer_anthropic,
+                retry_count=retry_count,
+                metadata=metadata,
+                enable_cache=enable_cache,
+                cache_response=cache_response,
+                coalesce=coalesce,
+                hedge=hedge
+            )
+        except Exception as e:
+            self._record_ledger_failure(tier, prefer_anthropic, metadata, started, e)
+            raise
+        self._record_ledger(tier, response)
+        return response
 
+    async def _generate(
+        self,
+        prompt: str,
+        tier: ModelTier = ModelTier.TIER_1,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        system_prompt: Optional[str] = None,
+        json_mode: bool = False,
+        prefer_anthropic: bool = False,
+        retry_count: int = 3,
+        metadata: Optional[Dict[str, Any]] = None,
+        enable_cache: bool = False,
+        cache_response: bool = False,
+        coalesce: bool = True,
+        hedge: Optional[bool] = None
+    ) -> AIResponse:
+        """generate() without telemetry (see generate for arguments)"""
+        # Learned output length decides the size class used for routing and hedging
+        call_budget_key = (
+            budget_key(metadata, f"tier{int(tier)}") if settings.TOKEN_BUDGET_ENABLED else None
+        )
+        project_id = get_project_id()
+        expected_max_tokens = await asyncio.to_thread(
+            self.token_budget.predict, call_budget_key, max_tokens, project_id
+        )
+
+        # Cache/coalescing keys use the static tier model, so routing does not fragment them
+        key_model, _ = self._get_model_for_tier(tier, prefer_anthropic)
+        model, provider = self._select_model(tier, prefer_anthropic, json_mode, expected_max_tokens)
+
+        # Content-addressed response cache (opt-in)
+        cache_key = None
+        if (
+            cache_response
+            and settings.LLM_RESPONSE_CACHE_ENABLED
+            and temperature <= settings.LLM_RESPONSE_CACHE_MAX_TEMPERATURE
+        ):
+            cache_key = request_fingerprint(
+                key_model, system_prompt, prompt, temperature, json_mode, max_tokens
+            )
+            lookup_start = time.time()
+            cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+            if cached is not None:
+                with self.metrics._lock:
+                    self.metrics.cache_hits += 1
+                logger.debug(f"Response cache HIT: model={model}, key={cache_key[:12]}")
+                return AIResponse(
+                    content=cached.content,
+                    model=cached.model,
+                    provider=ModelProvider(cached.provider),
+                    tokens_used=cached.tokens_used,
+                    cost=0.0,
+                    latency=time.time() - lookup_start,
+                    metadata={**(metadata or {}), "response_cache_hit": True}
+                )
+            with self.metrics._lock:
+                self.metrics.cache_misses += 1
+
+        if hedge is None:
+            hedge = expected_max_tokens <= settings.LLM_HEDGE_MAX_TOKENS
+        hedge_candidates = None
+        if hedge and settings.LLM_HEDGE_ENABLED:
+            hedge_candidates = self._tier_candidates(tier, prefer_anthropic, json_mode)
+
+        upstream_kwargs = dict(
+            model=model,
+            provider=provider,
+            prompt=prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_prompt=system_prompt,
+            json_mode=json_mode,
+            retry_count=retry_count,
+            metadata=metadata,
+            enable_cache=enable_cache,
+            cache_key=cache_key,
+            hedge_candidates=hedge_candidates,
+            budget_key=call_budget_key,
+            project_id=project_id
+        )
+
+        # Single-flight: identical in-flight requests share one upstream call
+        if (
+            coalesce
+            and settings.LLM_SINGLE_FLIGHT_ENABLED
+            and temperature <= settings.LLM_SINGLE_FLIGHT_MAX_TEMPERATURE
+        ):
+            flight_key = cache_key or request_fingerprint(
+                key_model, system_prompt, prompt, temperature, json_mode, max_tokens
+            )
+            wait_start = time.time()
+            response, shared = await self.single_flight.do(
+                flight_key, lambda: self._generate_upstream(**upstream_kwargs)
+            )
+            if not shared:
+                return response
+
+            with self.metrics._lock:
+                self.metrics.coalesced_calls += 1
+            logger.debug(f"Coalesced with in-flight request: model={model}, key={flight_key[:12]}")
+            # The leader paid for the request; followers report zero cost
+            return AIResponse(
+                content=response.content,
+                model=response.model,
+                provider=response.provider,
+                tokens_used=response.tokens_used,
+                cost=0.0,
+                latency=time.time() - wait_start,
+                metadata={**(metadata or {}), "coalesced": True}
+            )
+
+        return await self._generate_upstream(**upstream_kwargs)
+
+    async def _generate_upstream(
+        self,
+        model: str,
+        provider: ModelProvider,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        system_prompt: Optional[str],
+        json_mode: bool,
+        retry_count: int,
+        metadata: Optional[Dict[str, Any]],
+        enable_cache: bool,
+        cache_key: Optional[str],
+        hedge_candidates: Optional[List[Tuple[str, ModelProvider]]] = None,
+        budget_key: Optional[BudgetKey] = None,
+        project_id: Optional[int] = None
+    ) -> AIResponse:
+        """Call the provider with rate governing and retries (no cache/coalescing)"""
         # Accurate token counting via tiktoken (with fallback)
         full_prompt_text = (system_prompt or "") + prompt
         estimated_prompt_tokens = self.count_tokens(full_prompt_text, model)
 
-        # Calculate safe max_tokens that respects model context limits
-        safe_max_tokens = self.calculate_safe_max_tokens(
+        # Calculate safe max_tokens that respects model context limits;
+        # the ceiling is what a truncated call may be continued up to
+        ceiling_max_tokens = self.calculate_safe_max_tokens(
             model=model,
             estimated_prompt_tokens=estimated_prompt_tokens,
             requested_max_tokens=max_tokens
         )
+        safe_max_tokens = await self._budgeted_max_tokens(
+            ceiling_max_tokens, max_tokens, budget_key, project_id
+        )
 
         start_time = time.time()
         last_error = None
@@ -329,33 +653,67 @@ class AIService:
         # Retry logic with exponential backoff
         for attempt in range(retry_count):
             try:
-                if provider == ModelProvider.OPENAI:
-                    response = await self._call_openai(
-                        model=model,
-                        prompt=prompt,
-                        system_prompt=system_prompt,
-                        temperature=temperature,
-                        max_tokens=safe_max_tokens,
-                        json_mode=json_mode
+                # Wait for RPM/TPM budget shared by all workers on this API key
+                waited = await self.rate_governor.acquire(
+                    provider.value, model, estimated_prompt_tokens + safe_max_tokens
+                )
+                if waited > 0:
+                    with self.metrics._lock:
+                        self.metrics.throttled_calls += 1
+                        self.metrics.throttle_wait_seconds += waited
+
+                call_kwargs = dict(
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    temperature=temperature,
+                    max_tokens=safe_max_tokens,
+                    json_mode=json_mode,
+                    enable_cache=enable_cache
+                )
+                if hedge_candidates:
+                    response = await self._call_with_hedge(
+                        model, provider, call_kwargs, hedge_candidates,
+                        reserve_tokens=estimated_prompt_tokens + safe_max_tokens
                     )
-                else:  # Anthropic
-                    response = await self._call_anthropic(
-                        model=model,
-                        prompt=prompt,
-                        system_prompt=system_prompt,
-                        temperature=temperature,
-                        max_tokens=safe_max_tokens,
-                        enable_cache=enable_cache
+                else:
+                    response = await self._call_timed(model, provider, call_kwargs)
+
+                # A hedge may have been served by a tier-equivalent model
+                served_model = response.get('model', model)
+                served_provider = response.get('provider', provider)
+
+                # The learned budget was too tight for this call - finish it
+                if (
+                    response.get('finish_reason') in TRUNCATED_FINISH_REASONS
+                    and safe_max_tokens < ceiling_max_tokens
+                ):
+                    response = await self._continue_truncated(
+                        served_model, served_provider, call_kwargs, response,
+                        ceiling_max_tokens, estimated_prompt_tokens
+                    )
+
+                if budget_key is not None:
+                    # Length of the output itself - a JSON re-request's first attempt is not part of it
+                    await asyncio.to_thread(
+                        self.token_budget.record, budget_key, max_tokens,
+                        response.get('output_tokens', response['tokens_out']), project_id
                     )
 
                 # Calculate metrics
                 latency = time.time() - start_time
+                cache_read = response.get('cache_read_tokens', 0)
+                cache_creation = response.get('cache_creation_tokens', 0)
                 cost = self._calculate_cost(
                     response['tokens_in'],
                     response['tokens_out'],
-                    model,
-                    provider
+                    served_model,
+                    served_provider,
+                    cache_read_tokens=cache_read,
+                    cache_creation_tokens=cache_creation
                 )
+                # A cancelled hedge request is billed too (see _call_with_hedge)
+                cost += response.get('hedge_loser_cost', 0.0)
+                self._record_prompt_cache(cache_read, cache_creation)
 
                 # Update global metrics (thread-safe)
                 with self.metrics._lock:
@@ -364,23 +722,41 @@ class AIService:
                     self.metrics.calls_made += 1
 
                 logger.info(
-                    f"AI generation successful: model={model}, "
-                    f"tokens={response['tokens_in']}+{response['tokens_out']}, "
+                    f"AI generation successful: model={served_model}, "
+                    f"tokens={response['tokens_in']}+{response['tokens_out']}"
+                    f"{f' (cached {cache_read})' if cache_read else ''}, "
                     f"cost=${cost:.4f}, latency={latency:.2f}s"
                 )
 
+                tokens_used = {
+                    'input': response['tokens_in'],
+                    'output': response['tokens_out'],
+                    'total': response['tokens_in'] + response['tokens_out'],
+                    'cache_read': cache_read,
+                    'cache_creation': cache_creation
+                }
+
+                if cache_key is not None:
+                    await asyncio.to_thread(self.response_cache.set, cache_key, CachedResponse(
+                        content=response['content'],
+                        model=served_model,
+                        provider=served_provider.value,
+                        tokens_used=tokens_used,
+                        cost=cost,
+                        created_at=time.time()
+                    ))
+
                 return AIResponse(
                     content=response['content'],
-                    model=model,
-                    provider=provider,
-                    tokens_used={
-                        'input': response['tokens_in'],
-                        'output': response['tokens_out'],
-                        'total': response['tokens_in'] + response['tokens_out']
-                    },
+                    model=served_model,
+                    provider=served_provider,
+                    tokens_used=tokens_used,
                     cost=cost,
                     latency=latency,
-                    metadata=metadata or {}
+                    metadata=(
+                        {**(metadata or {}), "hedge_won": True}
+                        if response.get('hedge_won') else (metadata or {})
+                    )
                 )
 
             except (openai.RateLimitError, AnthropicRateLimit) as e:
@@ -392,6 +768,11 @@ class AIService:
                 wait_time = int(retry_after) if retry_after else (2 ** attempt)
                 logger.warning(f"Rate limit hit on attempt {attempt + 1}/{retry_count}, retrying after {wait_time}s")
 
+                # Drain the shared buckets so other workers back off too
+                await asyncio.to_thread(
+                    self.rate_governor.penalize, provider.value, model, retry_after=wait_time
+                )
+
                 if attempt < retry_count - 1:
                     await asyncio.sleep(wait_time)
                 else:
@@ -442,6 +823,211 @@ class AIService:
                 else:
                     raise Exception(f"AI generation failed after {retry_count} attempts: {last_error}")
 
+    async def _call_provider(
+        self,
+        model: str,
+        provider: ModelProvider,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        json_mode: bool,
+        enable_cache: bool,
+        continuation: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Dispatch one request to the provider's API"""
+        if provider == ModelProvider.OPENAI:
+            return await self._call_openai(
+                model=model,
+                prompt=prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                json_mode=json_mode,
+                continuation=continuation
+            )
+        return await self._call_anthropic(
+            model=model,
+            prompt=prompt,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            enable_cache=enable_cache,
+            continuation=continuation
+        )
+
+    async def _continue_truncated(
+        self,
+        model: str,
+        provider: ModelProvider,
+        call_kwargs: Dict[str, Any],
+        response: Dict[str, Any],
+        ceiling_max_tokens: int,
+        estimated_prompt_tokens: int
+    ) -> Dict[str, Any]:
+        """
+        Complete a call that hit a learned (tightened) max_tokens.
+
+        Text is continued from where it stopped, with the rest of the
+        original ceiling as budget. JSON cannot be stitched reliably, so it is
+        re-requested with the full ceiling. Usage (and cost) of both calls is
+        summed; output_tokens is the length of the final output only, the
+        sample the token budget predictor learns from.
+        """
+        with self.metrics._lock:
+            self.metrics.budget_continuations += 1
+
+        if call_kwargs['json_mode']:
+            extra_kwargs = {**call_kwargs, 'max_tokens': ceiling_max_tokens}
+        else:
+            remaining = max(ceiling_max_tokens - response['tokens_out'], settings.TOKEN_BUDGET_FLOOR)
+            extra_kwargs = {**call_kwargs, 'max_tokens': remaining, 'continuation': response['content']}
+        logger.info(
+            f"Output hit learned budget ({call_kwargs['max_tokens']} tokens), "
+            f"{'re-requesting' if call_kwargs['json_mode'] else 'continuing'} with "
+            f"{extra_kwargs['max_tokens']} tokens"
+        )
+
+        await self.rate_governor.acquire(
+            provider.value, model,
+            estimated_prompt_tokens + response['tokens_out'] + extra_kwargs['max_tokens']
+        )
+        extra = await self._call_timed(model, provider, extra_kwargs)
+
+        merged = dict(extra)
+        if not call_kwargs['json_mode']:
+            merged['content'] = response['content'] + extra['content']
+        for field_name in ('tokens_in', 'tokens_out', 'cache_read_tokens', 'cache_creation_tokens'):
+            merged[field_name] = response.get(field_name, 0) + extra.get(field_name, 0)
+        merged['output_tokens'] = (
+            extra['tokens_out'] if call_kwargs['json_mode'] else merged['tokens_out']
+        )
+        merged['hedge_won'] = response.get('hedge_won', False)
+        merged['hedge_loser_cost'] = response.get('hedge_loser_cost', 0.0)
+        return merged
+
+    async def _call_timed(
+        self,
+        model: str,
+        provider: ModelProvider,
+        call_kwargs: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Provider call that feeds its latency into the latency router"""
+        started = time.time()
+        try:
+            response = await self._call_provider(model, provider, **call_kwargs)
+        except asyncio.CancelledError:
+            # Hedge loser: its latency is at least the time it ran
+            self.latency_router.record_cancelled(
+                provider.value, model, call_kwargs['max_tokens'], time.time() - started
+            )
+            raise
+        except Exception:
+            self.latency_router.record(
+                provider.value, model, call_kwargs['max_tokens'], time.time() - started, success=False
+            )
+            raise
+        self.latency_router.record(provider.value, model, call_kwargs['max_tokens'], time.time() - started)
+        response['model'] = model
+        response['provider'] = provider
+        return response
+
+    async def _call_with_hedge(
+        self,
+        model: str,
+        provider: ModelProvider,
+        call_kwargs: Dict[str, Any],
+        candidates: List[Tuple[str, ModelProvider]],
+        reserve_tokens: int
+    ) -> Dict[str, Any]:
+        """
+        Hedged request: if the primary outlives its p95, fire a duplicate.
+
+        The duplicate goes to the fastest tier-equivalent model (possibly the
+        same one) and only if the rate governor admits it immediately. The
+        first successful response wins; the other request is cancelled.
+        The provider bills the cancelled request up to the cancellation, so
+        its estimated cost is returned as hedge_loser_cost and added to the
+        call's cost.
+        """
+        max_tokens = call_kwargs['max_tokens']
+        deadline = self.latency_router.hedge_deadline(provider.value, model, max_tokens)
+        if deadline is None:
+            return await self._call_timed(model, provider, call_kwargs)
+
+        primary = asyncio.ensure_future(self._call_timed(model, provider, call_kwargs))
+        secondary = None
+        started = {primary: time.time()}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=deadline)
+            if done:
+                return primary.result()
+
+            hedge_model, hedge_provider = self.latency_router.choose(candidates, max_tokens)
+            if not await asyncio.to_thread(
+                self.rate_governor.try_acquire, hedge_provider.value, hedge_model, reserve_tokens
+            ):
+                return await primary
+
+            with self.metrics._lock:
+                self.metrics.hedged_calls += 1
+            logger.info(
+                f"Hedging {model} after {deadline:.1f}s (p95) with {hedge_model}"
+            )
+            secondary = asyncio.ensure_future(self._call_timed(hedge_model, hedge_provider, call_kwargs))
+            started[secondary] = time.time()
+            targets = {primary: (model, provider), secondary: (hedge_model, hedge_provider)}
+
+            pending = {primary, secondary}
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        response = task.result()
+                        if task is secondary:
+                            response['hedge_won'] = True
+                            with self.metrics._lock:
+                                self.metrics.hedge_wins += 1
+                        loser = secondary if task is primary else primary
+                        if not loser.done():
+                            now = time.time()
+                            response['hedge_loser_cost'] = self._hedge_loser_cost(
+                                *targets[loser], call_kwargs, response,
+                                loser_elapsed=now - started[loser],
+                                winner_elapsed=now - started[task]
+                            )
+                        return response
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in (primary, secondary):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _hedge_loser_cost(
+        self,
+        model: str,
+        provider: ModelProvider,
+        call_kwargs: Dict[str, Any],
+        winner: Dict[str, Any],
+        loser_elapsed: float,
+        winner_elapsed: float
+    ) -> float:
+        """
+        Estimated bill of a hedge request cancelled after the other one won.
+
+        The whole prompt has been processed; of the answer, the share the
+        loser had time to generate is taken from the winner's output length
+        (same prompt), scaled by how long the loser ran relative to the winner.
+        """
+        tokens_in = self.count_tokens((call_kwargs.get('system_prompt') or "") + call_kwargs['prompt'], model)
+        share = min(1.0, loser_elapsed / winner_elapsed) if winner_elapsed > 0 else 1.0
+        cost = self._calculate_cost(tokens_in, int(winner['tokens_out'] * share), model, provider)
+        with self.metrics._lock:
+            self.metrics.hedge_cancelled_cost += cost
+        return cost
+
     async def _call_openai(
         self,
         model: str,
@@ -449,13 +1035,11 @@ class AIService:
         system_prompt: Optional[str],
         temperature: float,
         max_tokens: int,
-        json_mode: bool
+        json_mode: bool,
+        continuation: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Call OpenAI API"""
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
+        """Call OpenAI API (continuation: partial answer to continue after truncation)"""
+        messages = self._openai_messages(prompt, system_prompt, continuation)
 
         kwargs = {
             "model": model,
@@ -476,12 +1060,41 @@ class AIService:
         if not response.choices[0].message or not response.choices[0].message.content:
             raise Exception("OpenAI API returned no content in response")
 
+        # Automatic prefix caching (prompts >= 1024 tokens with a stable prefix)
+        details = getattr(response.usage, 'prompt_tokens_details', None)
+        cache_read_tokens = getattr(details, 'cached_tokens', 0) or 0
+
         return {
             'content': response.choices[0].message.content,
             'tokens_in': response.usage.prompt_tokens,
             'tokens_out': response.usage.completion_tokens,
+            'cache_read_tokens': cache_read_tokens,
+            'finish_reason': response.choices[0].finish_reason,
         }
 
+    @staticmethod
+    def _openai_messages(
+        prompt: str,
+        system_prompt: Optional[str],
+        continuation: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        if continuation:
+            messages.append({"role": "assistant", "content": continuation})
+            messages.append({"role": "user", "content": CONTINUATION_PROMPT})
+        return messages
+
+    @staticmethod
+    def _anthropic_messages(prompt: str, continuation: Optional[str] = None) -> List[Dict[str, str]]:
+        messages = [{"role": "user", "content": prompt}]
+        if continuation:
+            # Assistant prefill: Claude resumes the partial answer (no trailing whitespace allowed)
+            messages.append({"role": "assistant", "content": continuation.rstrip()})
+        return messages
+
     async def _call_anthropic(
         self,
         model: str,
@@ -489,7 +1102,8 @@ class AIService:
         system_prompt: Optional[str],
         temperature: float,
         max_tokens: int,
-        enable_cache: bool = False
+        enable_cache: bool = False,
+        continuation: Optional[str] = None
     ) -> Dict[str, Any]:
         """Call Anthropic Claude API with optional prompt caching.
 
@@ -508,7 +1122,7 @@ class AIService:
             "model": model,
             "max_tokens": max_tokens,
             "temperature": temperature,
-            "messages": [{"role": "user", "content": prompt}]
+            "messages": self._anthropic_messages(prompt, continuation)
         }
 
         if system_prompt:
@@ -559,7 +1173,446 @@ class AIService:
             'tokens_out': response.usage.output_tokens,
             'cache_creation_tokens': cache_creation_tokens,
             'cache_read_tokens': cache_read_tokens,
+            'finish_reason': response.stop_reason,
+        }
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        tier: ModelTier = ModelTier.TIER_1,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        system_prompt: Optional[str] = None,
+        prefer_anthropic: bool = False,
+        retry_count: int = 3,
+        metadata: Optional[Dict[str, Any]] = None,
+        enable_cache: bool = False
+    ) -> AsyncIterator[StreamChunk]:
+        """
+        Stream generated content token by token.
+
+        Same model selection, rate governing and cost tracking as generate(),
+        but yields StreamChunk deltas as the provider produces them. The last
+        chunk has done=True and carries the full AIResponse.
+
+        Retries only happen before the first token has been yielded; once
+        text has reached the caller a failure is raised as-is, because a
+        retry would produce a different continuation.
+
+        Usage:
+            async for chunk in ai_service.generate_stream(prompt, ...):
+                if chunk.done:
+                    response = chunk.response
+                else:
+                    publish(chunk.delta)
+        """
+        started = time.time()
+        try:
+            async for chunk in self._generate_stream(
+                prompt=prompt,
+                tier=tier,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_prompt=system_prompt,
+                prefer_anthropic=prefer_anthropic,
+                retry_count=retry_count,
+                metadata=metadata,
+                enable_cache=enable_cache
+            ):
+                if chunk.done:
+                    self._record_ledger(tier, chunk.response)
+                yield chunk
+        except Exception as e:
+            self._record_ledger_failure(tier, prefer_anthropic, metadata, started, e)
+            raise
+
+    async def _generate_stream(
+        self,
+        prompt: str,
+        tier: ModelTier = ModelTier.TIER_1,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        system_prompt: Optional[str] = None,
+        prefer_anthropic: bool = False,
+        retry_count: int = 3,
+        metadata: Optional[Dict[str, Any]] = None,
+        enable_cache: bool = False
+    ) -> AsyncIterator[StreamChunk]:
+        """generate_stream() without telemetry (see generate_stream for arguments)"""
+        call_budget_key = (
+            budget_key(metadata, f"tier{int(tier)}") if settings.TOKEN_BUDGET_ENABLED else None
+        )
+        project_id = get_project_id()
+        model, provider = self._select_model(
+            tier, prefer_anthropic, False,
+            await asyncio.to_thread(self.token_budget.predict, call_budget_key, max_tokens, project_id)
+        )
+
+        full_prompt_text = (system_prompt or "") + prompt
+        estimated_prompt_tokens = self.count_tokens(full_prompt_text, model)
+        ceiling_max_tokens = self.calculate_safe_max_tokens(
+            model=model,
+            estimated_prompt_tokens=estimated_prompt_tokens,
+            requested_max_tokens=max_tokens
+        )
+        safe_max_tokens = await self._budgeted_max_tokens(
+            ceiling_max_tokens, max_tokens, call_budget_key, project_id
+        )
+
+        start_time = time.time()
+        last_error = None
+
+        for attempt in range(retry_count):
+            parts: List[str] = []
+            usage: Dict[str, Any] = {}
+            first_token_at = None
+            try:
+                waited = await self.rate_governor.acquire(
+                    provider.value, model, estimated_prompt_tokens + safe_max_tokens
+                )
+                if waited > 0:
+                    with self.metrics._lock:
+                        self.metrics.throttled_calls += 1
+                        self.metrics.throttle_wait_seconds += waited
+
+                events = self._stream_events(
+                    model, provider, prompt, system_prompt, temperature,
+                    safe_max_tokens, enable_cache
+                )
+                async for kind, payload in events:
+                    if kind == "delta":
+                        if first_token_at is None:
+                            first_token_at = time.time()
+                        parts.append(payload)
+                        yield StreamChunk(delta=payload)
+                    else:
+                        usage = payload
+
+                content = "".join(parts)
+                if not content:
+                    raise Exception(f"{provider.value} stream returned no content")
+
+                # Providers report usage at stream end; estimate if it is missing
+                tokens_in = usage.get('tokens_in') or estimated_prompt_tokens
+                tokens_out = usage.get('tokens_out') or self.count_tokens(content, model)
+                cache_read = usage.get('cache_read_tokens', 0)
+                cache_creation = usage.get('cache_creation_tokens', 0)
+
+                # The learned budget was too tight - keep streaming a continuation
+                if (
+                    usage.get('finish_reason') in TRUNCATED_FINISH_REASONS
+                    and safe_max_tokens < ceiling_max_tokens
+                ):
+                    with self.metrics._lock:
+                        self.metrics.budget_continuations += 1
+                    remaining = max(ceiling_max_tokens - tokens_out, settings.TOKEN_BUDGET_FLOOR)
+                    logger.info(
+                        f"Stream hit learned budget ({safe_max_tokens} tokens), "
+                        f"continuing with {remaining} tokens"
+                    )
+                    await self.rate_governor.acquire(
+                        provider.value, model, estimated_prompt_tokens + tokens_out + remaining
+                    )
+                    continuation = self._stream_events(
+                        model, provider, prompt, system_prompt, temperature,
+                        remaining, enable_cache, continuation=content
+                    )
+                    extra_usage: Dict[str, Any] = {}
+                    async for kind, payload in continuation:
+                        if kind == "delta":
+                            parts.append(payload)
+                            yield StreamChunk(delta=payload)
+                        else:
+                            extra_usage = payload
+                    extra_content = "".join(parts)[len(content):]
+                    content += extra_content
+                    tokens_in += extra_usage.get('tokens_in') or estimated_prompt_tokens + tokens_out
+                    tokens_out += extra_usage.get('tokens_out') or self.count_tokens(extra_content, model)
+                    cache_read += extra_usage.get('cache_read_tokens', 0)
+                    cache_creation += extra_usage.get('cache_creation_tokens', 0)
+                    usage['finish_reason'] = extra_usage.get('finish_reason')
+
+                if call_budget_key is not None:
+                    await asyncio.to_thread(
+                        self.token_budget.record, call_budget_key, max_tokens, tokens_out, project_id
+                    )
+
+                latency = time.time() - start_time
+                self.latency_router.record(provider.value, model, safe_max_tokens, latency)
+                cost = self._calculate_cost(
+                    tokens_in, tokens_out, model, provider,
+                    cache_read_tokens=cache_read,
+                    cache_creation_tokens=cache_creation
+                )
+                self._record_prompt_cache(cache_read, cache_creation)
+
+                with self.metrics._lock:
+                    self.metrics.total_tokens += tokens_in + tokens_out
+                    self.metrics.total_cost += cost
+                    self.metrics.calls_made += 1
+
+                ttft = (first_token_at - start_time) if first_token_at else latency
+                logger.info(
+                    f"AI stream successful: model={model}, "
+                    f"tokens={tokens_in}+{tokens_out}, cost=${cost:.4f}, "
+                    f"ttft={ttft:.2f}s, latency={latency:.2f}s"
+                )
+
+                yield StreamChunk(
+                    delta="",
+                    done=True,
+                    response=AIResponse(
+                        content=content,
+                        model=model,
+                        provider=provider,
+                        tokens_used={
+                            'input': tokens_in,
+                            'output': tokens_out,
+                            'total': tokens_in + tokens_out,
+                            'cache_read': cache_read,
+                            'cache_creation': cache_creation
+                        },
+                        cost=cost,
+                        latency=latency,
+                        metadata={
+                            **(metadata or {}),
+                            "streamed": True,
+                            "time_to_first_token": round(ttft, 3),
+                            "finish_reason": usage.get('finish_reason'),
+                        }
+                    )
+                )
+                return
+
+            except (openai.AuthenticationError, openai.PermissionDeniedError, AnthropicAuthenticationError, AnthropicPermissionDeniedError) as e:
+                with self.metrics._lock:
+                    self.metrics.errors += 1
+                logger.error(f"Authentication/Permission error (non-retriable): {e}")
+                raise Exception(f"API authentication/permission error: {e}")
+
+            except (openai.BadRequestError, AnthropicBadRequestError) as e:
+                with self.metrics._lock:
+                    self.metrics.errors += 1
+                logger.error(f"Bad request error (non-retriable): {e}")
+                raise Exception(f"API bad request error: {e}")
+
+            except Exception as e:
+                last_error = e
+                with self.metrics._lock:
+                    self.metrics.errors += 1
+
+                if parts:
+                    # Text already reached the caller - cannot transparently retry
+                    logger.error(f"AI stream interrupted after {len(parts)} chunks: {e}")
+                    raise Exception(f"AI stream interrupted: {e}")
+
+                wait_time = 2 ** attempt
+                if isinstance(e, (openai.RateLimitError, AnthropicRateLimit)):
+                    retry_after = None
+                    if hasattr(e, 'response') and hasattr(e.response, 'headers'):
+                        retry_after = e.response.headers.get('retry-after') or e.response.headers.get('Retry-After')
+                    if retry_after:
+                        wait_time = int(retry_after)
+                    await asyncio.to_thread(
+                        self.rate_governor.penalize, provider.value, model, retry_after=wait_time
+                    )
+
+                logger.warning(f"Stream error on attempt {attempt + 1}/{retry_count}: {e}")
+                if attempt < retry_count - 1:
+                    await asyncio.sleep(wait_time)
+                else:
+                    raise Exception(f"AI stream failed after {retry_count} attempts: {last_error}")
+
+    def _stream_events(
+        self,
+        model: str,
+        provider: ModelProvider,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        enable_cache: bool,
+        continuation: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Provider stream of ("delta", text) events followed by one ("usage", dict)"""
+        if provider == ModelProvider.OPENAI:
+            return self._stream_openai(
+                model=model,
+                prompt=prompt,
+                system_prompt=system_prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                continuation=continuation
+            )
+        return self._stream_anthropic(
+            model=model,
+            prompt=prompt,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            enable_cache=enable_cache,
+            continuation=continuation
+        )
+
+    async def _stream_openai(
+        self,
+        model: str,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        continuation: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream OpenAI chat completion; yields ("delta", text) then ("usage", dict)"""
+        messages = self._openai_messages(prompt, system_prompt, continuation)
+
+        stream = await self.openai_stream_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        usage: Dict[str, Any] = {}
+        async for chunk in stream:
+            if chunk.choices:
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    yield "delta", choice.delta.content
+                if choice.finish_reason:
+                    usage['finish_reason'] = choice.finish_reason
+            # With include_usage the final chunk has no choices, only usage
+            if getattr(chunk, 'usage', None):
+                usage['tokens_in'] = chunk.usage.prompt_tokens
+                usage['tokens_out'] = chunk.usage.completion_tokens
+                details = getattr(chunk.usage, 'prompt_tokens_details', None)
+                usage['cache_read_tokens'] = getattr(details, 'cached_tokens', 0) or 0
+
+        yield "usage", usage
+
+    async def _stream_anthropic(
+        self,
+        model: str,
+        prompt: str,
+        system_prompt: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        enable_cache: bool = False,
+        continuation: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Stream Anthropic message; yields ("delta", text) then ("usage", dict)"""
+        if not self.anthropic_stream_client:
+            raise Exception("Anthropic client not initialized (missing API key)")
+
+        kwargs = {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": self._anthropic_messages(prompt, continuation)
         }
+        if system_prompt:
+            if enable_cache:
+                kwargs["system"] = [
+                    {
+                        "type": "text",
+                        "text": system_prompt,
+                        "cache_control": {"type": "ephemeral"}
+                    }
+                ]
+            else:
+                kwargs["system"] = system_prompt
+
+        async with self.anthropic_stream_client.messages.stream(**kwargs) as stream:
+            async for text in stream.text_stream:
+                if text:
+                    yield "delta", text
+            final = await stream.get_final_message()
+
+        yield "usage", {
+            'tokens_in': final.usage.input_tokens,
+            'tokens_out': final.usage.output_tokens,
+            'cache_creation_tokens': getattr(final.usage, 'cache_creation_input_tokens', 0) or 0,
+            'cache_read_tokens': getattr(final.usage, 'cache_read_input_tokens', 0) or 0,
+            'finish_reason': final.stop_reason,
+        }
+
+    async def embed(
+        self,
+        texts: List[str],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> List[List[float]]:
+        """
+        Embeddings of texts in ONE request (settings.EMBEDDING_MODEL).
+
+        Billed like generation calls: the cost lands in the metrics and the
+        telemetry ledger (as a TIER_1 call).
+
+        Raises:
+            Exception: The request failed
+        """
+        model = settings.EMBEDDING_MODEL
+        started = time.time()
+        try:
+            client = get_openai_client(PURPOSE_EMBEDDING)
+            response = await client.embeddings.create(input=texts, model=model)
+        except Exception as e:
+            with self.metrics._lock:
+                self.metrics.errors += 1
+            self.ledger.record(
+                tier=int(ModelTier.TIER_1), model=model, provider=ModelProvider.OPENAI.value,
+                tokens_used=None, cost=0.0, latency=time.time() - started, metadata=metadata,
+                success=False, error=str(e)
+            )
+            raise
+
+        tokens_in = getattr(response.usage, 'prompt_tokens', 0) or 0
+        cost = self._calculate_cost(tokens_in, 0, model, ModelProvider.OPENAI)
+        with self.metrics._lock:
+            self.metrics.total_tokens += tokens_in
+            self.metrics.total_cost += cost
+            self.metrics.calls_made += 1
+        self.ledger.record(
+            tier=int(ModelTier.TIER_1), model=model, provider=ModelProvider.OPENAI.value,
+            tokens_used={'input': tokens_in, 'output': 0, 'total': tokens_in},
+            cost=cost, latency=time.time() - started, metadata=metadata
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _record_ledger(self, tier: ModelTier, response: AIResponse) -> None:
+        """Queue a finished call for the telemetry ledger"""
+        self.ledger.record(
+            tier=int(tier),
+            model=response.model,
+            provider=response.provider.value,
+            tokens_used=response.tokens_used,
+            cost=response.cost,
+            latency=response.latency,
+            metadata=response.metadata
+        )
+
+    def _record_ledger_failure(
+        self,
+        tier: ModelTier,
+        prefer_anthropic: bool,
+        metadata: Optional[Dict[str, Any]],
+        started: float,
+        error: Exception
+    ) -> None:
+        """Queue a failed call for the telemetry ledger"""
+        model, provider = self._get_model_for_tier(tier, prefer_anthropic)
+        self.ledger.record(
+            tier=int(tier),
+            model=model,
+            provider=provider.value,
+            tokens_used=None,
+            cost=0.0,
+            latency=time.time() - started,
+            metadata=metadata,
+            success=False,
+            error=str(error)
+        )
 
     def get_metrics(self) -> GenerationMetrics:
         """Get current generation metrics"""
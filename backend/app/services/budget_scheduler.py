@@ -0,0 +1,209 @@
+"""
+Budget Scheduler - per-scene tier and quality passes that land on the project budget
+
+SemanticRouter picks a tier per chapter from static signals and the scene
+writer runs its critique/rewrite passes and validation retries whatever the
+spend; the only budget control was _check_cost_limit failing the run at
+MAX_COST_PER_PROJECT. The scheduler decides, before every scene:
+
+    tier            the router's tier or a cheaper one
+    critique_passes the quality mode's passes or fewer
+    max_retries     validation retries (2, 1 or 0)
+
+from a projection of the remaining spend:
+
+    available  = budget x (1 - BUDGET_SCHEDULER_RESERVE) - spent so far
+    allowance  = cost of the desired plan x min(1, available / (scenes left x average desired cost))
+
+and takes the best plan (cheaper critique first, then retries, then tier)
+whose estimated cost fits the allowance. Important scenes keep a
+proportionally larger share; a run that is under budget gets exactly what
+the router and quality mode asked for - never more.
+
+Scene cost estimates start from token-based priors per tier and are
+calibrated by the scenes the run has already written (observed cost /
+prior, exponentially smoothed), so the projection follows live telemetry:
+spend running ahead of plan degrades the next scenes a little instead of
+failing the book at the end.
+
+The reserve covers what is spent after prose (continuity, style polishing,
+assembly). Spend and progress are project-wide - in fan-out mode every
+worker sees the spend of the others at its chapter starts.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.ai_service import ModelTier
+
+logger = logging.getLogger(__name__)
+
+
+# Token use of one scene (beat sheet, prose, validation) before calibration
+SCENE_TOKENS_IN = 7000
+SCENE_TOKENS_OUT = 2200
+
+# Cost of one critique + rewrite pass relative to writing the scene
+CRITIQUE_PASS_SHARE = 0.9
+
+# Expected extra cost of allowing one validation retry (only failing scenes retry)
+RETRY_SHARE = 0.3
+
+# Calibration factor is kept within these bounds (one outlier scene cannot swing the plan)
+_CALIBRATION_BOUNDS = (0.25, 4.0)
+
+
+@dataclass
+class ScenePlan:
+    """How one scene is written"""
+    tier: ModelTier
+    critique_passes: int
+    max_retries: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tier": self.tier.name,
+            "critique_passes": self.critique_passes,
+            "max_retries": self.max_retries,
+        }
+
+
+def _tier_scene_cost(tier: ModelTier) -> float:
+    """Prior cost of writing one scene at a tier (USD)"""
+    prices = {
+        ModelTier.TIER_1: (settings.TIER1_INPUT_COST, settings.TIER1_OUTPUT_COST),
+        ModelTier.TIER_2: (settings.TIER2_INPUT_COST, settings.TIER2_OUTPUT_COST),
+        ModelTier.TIER_3: (settings.TIER3_INPUT_COST, settings.TIER3_OUTPUT_COST),
+    }
+    input_cost, output_cost = prices[tier]
+    return (SCENE_TOKENS_IN * input_cost + SCENE_TOKENS_OUT * output_cost) / 1_000_000
+
+
+def prior_cost(plan: ScenePlan) -> float:
+    """Prior cost of a scene plan (USD, uncalibrated)"""
+    return _tier_scene_cost(plan.tier) * (
+        1 + CRITIQUE_PASS_SHARE * plan.critique_passes + RETRY_SHARE * plan.max_retries
+    )
+
+
+def plan_ladder(desired: ScenePlan) -> List[ScenePlan]:
+    """Plans no richer than desired, best first: fewer critique passes, then retries, then a lower tier"""
+    return [
+        ScenePlan(ModelTier(tier), passes, retries)
+        for tier in range(int(desired.tier), 0, -1)
+        for retries in range(desired.max_retries, -1, -1)
+        for passes in range(desired.critique_passes, -1, -1)
+    ]
+
+
+class BudgetScheduler:
+    """
+    Plans tier and quality passes of each scene of one generation run.
+
+    Usage:
+        scheduler = BudgetScheduler(budget, total_scenes, spent=lambda: live_cost)
+        scheduler.sync_progress(scenes_done)                       # at chapter start
+        plan = scheduler.plan_scene(chapter, scene, desired_plan)  # before a scene
+        scheduler.record_scene(chapter, scene, cost)               # after it is saved
+    """
+
+    def __init__(
+        self,
+        budget: float,
+        total_scenes: int,
+        spent: Callable[[], float],
+        reserve: float = 0.1,
+        smoothing: float = 0.3
+    ):
+        """
+        Args:
+            budget: Project budget in USD (MAX_COST_PER_PROJECT)
+            total_scenes: Scenes of the whole book
+            spent: Live project spend in USD
+            reserve: Share of the budget kept for the steps after prose
+            smoothing: Weight of the newest scene in the calibration factor
+        """
+        self.budget = budget
+        self.total_scenes = max(1, total_scenes)
+        self.spent = spent
+        self.reserve = reserve
+        self.smoothing = smoothing
+
+        self.scenes_done = 0
+        self.calibration = 1.0
+        self._desired_average: Optional[float] = None
+        self._plans: Dict[Tuple[int, int], ScenePlan] = {}
+        self._lock = threading.Lock()
+
+        self.scenes_planned = 0
+        self.scenes_degraded = 0
+        self.planned_cost = 0.0
+        self.observed_cost = 0.0
+
+    def estimate(self, plan: ScenePlan) -> float:
+        """Expected cost of a scene plan, calibrated by this run's scenes"""
+        return prior_cost(plan) * self.calibration
+
+    def sync_progress(self, scenes_done: int) -> None:
+        """Scenes of the book already written (from the database, at chapter start)"""
+        with self._lock:
+            self.scenes_done = max(0, scenes_done)
+
+    def plan_scene(self, chapter: int, scene: int, desired: ScenePlan) -> ScenePlan:
+        """Best plan no richer than desired that keeps the projection within budget"""
+        available = self.budget * (1 - self.reserve) - self.spent()
+        with self._lock:
+            desired_cost = self.estimate(desired)
+            if self._desired_average is None:
+                self._desired_average = desired_cost
+            else:
+                self._desired_average += 0.1 * (desired_cost - self._desired_average)
+            scenes_left = max(1, self.total_scenes - self.scenes_done)
+            projected = scenes_left * self._desired_average
+            share = min(1.0, max(0.0, available) / projected) if projected > 0 else 1.0
+            allowance = desired_cost * share
+
+            ladder = plan_ladder(desired)
+            plan = next((p for p in ladder if self.estimate(p) <= allowance), ladder[-1])
+
+            self._plans[(chapter, scene)] = plan
+            self.scenes_planned += 1
+            self.planned_cost += self.estimate(plan)
+            if plan != desired:
+                self.scenes_degraded += 1
+
+        if plan != desired:
+            logger.info(
+                f"💸 Budget: scene {chapter}.{scene} {desired.tier.name}/{desired.critique_passes}c/"
+                f"{desired.max_retries}r -> {plan.tier.name}/{plan.critique_passes}c/{plan.max_retries}r "
+                f"(${available:.2f} left for ~{scenes_left} scenes, projected ${projected:.2f})"
+            )
+        return plan
+
+    def record_scene(self, chapter: int, scene: int, cost: Optional[float]) -> None:
+        """Observed cost of a saved scene - calibrates later estimates"""
+        with self._lock:
+            plan = self._plans.pop((chapter, scene), None)
+            self.scenes_done += 1
+            if plan is None or not cost or cost <= 0:
+                return
+            self.observed_cost += cost
+            ratio = cost / prior_cost(plan)
+            low, high = _CALIBRATION_BOUNDS
+            self.calibration += self.smoothing * (min(high, max(low, ratio)) - self.calibration)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "scenes_done": self.scenes_done,
+                "total_scenes": self.total_scenes,
+                "scenes_planned": self.scenes_planned,
+                "scenes_degraded": self.scenes_degraded,
+                "calibration": round(self.calibration, 3),
+                "planned_cost": round(self.planned_cost, 4),
+                "observed_cost": round(self.observed_cost, 4),
+            }
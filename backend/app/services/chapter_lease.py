@@ -0,0 +1,102 @@
+"""
+Chapter Lease - one live writer per chapter in fan-out generation
+
+A fan-out chapter batch can be redelivered by the broker while the first
+worker is still writing it (or run twice for any other reason). Before a
+worker writes a chapter it claims it in Redis (SET NX with a TTL and a
+unique token); the claim is refreshed after every finished scene and
+released when the chapter is done. A claim whose holder stops making
+progress expires after GENERATION_RESUME_STALE_SECONDS and the chapter
+can be taken over (it resumes from its scene checkpoints).
+
+Without Redis chapters are not claimed (no cross-worker coordination).
+Calls block on Redis round-trips - async callers use asyncio.to_thread.
+"""
+
+import logging
+import uuid
+
+from app.config import settings
+from app.services.redis_client import LazyRedis
+
+logger = logging.getLogger(__name__)
+
+
+# Extend / delete the lease only while this holder still owns it
+_REFRESH_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_redis = LazyRedis("Chapter leases", "chapters are not claimed")
+
+
+class ChapterLeaseLost(Exception):
+    """Another worker took over the chapter (this holder stopped refreshing in time)"""
+
+
+class ChapterLease:
+    """
+    Claim on one chapter of a project.
+
+    Usage:
+        lease = ChapterLease(project_id, chapter_number)
+        if lease.acquire():
+            try:
+                ... write the chapter, lease.refresh() after each scene ...
+            finally:
+                lease.release()
+    """
+
+    KEY_PREFIX = "narraforge:chapter_lease:"
+
+    def __init__(self, project_id: int, chapter_number: int, ttl_seconds: int = None):
+        self.project_id = project_id
+        self.chapter_number = chapter_number
+        self.ttl_seconds = int(ttl_seconds or settings.GENERATION_RESUME_STALE_SECONDS)
+        self.key = f"{self.KEY_PREFIX}{project_id}:{chapter_number}"
+        self.token = uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        """Claim the chapter; False if another live worker holds it"""
+        client = _redis.get()
+        if client is None:
+            return True
+        try:
+            return bool(client.set(self.key, self.token, nx=True, ex=self.ttl_seconds))
+        except Exception as e:
+            _redis.mark_failed(e)
+            return True
+
+    def refresh(self) -> bool:
+        """Extend the claim; False if it expired and was taken by another worker"""
+        client = _redis.get()
+        if client is None:
+            return True
+        try:
+            if client.eval(_REFRESH_LUA, 1, self.key, self.token, self.ttl_seconds):
+                return True
+            # Expired but not taken over yet - claim it again
+            return bool(client.set(self.key, self.token, nx=True, ex=self.ttl_seconds))
+        except Exception as e:
+            _redis.mark_failed(e)
+            return True
+
+    def release(self) -> None:
+        """Drop the claim (only if still held by this holder)"""
+        client = _redis.get()
+        if client is None:
+            return
+        try:
+            client.eval(_RELEASE_LUA, 1, self.key, self.token)
+        except Exception as e:
+            _redis.mark_failed(e)
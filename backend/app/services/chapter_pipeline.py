@@ -11,18 +11,31 @@ ZASADA: PROSTOTA = NIEZAWODNOŚĆ
 Jeśli generacja się nie uda - rzuć wyjątek.
 """
 
+import asyncio
+import json
 import logging
 import hashlib
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass
 
+from sqlalchemy import text as sa_text
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.config import settings
 from app.models.chapter import Chapter, ChapterStatus
+from app.models.plot_structure import PlotStructure
 from app.services.ai_service import get_ai_service, ModelTier
 from app.services.context_pack_builder import ContextPackBuilder, get_context_pack_builder
-from app.agents.scene_writer_agent import SceneWriterAgent, get_scene_writer
+from app.services.db_executor import get_db_executor
+from app.services.budget_scheduler import BudgetScheduler, ScenePlan
+from app.services.chapter_lease import ChapterLease, ChapterLeaseLost
+from app.services.duration_model import SCENES_PER_CHAPTER, DurationProfile, get_duration_model
+from app.services.repetition_index import RepetitionIndex, get_repetition_index
+from app.services.story_compactor import StoryCompactor, get_story_compactor
+from app.services.generation_stream import StreamPublisher
+from app.agents.scene_writer_agent import ChapterResult, SceneWriterAgent, get_scene_writer
 
 logger = logging.getLogger(__name__)
 
@@ -164,6 +177,7 @@ class PipelineConfig:
     target_tier: ModelTier = ModelTier.TIER_2  # GPT-4o for quality (default/fallback)
     use_semantic_router: bool = True  # Enable dynamic tier selection
     cost_limit_per_chapter: float = 1.00  # USD - generous limit
+    budget_scheduler: Optional[BudgetScheduler] = None  # per-scene tier/passes within the project budget
 
 
 @dataclass
@@ -181,6 +195,7 @@ class PipelineResult:
     tier_used: str
     escalated: bool
     error: Optional[str] = None
+    summary: Optional[str] = None  # compacted chapter summary (see story_compactor)
 
 
 class ChapterPipeline:
@@ -207,6 +222,7 @@ class ChapterPipeline:
         # Initialize agents
         self.context_builder = get_context_pack_builder()
         self.scene_writer = get_scene_writer()
+        self.compactor = get_story_compactor()
 
         logger.info(f"📦 ChapterPipeline initialized (tier={self.config.target_tier.name})")
 
@@ -222,22 +238,66 @@ class ChapterPipeline:
         chapter_summaries: Dict[int, str],
         target_word_count: int,
         book_title: str,
-        on_progress: Optional[callable] = None
+        on_progress: Optional[callable] = None,
+        lease: Optional[ChapterLease] = None
     ) -> PipelineResult:
         """
         Generate chapter - SIMPLE and RELIABLE
 
         No fallbacks. No retries. Just generate.
         If it fails - throw exception.
+
+        Every finished scene is committed to chapter.scenes_content as it
+        completes. A chapter left DRAFTING by a crashed worker resumes from
+        its first unfinished scene.
+
+        With a lease (fan-out) the claim on the chapter is refreshed before
+        each checkpoint; ChapterLeaseLost stops the chapter once another
+        worker has taken it over.
         """
         chapter_number = chapter.number
         logger.info(f"🚀 Pipeline: Chapter {chapter_number} (~{target_word_count} words)")
 
-        # Update status
-        chapter.status = ChapterStatus.DRAFTING
-        self.db.commit()
+        # Session work runs on the DB executor thread - the loop keeps streaming
+        db_executor = get_db_executor()
+        completed_scenes = await db_executor.run(self._start_drafting, chapter)
+
+        # RAG canon facts: one batched embedding request + one pgvector query, overlapping the loads below
+        facts_task = asyncio.ensure_future(
+            self.context_builder.retrieve_facts(chapter.project_id, chapter.outline or {}, all_characters)
+        )
+
+        # Book-wide repetition index: brought up to date with chapters written elsewhere
+        repetition_index = None
+        if settings.REPETITION_INDEX_ENABLED:
+            repetition_index = await db_executor.run(self._sync_repetition_index, chapter, completed_scenes)
+
+        # Per-scene tier and quality passes projected against the project budget
+        scheduler = self.config.budget_scheduler if settings.BUDGET_SCHEDULER_ENABLED else None
+        scene_planner = None
+        if scheduler is not None:
+            scheduler.sync_progress(await db_executor.run(self._written_scene_count, chapter.project_id))
+
+            def scene_planner(scene_num: int, desired: ScenePlan) -> ScenePlan:
+                return scheduler.plan_scene(chapter_number, scene_num, desired)
+
+        async def on_scene_checkpoint(checkpoint: Dict[str, Any]) -> None:
+            if lease is not None and not await asyncio.to_thread(lease.refresh):
+                raise ChapterLeaseLost(f"Chapter {chapter_number} was taken over by another worker")
+            await db_executor.run(self._save_scene_checkpoint, chapter, checkpoint, repetition_index)
+            if scheduler is not None:
+                scheduler.record_scene(chapter_number, checkpoint["scene_num"], checkpoint.get("cost"))
+
+        # Story so far: stored chapter summaries and act summaries, within the recap budget
+        recap = None
+        if settings.COMPACTION_ENABLED:
+            stored_summaries, act_summaries = await db_executor.run(self._load_story_memory, chapter)
+            chapter_summaries = {**chapter_summaries, **stored_summaries}
+            acts = self.compactor.acts_of(plot_structure, max([chapter_number, *chapter_summaries]))
+            recap = self.compactor.build_recap(chapter_number, chapter_summaries, acts, act_summaries)
 
         # Build context pack
+        retrieved_facts = await facts_task
         context_pack = self.context_builder.build_chapter_context(
             chapter_number=chapter_number,
             chapter_outline=chapter.outline or {},
@@ -245,7 +305,9 @@ class ChapterPipeline:
             world_bible=world_bible,
             plot_structure=plot_structure,
             canon_facts=canon_facts,
-            chapter_summaries=chapter_summaries
+            chapter_summaries=chapter_summaries,
+            recap=recap,
+            retrieved_facts=retrieved_facts
         )
 
         logger.info(f"📦 Context pack: ~{context_pack.estimated_tokens} tokens")
@@ -265,19 +327,53 @@ class ChapterPipeline:
         else:
             selected_tier = self.config.target_tier
 
-        # Generate chapter with SceneWriter
-        draft_result = await self.scene_writer.write_chapter(
-            chapter_number=chapter_number,
-            chapter_outline=chapter.outline or {},
-            genre=genre,
-            pov_character=pov_trimmed,
-            context_pack=context_pack,
-            target_word_count=target_word_count,
-            book_title=book_title,
-            tier=selected_tier,
-            on_scene_complete=on_progress
+        # Scene durations feed ETAs and the generation queue forecast (see duration_model)
+        duration_profile = DurationProfile(
+            genre=genre, tier=selected_tier.name, quality_mode=self.scene_writer.quality_mode
         )
 
+        # Scene digests are written in the background while the next scene is generated
+        digest_tasks: Dict[int, asyncio.Task] = {}
+
+        async def on_scene_complete(scene_num, total_scenes, scene_result):
+            await asyncio.to_thread(
+                get_duration_model().record_scene, scene_result.timings.get("total"), duration_profile
+            )
+            if settings.COMPACTION_ENABLED:
+                digest_tasks[scene_num] = asyncio.ensure_future(
+                    self.compactor.digest_scene(scene_result.content, chapter_number, scene_num)
+                )
+            if on_progress:
+                await on_progress(scene_num, total_scenes, scene_result)
+
+        # Generate chapter with SceneWriter
+        try:
+            draft_result = await self.scene_writer.write_chapter(
+                chapter_number=chapter_number,
+                chapter_outline=chapter.outline or {},
+                genre=genre,
+                pov_character=pov_trimmed,
+                context_pack=context_pack,
+                target_word_count=target_word_count,
+                book_title=book_title,
+                tier=selected_tier,
+                on_scene_complete=on_scene_complete,
+                all_characters=all_characters,
+                world_bible=world_bible,
+                stream_publisher=(
+                    StreamPublisher(chapter.project_id)
+                    if settings.GENERATION_STREAM_ENABLED else None
+                ),
+                completed_scenes=completed_scenes,
+                on_scene_checkpoint=on_scene_checkpoint,
+                repetition_index=repetition_index,
+                scene_planner=scene_planner
+            )
+        except BaseException:
+            for task in digest_tasks.values():
+                task.cancel()
+            raise
+
         # Validate result
         if draft_result.total_word_count < 500:
             raise RuntimeError(
@@ -286,19 +382,17 @@ class ChapterPipeline:
                 f"Expected ~{target_word_count} words."
             )
 
-        # Save to database
-        chapter.content = draft_result.full_content
-        chapter.word_count = draft_result.total_word_count
-        chapter.status = ChapterStatus.DRAFTED
-        chapter.generation_meta = {
-            "model_tier": selected_tier.name,
-            "cost": draft_result.total_cost,
-            "scenes": len(draft_result.scenes),
-            "generated_at": datetime.utcnow().isoformat()
-        }
-        chapter.is_complete = 1
+        summary, digests = None, {}
+        if settings.COMPACTION_ENABLED:
+            summary, digests = await self._compact_chapter(chapter_number, draft_result, completed_scenes, digest_tasks)
 
-        self.db.commit()
+        # Save to database
+        await db_executor.run(self._save_draft, chapter, draft_result, selected_tier, summary, digests)
+        if summary:
+            try:
+                await self._update_act_summary(chapter, plot_structure, chapter_summaries)
+            except Exception as e:
+                logger.warning(f"Act summary for chapter {chapter_number} not updated (non-critical): {e}")
 
         logger.info(
             f"✅ Chapter {chapter_number} COMPLETE: "
@@ -316,9 +410,246 @@ class ChapterPipeline:
             retries=0,
             repairs=0,
             tier_used=selected_tier.name,
-            escalated=(selected_tier != self.config.target_tier)
+            escalated=(selected_tier != self.config.target_tier),
+            summary=summary
         )
 
+    # ---- Story memory (see story_compactor) ----
+
+    def _load_story_memory(self, chapter: Chapter) -> Tuple[Dict[int, str], Dict[str, Dict[str, Any]]]:
+        """Stored summaries of the chapters before this one, and the act summaries"""
+        rows = self.db.query(Chapter.number, Chapter.generation_meta).filter(
+            Chapter.project_id == chapter.project_id,
+            Chapter.number < chapter.number
+        ).all()
+        summaries = {
+            number: meta["summary"]
+            for number, meta in rows
+            if isinstance(meta, dict) and meta.get("summary")
+        }
+        act_summaries = self.db.query(PlotStructure.act_summaries).filter(
+            PlotStructure.project_id == chapter.project_id
+        ).scalar()
+        return summaries, act_summaries or {}
+
+    async def _compact_chapter(
+        self,
+        chapter_number: int,
+        draft_result: ChapterResult,
+        completed_scenes: List[Dict[str, Any]],
+        digest_tasks: Dict[int, asyncio.Task]
+    ) -> Tuple[str, Dict[int, str]]:
+        """Scene digests (background, checkpointed or written now) and the chapter summary"""
+        stored = {scene.get("scene_num"): scene.get("digest") for scene in completed_scenes or []}
+
+        async def digest(scene) -> str:
+            if scene.scene_number in digest_tasks:
+                return await digest_tasks[scene.scene_number]
+            if stored.get(scene.scene_number):
+                return stored[scene.scene_number]
+            return await self.compactor.digest_scene(scene.content, chapter_number, scene.scene_number)
+
+        scenes = sorted(draft_result.scenes, key=lambda scene: scene.scene_number)
+        digests = await asyncio.gather(*(digest(scene) for scene in scenes))
+        summary = await self.compactor.summarize_chapter(chapter_number, list(digests))
+        return summary, {scene.scene_number: text for scene, text in zip(scenes, digests)}
+
+    async def _update_act_summary(
+        self,
+        chapter: Chapter,
+        plot_structure: Dict[str, Any],
+        chapter_summaries: Dict[int, str]
+    ) -> None:
+        """Recompose the summary of this chapter's act once all its chapters are summarized"""
+        db_executor = get_db_executor()
+        acts = self.compactor.acts_of(plot_structure, max([chapter.number, *chapter_summaries]))
+        act = next(((key, chapters) for key, chapters in acts if chapter.number in chapters), None)
+        if act is None:
+            return
+        act_key, act_chapters = act
+
+        summaries, act_summaries = await db_executor.run(self._load_act_memory, chapter, act_chapters)
+        if any(number not in summaries for number in act_chapters):
+            return
+        inputs = StoryCompactor.act_inputs(summaries, act_chapters)
+        if (act_summaries.get(act_key) or {}).get("inputs") == inputs:
+            return
+
+        summary = await self.compactor.summarize_act(act_key, summaries)
+        await db_executor.run(
+            self._save_act_summary, chapter.project_id, act_key, {"summary": summary, "inputs": inputs}
+        )
+        logger.info(f"🗜️ Act summary '{act_key}' updated ({len(act_chapters)} chapters)")
+
+    def _load_act_memory(
+        self,
+        chapter: Chapter,
+        act_chapters: List[int]
+    ) -> Tuple[Dict[int, str], Dict[str, Dict[str, Any]]]:
+        rows = self.db.query(Chapter.number, Chapter.generation_meta).filter(
+            Chapter.project_id == chapter.project_id,
+            Chapter.number.in_(act_chapters)
+        ).all()
+        summaries = {
+            number: meta["summary"]
+            for number, meta in rows
+            if isinstance(meta, dict) and meta.get("summary")
+        }
+        act_summaries = self.db.query(PlotStructure.act_summaries).filter(
+            PlotStructure.project_id == chapter.project_id
+        ).scalar()
+        return summaries, act_summaries or {}
+
+    def _save_act_summary(self, project_id: int, act_key: str, entry: Dict[str, Any]) -> None:
+        """Merge one act summary in SQL - concurrent chapter writers never overwrite each other"""
+        try:
+            self.db.execute(
+                sa_text(
+                    "UPDATE plot_structures "
+                    "SET act_summaries = COALESCE(act_summaries, '{}'::jsonb) || CAST(:patch AS jsonb) "
+                    "WHERE project_id = :project_id"
+                ),
+                {"patch": json.dumps({act_key: entry}, ensure_ascii=False), "project_id": project_id}
+            )
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.warning(f"Act summary '{act_key}' not saved (non-critical): {e}")
+
+    def _sync_repetition_index(self, chapter: Chapter, completed_scenes: List[Dict[str, Any]]) -> RepetitionIndex:
+        """
+        Repetition index of the project with every other chapter's current scenes.
+
+        Only chapters whose (status, current scene, word count) changed since
+        the last sync are loaded - on a warm worker that is the few chapters
+        written in the meantime. This chapter keeps only its resumed scenes.
+        """
+        index = get_repetition_index(chapter.project_id)
+        versions = self.db.query(
+            Chapter.id, Chapter.number, Chapter.status, Chapter.current_scene, Chapter.word_count
+        ).filter(
+            Chapter.project_id == chapter.project_id,
+            Chapter.number != chapter.number
+        ).all()
+        changed = {
+            chapter_id: (number, (status, current_scene, word_count))
+            for chapter_id, number, status, current_scene, word_count in versions
+            if index.chapter_versions.get(number) != (status, current_scene, word_count)
+        }
+        if changed:
+            rows = self.db.query(Chapter.id, Chapter.scenes_content, Chapter.content).filter(
+                Chapter.id.in_(list(changed))
+            ).all()
+            for chapter_id, scenes_content, content in rows:
+                number, version = changed[chapter_id]
+                scenes = {
+                    scene["scene_num"]: scene["content"]
+                    for scene in scenes_content or []
+                    if isinstance(scene, dict) and scene.get("content") and scene.get("scene_num")
+                }
+                if not scenes and content:
+                    scenes = {0: content}  # chapters written before scene checkpoints
+                index.sync_chapter(number, version, scenes)
+            logger.info(f"🔁 Repetition index: {len(changed)} chapters synced, {len(index)} passages/metaphors")
+
+        index.chapter_versions.pop(chapter.number, None)
+        index.retain_scenes(chapter.number, [scene["scene_num"] for scene in completed_scenes])
+        for scene in completed_scenes:
+            index.add_scene(chapter.number, scene["scene_num"], scene["content"])
+        return index
+
+    def _written_scene_count(self, project_id: int) -> int:
+        """Scenes of the book already written (finished chapters whole, drafts by checkpoint)"""
+        rows = self.db.query(Chapter.status, Chapter.current_scene).filter(
+            Chapter.project_id == project_id
+        ).all()
+        return sum(
+            (current_scene or 0) if status in (ChapterStatus.PLANNED, ChapterStatus.DRAFTING) else SCENES_PER_CHAPTER
+            for status, current_scene in rows
+        )
+
+    def _start_drafting(self, chapter: Chapter) -> List[Dict[str, Any]]:
+        """Mark the chapter DRAFTING; returns the scene checkpoints to resume from"""
+        completed_scenes = self._completed_scenes(chapter)
+        if not completed_scenes:
+            chapter.scenes_content = []
+            chapter.current_scene = 0
+
+        # Update status
+        chapter.status = ChapterStatus.DRAFTING
+        self.db.commit()
+        return completed_scenes
+
+    def _save_draft(
+        self,
+        chapter: Chapter,
+        draft_result: ChapterResult,
+        selected_tier: ModelTier,
+        summary: Optional[str] = None,
+        digests: Optional[Dict[int, str]] = None
+    ) -> None:
+        """Persist the assembled chapter draft (with its summary and scene digests)"""
+        chapter.content = draft_result.full_content
+        chapter.word_count = draft_result.total_word_count
+        chapter.status = ChapterStatus.DRAFTED
+        chapter.generation_meta = {
+            "model_tier": selected_tier.name,
+            "cost": draft_result.total_cost,
+            "scenes": len(draft_result.scenes),
+            "prompt_cache": draft_result.prompt_cache,
+            "scene_timings": draft_result.scene_timings,
+            "generated_at": datetime.utcnow().isoformat()
+        }
+        if summary:
+            chapter.generation_meta["summary"] = summary
+        if digests:
+            chapter.scenes_content = [
+                {**scene, "digest": digests[scene.get("scene_num")]} if scene.get("scene_num") in digests else scene
+                for scene in chapter.scenes_content or []
+            ]
+        chapter.is_complete = 1
+
+        self.db.commit()
+
+    @staticmethod
+    def _completed_scenes(chapter: Chapter) -> List[Dict[str, Any]]:
+        """Scene checkpoints of an interrupted draft (contiguous from scene 1)"""
+        if chapter.status != ChapterStatus.DRAFTING:
+            return []
+        by_number = {
+            scene.get("scene_num"): scene
+            for scene in chapter.scenes_content or []
+            if isinstance(scene, dict) and scene.get("content")
+        }
+        completed = []
+        while len(completed) + 1 in by_number:
+            completed.append(by_number[len(completed) + 1])
+        return completed
+
+    def _save_scene_checkpoint(
+        self,
+        chapter: Chapter,
+        checkpoint: Dict[str, Any],
+        repetition_index: Optional[RepetitionIndex] = None
+    ) -> None:
+        """Commit one finished scene (a crash afterwards loses at most the scene in progress)"""
+        if repetition_index is not None:
+            repetition_index.add_scene(chapter.number, checkpoint["scene_num"], checkpoint["content"])
+        scenes = [
+            scene for scene in chapter.scenes_content or []
+            if scene.get("scene_num") != checkpoint["scene_num"]
+        ]
+        scenes.append(checkpoint)
+        # New list object - JSONB columns only detect reassignment
+        chapter.scenes_content = sorted(scenes, key=lambda scene: scene["scene_num"])
+        chapter.current_scene = checkpoint["scene_num"]
+        chapter.word_count = sum(scene.get("word_count", 0) for scene in chapter.scenes_content)
+        try:
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.warning(f"Scene checkpoint {chapter.number}.{checkpoint['scene_num']} not saved: {e}")
+
 
 def get_chapter_pipeline(db: Session, config: Optional[PipelineConfig] = None) -> ChapterPipeline:
     """Get Chapter Pipeline instance"""
@@ -18,22 +18,89 @@ Layer 3: CONTEXT PACK (Dynamic)
 
 KEY PRINCIPLE: Don't pump 100k context.
 Retrieve only what's needed for current chapter.
+
+Token counts are cached per section text - consecutive chapters with the
+same cast or setting are not re-encoded. The sections themselves are cheap
+to build (a few dict lookups) and are rebuilt for every chapter.
 """
 
+import hashlib
 import logging
 import asyncio
-from typing import Dict, Any, List, Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
 from dataclasses import dataclass
 
+from app.config import settings
+from app.services.db_executor import get_db_executor
+from app.services.story_compactor import count_tokens
+
 logger = logging.getLogger(__name__)
 
 
 # Token limits for context pack
 MAX_CONTEXT_TOKENS = 10000  # ~7500 words
 MAX_CANON_FACTS = 30
+MAX_RAG_FACTS = 10  # semantic matches merged into the canon facts
+MAX_FACT_QUERIES = 16  # retrieval queries per chapter (embedded in one request)
 MAX_RECAP_LENGTH = 800  # words
 MAX_CHARACTER_CONTEXT = 500  # words per character
 
+# Section token counts kept per worker
+TOKEN_CACHE_SIZE = 2048
+
+
+class _TokenCache:
+    """Thread-safe LRU of section token counts, plus context pack build timings"""
+
+    def __init__(self, size: int = TOKEN_CACHE_SIZE):
+        self._tokens: "OrderedDict[str, int]" = OrderedDict()
+        self._max_tokens = size
+        self._lock = threading.Lock()
+        self.token_hits = 0
+        self.token_misses = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+
+    def tokens(self, text: str) -> int:
+        """Token count of a section text (encoded once per distinct text)"""
+        if not text:
+            return 0
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            value = self._tokens.get(key)
+            if value is not None:
+                self._tokens.move_to_end(key)
+                self.token_hits += 1
+                return value
+            self.token_misses += 1
+        value = count_tokens(text)
+        with self._lock:
+            self._tokens[key] = value
+            while len(self._tokens) > self._max_tokens:
+                self._tokens.popitem(last=False)
+        return value
+
+    def record_build(self, seconds: float) -> None:
+        with self._lock:
+            self.builds += 1
+            self.build_seconds += seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "builds": self.builds,
+                "build_seconds": round(self.build_seconds, 4),
+                "avg_build_ms": round(self.build_seconds / self.builds * 1000, 2) if self.builds else 0.0,
+                "token_hits": self.token_hits,
+                "token_misses": self.token_misses,
+            }
+
+
+_token_cache = _TokenCache()
+
 
 @dataclass
 class ContextPack:
@@ -84,7 +151,8 @@ class ContextPackBuilder:
         plot_structure: Dict[str, Any],
         canon_facts: List[Dict[str, Any]],
         chapter_summaries: Dict[int, str],  # {chapter_num: summary}
-        recap: Optional[str] = None
+        recap: Optional[str] = None,
+        retrieved_facts: Optional[List[Dict[str, Any]]] = None
     ) -> ContextPack:
         """
         Build optimized context pack for a chapter
@@ -98,11 +166,13 @@ class ContextPackBuilder:
             canon_facts: All established facts
             chapter_summaries: Previous chapter summaries
             recap: Optional overall story recap
+            retrieved_facts: Canon facts from retrieve_facts (RAG)
 
         Returns:
             ContextPack with only relevant context
         """
         logger.info(f"📦 Building context pack for Chapter {chapter_number}")
+        build_start = time.perf_counter()
 
         # 1. Get characters present in this chapter
         characters_present = self._get_chapter_characters(
@@ -133,7 +203,8 @@ class ContextPackBuilder:
         relevant_facts = self._filter_relevant_facts(
             chapter_outline,
             characters_present,
-            canon_facts
+            canon_facts,
+            retrieved_facts
         )
 
         # 6. Get previous chapter summary
@@ -154,7 +225,9 @@ class ContextPackBuilder:
             prev_summary
         )
 
-        logger.info(f"📦 Context pack built: ~{estimated_tokens} tokens")
+        build_seconds = time.perf_counter() - build_start
+        _token_cache.record_build(build_seconds)
+        logger.info(f"📦 Context pack built: ~{estimated_tokens} tokens in {build_seconds * 1000:.1f}ms")
 
         return ContextPack(
             canon_facts=relevant_facts,
@@ -342,32 +415,26 @@ class ContextPackBuilder:
         self,
         chapter_outline: Dict[str, Any],
         characters: List[Dict[str, Any]],
-        canon_facts: List[Dict[str, Any]]
+        canon_facts: List[Dict[str, Any]],
+        retrieved_facts: Optional[List[Dict[str, Any]]] = None
     ) -> List[Dict[str, Any]]:
         """Filter canon facts relevant to this chapter.
 
         Uses a hybrid approach:
         1. Keyword matching (fast, deterministic) for entity/setting matches
-        2. RAG semantic search (pgvector) for fuzzy thematic relevance
+        2. RAG semantic search (pgvector) for fuzzy thematic relevance -
+           retrieved beforehand by retrieve_facts (async, one round-trip)
         De-duplicates results, respects MAX_CANON_FACTS limit.
         """
-        if not canon_facts:
-            return []
-
         # --- Phase 1: Keyword matching (fast, deterministic) ---
-        keywords = set()
-        for char in characters:
-            keywords.add(char.get('name', '').lower())
-
-        setting = chapter_outline.get('setting', '').lower()
-        keywords.update(w for w in setting.split() if len(w) > 2)
+        keywords = self._fact_keywords(chapter_outline, characters)
 
         keyword_results = []
-        for fact in canon_facts:
+        for fact in canon_facts or []:
             fact_text = fact.get('fact', '').lower()
             related = fact.get('related_entity', '').lower()
 
-            if any(kw in fact_text or kw in related for kw in keywords if len(kw) > 2):
+            if any(kw in fact_text or kw in related for kw in keywords):
                 keyword_results.append({
                     "fact": fact.get('fact', ''),
                     "type": fact.get('fact_type', ''),
@@ -378,103 +445,196 @@ class ContextPackBuilder:
             if len(keyword_results) >= MAX_CANON_FACTS:
                 break
 
-        # --- Phase 2: RAG semantic search (fuzzy, pgvector) ---
-        rag_results = self._rag_search_facts(chapter_outline, characters)
-
-        # --- Merge & deduplicate ---
+        # --- Phase 2: RAG semantic search results (fuzzy, pgvector) ---
         seen_facts = {f["fact"] for f in keyword_results}
-        for rag_fact in rag_results:
+        for rag_fact in retrieved_facts or []:
             if rag_fact["fact"] not in seen_facts:
                 keyword_results.append(rag_fact)
                 seen_facts.add(rag_fact["fact"])
 
         return keyword_results[:MAX_CANON_FACTS]
 
-    def _rag_search_facts(
+    @staticmethod
+    def _fact_keywords(chapter_outline: Dict[str, Any], characters: List[Dict[str, Any]]) -> List[str]:
+        """Names of characters present and setting words (> 2 chars)"""
+        keywords = {char.get('name', '').lower() for char in characters}
+        keywords.update((chapter_outline.get('setting') or '').lower().split())
+        return sorted(kw for kw in keywords if len(kw) > 2)
+
+    # ---- RAG: canon fact retrieval (async, one round-trip per chapter) ----
+
+    def _fact_queries(
         self,
         chapter_outline: Dict[str, Any],
-        characters: List[Dict[str, Any]],
-    ) -> List[Dict[str, Any]]:
-        """RAG: Use pgvector semantic search to find thematically relevant facts.
+        characters: List[Dict[str, Any]]
+    ) -> List[str]:
+        """Natural language retrieval queries of a chapter: the chapter, each planned scene, each character"""
+        query_parts = []
+        char_names = [c.get('name', '') for c in characters if c.get('name')]
+        if char_names:
+            query_parts.append(f"Postacie: {', '.join(char_names)}")
+        if chapter_outline.get('setting'):
+            query_parts.append(f"Miejsce: {chapter_outline['setting']}")
+        if chapter_outline.get('goal'):
+            query_parts.append(f"Cel: {chapter_outline['goal']}")
+        if chapter_outline.get('emotional_beat'):
+            query_parts.append(f"Emocja: {chapter_outline['emotional_beat']}")
+
+        queries = [". ".join(query_parts)] if query_parts else []
+
+        # Scenes planned in the outline (when the plot architect provides them)
+        for scene in chapter_outline.get('scenes') or []:
+            if isinstance(scene, dict):
+                scene_text = ". ".join(
+                    str(scene[key]) for key in ('setting', 'goal', 'description', 'summary') if scene.get(key)
+                )
+            else:
+                scene_text = str(scene)
+            if scene_text:
+                queries.append(scene_text)
 
-        Builds a natural language query from the chapter context and searches
-        the mirix_vectors table for semantically similar content.
-        """
-        try:
-            from app.database import engine
-            from sqlalchemy import text as sa_text
-
-            # Build a natural language query from chapter context
-            query_parts = []
-            char_names = [c.get('name', '') for c in characters if c.get('name')]
-            if char_names:
-                query_parts.append(f"Postacie: {', '.join(char_names)}")
-            if chapter_outline.get('setting'):
-                query_parts.append(f"Miejsce: {chapter_outline['setting']}")
-            if chapter_outline.get('goal'):
-                query_parts.append(f"Cel: {chapter_outline['goal']}")
-            if chapter_outline.get('emotional_beat'):
-                query_parts.append(f"Emocja: {chapter_outline['emotional_beat']}")
-
-            if not query_parts:
-                return []
+        for char in characters:
+            if char.get('name'):
+                queries.append(". ".join(
+                    part for part in (f"Postać: {char['name']}", char.get('want'), char.get('wound')) if part
+                ))
 
-            search_text = ". ".join(query_parts)
+        unique = list(dict.fromkeys(q[:2000] for q in queries if q))
+        return unique[:MAX_FACT_QUERIES]
 
-            # Try embedding-based search first
-            try:
-                from openai import OpenAI
-                client = OpenAI()
-                resp = client.embeddings.create(
-                    input=search_text[:2000],
-                    model="text-embedding-3-small"
+    async def _embed_queries(self, queries: List[str]) -> Optional[List[List[float]]]:
+        """Embeddings of all queries in ONE request (None when unavailable), billed via AIService"""
+        try:
+            from app.services.ai_service import get_ai_service
+            embeddings = await get_ai_service().embed(
+                queries, metadata={"agent": "ContextPackBuilder", "task": "fact_retrieval"}
+            )
+            return embeddings if len(embeddings) == len(queries) else None
+        except Exception as e:
+            logger.debug(f"Fact query embeddings unavailable: {e}")
+            return None
+
+    @staticmethod
+    def _has_embedded_facts(project_id: int) -> bool:
+        """Whether the project has any embedded continuity fact (DB executor thread)"""
+        from app.database import engine
+        from sqlalchemy import text as sa_text
+
+        with engine.connect() as conn:
+            return bool(conn.execute(sa_text("""
+                SELECT EXISTS (
+                    SELECT 1 FROM continuity_facts
+                    WHERE project_id = :project_id AND embedding IS NOT NULL
                 )
-                embedding = resp.data[0].embedding
-                embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
-
-                with engine.connect() as conn:
-                    result = conn.execute(sa_text("""
-                        SELECT content, metadata,
-                               embedding <=> :embedding::vector AS distance
-                        FROM mirix_vectors
-                        WHERE collection LIKE '%core%'
-                          AND embedding IS NOT NULL
-                        ORDER BY distance
-                        LIMIT 10
-                    """), {"embedding": embedding_str})
-
-                    rows = result.fetchall()
-            except Exception:
-                # Fallback: text similarity
-                with engine.connect() as conn:
-                    result = conn.execute(sa_text("""
-                        SELECT content, metadata, 0.5 AS distance
-                        FROM mirix_vectors
-                        WHERE collection LIKE '%core%'
-                          AND content ILIKE :query
-                        LIMIT 10
-                    """), {"query": f"%{search_text[:80]}%"})
-                    rows = result.fetchall()
-
-            rag_facts = []
-            for row in rows:
-                import json
-                meta = json.loads(row[1]) if isinstance(row[1], str) else row[1] or {}
-                rag_facts.append({
-                    "fact": row[0],
-                    "type": meta.get("category", "rag"),
-                    "entity": meta.get("entities", ""),
-                    "source": "rag",
-                    "relevance": max(0.0, 1.0 - float(row[2])),
-                })
+            """), {"project_id": project_id}).scalar())
 
-            # Sort by relevance
-            rag_facts.sort(key=lambda x: x.get("relevance", 0), reverse=True)
-            return rag_facts[:5]  # Top 5 RAG results
+    async def retrieve_facts(
+        self,
+        project_id: int,
+        chapter_outline: Dict[str, Any],
+        all_characters: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """RAG: canon facts semantically related to a chapter (pass to build_chapter_context).
+
+        All retrieval queries of the chapter are embedded in one batched
+        request and matched against ContinuityFact.embedding (pgvector) in
+        one SQL statement on the DB executor thread - nothing blocks the
+        event loop. Without embeddings the same round-trip matches names
+        and setting words with ILIKE. Queries are embedded only when the
+        project has embedded facts to match.
+        """
+        characters = self._get_chapter_characters(chapter_outline, all_characters)
+        queries = self._fact_queries(chapter_outline, characters)
+        if not queries:
+            return []
 
+        start = time.perf_counter()
+        db_executor = get_db_executor()
+        try:
+            # No vectors to match = no paid embedding request
+            has_vectors = await db_executor.run(self._has_embedded_facts, project_id)
         except Exception as e:
             logger.debug(f"RAG search unavailable: {e}")
             return []
+        embeddings = await self._embed_queries(queries) if has_vectors else None
+        try:
+            facts = await db_executor.run(
+                self._search_facts,
+                project_id,
+                embeddings,
+                self._fact_keywords(chapter_outline, characters)
+            )
+        except Exception as e:
+            logger.debug(f"RAG search unavailable: {e}")
+            return []
+
+        logger.info(
+            f"🔎 RAG: {len(facts)} canon facts for {len(queries)} queries "
+            f"({'pgvector' if embeddings else 'text match'}) in {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+        return facts
+
+    @staticmethod
+    def _search_facts(
+        project_id: int,
+        embeddings: Optional[List[List[float]]],
+        keywords: List[str]
+    ) -> List[Dict[str, Any]]:
+        """Nearest continuity facts of every query vector - one statement (DB executor thread)"""
+        from app.database import engine
+        from sqlalchemy import text as sa_text
+
+        with engine.connect() as conn:
+            if embeddings:
+                # Top-k per query vector; the project filter keeps the scan to one book's facts
+                values = ", ".join(f"({i}, CAST(:q{i} AS vector))" for i in range(len(embeddings)))
+                params = {
+                    f"q{i}": "[" + ",".join(str(x) for x in embedding) + "]"
+                    for i, embedding in enumerate(embeddings)
+                }
+                rows = conn.execute(sa_text(f"""
+                    SELECT f.fact, f.fact_type, f.related_entity, f.distance
+                    FROM (VALUES {values}) AS q(idx, embedding)
+                    CROSS JOIN LATERAL (
+                        SELECT fact, fact_type, related_entity,
+                               embedding <=> q.embedding AS distance
+                        FROM continuity_facts
+                        WHERE project_id = :project_id
+                          AND embedding IS NOT NULL
+                        ORDER BY distance
+                        LIMIT :top_k
+                    ) AS f
+                """), {**params, "project_id": project_id, "top_k": settings.RAG_TOP_K}).fetchall()
+            elif keywords:
+                rows = conn.execute(sa_text("""
+                    SELECT fact, fact_type, related_entity, 0.5 AS distance
+                    FROM continuity_facts
+                    WHERE project_id = :project_id
+                      AND (fact ILIKE ANY(:patterns) OR related_entity ILIKE ANY(:patterns))
+                    LIMIT :limit
+                """), {
+                    "project_id": project_id,
+                    "patterns": [f"%{kw}%" for kw in keywords],
+                    "limit": MAX_RAG_FACTS,
+                }).fetchall()
+            else:
+                return []
+
+        # A fact found by several queries keeps its best distance
+        best: Dict[str, Dict[str, Any]] = {}
+        for fact, fact_type, entity, distance in rows:
+            relevance = max(0.0, 1.0 - float(distance))
+            if fact not in best or relevance > best[fact]["relevance"]:
+                best[fact] = {
+                    "fact": fact,
+                    "type": fact_type or "rag",
+                    "entity": entity or "",
+                    "source": "rag",
+                    "relevance": relevance,
+                }
+
+        # Sort by relevance
+        return sorted(best.values(), key=lambda f: f["relevance"], reverse=True)[:MAX_RAG_FACTS]
 
     def _build_recap(
         self,
@@ -510,8 +670,11 @@ class ContextPackBuilder:
         foreshadowing: List[Dict[str, Any]],
         prev_summary: str
     ) -> int:
-        """Estimate token count for context pack using tiktoken when available."""
-        # Concatenate all text for accurate counting
+        """Estimate token count for context pack using tiktoken when available.
+
+        Sections are counted separately, so unchanged sections (the cast of
+        the previous chapter, the same setting) come from the token cache.
+        """
         parts = [
             str(facts) if facts else "",
             recap or "",
@@ -521,15 +684,7 @@ class ContextPackBuilder:
             str(foreshadowing) if foreshadowing else "",
             prev_summary or "",
         ]
-        full_text = " ".join(parts)
-
-        try:
-            import tiktoken
-            enc = tiktoken.get_encoding("cl100k_base")
-            return len(enc.encode(full_text))
-        except (ImportError, Exception):
-            # Fallback: Polish text ≈ 3 chars/token
-            return len(full_text) // 3
+        return sum(_token_cache.tokens(part) for part in parts)
 
     def format_for_prompt(self, context_pack: ContextPack) -> str:
         """Format context pack for inclusion in prompt"""
@@ -649,6 +804,11 @@ class ContextPackBuilder:
         return "\n\n".join(sections)
 
 
+def get_context_pack_stats() -> Dict[str, Any]:
+    """Context pack build time and token cache hit rates of this worker"""
+    return _token_cache.get_stats()
+
+
 def get_context_pack_builder() -> ContextPackBuilder:
     """Get Context Pack Builder instance"""
     return ContextPackBuilder()
@@ -0,0 +1,84 @@
+"""
+DB Executor - synchronous SQLAlchemy work off the generation event loop
+
+Generation runs on an asyncio loop that also drives in-flight LLM streams.
+Session commits and queries made directly on that loop stall every stream
+for the duration of the round trip. Generation code hands such work to
+get_db_executor().run(fn, ...) instead:
+
+- One dedicated thread executes all of it, so calls are serialized and a
+  Session is never used by two threads at once.
+- The calling coroutine awaits the result; other coroutines keep running.
+- Attribute changes and the commit belong in the same callable - mutating
+  an object on the loop while the DB thread flushes its session is a race.
+
+Sessions used this way are created with GenerationSessionLocal
+(expire_on_commit=False), so reading ORM attributes on the loop after a
+commit never triggers a lazy load.
+
+With DB_EXECUTOR_ENABLED=false calls run inline (the previous behaviour).
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DBExecutor:
+    """Single-thread executor for synchronous session work"""
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="narraforge-db")
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._busy_seconds = 0.0
+        self._max_seconds = 0.0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on the DB thread and await its result (exceptions propagate)"""
+        call = functools.partial(self._timed, fn, *args, **kwargs)
+        if not settings.DB_EXECUTOR_ENABLED:
+            return call()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, call)
+
+    def _timed(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._calls += 1
+                self._busy_seconds += elapsed
+                self._max_seconds = max(self._max_seconds, elapsed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": settings.DB_EXECUTOR_ENABLED,
+                "calls": self._calls,
+                "busy_seconds": round(self._busy_seconds, 3),
+                "max_call_ms": round(self._max_seconds * 1000, 1),
+            }
+
+
+_db_executor: Optional[DBExecutor] = None
+
+
+def get_db_executor() -> DBExecutor:
+    """Get or create the DB executor singleton"""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = DBExecutor()
+    return _db_executor
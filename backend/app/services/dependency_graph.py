@@ -0,0 +1,211 @@
+"""
+Dependency Graph - content hashes that tell which parts of a book are stale
+
+Every generated artifact records fingerprints of the inputs it was written
+from. When a user edits an outline or a character profile, comparing the
+stored fingerprints with the current ones finds the few chapters and scenes
+that must be rewritten; everything else is kept (see
+AgentOrchestrator.regenerate_stale).
+
+Graph (arrows point from input to dependent):
+
+    world bible ─┐
+    plot slice ──┼──> chapter N ──> scene 1 ──> scene 2 ──> ... ──> scene K
+    outline N ───┤    (beat sheet + prose of every scene)
+    characters ──┘
+    ending of chapter N-1 ~~> opening of chapter N   (soft edge)
+
+- Hard inputs (world bible, the chapter's slice of the plot, its outline,
+  the characters it involves) change what a chapter is about: the whole
+  chapter is rewritten.
+- Scene K is written from scene K-1 (beat sheet planning and prose), so an
+  edited scene invalidates the scenes after it, not the ones before.
+- The predecessor's ending only shapes the opening: a changed ending is
+  fixed by reconciling the opening, not by rewriting the chapter.
+
+Stored fingerprints:
+    chapter.generation_meta["dependencies"] = {
+        "world": "...", "plot": "...", "outline": "...",
+        "characters": {"Anna Kowalska": "...", ...},
+        "predecessor": "..." | None   # None = written against the plot plan
+    }
+    chapter.scenes_content[i]["input_hash"] / ["content_hash"]
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Hex digits kept from sha256 - collisions are irrelevant at book scale
+_HASH_LENGTH = 16
+
+HARD_INPUTS = ("world", "plot", "outline")
+
+# Staleness kinds, from cheapest to most expensive fix
+FRESH = "fresh"
+UNTRACKED = "untracked"    # written before fingerprints existed - stamped, not rewritten
+OPENING = "opening"        # predecessor changed - reconcile the opening
+SCENES = "scenes"          # a scene was edited - rewrite the scenes after it
+CHAPTER = "chapter"        # hard input changed - rewrite the whole chapter
+UNWRITTEN = "unwritten"    # no finished prose yet
+
+
+def content_hash(value: Any) -> str:
+    """Short sha256 of the canonical JSON of a value"""
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:_HASH_LENGTH]
+
+
+def _folded(text: str) -> str:
+    return unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().casefold()
+
+
+def involved_characters(
+    all_characters: List[Dict[str, Any]],
+    pov_name: str,
+    outline: Dict[str, Any],
+    content: str
+) -> List[Dict[str, Any]]:
+    """
+    Characters a chapter depends on: the POV plus everyone named in its
+    outline or prose.
+
+    Names are matched by the stem of the first name, so Polish inflection
+    ("Anna" / "Anny" / "Annę") still counts as a mention.
+    """
+    haystack = _folded(json.dumps(outline or {}, ensure_ascii=False) + " " + (content or ""))
+    involved = []
+    for character in all_characters:
+        name = character.get("name") or ""
+        words = re.findall(r"[a-z]+", _folded(name))
+        stem = words[0][:max(3, len(words[0]) - 2)] if words else ""
+        if name == pov_name or (stem and re.search(rf"\b{re.escape(stem)}", haystack)):
+            involved.append(character)
+    return involved
+
+
+def plot_slice(plot_structure: Dict[str, Any], chapter_num: int) -> Dict[str, Any]:
+    """
+    The part of the plot structure a chapter is written from: the book's
+    conflict and stakes plus the tension, plot points and subplot
+    intersections placed in this chapter. Editing another chapter's plot
+    point does not invalidate this one.
+    """
+    plot_points = plot_structure.get("plot_points")
+    return {
+        "main_conflict": plot_structure.get("main_conflict"),
+        "stakes": plot_structure.get("stakes"),
+        "tension": [
+            entry for entry in plot_structure.get("tension_graph") or []
+            if isinstance(entry, dict) and entry.get("chapter") == chapter_num
+        ],
+        "plot_points": {
+            name: point for name, point in (plot_points if isinstance(plot_points, dict) else {}).items()
+            if isinstance(point, dict) and point.get("chapter") == chapter_num
+        },
+        "subplots": [
+            subplot for subplot in plot_structure.get("subplots") or []
+            if isinstance(subplot, dict) and chapter_num in (subplot.get("intersection_points") or [])
+        ],
+    }
+
+
+def chapter_dependencies(
+    world_bible: Dict[str, Any],
+    plot_inputs: Dict[str, Any],
+    outline: Dict[str, Any],
+    characters: List[Dict[str, Any]],
+    predecessor: Optional[str]
+) -> Dict[str, Any]:
+    """Fingerprints of a chapter's inputs (stored in generation_meta["dependencies"])"""
+    return {
+        "world": content_hash(world_bible),
+        "plot": content_hash(plot_inputs),
+        "outline": content_hash(outline or {}),
+        "characters": {c.get("name"): content_hash(c) for c in characters},
+        "predecessor": predecessor,
+    }
+
+
+def chapter_input_hash(dependencies: Dict[str, Any]) -> str:
+    """Single fingerprint of the hard inputs - the root of the scene chain"""
+    return content_hash({
+        **{key: dependencies.get(key) for key in HARD_INPUTS},
+        "characters": dependencies.get("characters") or {},
+    })
+
+
+def stamp_scenes(scenes: List[Dict[str, Any]], dependencies: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Scene checkpoints with input/content fingerprints chained from the chapter inputs"""
+    previous = chapter_input_hash(dependencies)
+    stamped = []
+    for scene in sorted(scenes or [], key=lambda s: s.get("scene_num", 0)):
+        scene_hash = content_hash(scene.get("content") or "")
+        stamped.append({
+            **scene,
+            "input_hash": content_hash([previous, scene.get("scene_num")]),
+            "content_hash": scene_hash,
+        })
+        previous = scene_hash
+    return stamped
+
+
+@dataclass
+class ChapterStaleness:
+    """Verdict for one chapter: what changed and how much must be rewritten"""
+    number: int
+    kind: str
+    from_scene: int = 1
+    changed: List[str] = field(default_factory=list)
+
+    @property
+    def needs_work(self) -> bool:
+        return self.kind not in (FRESH, UNTRACKED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "number": self.number,
+            "kind": self.kind,
+            "from_scene": self.from_scene,
+            "changed": self.changed,
+        }
+
+
+def diagnose_chapter(
+    number: int,
+    written: bool,
+    stored: Optional[Dict[str, Any]],
+    current: Dict[str, Any],
+    scenes: List[Dict[str, Any]]
+) -> ChapterStaleness:
+    """Compare stored fingerprints of a chapter with the current ones"""
+    if not written:
+        return ChapterStaleness(number, UNWRITTEN)
+    if not stored:
+        return ChapterStaleness(number, UNTRACKED)
+
+    changed = [key for key in HARD_INPUTS if stored.get(key) != current.get(key)]
+    stored_characters = stored.get("characters") or {}
+    current_characters = current.get("characters") or {}
+    for name in sorted(set(stored_characters) | set(current_characters)):
+        if stored_characters.get(name) != current_characters.get(name):
+            changed.append(f"character:{name}")
+    if changed:
+        return ChapterStaleness(number, CHAPTER, changed=changed)
+
+    # Scene chain: the first scene whose recorded input no longer matches
+    previous = chapter_input_hash(current)
+    for scene in sorted(scenes or [], key=lambda s: s.get("scene_num", 0)):
+        if "input_hash" not in scene:
+            break
+        scene_num = scene.get("scene_num")
+        if scene["input_hash"] != content_hash([previous, scene_num]):
+            return ChapterStaleness(number, SCENES, from_scene=scene_num, changed=[f"scene:{scene_num - 1}"])
+        previous = content_hash(scene.get("content") or "")
+
+    if stored.get("predecessor") != current.get("predecessor"):
+        return ChapterStaleness(number, OPENING, changed=["predecessor"])
+    return ChapterStaleness(number, FRESH)
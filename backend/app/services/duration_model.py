@@ -0,0 +1,307 @@
+"""
+Duration Model - learned step and scene durations for ETAs and capacity planning
+
+STEP_DURATIONS are guesses (prose generation was a flat 20 minutes whatever
+the size of the book). Every run records how long it actually took:
+
+- every pipeline step except prose generation, keyed by genre and book size
+  (chapter count bucket)
+- every written scene (SceneResult.timings["total"]), keyed by genre, model
+  tier and scene writer quality mode
+
+Prose generation is estimated as scenes x scene duration / chapters written
+in parallel, so it scales with the book.
+
+Lookups fall back from the most specific key to broader ones
+(step:4:fantasy:m -> step:4:fantasy -> step:4) and to the defaults until a
+key has DURATION_MODEL_MIN_SAMPLES samples. Estimates are medians - one run
+stalled behind a rate limit does not move them.
+
+Consumers:
+- GenerationProgress: online ETA of a running book (the learned scene
+  duration blended with the pace observed in the run itself)
+- project_service.simulate_generation: per-step durations of the plan
+- project_service.get_generation_capacity: generation queue forecast
+
+Samples are kept in Redis lists (trimmed to a window); without Redis the
+model keeps in-process windows. Recording and estimating may block on Redis,
+so generation code calls them via asyncio.to_thread.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.redis_client import LazyRedis
+
+logger = logging.getLogger(__name__)
+
+
+# Default duration of each step in minutes (used until a step has history)
+STEP_DURATIONS = {
+    1: 1,   # Inicjalizacja Projektu
+    2: 1,   # Parametryzacja
+    3: 1,   # World Bible
+    4: 3,   # Kreacja Postaci Głównych
+    5: 2,   # Kreacja Postaci Pobocznych
+    6: 2,   # Główna Oś Fabularna
+    7: 2,   # Wątki Poboczne
+    8: 2,   # Chapter Breakdown
+    9: 3,   # Scene Detailing
+    10: 1,  # Pre-Writing Validation
+    11: 20, # Prose Generation (LONGEST!) - only without a scene plan
+    12: 2,  # Continuity Check
+    13: 5,  # Style Polishing
+    14: 1,  # Genre Compliance
+    15: 1,  # Final Assembly
+}
+
+TOTAL_STEPS = 15
+PROSE_STEP = 11
+
+# Scenes written per chapter (SceneWriterAgent.write_chapter)
+SCENES_PER_CHAPTER = 5
+
+# Default duration of one scene in minutes (beat sheet, prose, review)
+DEFAULT_SCENE_MINUTES = 1.5
+
+# Estimates are recomputed at most this often per key (avoids a Redis read per progress update)
+_ESTIMATE_TTL = 60.0
+
+
+def size_bucket(chapter_count: int) -> str:
+    """Book size class used in step keys"""
+    if chapter_count <= 15:
+        return "s"
+    if chapter_count <= 30:
+        return "m"
+    return "l"
+
+
+def prose_parallelism(chapter_count: int) -> int:
+    """Chapters of one book written at the same time"""
+    if settings.GENERATION_FANOUT_ENABLED:
+        batches = math.ceil(chapter_count / max(1, settings.GENERATION_FANOUT_BATCH_SIZE))
+        return max(1, min(settings.GENERATION_WORKER_SLOTS, batches))
+    return max(1, settings.CHAPTER_CONCURRENCY)
+
+
+@dataclass
+class DurationProfile:
+    """What a run's durations depend on"""
+    genre: Optional[str] = None
+    chapter_count: int = 25
+    tier: str = "TIER_2"
+    quality_mode: str = "standard"
+    parallelism: int = 1
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+
+class DurationModel:
+    """
+    Learns step and scene durations across runs.
+
+    Usage:
+        model = get_duration_model()
+        model.record_step(step, seconds, profile)
+        model.record_scene(seconds, profile)
+        minutes = model.remaining_minutes(profile, current_step, scenes_left)
+    """
+
+    KEY_PREFIX = "narraforge:durations:"
+
+    def __init__(self, window: int = 100, min_samples: int = 3):
+        """
+        Args:
+            window: Samples kept per key
+            min_samples: Samples required before a key replaces the defaults
+        """
+        self.window = window
+        self.min_samples = min_samples
+
+        self._redis = LazyRedis("Duration model", "using local windows")
+        self._local: Dict[str, Deque[float]] = {}
+        self._estimates: Dict[str, Tuple[float, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+        self.recorded_steps = 0
+        self.recorded_scenes = 0
+
+    # ---- Storage ----
+
+    def _push(self, key: str, minutes: float) -> None:
+        storage_key = self.KEY_PREFIX + key
+        client = self._redis.get()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                pipe.lpush(storage_key, f"{minutes:.4f}")
+                pipe.ltrim(storage_key, 0, self.window - 1)
+                pipe.execute()
+                return
+            except Exception as e:
+                self._redis.mark_failed(e)
+        with self._lock:
+            self._local.setdefault(storage_key, deque(maxlen=self.window)).append(minutes)
+
+    def _samples(self, key: str) -> List[float]:
+        storage_key = self.KEY_PREFIX + key
+        client = self._redis.get()
+        if client is not None:
+            try:
+                return [float(v) for v in client.lrange(storage_key, 0, self.window - 1)]
+            except Exception as e:
+                self._redis.mark_failed(e)
+        with self._lock:
+            return list(self._local.get(storage_key, ()))
+
+    # ---- Keys ----
+
+    @staticmethod
+    def _step_keys(step: int, profile: DurationProfile) -> List[str]:
+        """Most specific key first"""
+        keys = [f"step:{step}"]
+        if profile.genre:
+            keys.insert(0, f"step:{step}:{profile.genre}")
+            keys.insert(0, f"step:{step}:{profile.genre}:{size_bucket(profile.chapter_count)}")
+        return keys
+
+    @staticmethod
+    def _scene_keys(profile: DurationProfile) -> List[str]:
+        """Most specific key first"""
+        keys = [f"scene:{profile.tier}:{profile.quality_mode}", "scene"]
+        if profile.genre:
+            keys.insert(0, f"scene:{profile.genre}:{profile.tier}:{profile.quality_mode}")
+        return keys
+
+    def _estimate(self, keys: List[str]) -> Optional[float]:
+        """Median of the most specific key with enough samples (minutes)"""
+        for key in keys:
+            now = time.monotonic()
+            with self._lock:
+                cached = self._estimates.get(key)
+            if cached is not None and now - cached[0] < _ESTIMATE_TTL:
+                minutes = cached[1]
+            else:
+                samples = self._samples(key)
+                minutes = _median(samples) if len(samples) >= self.min_samples else None
+                with self._lock:
+                    self._estimates[key] = (now, minutes)
+            if minutes is not None:
+                return minutes
+        return None
+
+    # ---- Recording ----
+
+    def record_step(self, step: int, seconds: float, profile: DurationProfile) -> None:
+        """Record a finished pipeline step (prose generation is recorded per scene)"""
+        if step == PROSE_STEP or step not in STEP_DURATIONS or seconds < 0:
+            return
+        for key in self._step_keys(step, profile):
+            self._push(key, seconds / 60)
+        with self._lock:
+            self.recorded_steps += 1
+
+    def record_scene(self, seconds: Optional[float], profile: DurationProfile) -> None:
+        """Record a written scene (SceneResult.timings["total"])"""
+        if not seconds or seconds <= 0:
+            return
+        for key in self._scene_keys(profile):
+            self._push(key, seconds / 60)
+        with self._lock:
+            self.recorded_scenes += 1
+
+    # ---- Estimates ----
+
+    def learned_step_minutes(self, step: int, profile: DurationProfile) -> Optional[float]:
+        """Learned duration of a step, None without enough history"""
+        return self._estimate(self._step_keys(step, profile))
+
+    def step_minutes(self, step: int, profile: DurationProfile) -> float:
+        """Expected duration of a step (learned, else the default)"""
+        learned = self.learned_step_minutes(step, profile)
+        return learned if learned is not None else float(STEP_DURATIONS.get(step, 1))
+
+    def learned_scene_minutes(self, profile: DurationProfile) -> Optional[float]:
+        """Learned duration of one scene, None without enough history"""
+        return self._estimate(self._scene_keys(profile))
+
+    def scene_minutes(self, profile: DurationProfile) -> float:
+        """Expected duration of one scene (learned, else the default)"""
+        learned = self.learned_scene_minutes(profile)
+        return learned if learned is not None else DEFAULT_SCENE_MINUTES
+
+    def learned_prose_minutes(self, profile: DurationProfile) -> Optional[float]:
+        """Wall-clock prose generation of a whole book, None without scene history"""
+        scene = self.learned_scene_minutes(profile)
+        if scene is None:
+            return None
+        scenes = profile.chapter_count * SCENES_PER_CHAPTER
+        return scenes * scene / max(1, profile.parallelism)
+
+    def remaining_minutes(
+        self,
+        profile: DurationProfile,
+        current_step: int,
+        scenes_left: int,
+        scene_pace: Optional[float] = None
+    ) -> float:
+        """
+        Minutes needed after the current step's own work.
+
+        Args:
+            profile: Run profile
+            current_step: Step in progress (0 = not started)
+            scenes_left: Scenes still to write (counted while step <= 11)
+            scene_pace: Wall-clock minutes per scene, default the learned
+                scene duration / parallelism
+        """
+        minutes = sum(
+            self.step_minutes(step, profile)
+            for step in range(current_step + 1, TOTAL_STEPS + 1)
+            if step != PROSE_STEP
+        )
+        if current_step <= PROSE_STEP and scenes_left > 0:
+            if scene_pace is None:
+                scene_pace = self.scene_minutes(profile) / max(1, profile.parallelism)
+            minutes += scenes_left * scene_pace
+        return minutes
+
+    def book_minutes(self, profile: DurationProfile) -> float:
+        """Expected duration of a whole run"""
+        return self.remaining_minutes(profile, 0, profile.chapter_count * SCENES_PER_CHAPTER)
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "recorded_steps": self.recorded_steps,
+                "recorded_scenes": self.recorded_scenes,
+                "backend": "redis" if self._redis.connected else "local",
+            }
+
+
+# Singleton instance
+_duration_model: Optional[DurationModel] = None
+
+
+def get_duration_model() -> DurationModel:
+    """Get or create duration model singleton"""
+    global _duration_model
+    if _duration_model is None:
+        _duration_model = DurationModel(
+            window=settings.DURATION_MODEL_WINDOW,
+            min_samples=settings.DURATION_MODEL_MIN_SAMPLES,
+        )
+    return _duration_model
@@ -28,7 +28,7 @@ import logging
 import math
 from collections import defaultdict
 
-from app.services.ai_service import AIService
+from app.services.ai_service import AIService, ModelTier
 from app.models.project import GenreType
 
 logger = logging.getLogger(__name__)
@@ -587,13 +587,15 @@ Odpowiedz TYLKO w JSON:
         try:
             response = await self.ai_service.generate(
                 prompt=prompt,
-                model_tier=1,
+                tier=ModelTier.TIER_1,
                 max_tokens=500,
-                temperature=0.2
+                temperature=0.2,
+                cache_response=True,
+                metadata={"agent": "EmotionalResonanceEngine", "task": "paragraph_emotion_analysis"}
             )
 
             import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
             if json_match:
                 data = json.loads(json_match.group(0))
                 emotions = data.get("emotions", {})
@@ -0,0 +1,46 @@
+"""
+Generation Context - ambient per-task context for AI calls
+
+Agents call AIService.generate() deep inside the pipeline without knowing
+which project or pipeline step they work for. The pipeline entry points set
+the project once via project_scope() and the orchestrator marks each step
+with set_pipeline_step(); services that keep per-project state (token budget
+predictor, telemetry ledger, ...) read them with get_project_id() /
+get_pipeline_step().
+
+Context variables are copied into every asyncio task created inside the
+scope, so concurrently generated scenes/chapters keep their own project.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+
+
+_current_project_id: ContextVar[Optional[int]] = ContextVar("narraforge_project_id", default=None)
+_current_step: ContextVar[Tuple[int, str]] = ContextVar("narraforge_pipeline_step", default=(0, "adhoc"))
+
+
+def get_project_id() -> Optional[int]:
+    """Project the current generation belongs to (None outside a pipeline run)"""
+    return _current_project_id.get()
+
+
+@contextmanager
+def project_scope(project_id: Optional[int]) -> Iterator[None]:
+    """Attribute every AI call inside the block to a project"""
+    token = _current_project_id.set(project_id)
+    try:
+        yield
+    finally:
+        _current_project_id.reset(token)
+
+
+def get_pipeline_step() -> Tuple[int, str]:
+    """(step number, step name) of the running pipeline step; (0, "adhoc") outside the pipeline"""
+    return _current_step.get()
+
+
+def set_pipeline_step(step: int, step_name: str) -> None:
+    """Mark the pipeline step for the current task and every task it spawns afterwards"""
+    _current_step.set((step, step_name))
@@ -0,0 +1,342 @@
+"""
+Generation Stream - live relay of generated prose to connected clients
+
+Scene text is produced inside Celery workers; clients are connected to the
+API process. This module bridges the two over Redis pub/sub:
+
+- StreamPublisher (worker side): buffers token deltas and publishes them in
+  small batches to `narraforge:stream:project:{id}`. Publishing never blocks
+  or breaks generation: events are handed to one sender thread per process
+  (Redis I/O stays off the event loop) and dropped if Redis is down or the
+  sender falls behind.
+- subscribe_project_stream (API side): async iterator over the events of one
+  project.
+- ProjectStreamHub (API side): one subscription per project shared by every
+  watcher (SSE and WebSocket endpoints in app/api/projects.py); a watcher
+  that falls behind loses its oldest events, never slows the others.
+
+Progress (step, chapter/scene, cost, ETA) is published by the orchestrator
+as well, and the latest progress event of a running project is kept at
+`narraforge:progress:project:{id}`, so watchers and GET /status get the
+current state without touching Postgres.
+
+Event payloads (JSON):
+    {"type": "scene_start", "chapter": 3, "scene": 2, "attempt": 0}
+    {"type": "delta", "chapter": 3, "scene": 2, "text": "..."}
+    {"type": "scene_end", "chapter": 3, "scene": 2, "word_count": 812}
+    {"type": "scene_complete", "chapter": 3, "scene": 2, "content": "..."}
+    {"type": "progress", "status": "generating", "current_step": 11,
+     "progress_percentage": 73.3, "current_activity": "...", "chapter": 3,
+     "scene": 2, "actual_cost": 4.2, "eta_minutes": 25, ...}
+
+A scene may be drafted more than once (validation retries); each draft
+starts with a new scene_start and clients should reset the scene buffer.
+scene_complete carries the final (possibly rewritten) text.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.redis_client import LazyRedis
+
+logger = logging.getLogger(__name__)
+
+
+# Flush buffered deltas after this many characters or seconds
+_FLUSH_CHARS = 200
+_FLUSH_INTERVAL = 0.15
+
+# Events waiting for the sender thread before new ones are dropped
+_SENDER_QUEUE_SIZE = 1000
+
+# Progress snapshot lifetime - a run silent for longer (dead worker) falls back to Postgres
+_PROGRESS_SNAPSHOT_TTL = 600
+
+# Events buffered per watcher before its oldest ones are dropped
+_WATCHER_QUEUE_SIZE = 256
+
+
+def project_channel(project_id: int) -> str:
+    """Redis pub/sub channel for a project's live generation events"""
+    return f"narraforge:stream:project:{project_id}"
+
+
+def progress_key(project_id: int) -> str:
+    """Redis key holding the latest progress event of a project"""
+    return f"narraforge:progress:project:{project_id}"
+
+
+class _StreamSender:
+    """Publishes queued events from one daemon thread (in order, never on the event loop)"""
+
+    def __init__(self):
+        self._redis = LazyRedis("Generation stream", "live events disabled")
+        self._queue: "queue.Queue[Tuple[str, Optional[str], str]]" = queue.Queue(maxsize=_SENDER_QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, channel: str, snapshot_key: Optional[str], payload: str) -> None:
+        """Queue an event; snapshot_key also stores it as the project's progress snapshot"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="generation-stream-sender", daemon=True
+                    )
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((channel, snapshot_key, payload))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            channel, snapshot_key, payload = self._queue.get()
+            r = self._redis.get()
+            if r is None:
+                continue
+            try:
+                if snapshot_key:
+                    pipe = r.pipeline(transaction=False)
+                    pipe.set(snapshot_key, payload, ex=_PROGRESS_SNAPSHOT_TTL)
+                    pipe.publish(channel, payload)
+                    pipe.execute()
+                else:
+                    r.publish(channel, payload)
+            except Exception as e:
+                self._redis.mark_failed(e)
+
+
+_sender = _StreamSender()
+
+
+class StreamPublisher:
+    """
+    Publishes generation events for one project.
+
+    Usage:
+        publisher = StreamPublisher(project_id)
+        publisher.scene_start(chapter, scene)
+        publisher.delta(chapter, scene, text)   # called per token
+        publisher.scene_end(chapter, scene, word_count)
+    """
+
+    def __init__(self, project_id: int):
+        self.project_id = project_id
+        self.channel = project_channel(project_id)
+        self._buffer: List[str] = []
+        self._buffer_chars = 0
+        self._buffer_key: Optional[tuple] = None
+        self._last_flush = time.monotonic()
+
+    def _publish(self, event: Dict[str, Any], snapshot: bool = False) -> None:
+        payload = json.dumps(event, ensure_ascii=False, default=str)
+        _sender.submit(self.channel, progress_key(self.project_id) if snapshot else None, payload)
+
+    def flush(self) -> None:
+        """Publish buffered deltas as one event"""
+        if self._buffer and self._buffer_key:
+            chapter, scene = self._buffer_key
+            self._publish({
+                "type": "delta",
+                "chapter": chapter,
+                "scene": scene,
+                "text": "".join(self._buffer),
+            })
+        self._buffer = []
+        self._buffer_chars = 0
+        self._last_flush = time.monotonic()
+
+    def delta(self, chapter: int, scene: int, text: str) -> None:
+        """Buffer a token delta; flushes in ~200 char / 150 ms batches"""
+        if self._buffer_key != (chapter, scene):
+            self.flush()
+            self._buffer_key = (chapter, scene)
+        self._buffer.append(text)
+        self._buffer_chars += len(text)
+        if self._buffer_chars >= _FLUSH_CHARS or time.monotonic() - self._last_flush >= _FLUSH_INTERVAL:
+            self.flush()
+
+    def scene_start(self, chapter: int, scene: int, attempt: int = 0) -> None:
+        self.flush()
+        self._buffer_key = (chapter, scene)
+        self._publish({"type": "scene_start", "chapter": chapter, "scene": scene, "attempt": attempt})
+
+    def scene_end(self, chapter: int, scene: int, word_count: int) -> None:
+        self.flush()
+        self._publish({"type": "scene_end", "chapter": chapter, "scene": scene, "word_count": word_count})
+
+    def scene_complete(self, chapter: int, scene: int, content: str) -> None:
+        self.flush()
+        self._publish({"type": "scene_complete", "chapter": chapter, "scene": scene, "content": content})
+
+    def progress(self, snapshot: Dict[str, Any]) -> None:
+        """Publish a progress event and keep it as the project's current state"""
+        self._publish({"type": "progress", **snapshot}, snapshot=True)
+
+
+async def read_progress_snapshot(project_id: int) -> Optional[Dict[str, Any]]:
+    """Latest progress event of a project, None if there is none (or Redis is down)"""
+    client = get_stream_hub()._get_client()
+    if client is None:
+        return None
+    try:
+        payload = await client.get(progress_key(project_id))
+    except Exception as e:
+        logger.warning(f"Generation stream: progress snapshot unavailable: {e}")
+        return None
+    if not payload:
+        return None
+    try:
+        return json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+
+
+async def subscribe_project_stream(
+    project_id: int,
+    heartbeat_seconds: float = 15.0
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Iterate over live generation events of a project.
+
+    Yields event dicts as they arrive, and None every `heartbeat_seconds`
+    without traffic (callers use it to keep idle connections alive).
+    Raises if Redis is unreachable.
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(project_channel(project_id))
+        last_event = time.monotonic()
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message and message.get("type") == "message":
+                last_event = time.monotonic()
+                try:
+                    event = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                yield event
+            elif time.monotonic() - last_event >= heartbeat_seconds:
+                last_event = time.monotonic()
+                yield None
+            else:
+                await asyncio.sleep(0)
+    finally:
+        for closer in (pubsub.unsubscribe, pubsub.aclose, client.aclose):
+            try:
+                await closer()
+            except Exception:
+                pass
+
+
+class ProjectStreamHub:
+    """
+    Fans the events of a project out to any number of watchers in this
+    process from a single Redis subscription.
+
+    The subscription opens with the first watcher of a project and closes
+    with the last one. Each watcher has a bounded queue; when it is full the
+    oldest event is dropped, so a slow client cannot hold up the others.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._watchers: Dict[int, Set[asyncio.Queue]] = {}
+        self._readers: Dict[int, asyncio.Task] = {}
+
+    def _get_client(self):
+        if self._client is None:
+            try:
+                import redis.asyncio as aioredis
+                self._client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+            except Exception as e:
+                logger.warning(f"Generation stream: Redis client unavailable: {e}")
+                return None
+        return self._client
+
+    async def watch(
+        self,
+        project_id: int,
+        heartbeat_seconds: float = 15.0
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Iterate over live events of a project (shared subscription).
+
+        Yields event dicts, and None every `heartbeat_seconds` without
+        traffic. Raises if the subscription fails.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_WATCHER_QUEUE_SIZE)
+        self._watchers.setdefault(project_id, set()).add(queue)
+        if project_id not in self._readers:
+            self._readers[project_id] = asyncio.ensure_future(self._read(project_id))
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            watchers = self._watchers.get(project_id)
+            if watchers is not None:
+                watchers.discard(queue)
+                if not watchers:
+                    del self._watchers[project_id]
+                    reader = self._readers.pop(project_id, None)
+                    if reader is not None:
+                        reader.cancel()
+
+    async def _read(self, project_id: int) -> None:
+        """One subscription per project; every event goes to every watcher's queue"""
+        try:
+            async for event in subscribe_project_stream(project_id, heartbeat_seconds=3600):
+                if event is not None:
+                    self._broadcast(project_id, event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Generation stream hub: subscription for project {project_id} failed: {e}")
+            self._broadcast(project_id, e)
+        finally:
+            if self._readers.get(project_id) is asyncio.current_task():
+                del self._readers[project_id]
+
+    def _broadcast(self, project_id: int, event: Any) -> None:
+        for queue in list(self._watchers.get(project_id, ())):
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "projects": len(self._readers),
+            "watchers": sum(len(w) for w in self._watchers.values()),
+        }
+
+
+_stream_hub: Optional[ProjectStreamHub] = None
+
+
+def get_stream_hub() -> ProjectStreamHub:
+    """Get or create the stream hub singleton (API process)"""
+    global _stream_hub
+    if _stream_hub is None:
+        _stream_hub = ProjectStreamHub()
+    return _stream_hub
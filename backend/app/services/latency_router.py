@@ -0,0 +1,238 @@
+"""
+Latency Router - latency-aware provider selection and hedging decisions
+
+Keeps rolling latency windows per (provider, model, size class) and uses
+them to:
+- route a call to the faster of two tier-equivalent models
+  (TIER_2: gpt-4o <-> claude-sonnet, TIER_3: gpt-4-turbo <-> claude-opus)
+- give a hedge deadline (the primary's p95) after which a short analysis
+  call may fire a duplicate request; whichever finishes first wins
+
+Quality tiers never change: only models listed as equivalent for the same
+tier are candidates. Latencies are bucketed by requested output size so a
+5000-token chapter and a 300-token JSON verdict are never compared.
+
+State is in-process (per worker): routing reacts to what this worker sees.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Output-size classes (max_tokens upper bounds)
+_SIZE_CLASSES = ((1000, "short"), (4000, "medium"))
+
+
+def size_class(max_tokens: int) -> str:
+    """Bucket a request by requested completion size"""
+    for bound, name in _SIZE_CLASSES:
+        if max_tokens <= bound:
+            return name
+    return "long"
+
+
+@dataclass
+class LatencySnapshot:
+    """Summary of one latency window"""
+    samples: int
+    p50: float
+    p95: float
+    errors: int
+
+
+class _LatencyWindow:
+    """Rolling window of recent latencies (seconds)"""
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.errors: Deque[float] = deque(maxlen=size)  # timestamps of recent failures
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class LatencyRouter:
+    """
+    Latency-aware routing between tier-equivalent models.
+
+    Usage:
+        router = get_latency_router()
+        model, provider = router.choose(candidates, max_tokens)
+        deadline = router.hedge_deadline(provider, model, max_tokens)
+        ...
+        router.record(provider, model, max_tokens, latency, success=True)
+    """
+
+    def __init__(
+        self,
+        window_size: int = 200,
+        min_samples: int = 20,
+        switch_margin: float = 0.2,
+        explore_rate: float = 0.05,
+        error_window_seconds: float = 300.0
+    ):
+        """
+        Args:
+            window_size: Samples kept per (provider, model, size class)
+            min_samples: Samples required before a window influences routing
+            switch_margin: Alternative must be this much faster (p50) to win
+            explore_rate: Share of calls sent to the other candidate to keep its stats fresh
+                (short calls, or under-sampled candidates)
+            error_window_seconds: Failures within this window count against a model
+        """
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.switch_margin = switch_margin
+        self.explore_rate = explore_rate
+        self.error_window_seconds = error_window_seconds
+        self._windows: Dict[Tuple[str, str, str], _LatencyWindow] = {}
+        self._lock = threading.Lock()
+
+    def _window(self, key: Tuple[str, str, str]) -> _LatencyWindow:
+        window = self._windows.get(key)
+        if window is None:
+            window = _LatencyWindow(self.window_size)
+            self._windows[key] = window
+        return window
+
+    def _snapshot(self, key: Tuple[str, str, str]) -> LatencySnapshot:
+        with self._lock:
+            window = self._window(key)
+            cutoff = time.monotonic() - self.error_window_seconds
+            return LatencySnapshot(
+                samples=len(window.samples),
+                p50=window.percentile(0.5) or 0.0,
+                p95=window.percentile(0.95) or 0.0,
+                errors=sum(1 for t in window.errors if t >= cutoff),
+            )
+
+    def record(self, provider: str, model: str, max_tokens: int, latency: float, success: bool = True) -> None:
+        """Record one upstream call (failures also count their elapsed time)"""
+        with self._lock:
+            window = self._window((provider, model, size_class(max_tokens)))
+            window.samples.append(latency)
+            if not success:
+                window.errors.append(time.monotonic())
+
+    def record_cancelled(self, provider: str, model: str, max_tokens: int, elapsed: float) -> None:
+        """
+        Record a cancelled call (hedge loser) - its latency is at least `elapsed`.
+
+        Counted only when it already ran past the window's p95: a slow primary
+        cancelled by its hedge must keep the p95 (and the hedge deadline) up;
+        a hedge cancelled early by the primary says nothing about its latency.
+        """
+        with self._lock:
+            window = self._window((provider, model, size_class(max_tokens)))
+            p95 = window.percentile(0.95)
+            if p95 is not None and elapsed >= p95:
+                window.samples.append(elapsed)
+
+    def snapshot(self, provider: str, model: str, max_tokens: int) -> LatencySnapshot:
+        """Latency summary for the size class of a request"""
+        return self._snapshot((provider, model, size_class(max_tokens)))
+
+    def _score(self, provider: str, model: str, max_tokens: int) -> Optional[float]:
+        """Routing score (lower is better); None until the window has enough samples"""
+        snap = self.snapshot(provider, model, max_tokens)
+        if snap.samples < self.min_samples:
+            return None
+        error_ratio = snap.errors / snap.samples
+        # Recent failures inflate the expected latency (retries + backoff)
+        return snap.p50 * (1.0 + 2.0 * error_ratio)
+
+    def choose(
+        self,
+        candidates: List[Tuple[str, str]],
+        max_tokens: int
+    ) -> Tuple[str, str]:
+        """
+        Pick (model, provider) among tier-equivalent candidates.
+
+        The first candidate is the static default; it keeps the call unless
+        another candidate is measurably faster (switch_margin) or is being
+        explored to refresh its statistics.
+        """
+        if len(candidates) < 2:
+            return candidates[0]
+
+        default = candidates[0]
+        alternatives = candidates[1:]
+
+        # Explore alternatives occasionally so they get measured. Longer calls
+        # (scene prose) explore only under-sampled alternatives - a switch costs
+        # them the default provider's prompt cache
+        if random.random() < self.explore_rate:
+            explorable = alternatives if size_class(max_tokens) == "short" else [
+                candidate for candidate in alternatives
+                if self.snapshot(candidate[1], candidate[0], max_tokens).samples < self.min_samples
+            ]
+            if explorable:
+                return random.choice(explorable)
+
+        default_score = self._score(default[1], default[0], max_tokens)
+        if default_score is None:
+            return default
+
+        best, best_score = default, default_score
+        for candidate in alternatives:
+            score = self._score(candidate[1], candidate[0], max_tokens)
+            if score is not None and score < best_score * (1.0 - self.switch_margin):
+                best, best_score = candidate, score
+
+        if best != default:
+            logger.debug(
+                f"Latency router: {best[0]} ({best_score:.1f}s p50) preferred over "
+                f"{default[0]} ({default_score:.1f}s p50) for {size_class(max_tokens)} calls"
+            )
+        return best
+
+    def hedge_deadline(self, provider: str, model: str, max_tokens: int) -> Optional[float]:
+        """Seconds after which a duplicate request is worth firing (None = not enough data)"""
+        snap = self.snapshot(provider, model, max_tokens)
+        if snap.samples < self.min_samples or snap.p95 <= 0:
+            return None
+        return snap.p95
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/sample counts for every tracked window"""
+        with self._lock:
+            keys = list(self._windows.keys())
+        stats = {}
+        for key in keys:
+            snap = self._snapshot(key)
+            stats["/".join(key)] = {
+                "samples": snap.samples,
+                "p50": round(snap.p50, 3),
+                "p95": round(snap.p95, 3),
+                "recent_errors": snap.errors,
+            }
+        return stats
+
+
+# Singleton instance
+_latency_router: Optional[LatencyRouter] = None
+
+
+def get_latency_router() -> LatencyRouter:
+    """Get or create latency router singleton"""
+    global _latency_router
+    if _latency_router is None:
+        _latency_router = LatencyRouter(
+            window_size=settings.LLM_LATENCY_WINDOW,
+            min_samples=settings.LLM_LATENCY_MIN_SAMPLES,
+        )
+    return _latency_router
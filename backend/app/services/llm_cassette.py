@@ -0,0 +1,573 @@
+"""
+LLM Cassette - record/replay backend for offline pipeline runs and benchmarks
+
+LLM_BACKEND selects how provider clients behave (see llm_clients):
+    live    - real API calls (default)
+    record  - real API calls, every response appended to the cassette file
+    replay  - no network; responses served from the cassette with synthetic
+              latency, so the full pipeline runs on a laptop without API keys
+
+Cassette entries are keyed by a SHA-256 of the request (API, model, messages,
+sampling parameters). Replaying a recorded run reproduces it exactly as long
+as prompts are deterministic; on a miss the "nearest" policy serves the
+recorded response of the same API/model/json-mode whose prompt length is
+closest, which keeps benchmarks running when prompts drift slightly.
+
+Latency distributions (LLM_CASSETTE_LATENCY, scaled by LLM_CASSETTE_LATENCY_SCALE):
+    recorded              - latency measured when the entry was recorded
+    none                  - no delay (pure orchestration overhead)
+    fixed:SECONDS         - constant delay
+    lognormal:MEDIAN,SIGMA
+    per_token:BASE,MS_PER_OUTPUT_TOKEN
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+BACKEND_LIVE = "live"
+BACKEND_RECORD = "record"
+BACKEND_REPLAY = "replay"
+
+# Request fields that do not change the response
+_IGNORED_FIELDS = {"stream", "stream_options", "timeout", "extra_headers", "extra_query", "extra_body"}
+
+# Characters per replayed stream chunk
+_STREAM_CHUNK_CHARS = 24
+
+_EMBEDDING_DIMENSIONS = 1536
+
+
+class CassetteMissError(Exception):
+    """No recorded response matches a request in replay mode"""
+
+
+def backend_mode() -> str:
+    """Configured LLM backend (live / record / replay)"""
+    return (settings.LLM_BACKEND or BACKEND_LIVE).lower()
+
+
+def request_key(api: str, request: Dict[str, Any]) -> str:
+    """Stable hash of a provider request"""
+    payload = {k: v for k, v in request.items() if k not in _IGNORED_FIELDS and v is not None}
+    payload["__api__"] = api
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _prompt_length(request: Dict[str, Any]) -> int:
+    length = len(str(request.get("system", "")))
+    for message in request.get("messages", []) or []:
+        length += len(str(message.get("content", "")))
+    if "input" in request:
+        length += len(str(request["input"]))
+    return length
+
+
+def _json_mode(request: Dict[str, Any]) -> bool:
+    return (request.get("response_format") or {}).get("type") == "json_object"
+
+
+class LatencyModel:
+    """Synthetic latency for replayed responses"""
+
+    def __init__(self, spec: str, scale: float = 1.0, seed: Optional[int] = None):
+        self.spec = spec or "recorded"
+        self.scale = scale
+        self._random = random.Random(seed)
+        kind, _, params = self.spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+
+    def sample(self, entry: Dict[str, Any]) -> float:
+        """Seconds to wait before a replayed response completes"""
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "fixed":
+            seconds = self.params[0] if self.params else 0.0
+        elif self.kind == "lognormal":
+            median = self.params[0] if self.params else 1.0
+            sigma = self.params[1] if len(self.params) > 1 else 0.5
+            seconds = self._random.lognormvariate(math.log(max(median, 1e-6)), sigma)
+        elif self.kind == "per_token":
+            base = self.params[0] if self.params else 0.3
+            ms_per_token = self.params[1] if len(self.params) > 1 else 15.0
+            tokens = (entry.get("response") or {}).get("tokens_out", 0)
+            seconds = base + tokens * ms_per_token / 1000.0
+        else:  # recorded
+            seconds = float(entry.get("latency", 0.0))
+        return max(0.0, seconds * self.scale)
+
+
+class Cassette:
+    """JSONL store of recorded provider responses"""
+
+    def __init__(self, path: str, miss_policy: str = "nearest"):
+        self.path = path
+        self.miss_policy = miss_policy
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_shape: Dict[tuple, List[Dict[str, Any]]] = {}
+        self._replay_positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.nearest_hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._load()
+
+    @staticmethod
+    def _shape(entry: Dict[str, Any]) -> tuple:
+        return (entry.get("api"), entry.get("model"), bool(entry.get("json_mode")))
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        self._entries.setdefault(entry["key"], []).append(entry)
+        self._by_shape.setdefault(self._shape(entry), []).append(entry)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        count = 0
+        with open(self.path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self._index(json.loads(line))
+                    count += 1
+                except (ValueError, KeyError):
+                    continue
+        logger.info(f"LLM cassette loaded: {count} entries from {self.path}")
+
+    def record(self, api: str, request: Dict[str, Any], response: Dict[str, Any], latency: float) -> None:
+        """Append a live response to the cassette"""
+        entry = {
+            "key": request_key(api, request),
+            "api": api,
+            "model": request.get("model"),
+            "json_mode": _json_mode(request),
+            "prompt_length": _prompt_length(request),
+            "latency": round(latency, 4),
+            "recorded_at": time.time(),
+            "response": response,
+        }
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index(entry)
+            self.recorded += 1
+
+    def lookup(self, api: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Find the recorded entry for a request (raises CassetteMissError)"""
+        key = request_key(api, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries:
+                # Identical requests replay their recordings in order, then repeat the last
+                position = self._replay_positions.get(key, 0)
+                self._replay_positions[key] = position + 1
+                self.hits += 1
+                return entries[min(position, len(entries) - 1)]
+
+            if self.miss_policy == "nearest":
+                shape = (api, request.get("model"), _json_mode(request))
+                candidates = self._by_shape.get(shape) or [
+                    e for s, group in self._by_shape.items()
+                    if s[0] == api and s[2] == shape[2] for e in group
+                ]
+                if candidates:
+                    length = _prompt_length(request)
+                    self.nearest_hits += 1
+                    return min(candidates, key=lambda e: abs(e.get("prompt_length", 0) - length))
+
+            self.misses += 1
+        raise CassetteMissError(
+            f"No cassette entry for {api} request (model={request.get('model')}, key={key[:12]})"
+        )
+
+    def has_api(self, api: str) -> bool:
+        """Whether any entry was recorded for an API"""
+        with self._lock:
+            return any(shape[0] == api for shape in self._by_shape)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": sum(len(v) for v in self._entries.values()),
+                "hits": self.hits,
+                "nearest_hits": self.nearest_hits,
+                "misses": self.misses,
+                "recorded": self.recorded,
+            }
+
+
+# ---- Normalized response <-> SDK-shaped objects ----
+
+def _openai_chat_to_dict(response: Any) -> Dict[str, Any]:
+    details = getattr(response.usage, "prompt_tokens_details", None)
+    return {
+        "content": response.choices[0].message.content,
+        "finish_reason": response.choices[0].finish_reason,
+        "tokens_in": response.usage.prompt_tokens,
+        "tokens_out": response.usage.completion_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+
+def _openai_usage(data: Dict[str, Any]) -> SimpleNamespace:
+    return SimpleNamespace(
+        prompt_tokens=data.get("tokens_in", 0),
+        completion_tokens=data.get("tokens_out", 0),
+        total_tokens=data.get("tokens_in", 0) + data.get("tokens_out", 0),
+        prompt_tokens_details=SimpleNamespace(cached_tokens=data.get("cached_tokens", 0)),
+    )
+
+
+def _openai_chat_from_dict(data: Dict[str, Any], model: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(
+            index=0,
+            message=SimpleNamespace(role="assistant", content=data.get("content", "")),
+            finish_reason=data.get("finish_reason", "stop"),
+        )],
+        usage=_openai_usage(data),
+    )
+
+
+def _openai_chunk(content: Optional[str] = None, finish_reason: Optional[str] = None,
+                  usage: Optional[SimpleNamespace] = None) -> SimpleNamespace:
+    choices = [] if usage is not None else [SimpleNamespace(
+        index=0, delta=SimpleNamespace(content=content), finish_reason=finish_reason
+    )]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def _anthropic_to_dict(message: Any) -> Dict[str, Any]:
+    return {
+        "content": "".join(getattr(block, "text", "") for block in message.content),
+        "finish_reason": message.stop_reason,
+        "tokens_in": message.usage.input_tokens,
+        "tokens_out": message.usage.output_tokens,
+        "cache_creation_tokens": getattr(message.usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_tokens": getattr(message.usage, "cache_read_input_tokens", 0) or 0,
+    }
+
+
+def _anthropic_from_dict(data: Dict[str, Any], model: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        model=model,
+        role="assistant",
+        content=[SimpleNamespace(type="text", text=data.get("content", ""))],
+        stop_reason=data.get("finish_reason", "end_turn"),
+        usage=SimpleNamespace(
+            input_tokens=data.get("tokens_in", 0),
+            output_tokens=data.get("tokens_out", 0),
+            cache_creation_input_tokens=data.get("cache_creation_tokens", 0),
+            cache_read_input_tokens=data.get("cache_read_tokens", 0),
+        ),
+    )
+
+
+def _synthetic_embedding(text: str) -> List[float]:
+    """Deterministic unit vector derived from the text (replay misses only)"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).hexdigest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(_EMBEDDING_DIMENSIONS)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _embedding_inputs(kwargs: Dict[str, Any]) -> List[str]:
+    """Texts of an embeddings request (input is a string or a batch)"""
+    inputs = kwargs.get("input", "")
+    return [str(text) for text in inputs] if isinstance(inputs, list) else [str(inputs)]
+
+
+def _replay_embeddings(cassette: "Cassette", api: str, kwargs: Dict[str, Any]) -> Any:
+    """Embeddings response from the cassette, one vector per input"""
+    inputs = _embedding_inputs(kwargs)
+    try:
+        entry = cassette.lookup(api, kwargs)
+        response = entry["response"]
+        vectors = response.get("embeddings") or [response["embedding"]]
+    except CassetteMissError:
+        vectors = None
+    if vectors is None or len(vectors) != len(inputs):
+        # Miss, or a "nearest" entry recorded for another batch - its vectors would not line up
+        vectors = [_synthetic_embedding(text) for text in inputs]
+    return SimpleNamespace(
+        data=[SimpleNamespace(embedding=v, index=i) for i, v in enumerate(vectors)],
+        usage=SimpleNamespace(prompt_tokens=0, total_tokens=0),
+    )
+
+
+def _embeddings_record(response: Any) -> Dict[str, Any]:
+    vectors = [item.embedding for item in response.data]
+    record = {"embedding": vectors[0] if vectors else []}
+    if len(vectors) > 1:
+        record["embeddings"] = vectors
+    return record
+
+
+def _chunks(text: str) -> List[str]:
+    return [text[i:i + _STREAM_CHUNK_CHARS] for i in range(0, len(text), _STREAM_CHUNK_CHARS)] or [""]
+
+
+# ---- Client wrappers ----
+
+class _CassetteBase:
+    def __init__(self, real: Any, cassette: Cassette, latency: LatencyModel):
+        self._real = real
+        self._cassette = cassette
+        self._latency = latency
+
+    @property
+    def replaying(self) -> bool:
+        return self._real is None
+
+    def __getattr__(self, name: str) -> Any:
+        # Endpoints without cassette support (images, audio, ...) go straight to the real client
+        real = self.__dict__.get("_real")
+        if real is None:
+            raise AttributeError(f"'{name}' is not available with LLM_BACKEND=replay")
+        return getattr(real, name)
+
+    def with_options(self, **kwargs) -> "_CassetteBase":
+        # Timeouts/retries do not apply to replay; keep the wrapper
+        if self._real is None:
+            return self
+        return type(self)(self._real.with_options(**kwargs), self._cassette, self._latency)
+
+
+class CassetteAsyncOpenAI(_CassetteBase):
+    """AsyncOpenAI look-alike: records through a real client, or replays without one"""
+
+    def __init__(self, real: Any, cassette: Cassette, latency: LatencyModel):
+        super().__init__(real, cassette, latency)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat_create))
+        self.embeddings = SimpleNamespace(create=self._embeddings_create)
+
+    async def _chat_create(self, **kwargs):
+        api = "openai.chat"
+        if kwargs.get("stream"):
+            return self._chat_stream(api, kwargs)
+
+        if self.replaying:
+            entry = self._cassette.lookup(api, kwargs)
+            await asyncio.sleep(self._latency.sample(entry))
+            return _openai_chat_from_dict(entry["response"], kwargs.get("model", ""))
+
+        started = time.time()
+        response = await self._real.chat.completions.create(**kwargs)
+        self._cassette.record(api, kwargs, _openai_chat_to_dict(response), time.time() - started)
+        return response
+
+    async def _chat_stream(self, api: str, kwargs: Dict[str, Any]):
+        if self.replaying:
+            entry = self._cassette.lookup(api, kwargs)
+            data = entry["response"]
+            pieces = _chunks(data.get("content", ""))
+            delay = self._latency.sample(entry) / max(1, len(pieces))
+            for piece in pieces:
+                await asyncio.sleep(delay)
+                yield _openai_chunk(content=piece)
+            yield _openai_chunk(finish_reason=data.get("finish_reason", "stop"))
+            yield _openai_chunk(usage=_openai_usage(data))
+            return
+
+        started = time.time()
+        stream = await self._real.chat.completions.create(**kwargs)
+        parts: List[str] = []
+        data: Dict[str, Any] = {"finish_reason": "stop", "tokens_in": 0, "tokens_out": 0, "cached_tokens": 0}
+        async for chunk in stream:
+            if chunk.choices:
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    parts.append(choice.delta.content)
+                if choice.finish_reason:
+                    data["finish_reason"] = choice.finish_reason
+            if getattr(chunk, "usage", None):
+                details = getattr(chunk.usage, "prompt_tokens_details", None)
+                data["tokens_in"] = chunk.usage.prompt_tokens
+                data["tokens_out"] = chunk.usage.completion_tokens
+                data["cached_tokens"] = getattr(details, "cached_tokens", 0) or 0
+            yield chunk
+        data["content"] = "".join(parts)
+        self._cassette.record(api, kwargs, data, time.time() - started)
+
+    async def _embeddings_create(self, **kwargs):
+        api = "openai.embeddings"
+        if self.replaying:
+            return _replay_embeddings(self._cassette, api, kwargs)
+
+        started = time.time()
+        response = await self._real.embeddings.create(**kwargs)
+        self._cassette.record(api, kwargs, _embeddings_record(response), time.time() - started)
+        return response
+
+
+class CassetteOpenAI(_CassetteBase):
+    """Synchronous OpenAI look-alike (embeddings only - the sync call sites use nothing else)"""
+
+    def __init__(self, real: Any, cassette: Cassette, latency: LatencyModel):
+        super().__init__(real, cassette, latency)
+        self.embeddings = SimpleNamespace(create=self._embeddings_create)
+
+    def _embeddings_create(self, **kwargs):
+        api = "openai.embeddings"
+        if self.replaying:
+            return _replay_embeddings(self._cassette, api, kwargs)
+
+        started = time.time()
+        response = self._real.embeddings.create(**kwargs)
+        self._cassette.record(api, kwargs, _embeddings_record(response), time.time() - started)
+        return response
+
+
+class _ReplayAnthropicStream:
+    """Async context manager mimicking AsyncAnthropic.messages.stream()"""
+
+    def __init__(self, entry: Dict[str, Any], model: str, latency: float):
+        self._entry = entry
+        self._model = model
+        self._latency = latency
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        return self._iter_text()
+
+    async def _iter_text(self):
+        pieces = _chunks(self._entry["response"].get("content", ""))
+        delay = self._latency / max(1, len(pieces))
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            yield piece
+
+    async def get_final_message(self):
+        return _anthropic_from_dict(self._entry["response"], self._model)
+
+
+class _RecordingAnthropicStream:
+    """Wraps a real messages.stream() context manager and records the final message"""
+
+    def __init__(self, manager: Any, cassette: Cassette, request: Dict[str, Any]):
+        self._manager = manager
+        self._cassette = cassette
+        self._request = request
+        self._stream = None
+        self._started = 0.0
+
+    async def __aenter__(self):
+        self._started = time.time()
+        self._stream = await self._manager.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        return await self._manager.__aexit__(*exc)
+
+    @property
+    def text_stream(self):
+        return self._stream.text_stream
+
+    async def get_final_message(self):
+        message = await self._stream.get_final_message()
+        self._cassette.record(
+            "anthropic.messages", self._request, _anthropic_to_dict(message), time.time() - self._started
+        )
+        return message
+
+
+class CassetteAsyncAnthropic(_CassetteBase):
+    """AsyncAnthropic look-alike: records through a real client, or replays without one"""
+
+    def __init__(self, real: Any, cassette: Cassette, latency: LatencyModel):
+        super().__init__(real, cassette, latency)
+        self.messages = SimpleNamespace(create=self._messages_create, stream=self._messages_stream)
+
+    async def _messages_create(self, **kwargs):
+        api = "anthropic.messages"
+        if self.replaying:
+            entry = self._cassette.lookup(api, kwargs)
+            await asyncio.sleep(self._latency.sample(entry))
+            return _anthropic_from_dict(entry["response"], kwargs.get("model", ""))
+
+        started = time.time()
+        message = await self._real.messages.create(**kwargs)
+        self._cassette.record(api, kwargs, _anthropic_to_dict(message), time.time() - started)
+        return message
+
+    def _messages_stream(self, **kwargs):
+        if self.replaying:
+            entry = self._cassette.lookup("anthropic.messages", kwargs)
+            return _ReplayAnthropicStream(entry, kwargs.get("model", ""), self._latency.sample(entry))
+        return _RecordingAnthropicStream(self._real.messages.stream(**kwargs), self._cassette, kwargs)
+
+
+# Singleton cassette (one file per process)
+_cassette: Optional[Cassette] = None
+_latency_model: Optional[LatencyModel] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Get or create the cassette singleton"""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(settings.LLM_CASSETTE_PATH, settings.LLM_CASSETTE_MISS_POLICY)
+        return _cassette
+
+
+def get_latency_model() -> LatencyModel:
+    """Get or create the replay latency model singleton"""
+    global _latency_model
+    with _cassette_lock:
+        if _latency_model is None:
+            _latency_model = LatencyModel(
+                settings.LLM_CASSETTE_LATENCY,
+                scale=settings.LLM_CASSETTE_LATENCY_SCALE,
+                seed=settings.LLM_CASSETTE_SEED,
+            )
+        return _latency_model
+
+
+def wrap_client(kind: str, real: Any) -> Any:
+    """
+    Wrap an SDK client for the configured backend.
+
+    Args:
+        kind: "openai" / "openai_sync" / "anthropic"
+        real: Real SDK client (None in replay mode)
+    """
+    mode = backend_mode()
+    if mode == BACKEND_LIVE:
+        return real
+    wrappers: Dict[str, Callable[..., Any]] = {
+        "openai": CassetteAsyncOpenAI,
+        "openai_sync": CassetteOpenAI,
+        "anthropic": CassetteAsyncAnthropic,
+    }
+    return wrappers[kind](None if mode == BACKEND_REPLAY else real, get_cassette(), get_latency_model())
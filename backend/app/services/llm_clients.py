@@ -0,0 +1,247 @@
+"""
+LLM Clients - shared, pooled HTTP transport for every OpenAI/Anthropic client
+
+All SDK clients in the app are built here and share one httpx connection
+pool (keep-alive, HTTP/2 when the `h2` package is installed), so:
+- TLS/TCP setup happens once per host, not once per call site
+- connection limits (LLM_HTTP_MAX_CONNECTIONS) apply to each event loop's
+  pool (see below) and to the sync pool
+- timeouts are chosen per purpose instead of per call site
+
+Purposes (timeouts in LLM_CLIENT_TIMEOUTS, seconds of read timeout):
+    generation - long completions (chapters, plot structure)
+    streaming  - token streams (read timeout applies between chunks)
+    embedding  - short embedding requests
+
+Pools are kept per event loop: Celery tasks run each in a fresh loop, and
+asyncio connections cannot be reused across loops. The SDK clients are
+process-wide singletons; the transport underneath picks the pool of the
+running loop. A loop's pool is closed with close_loop_http_pool() before the
+loop is closed (generation tasks, API shutdown).
+
+LLM_BACKEND=record|replay wraps every client returned here with the
+record/replay cassette (see llm_cassette); in replay no SDK client is built.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from anthropic import AsyncAnthropic
+
+from app.config import settings
+from app.services.llm_cassette import BACKEND_REPLAY, backend_mode, get_cassette, wrap_client
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - presence enables HTTP/2 in httpx
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+PURPOSE_GENERATION = "generation"
+PURPOSE_STREAMING = "streaming"
+PURPOSE_EMBEDDING = "embedding"
+
+_PLACEHOLDER_KEY = "sk-placeholder-add-your-key"
+
+
+def _http2_enabled() -> bool:
+    return settings.LLM_HTTP2 and _HTTP2_AVAILABLE
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_timeout(purpose: str) -> httpx.Timeout:
+    """httpx timeout for a purpose (unknown purposes use the generation timeout)"""
+    timeouts = settings.LLM_CLIENT_TIMEOUTS
+    read = float(timeouts.get(purpose, timeouts.get(PURPOSE_GENERATION, 600.0)))
+    return httpx.Timeout(
+        read,
+        connect=settings.LLM_HTTP_CONNECT_TIMEOUT,
+        # Waiting for a free pooled connection is bounded by the same budget
+        pool=read,
+    )
+
+
+class _PerLoopAsyncTransport(httpx.AsyncBaseTransport):
+    """Async transport that keeps one connection pool per running event loop"""
+
+    def __init__(self):
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _get_transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(
+                    http2=_http2_enabled(),
+                    limits=_limits(),
+                    retries=1,  # connection-level retry only; SDK/AIService handle the rest
+                )
+                self._transports[loop] = transport
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._get_transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            transport = self._transports.pop(loop, None)
+        if transport is not None:
+            await transport.aclose()
+
+
+# Process-wide shared HTTP clients and SDK clients
+_lock = threading.Lock()
+_async_http_client: Optional[httpx.AsyncClient] = None
+_async_transport: Optional[_PerLoopAsyncTransport] = None
+_sync_http_client: Optional[httpx.Client] = None
+_openai_clients: Dict[str, AsyncOpenAI] = {}
+_sync_openai_clients: Dict[str, OpenAI] = {}
+_anthropic_clients: Dict[str, AsyncAnthropic] = {}
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared async httpx client (per-loop pools) used by all async SDK clients"""
+    global _async_http_client, _async_transport
+    with _lock:
+        if _async_http_client is None:
+            _async_transport = _PerLoopAsyncTransport()
+            _async_http_client = httpx.AsyncClient(
+                transport=_async_transport,
+                timeout=get_timeout(PURPOSE_GENERATION),
+            )
+            logger.info(
+                f"LLM HTTP pool ready (http2={_http2_enabled()}, "
+                f"max_connections={settings.LLM_HTTP_MAX_CONNECTIONS})"
+            )
+        return _async_http_client
+
+
+def get_sync_http_client() -> httpx.Client:
+    """Shared sync httpx client (thread-safe pool) for synchronous call sites"""
+    global _sync_http_client
+    with _lock:
+        if _sync_http_client is None:
+            _sync_http_client = httpx.Client(
+                http2=_http2_enabled(),
+                limits=_limits(),
+                timeout=get_timeout(PURPOSE_GENERATION),
+            )
+        return _sync_http_client
+
+
+async def close_loop_http_pool() -> None:
+    """
+    Close the connection pool of the running event loop.
+
+    Call before closing a loop that made AI calls - otherwise its connections
+    stay open until the loop is garbage collected.
+    """
+    if _async_transport is not None:
+        await _async_transport.aclose()
+
+
+def close_sync_http_client() -> None:
+    """Close the shared sync pool (process shutdown)"""
+    global _sync_http_client
+    with _lock:
+        client, _sync_http_client = _sync_http_client, None
+        _sync_openai_clients.clear()  # rebuilt on a new pool if used again
+    if client is not None:
+        client.close()
+
+
+def _max_retries(purpose: str) -> int:
+    # AIService runs its own retry loop for generation/streaming
+    return 2 if purpose == PURPOSE_EMBEDDING else 0
+
+
+def get_openai_client(purpose: str = PURPOSE_GENERATION) -> AsyncOpenAI:
+    """Shared AsyncOpenAI client for a purpose"""
+    client = _openai_clients.get(purpose)
+    if client is None:
+        replay = backend_mode() == BACKEND_REPLAY
+        http_client = None if replay else get_async_http_client()
+        with _lock:
+            client = _openai_clients.get(purpose)
+            if client is None:
+                real = None if replay else AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=get_timeout(purpose),
+                    max_retries=_max_retries(purpose),
+                    http_client=http_client,
+                )
+                client = wrap_client("openai", real)
+                _openai_clients[purpose] = client
+    return client
+
+
+def get_sync_openai_client(purpose: str = PURPOSE_EMBEDDING) -> OpenAI:
+    """Shared synchronous OpenAI client for a purpose"""
+    client = _sync_openai_clients.get(purpose)
+    if client is None:
+        replay = backend_mode() == BACKEND_REPLAY
+        http_client = None if replay else get_sync_http_client()
+        with _lock:
+            client = _sync_openai_clients.get(purpose)
+            if client is None:
+                real = None if replay else OpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=get_timeout(purpose),
+                    max_retries=_max_retries(purpose),
+                    http_client=http_client,
+                )
+                client = wrap_client("openai_sync", real)
+                _sync_openai_clients[purpose] = client
+    return client
+
+
+def get_anthropic_client(purpose: str = PURPOSE_GENERATION) -> Optional[AsyncAnthropic]:
+    """
+    Shared AsyncAnthropic client for a purpose.
+
+    None if no API key is configured - or, in replay mode, if the cassette
+    holds no Anthropic recordings.
+    """
+    replay = backend_mode() == BACKEND_REPLAY
+    api_key = getattr(settings, 'ANTHROPIC_API_KEY', None)
+    if replay:
+        if not get_cassette().has_api("anthropic.messages"):
+            return None
+    elif not api_key or api_key == _PLACEHOLDER_KEY:
+        return None
+
+    client = _anthropic_clients.get(purpose)
+    if client is None:
+        http_client = None if replay else get_async_http_client()
+        with _lock:
+            client = _anthropic_clients.get(purpose)
+            if client is None:
+                real = None if replay else AsyncAnthropic(
+                    api_key=api_key,
+                    timeout=get_timeout(purpose),
+                    max_retries=_max_retries(purpose),
+                    http_client=http_client,
+                )
+                client = wrap_client("anthropic", real)
+                _anthropic_clients[purpose] = client
+    return client
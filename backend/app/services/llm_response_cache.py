@@ -0,0 +1,368 @@
+"""
+LLM Response Cache - content-addressed cache for deterministic AI calls
+
+Low-temperature analysis prompts (emotion analysis, fact extraction, pacing,
+voice validation) are re-issued with identical inputs whenever a chapter is
+re-analyzed. This cache stores their responses keyed by a hash of everything
+that determines the output, so re-running a dashboard on an unchanged
+manuscript costs zero API calls.
+
+Backends:
+- redis: shared by all workers/API processes (value keys with TTL + LRU index)
+- disk:  SQLite file, for single-host setups and offline runs
+
+Opt-in per call via AIService.generate(..., cache_response=True). Lookups
+and writes block (Redis / SQLite I/O); AIService runs them via asyncio.to_thread.
+While Redis is unreachable calls go to the disk backend; Redis is retried
+after a cooldown (LazyRedis), so workers do not stay split across backends.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.services.redis_client import LazyRedis
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(
+    model: str,
+    system_prompt: Optional[str],
+    prompt: str,
+    temperature: float,
+    json_mode: bool,
+    max_tokens: int
+) -> str:
+    """
+    Stable SHA-256 fingerprint of an AI request.
+
+    Everything that can change the response is part of the key; anything
+    else (metadata, retry settings) is deliberately excluded.
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "system_prompt": system_prompt or "",
+            "prompt": prompt,
+            "temperature": round(float(temperature), 4),
+            "json_mode": bool(json_mode),
+            "max_tokens": int(max_tokens),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    """Serializable subset of AIResponse kept in the cache"""
+    content: str
+    model: str
+    provider: str
+    tokens_used: Dict[str, int]
+    cost: float
+    created_at: float
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CachedResponse":
+        return cls(**json.loads(raw))
+
+
+@dataclass
+class ResponseCacheStats:
+    """Hit/miss counters"""
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    errors: int = 0
+    saved_cost: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "saved_cost": round(self.saved_cost, 6),
+            "hit_rate": self.hit_rate,
+        }
+
+
+class RedisCacheBackend:
+    """Redis backend: one key per entry (native TTL) + sorted-set LRU index"""
+
+    KEY_PREFIX = "narraforge:llmcache:"
+    INDEX_KEY = "narraforge:llmcache:__lru__"
+
+    def __init__(self, max_entries: int):
+        self._redis = LazyRedis("LLM response cache", "using the disk cache", socket_timeout=1.0)
+        self.max_entries = max_entries
+
+    def available(self) -> bool:
+        """Redis reachable (False during the cooldown after a failure)"""
+        return self._redis.get() is not None
+
+    def _run(self, command: Callable[[Any], Any]) -> Any:
+        client = self._redis.get()
+        if client is None:
+            raise ConnectionError("Redis unavailable")
+        try:
+            return command(client)
+        except Exception as e:
+            self._redis.mark_failed(e)
+            raise
+
+    def get(self, key: str) -> Optional[str]:
+        def command(client):
+            raw = client.get(self.KEY_PREFIX + key)
+            if raw is None:
+                client.zrem(self.INDEX_KEY, key)
+                return None
+            client.zadd(self.INDEX_KEY, {key: time.time()})
+            return raw
+        return self._run(command)
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        def command(client):
+            pipe = client.pipeline()
+            pipe.set(self.KEY_PREFIX + key, value, ex=ttl_seconds)
+            pipe.zadd(self.INDEX_KEY, {key: time.time()})
+            pipe.zcard(self.INDEX_KEY)
+            overflow = pipe.execute()[-1] - self.max_entries
+            if overflow > 0:
+                # Evict least recently used entries beyond the size bound
+                stale = client.zrange(self.INDEX_KEY, 0, overflow - 1)
+                if stale:
+                    pipe = client.pipeline()
+                    pipe.delete(*[self.KEY_PREFIX + k for k in stale])
+                    pipe.zrem(self.INDEX_KEY, *stale)
+                    pipe.execute()
+        self._run(command)
+
+    def clear(self) -> int:
+        def command(client):
+            keys = client.zrange(self.INDEX_KEY, 0, -1)
+            if keys:
+                client.delete(*[self.KEY_PREFIX + k for k in keys])
+            client.delete(self.INDEX_KEY)
+            return len(keys)
+        return self._run(command)
+
+    def size(self) -> int:
+        return int(self._run(lambda client: client.zcard(self.INDEX_KEY)))
+
+
+class DiskCacheBackend:
+    """SQLite backend: TTL per row, LRU eviction by last access time"""
+
+    def __init__(self, path: str, max_entries: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, ttl_seconds: int) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl_seconds, now),
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> int:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+            return count
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMResponseCache:
+    """
+    Content-addressed response cache with pluggable backend.
+
+    Failures never propagate: a broken backend degrades to a cache miss.
+    """
+
+    def __init__(
+        self,
+        backend_name: str = "redis",
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_entries: int = 50000
+    ):
+        self.backend_name = backend_name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = ResponseCacheStats()
+        self._stats_lock = threading.Lock()
+        self._backend = None
+        self._backend_failed = False
+        self._disk_backend = None
+        self._disk_failed = False
+        self._backend_lock = threading.Lock()
+
+    def _get_disk_backend(self):
+        with self._backend_lock:
+            if self._disk_backend is not None or self._disk_failed:
+                return self._disk_backend
+            try:
+                self._disk_backend = DiskCacheBackend(settings.LLM_RESPONSE_CACHE_PATH, self.max_entries)
+            except Exception as e:
+                logger.warning(f"LLM response cache: disk backend unavailable: {e}")
+                self._disk_failed = True
+            return self._disk_backend
+
+    def _get_backend(self):
+        """Backend for the next call: Redis while reachable, else the disk cache"""
+        if self._backend is None and not self._backend_failed:
+            if self.backend_name == "redis":
+                with self._backend_lock:
+                    if self._backend is None:
+                        self._backend = RedisCacheBackend(self.max_entries)
+            else:
+                self._backend = self._get_disk_backend()
+                self._backend_failed = self._backend is None
+                if self._backend_failed:
+                    logger.warning("LLM response cache disabled")
+            if self._backend is not None:
+                logger.info(f"LLM response cache ready (backend={self.backend_name})")
+        if isinstance(self._backend, RedisCacheBackend) and not self._backend.available():
+            return self._get_disk_backend()
+        return self._backend
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Look up a cached response (counts hit/miss)"""
+        backend = self._get_backend()
+        if backend is None:
+            return None
+        try:
+            raw = backend.get(key)
+        except Exception as e:
+            logger.warning(f"LLM response cache read failed: {e}")
+            with self._stats_lock:
+                self.stats.errors += 1
+                self.stats.misses += 1
+            return None
+
+        with self._stats_lock:
+            if raw is None:
+                self.stats.misses += 1
+                return None
+            cached = CachedResponse.from_json(raw)
+            self.stats.hits += 1
+            self.stats.saved_cost += cached.cost
+            return cached
+
+    def set(self, key: str, response: CachedResponse) -> None:
+        """Store a response under its fingerprint"""
+        backend = self._get_backend()
+        if backend is None:
+            return
+        try:
+            backend.set(key, response.to_json(), self.ttl_seconds)
+            with self._stats_lock:
+                self.stats.writes += 1
+        except Exception as e:
+            logger.warning(f"LLM response cache write failed: {e}")
+            with self._stats_lock:
+                self.stats.errors += 1
+
+    def clear(self) -> int:
+        """Drop all cached responses; returns number of entries removed"""
+        backend = self._get_backend()
+        if backend is None:
+            return 0
+        return backend.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss metrics plus backend info"""
+        stats = self.stats.to_dict()
+        backend = self._get_backend()
+        stats["backend"] = self.backend_name
+        stats["active_backend"] = (
+            "redis" if isinstance(backend, RedisCacheBackend) else "disk" if backend is not None else None
+        )
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["max_entries"] = self.max_entries
+        try:
+            stats["entries"] = backend.size() if backend else 0
+        except Exception:
+            stats["entries"] = None
+        return stats
+
+
+# Singleton instance
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_response_cache() -> LLMResponseCache:
+    """Get or create LLM response cache singleton"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LLMResponseCache(
+            backend_name=settings.LLM_RESPONSE_CACHE_BACKEND,
+            ttl_seconds=settings.LLM_RESPONSE_CACHE_TTL,
+            max_entries=settings.LLM_RESPONSE_CACHE_MAX_ENTRIES,
+        )
+    return _response_cache
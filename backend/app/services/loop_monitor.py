@@ -0,0 +1,77 @@
+"""
+Loop Monitor - event loop lag of a generation run
+
+A sampler task sleeps LOOP_LAG_SAMPLE_INTERVAL seconds at a time; how much
+later than requested it wakes up is the time the loop spent blocked
+(synchronous DB calls, CPU-heavy parsing, ...). The summary is logged at
+the end of every generation task, so the effect of moving work off the
+loop (see db_executor) shows up directly in worker logs.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Samples kept for percentiles (~100 minutes at the default interval)
+_MAX_SAMPLES = 60000
+
+
+class LoopLagMonitor:
+    """Samples event loop lag while a run is in progress"""
+
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or settings.LOOP_LAG_SAMPLE_INTERVAL
+        self._samples: List[float] = []
+        self._max_lag = 0.0
+        self._total_lag = 0.0
+        self._count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start sampling on the running loop"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._sample())
+
+    async def stop(self) -> Dict[str, Any]:
+        """Stop sampling and return the summary"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        return self.summary()
+
+    async def _sample(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self._count += 1
+            self._total_lag += lag
+            self._max_lag = max(self._max_lag, lag)
+            if len(self._samples) < _MAX_SAMPLES:
+                self._samples.append(lag)
+
+    def summary(self) -> Dict[str, Any]:
+        """Lag statistics in milliseconds"""
+        if not self._count:
+            return {"samples": 0, "mean_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self._samples)
+
+        def percentile(p: float) -> float:
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+        return {
+            "samples": self._count,
+            "mean_ms": round(self._total_lag / self._count * 1000, 2),
+            "p95_ms": round(percentile(0.95), 2),
+            "p99_ms": round(percentile(0.99), 2),
+            "max_ms": round(self._max_lag * 1000, 2),
+        }
@@ -33,7 +33,7 @@ except ImportError:
     nx = None
     _NETWORKX_AVAILABLE = False
 
-from app.services.ai_service import AIService
+from app.services.ai_service import AIService, ModelTier
 from app.models.project import GenreType
 
 logger = logging.getLogger(__name__)
@@ -1198,8 +1198,8 @@ class VectorMemoryLayer:
         """Generate embedding using OpenAI text-embedding-3-small."""
         try:
             if self._openai_client is None:
-                from openai import AsyncOpenAI
-                self._openai_client = AsyncOpenAI()
+                from app.services.llm_clients import get_openai_client, PURPOSE_EMBEDDING
+                self._openai_client = get_openai_client(PURPOSE_EMBEDDING)
 
             response = await self._openai_client.embeddings.create(
                 input=text[:8000],  # Limit input length
@@ -2602,13 +2602,15 @@ Odpowiedz TYLKO w formacie JSON:
         try:
             response = await self.ai_service.generate(
                 prompt=prompt,
-                model_tier=1,
+                tier=ModelTier.TIER_1,
                 max_tokens=500,
-                temperature=0.2
+                temperature=0.2,
+                cache_response=True,
+                metadata={"agent": "MIRIX", "task": "scene_emotion_analysis"}
             )
 
             import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
             if json_match:
                 return json.loads(json_match.group(0))
         except Exception as e:
@@ -2650,13 +2652,15 @@ Wyekstrahuj MAX 5 najważniejszych faktów. Jeśli nie ma nowych faktów, zwró
         try:
             response = await self.ai_service.generate(
                 prompt=prompt,
-                model_tier=1,
+                tier=ModelTier.TIER_1,
                 max_tokens=1000,
-                temperature=0.2
+                temperature=0.2,
+                cache_response=True,
+                metadata={"agent": "MIRIX", "task": "prose_fact_extraction"}
             )
 
             import re
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            json_match = re.search(r'\{.*\}', response.content, re.DOTALL)
             if json_match:
                 data = json.loads(json_match.group(0))
                 return data.get("facts", [])
@@ -19,6 +19,7 @@ import json
 import math
 
 from app.services.llm_service import get_llm_service
+from app.services.ai_service import get_ai_service, ModelTier
 from app.models.project import GenreType
 
 
@@ -436,14 +437,18 @@ Oceń na skali 0.0-1.0:
 
 Odpowiedz w JSON."""
 
-        response = await self._get_llm("low").chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
+        # Routed through AIService so re-measuring unchanged text hits the response cache
+        response = await get_ai_service().generate(
+            prompt=prompt,
+            tier=ModelTier.TIER_1,
             temperature=0.3,
-            response_format={"type": "json_object"}
+            max_tokens=500,
+            json_mode=True,
+            cache_response=True,
+            metadata={"agent": "PredictivePacingEngine", "task": "pacing_measurement", "segment": segment_id}
         )
 
-        analysis = json.loads(response.choices[0].message.content)
+        analysis = json.loads(response.content)
 
         pacing_score = float(analysis.get("pacing_score", 0.5))
 
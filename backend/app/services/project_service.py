@@ -2,8 +2,9 @@
 Project service - core business logic for project management
 """
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 import logging
 import re
 from pathlib import Path
@@ -13,9 +14,16 @@ from app.models.project import Project, ProjectStatus, GenreType
 from app.models.world_bible import WorldBible
 from app.models.character import Character
 from app.models.plot_structure import PlotStructure
-from app.models.chapter import Chapter
+from app.models.chapter import Chapter, ChapterStatus
 from app.schemas.project import ProjectCreate, ProjectSimulation
 from app.config import settings, genre_config, model_tier_config
+from app.services.duration_model import (
+    PROSE_STEP,
+    SCENES_PER_CHAPTER,
+    DurationProfile,
+    get_duration_model,
+    prose_parallelism,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -1255,6 +1263,15 @@ def _calculate_step_costs(ai_decisions: dict, genre: str) -> List[dict]:
         },
     ]
 
+    # Durations learned from finished runs replace the token throughput heuristic
+    durations = get_duration_model()
+    duration_profile = DurationProfile(
+        genre=genre,
+        chapter_count=chapter_count,
+        tier=f"TIER_{model_tier_config.get_tier_for_task('prose_writing')}",
+        parallelism=prose_parallelism(chapter_count),
+    )
+
     estimated_steps = []
 
     for step_data in steps:
@@ -1293,6 +1310,14 @@ def _calculate_step_costs(ai_decisions: dict, genre: str) -> List[dict]:
             # Assume ~3x parallelization (Celery concurrency=4, minus overhead)
             duration = max(1, int(duration / 3))
 
+        learned = (
+            durations.learned_prose_minutes(duration_profile)
+            if step_data["step"] == PROSE_STEP
+            else durations.learned_step_minutes(step_data["step"], duration_profile)
+        )
+        if learned is not None:
+            duration = max(1, int(round(learned)))
+
         estimated_steps.append({
             "step": step_data["step"],
             "name": step_data["name"],
@@ -1336,18 +1361,30 @@ def start_generation_task(project_id: int) -> str:
     return task.id
 
 
+def start_stale_regeneration_task(project_id: int) -> str:
+    """
+    Start incremental regeneration of an edited book in background (Celery)
+
+    Returns task ID for tracking
+    """
+    # Import here to avoid circular dependency
+    from app.tasks.generation_tasks import regenerate_stale_chapters
+
+    task = regenerate_stale_chapters.delay(project_id)
+    logger.info(f"Started stale regeneration task {task.id} for project {project_id}")
+
+    return task.id
+
+
 def get_project_status(db: Session, project: Project) -> dict:
     """
     Get real-time status of project generation
     """
     eta = None
-    if project.started_at and project.estimated_cost > 0:
-        # Rough ETA based on cost progress
-        if project.actual_cost > 0:
-            progress_ratio = project.actual_cost / project.estimated_cost
-            # This is a simplified calculation
-            eta = datetime.now() + timedelta(minutes=30)  # Placeholder
-    
+    if project.status == ProjectStatus.GENERATING:
+        chapters_written = _written_chapter_counts(db, [project.id]).get(project.id, 0)
+        eta = datetime.utcnow() + timedelta(minutes=_remaining_generation_minutes(project, chapters_written))
+
     return {
         "project_id": project.id,
         "status": project.status,
@@ -1362,6 +1399,96 @@ def get_project_status(db: Session, project: Project) -> dict:
     }
 
 
+def _written_chapter_counts(db: Session, project_ids: List[int]) -> Dict[int, int]:
+    """Chapters with finished prose per project"""
+    if not project_ids:
+        return {}
+    rows = (
+        db.query(Chapter.project_id, func.count(Chapter.id))
+        .filter(
+            Chapter.project_id.in_(project_ids),
+            Chapter.content.isnot(None),
+            Chapter.status.notin_([ChapterStatus.PLANNED, ChapterStatus.DRAFTING]),
+        )
+        .group_by(Chapter.project_id)
+        .all()
+    )
+    return {project_id: count for project_id, count in rows}
+
+
+def _duration_profile(genre: Optional[str], chapter_count: int) -> DurationProfile:
+    return DurationProfile(
+        genre=genre,
+        chapter_count=chapter_count,
+        parallelism=prose_parallelism(chapter_count),
+    )
+
+
+def _remaining_generation_minutes(project: Project, chapters_written: int) -> float:
+    """Learned estimate of the time a GENERATING project still needs"""
+    chapter_count = (project.parameters or {}).get("chapter_count", 25)
+    profile = _duration_profile(project.genre.value, chapter_count)
+    durations = get_duration_model()
+    step = project.current_step or 0
+    scenes_left = max(0, chapter_count - chapters_written) * SCENES_PER_CHAPTER
+    minutes = durations.remaining_minutes(profile, step, scenes_left)
+    if step and step != PROSE_STEP:
+        minutes += durations.step_minutes(step, profile)
+    return minutes
+
+
+def get_generation_capacity(db: Session, genre: Optional[str] = None, chapter_count: int = 25) -> dict:
+    """
+    Generation queue forecast from learned durations (see duration_model)
+
+    Running books are laid out over GENERATION_WORKER_SLOTS in start order,
+    each holding as many slots as it writes chapters in parallel (fan-out)
+    until its estimated end. A book started now waits for the first free
+    slot, then takes its expected duration.
+    """
+    durations = get_duration_model()
+    slots = max(1, settings.GENERATION_WORKER_SLOTS)
+    running = (
+        db.query(Project)
+        .filter(Project.status == ProjectStatus.GENERATING)
+        .order_by(Project.started_at)
+        .all()
+    )
+    written = _written_chapter_counts(db, [p.id for p in running])
+
+    free_at = [0.0] * slots
+    runs = []
+    for project in running:
+        book_chapters = (project.parameters or {}).get("chapter_count", 25)
+        remaining = _remaining_generation_minutes(project, written.get(project.id, 0))
+        held = min(slots, prose_parallelism(book_chapters)) if settings.GENERATION_FANOUT_ENABLED else 1
+        for _ in range(held):
+            slot = free_at.index(min(free_at))
+            free_at[slot] += remaining
+        runs.append({
+            "project_id": project.id,
+            "genre": project.genre.value,
+            "current_step": project.current_step,
+            "chapters_written": written.get(project.id, 0),
+            "chapter_count": book_chapters,
+            "worker_slots": held,
+            "remaining_minutes": round(remaining, 1),
+        })
+
+    wait = min(free_at)
+    new_book = durations.book_minutes(_duration_profile(genre, chapter_count))
+    return {
+        "worker_slots": slots,
+        "active_runs": len(runs),
+        "runs": runs,
+        "queued_worker_minutes": round(sum(free_at), 1),
+        "next_slot_free_minutes": round(wait, 1),
+        "new_book_minutes": round(new_book, 1),
+        "new_book_completion_minutes": round(wait + new_book, 1),
+        "duration_model": durations.get_stats(),
+    }
+
+
 def get_world_bible(db: Session, project_id: int) -> Optional[WorldBible]:
     """Get World Bible for project"""
     return db.query(WorldBible).filter(WorldBible.project_id == project_id).first()
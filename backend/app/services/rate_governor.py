@@ -0,0 +1,310 @@
+"""
+LLM Rate Governor - shared admission control for AI calls
+
+Token buckets for requests/min (RPM) and tokens/min (TPM) per (provider, model).
+State lives in Redis so that every Celery worker and API process drawing on the
+same API key sees one budget. When Redis is unavailable the governor falls back
+to an in-process bucket (per-worker limits, no cross-worker coordination).
+Redis round-trips of acquire() run on a worker thread, never on the event loop.
+
+Instead of firing requests as fast as callers await them and reacting to 429s
+with exponential sleeps, callers wait *before* the request until both buckets
+can cover it. Throughput then stays close to the contractual limit across all
+workers instead of oscillating between bursts and back-off storms.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+from app.services.redis_client import LazyRedis
+
+logger = logging.getLogger(__name__)
+
+
+# Longest single sleep between admission attempts (keeps waiters responsive)
+_MAX_SLEEP_SLICE = 5.0
+
+
+# Atomic two-bucket acquire.  Both buckets refill continuously at capacity/60s.
+# Either both are debited or neither is; otherwise returns the wait in ms.
+_ACQUIRE_LUA = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local function refill(key, capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1])
+    local ts = tonumber(state[2])
+    if tokens == nil or ts == nil then
+        return capacity
+    end
+    return math.min(capacity, tokens + math.max(0, now - ts) * capacity / 60000.0)
+end
+
+local rpm_cap = tonumber(ARGV[1])
+local tpm_cap = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), tpm_cap)
+
+local req_tokens = refill(KEYS[1], rpm_cap)
+local tok_tokens = refill(KEYS[2], tpm_cap)
+
+local wait = 0
+if req_tokens < 1 then
+    wait = math.max(wait, (1 - req_tokens) * 60000.0 / rpm_cap)
+end
+if tok_tokens < cost then
+    wait = math.max(wait, (cost - tok_tokens) * 60000.0 / tpm_cap)
+end
+if wait == 0 then
+    req_tokens = req_tokens - 1
+    tok_tokens = tok_tokens - cost
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(req_tokens), 'ts', now)
+redis.call('HSET', KEYS[2], 'tokens', tostring(tok_tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+redis.call('PEXPIRE', KEYS[2], 120000)
+return math.ceil(wait)
+"""
+
+# Drain both buckets after a provider 429 so every worker backs off together.
+_DRAIN_LUA = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local penalty_ms = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local cap = tonumber(ARGV[i + 1])
+    -- Negative balance = capacity-proportional debt repaid over penalty_ms
+    local debt = cap * penalty_ms / 60000.0
+    redis.call('HSET', key, 'tokens', tostring(-debt), 'ts', now)
+    redis.call('PEXPIRE', key, 120000)
+end
+return 1
+"""
+
+
+@dataclass
+class RateLimit:
+    """Contractual limits for one (provider, model) pair"""
+    rpm: int
+    tpm: int
+
+
+class _LocalBucket:
+    """In-process token bucket (fallback when Redis is unavailable)"""
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / 60.0)
+        self.updated_at = now
+
+
+class RateGovernor:
+    """
+    Admission controller for LLM requests.
+
+    Usage:
+        governor = get_rate_governor()
+        waited = await governor.acquire("openai", "gpt-4o", estimated_tokens)
+        ... call the API ...
+        governor.penalize("openai", "gpt-4o", retry_after=20)  # on 429
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, int]]] = None, enabled: bool = True):
+        self.enabled = enabled
+        self._limits: Dict[str, RateLimit] = {
+            model: RateLimit(rpm=int(cfg.get("rpm", 0)), tpm=int(cfg.get("tpm", 0)))
+            for model, cfg in (limits or {}).items()
+        }
+        self._redis = LazyRedis("Rate governor", "using local buckets", on_connect=self._register_scripts)
+        self._acquire_script = None
+        self._drain_script = None
+
+        self._local_buckets: Dict[Tuple[str, str, str], _LocalBucket] = {}
+        self._local_lock = threading.Lock()
+
+    # ---- Limits ----
+
+    def get_limit(self, model: str) -> Optional[RateLimit]:
+        """Limits for a model (None = not governed)"""
+        limit = self._limits.get(model)
+        if limit is None or limit.rpm <= 0 or limit.tpm <= 0:
+            return None
+        return limit
+
+    # ---- Redis access ----
+
+    def _register_scripts(self, client) -> None:
+        self._acquire_script = client.register_script(_ACQUIRE_LUA)
+        self._drain_script = client.register_script(_DRAIN_LUA)
+
+    @staticmethod
+    def _keys(provider: str, model: str) -> Tuple[str, str]:
+        base = f"narraforge:ratelimit:{provider}:{model}"
+        return f"{base}:rpm", f"{base}:tpm"
+
+    # ---- Admission ----
+
+    def _try_acquire_local(self, provider: str, model: str, limit: RateLimit, tokens: int) -> float:
+        """Returns seconds to wait (0 = admitted)"""
+        now = time.monotonic()
+        cost = min(tokens, limit.tpm)
+        with self._local_lock:
+            rpm_bucket = self._local_buckets.setdefault(
+                (provider, model, "rpm"), _LocalBucket(limit.rpm)
+            )
+            tpm_bucket = self._local_buckets.setdefault(
+                (provider, model, "tpm"), _LocalBucket(limit.tpm)
+            )
+            rpm_bucket.refill(now)
+            tpm_bucket.refill(now)
+
+            wait = 0.0
+            if rpm_bucket.tokens < 1:
+                wait = max(wait, (1 - rpm_bucket.tokens) * 60.0 / limit.rpm)
+            if tpm_bucket.tokens < cost:
+                wait = max(wait, (cost - tpm_bucket.tokens) * 60.0 / limit.tpm)
+
+            if wait == 0.0:
+                rpm_bucket.tokens -= 1
+                tpm_bucket.tokens -= cost
+            return wait
+
+    def _try_acquire(self, provider: str, model: str, limit: RateLimit, tokens: int) -> float:
+        """Try Redis first, local bucket on failure. Returns seconds to wait."""
+        if self._redis.get() is not None:
+            try:
+                wait_ms = self._acquire_script(
+                    keys=list(self._keys(provider, model)),
+                    args=[limit.rpm, limit.tpm, max(1, int(tokens))],
+                )
+                return float(wait_ms) / 1000.0
+            except Exception as e:
+                self._redis.mark_failed(e)
+        return self._try_acquire_local(provider, model, limit, tokens)
+
+    def try_acquire(self, provider: str, model: str, tokens: int) -> bool:
+        """
+        Admit a request only if both buckets can cover it right now (never waits).
+
+        Blocking (Redis round-trip) - async callers use asyncio.to_thread.
+        """
+        if not self.enabled:
+            return True
+        limit = self.get_limit(model)
+        if limit is None:
+            return True
+        return self._try_acquire(provider, model, limit, tokens) <= 0
+
+    async def acquire(
+        self,
+        provider: str,
+        model: str,
+        tokens: int,
+        max_wait: Optional[float] = None
+    ) -> float:
+        """
+        Wait until the (provider, model) buckets admit a request of `tokens` tokens.
+
+        Args:
+            provider: "openai" / "anthropic"
+            model: Model name (limits are looked up by model)
+            tokens: Tokens to reserve (prompt estimate + max completion tokens)
+            max_wait: Give up waiting after this many seconds and let the call through
+
+        Returns:
+            Seconds spent waiting
+        """
+        if not self.enabled:
+            return 0.0
+        limit = self.get_limit(model)
+        if limit is None:
+            return 0.0
+
+        max_wait = settings.LLM_RATE_GOVERNOR_MAX_WAIT if max_wait is None else max_wait
+        started = time.monotonic()
+        first_attempt = True
+
+        while True:
+            wait = await asyncio.to_thread(self._try_acquire, provider, model, limit, tokens)
+            if wait <= 0:
+                if first_attempt:
+                    return 0.0
+                waited = time.monotonic() - started
+                if waited > 1.0:
+                    logger.info(f"Rate governor: admitted {provider}/{model} after {waited:.1f}s wait")
+                return waited
+
+            waited = time.monotonic() - started
+            if waited >= max_wait:
+                logger.warning(
+                    f"Rate governor: waited {waited:.1f}s for {provider}/{model} "
+                    f"({tokens} tokens) - letting request through"
+                )
+                return waited
+
+            # Small jitter de-synchronises workers released by the same refill
+            sleep_for = min(wait, _MAX_SLEEP_SLICE, max_wait - waited) + random.uniform(0, 0.05)
+            first_attempt = False
+            await asyncio.sleep(sleep_for)
+
+    def penalize(self, provider: str, model: str, retry_after: Optional[float] = None) -> None:
+        """
+        Drain the buckets after a provider 429 so that all workers pause together.
+
+        Blocking (Redis round-trip) - async callers use asyncio.to_thread.
+
+        Args:
+            retry_after: Provider's Retry-After in seconds (defaults to 1s of debt)
+        """
+        if not self.enabled:
+            return
+        limit = self.get_limit(model)
+        if limit is None:
+            return
+
+        penalty = max(1.0, float(retry_after or 1.0))
+        if self._redis.get() is not None:
+            try:
+                self._drain_script(
+                    keys=list(self._keys(provider, model)),
+                    args=[int(penalty * 1000), limit.rpm, limit.tpm],
+                )
+                return
+            except Exception as e:
+                self._redis.mark_failed(e)
+
+        now = time.monotonic()
+        with self._local_lock:
+            for kind, capacity in (("rpm", limit.rpm), ("tpm", limit.tpm)):
+                bucket = self._local_buckets.setdefault((provider, model, kind), _LocalBucket(capacity))
+                bucket.tokens = -capacity * penalty / 60.0
+                bucket.updated_at = now
+
+
+# Singleton instance
+_rate_governor: Optional[RateGovernor] = None
+
+
+def get_rate_governor() -> RateGovernor:
+    """Get or create rate governor singleton"""
+    global _rate_governor
+    if _rate_governor is None:
+        _rate_governor = RateGovernor(
+            limits=settings.LLM_RATE_LIMITS,
+            enabled=settings.LLM_RATE_GOVERNOR_ENABLED,
+        )
+    return _rate_governor
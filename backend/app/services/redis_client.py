@@ -0,0 +1,106 @@
+"""
+Redis Client - lazily connected Redis shared by the worker-side services
+
+Rate governor, response cache, generation stream, token budget predictor and
+duration model all keep their state in Redis with a local fallback. Each
+needs the same thing: connect on first use, ping, and after a failure stay on
+the fallback for a cooldown instead of retrying the connection on every call.
+
+The clients are synchronous (redis-py's connection pool is thread-safe).
+Generation runs on event loops, so async callers do not call them inline:
+they go through asyncio.to_thread (or, for the stream, a sender thread).
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds to wait before retrying a Redis connection after a failure
+REDIS_RETRY_COOLDOWN = 30.0
+
+
+def connect_redis(socket_timeout: float = 0.5):
+    """New client for settings.REDIS_URL, pinged (raises if Redis is unreachable)"""
+    import redis as redis_lib
+    client = redis_lib.Redis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=socket_timeout,
+    )
+    client.ping()
+    return client
+
+
+class LazyRedis:
+    """
+    Redis client connected on first use, with a cooldown after failures.
+
+    Usage:
+        redis = LazyRedis("Duration model", "using local windows")
+        client = redis.get()          # None while Redis is unavailable
+        try:
+            client.lpush(...)
+        except Exception as e:
+            redis.mark_failed(e)      # fall back until the cooldown passes
+    """
+
+    def __init__(
+        self,
+        owner: str,
+        fallback: str,
+        socket_timeout: float = 0.5,
+        on_connect: Optional[Callable[[Any], None]] = None
+    ):
+        """
+        Args:
+            owner: Service name used in log lines
+            fallback: What the service does without Redis (log lines)
+            socket_timeout: Connect and command timeout in seconds
+            on_connect: Called with every new client (e.g. to register scripts)
+        """
+        self.owner = owner
+        self.fallback = fallback
+        self.socket_timeout = socket_timeout
+        self.on_connect = on_connect
+        self._client = None
+        self._failed_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def get(self):
+        """The client, or None while Redis is unavailable (cooldown after a failure)"""
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            if self._failed_at and time.monotonic() - self._failed_at < REDIS_RETRY_COOLDOWN:
+                return None
+            try:
+                client = connect_redis(self.socket_timeout)
+                if self.on_connect is not None:
+                    self.on_connect(client)
+                self._client = client
+                self._failed_at = None
+            except Exception as e:
+                logger.warning(f"{self.owner}: Redis unavailable, {self.fallback}: {e}")
+                self._failed_at = time.monotonic()
+            return self._client
+
+    def mark_failed(self, error: Exception) -> None:
+        """A command failed - use the fallback until the cooldown passes"""
+        logger.warning(f"{self.owner}: Redis error, {self.fallback}: {error}")
+        with self._lock:
+            self._client = None
+            self._failed_at = time.monotonic()
@@ -0,0 +1,296 @@
+"""
+Repetition Index - book-wide near-duplicate detection for scene prose
+
+Repetition was caught only inside a scene (_extract_metaphors, the
+anti-pattern validator). Comparing a new scene against the whole manuscript
+by rescanning 165 scenes is too slow to do per scene, so every project gets
+an incremental index:
+
+- passages: sentences of >= PASSAGE_MIN_WORDS words, shingled into word
+  3-grams of stemmed words (Polish inflection: "drzwi skrzypiały" and
+  "drzwiami skrzypiącymi" share shingles)
+- metaphors: similes found by the scene writer's patterns ("jak ...",
+  "niczym ..."), shingled into stemmed words
+
+Each item gets a MinHash signature (NUM_PERM permutations); signatures are
+split into LSH bands, so a query touches only the few items sharing a band
+bucket and estimates their Jaccard similarity - well under a millisecond
+per passage regardless of book length.
+
+The index lives in worker memory. It is built from the stored scenes the
+first time a project is used, refreshed for chapters another worker changed
+(see ChapterPipeline._sync_repetition_index) and updated as each scene is
+checkpointed. Hits feed the anti-pattern validator as repair hints.
+Replaced scenes leave tombstones; once they are most of the index it is
+rebuilt from the live items.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import settings
+
+
+NUM_PERM = 32
+BANDS = 8  # 8 bands x 4 rows: items with Jaccard >= ~0.6 collide with high probability
+ROWS = NUM_PERM // BANDS
+
+PASSAGE_MIN_WORDS = 8
+PASSAGE_SHINGLE = 3
+STEM_LENGTH = 6
+
+# Rebuild the index once removed items are this share of it (and at least COMPACT_MIN_TOMBSTONES)
+COMPACT_RATIO = 0.5
+COMPACT_MIN_TOMBSTONES = 256
+
+PASSAGE = "passage"
+METAPHOR = "metaphor"
+
+# Same similes the scene writer tracks within a chapter (SceneWriterAgent._extract_metaphors)
+_METAPHOR_PATTERN = re.compile(r"(?:jak|niczym|jakby|niby)\s+([^,.!?;:—\n]{5,50})", re.IGNORECASE)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?…])\s+")
+_WORD = re.compile(r"[a-z0-9]+")
+# NFKD does not decompose "ł" - without this the ascii fold drops it ("łza" -> "za")
+_FOLD = str.maketrans({"ł": "l", "Ł": "L"})
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(1337)  # fixed seed - signatures are comparable across workers
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+SceneKey = Tuple[int, int]
+
+
+def _stems(text: str) -> List[str]:
+    folded = unicodedata.normalize("NFKD", (text or "").translate(_FOLD)).encode("ascii", "ignore").decode().casefold()
+    return [word[:STEM_LENGTH] for word in _WORD.findall(folded)]
+
+
+def _shingles(stems: List[str], size: int) -> Set[str]:
+    if len(stems) < size:
+        return {" ".join(stems)} if stems else set()
+    return {" ".join(stems[i:i + size]) for i in range(len(stems) - size + 1)}
+
+
+def _signature(shingles: Iterable[str]) -> Tuple[int, ...]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little")
+        for s in shingles
+    ]
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def _bands(signature: Tuple[int, ...]) -> List[int]:
+    return [hash(signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+def _similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def split_items(content: str) -> List[Tuple[str, str, Set[str]]]:
+    """(kind, text, shingles) of every indexable passage and metaphor of a scene"""
+    items = []
+    for sentence in _SENTENCE_SPLIT.split(content or ""):
+        stems = _stems(sentence)
+        if len(stems) >= PASSAGE_MIN_WORDS:
+            items.append((PASSAGE, sentence.strip(), _shingles(stems, PASSAGE_SHINGLE)))
+    for match in _METAPHOR_PATTERN.finditer(content or ""):
+        stems = _stems(match.group(1))
+        if len(stems) >= 2:
+            items.append((METAPHOR, match.group(0).strip(), set(stems)))
+    return items
+
+
+@dataclass
+class RepetitionHit:
+    """A passage or metaphor of a new scene that near-duplicates an earlier one"""
+    kind: str
+    text: str
+    earlier: str
+    chapter: int
+    scene: int
+    similarity: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "text": self.text,
+            "earlier": self.earlier,
+            "chapter": self.chapter,
+            "scene": self.scene,
+            "similarity": round(self.similarity, 2),
+        }
+
+
+class RepetitionIndex:
+    """
+    MinHash/LSH index of one project's scenes.
+
+    Usage:
+        index.add_scene(chapter, scene, content)
+        hits = index.check(content, chapter, scene)
+    """
+
+    def __init__(self, passage_threshold: float = 0.6, metaphor_threshold: float = 0.7):
+        """
+        Args:
+            passage_threshold: Estimated Jaccard similarity from which a passage repeats
+            metaphor_threshold: Same for metaphors (shorter, so stricter)
+        """
+        self.thresholds = {PASSAGE: passage_threshold, METAPHOR: metaphor_threshold}
+        self._items: List[Optional[Tuple[str, SceneKey, str, Tuple[int, ...]]]] = []
+        self._buckets: Dict[Tuple[str, int, int], List[int]] = {}
+        self._by_scene: Dict[SceneKey, List[int]] = {}
+        self._scene_versions: Dict[SceneKey, str] = {}
+        self.chapter_versions: Dict[int, Any] = {}
+        self._tombstones = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._by_scene.values())
+
+    def add_scene(self, chapter: int, scene: int, content: str) -> None:
+        """Index a scene, replacing what was indexed for it before"""
+        key = (chapter, scene)
+        version = hashlib.blake2b((content or "").encode(), digest_size=8).hexdigest()
+        if self._scene_versions.get(key) == version:
+            return
+        items = [(kind, text, _signature(shingles)) for kind, text, shingles in split_items(content)]
+        with self._lock:
+            self._remove(key)
+            ids = []
+            for kind, text, signature in items:
+                item_id = len(self._items)
+                self._items.append((kind, key, text, signature))
+                for band, bucket in enumerate(_bands(signature)):
+                    self._buckets.setdefault((kind, band, bucket), []).append(item_id)
+                ids.append(item_id)
+            self._by_scene[key] = ids
+            self._scene_versions[key] = version
+
+    def remove_scene(self, chapter: int, scene: int) -> None:
+        with self._lock:
+            self._remove((chapter, scene))
+
+    def retain_scenes(self, chapter: int, scenes: Iterable[int]) -> None:
+        """Drop indexed scenes of a chapter that are not in scenes (chapter being rewritten)"""
+        keep = set(scenes)
+        with self._lock:
+            for key in [k for k in self._by_scene if k[0] == chapter and k[1] not in keep]:
+                self._remove(key)
+
+    def sync_chapter(self, chapter: int, version: Any, scenes: Dict[int, str]) -> bool:
+        """
+        Replace a chapter's scenes unless it is indexed at this version.
+
+        Args:
+            chapter: Chapter number
+            version: Anything that changes when the chapter's scenes change
+            scenes: scene number -> content
+
+        Returns:
+            True if the chapter was (re)indexed
+        """
+        if self.chapter_versions.get(chapter) == version:
+            return False
+        self.retain_scenes(chapter, scenes)
+        for scene, content in scenes.items():
+            self.add_scene(chapter, scene, content)
+        self.chapter_versions[chapter] = version
+        return True
+
+    def _remove(self, key: SceneKey) -> None:
+        # Bucket lists keep the ids; tombstones are skipped at query time
+        for item_id in self._by_scene.pop(key, []):
+            self._items[item_id] = None
+            self._tombstones += 1
+        self._scene_versions.pop(key, None)
+        if self._tombstones >= COMPACT_MIN_TOMBSTONES and self._tombstones > len(self._items) * COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rebuild items and buckets from the live items (drops tombstones)"""
+        items: List[Optional[Tuple[str, SceneKey, str, Tuple[int, ...]]]] = []
+        buckets: Dict[Tuple[str, int, int], List[int]] = {}
+        by_scene: Dict[SceneKey, List[int]] = {}
+        for key, ids in self._by_scene.items():
+            by_scene[key] = []
+            for item_id in ids:
+                item = self._items[item_id]
+                new_id = len(items)
+                items.append(item)
+                for band, bucket in enumerate(_bands(item[3])):
+                    buckets.setdefault((item[0], band, bucket), []).append(new_id)
+                by_scene[key].append(new_id)
+        self._items, self._buckets, self._by_scene = items, buckets, by_scene
+        self._tombstones = 0
+
+    def query(
+        self,
+        kind: str,
+        signature: Tuple[int, ...],
+        exclude: Optional[SceneKey] = None
+    ) -> Optional[Tuple[float, SceneKey, str]]:
+        """Most similar indexed item of a kind above its threshold"""
+        best = None
+        seen: Set[int] = set()
+        with self._lock:
+            for band, bucket in enumerate(_bands(signature)):
+                for item_id in self._buckets.get((kind, band, bucket), ()):
+                    if item_id in seen:
+                        continue
+                    seen.add(item_id)
+                    item = self._items[item_id]
+                    if item is None or item[1] == exclude:
+                        continue
+                    similarity = _similarity(signature, item[3])
+                    if similarity >= self.thresholds[kind] and (best is None or similarity > best[0]):
+                        best = (similarity, item[1], item[2])
+        return best
+
+    def check(self, content: str, chapter: int, scene: int, limit: int = 5) -> List[RepetitionHit]:
+        """Passages and metaphors of a scene that near-duplicate other scenes of the book"""
+        hits = []
+        for kind, text, shingles in split_items(content):
+            found = self.query(kind, _signature(shingles), exclude=(chapter, scene))
+            if found is None:
+                continue
+            similarity, (earlier_chapter, earlier_scene), earlier = found
+            hits.append(RepetitionHit(kind, text, earlier, earlier_chapter, earlier_scene, similarity))
+        hits.sort(key=lambda hit: (hit.kind != PASSAGE, -hit.similarity))
+        return hits[:limit]
+
+
+# Per-project indexes kept by this worker (least recently used are dropped)
+_indexes: "OrderedDict[int, RepetitionIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_repetition_index(project_id: int) -> RepetitionIndex:
+    """Get or create the index of a project (empty until scenes are added)"""
+    with _indexes_lock:
+        index = _indexes.get(project_id)
+        if index is None:
+            index = RepetitionIndex(
+                passage_threshold=settings.REPETITION_PASSAGE_THRESHOLD,
+                metaphor_threshold=settings.REPETITION_METAPHOR_THRESHOLD,
+            )
+            _indexes[project_id] = index
+            while len(_indexes) > settings.REPETITION_INDEX_MAX_PROJECTS:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(project_id)
+        return index
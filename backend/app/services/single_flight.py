@@ -0,0 +1,114 @@
+"""
+Single-Flight - coalescing of identical in-flight AI requests
+
+When several callers issue the same request concurrently (e.g. multiple
+dashboard panels analysing the same chapter), only the first one goes
+upstream; the others await the same task and receive its result.
+
+Keys are request fingerprints (see llm_response_cache.request_fingerprint).
+The registry is per event loop: Celery tasks each run their own loop and
+an asyncio task cannot be awaited from a different loop.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SingleFlightStats:
+    """Leader/follower counters"""
+    leaders: int = 0
+    coalesced: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesce_rate": self.coalesced / total if total > 0 else 0.0,
+        }
+
+
+class SingleFlight:
+    """
+    Shares one upstream task between concurrent callers with the same key.
+
+    Usage:
+        result, shared = await single_flight.do(key, lambda: call_api(...))
+        # shared=True -> this caller did not trigger an upstream request
+    """
+
+    def __init__(self):
+        self._inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.stats = SingleFlightStats()
+
+    def _registry(self, loop: asyncio.AbstractEventLoop) -> Dict[str, asyncio.Task]:
+        with self._lock:
+            registry = self._inflight.get(loop)
+            if registry is None:
+                registry = {}
+                self._inflight[loop] = registry
+            return registry
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run factory() once per key among concurrent callers.
+
+        The upstream call runs as its own task, so a cancelled caller does not
+        cancel the request for the others.
+
+        Returns:
+            (result, shared) - shared is True for callers that joined an
+            already running request
+        """
+        loop = asyncio.get_running_loop()
+        registry = self._registry(loop)
+
+        task = registry.get(key)
+        shared = task is not None
+        if shared:
+            with self._lock:
+                self.stats.coalesced += 1
+            logger.debug(f"Single-flight: joined in-flight request {key[:12]}")
+        else:
+            task = loop.create_task(factory())
+            registry[key] = task
+            with self._lock:
+                self.stats.leaders += 1
+
+            def _release(done: asyncio.Task, key: str = key) -> None:
+                if registry.get(key) is done:
+                    del registry[key]
+                # Mark the exception retrieved even if every caller was cancelled
+                if not done.cancelled():
+                    done.exception()
+
+            task.add_done_callback(_release)
+
+        return await asyncio.shield(task), shared
+
+    def in_flight(self) -> int:
+        """Number of upstream requests currently shared"""
+        with self._lock:
+            return sum(len(r) for r in self._inflight.values())
+
+
+# Singleton instance
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    """Get or create single-flight registry singleton"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
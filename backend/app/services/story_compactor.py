@@ -0,0 +1,301 @@
+"""
+Story Compactor - hierarchical "story so far" under a fixed token budget
+
+Scene prompts used to see the story only through the first 500 characters
+of the previous chapter; the recap was the last 5 such openings cut by word
+count. The compactor keeps rolling summaries at three levels:
+
+    scene digest     written as each scene lands, in the background while the
+                     next scene is generated   (<= COMPACTION_SCENE_DIGEST_TOKENS)
+    chapter summary  the chapter's scene digests compressed once the chapter
+                     is drafted                (<= COMPACTION_CHAPTER_SUMMARY_TOKENS)
+    act summary      the act's chapter summaries compressed once every chapter
+                     of the act is summarized  (<= COMPACTION_ACT_SUMMARY_TOKENS)
+
+The recap of chapter N is built from the summaries of finished acts plus the
+chapter summaries of the current act (newest first) and never exceeds
+COMPACTION_RECAP_TOKENS - measured with tiktoken, not words - so chapter 40
+gets a prompt of the same size as chapter 4.
+
+Storage:
+    chapter.scenes_content[i]["digest"]
+    chapter.generation_meta["summary"]
+    plot_structure.act_summaries = {"<act>": {"summary": "...", "inputs": "<hash>"}}
+
+"inputs" fingerprints the chapter summaries an act summary was written from;
+a stale act summary (chapter rewritten) is ignored until it is recomposed.
+
+Summaries are written by the TIER_1 model. When a call fails the level falls
+back to an extractive cut of its input, so compaction never fails a chapter.
+"""
+
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.ai_service import get_ai_service, ModelTier
+from app.services.dependency_graph import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+# ---- Token measurement ----
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """Module-level tiktoken encoding (None without tiktoken - chars/3 estimate)"""
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of a text (Polish text ≈ 3 chars/token without tiktoken)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 3
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cut a text to max_tokens, on a word boundary, marking the cut with an ellipsis"""
+    if not text or max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        if len(text) <= max_tokens * 3:
+            return text
+        cut = text[-max_tokens * 3:] if keep_end else text[:max_tokens * 3]
+    else:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        cut = encoding.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+    if keep_end:
+        return "..." + cut.split(" ", 1)[-1]
+    return cut.rsplit(" ", 1)[0] + "..."
+
+
+def _extract(text: str, max_tokens: int) -> str:
+    """Extractive fallback: opening and closing sentences within the budget"""
+    sentences = [s for s in re.split(r"(?<=[.!?…])\s+", (text or "").strip()) if s]
+    if len(sentences) <= 2:
+        return truncate_to_tokens(text, max_tokens)
+    head = truncate_to_tokens(" ".join(sentences[:2]), max_tokens // 2)
+    tail = truncate_to_tokens(" ".join(sentences[-2:]), max_tokens - count_tokens(head), keep_end=True)
+    return f"{head} {tail}".strip()
+
+
+COMPACTION_SYSTEM_PROMPT = (
+    "Jesteś redaktorem prowadzącym powieść. Streszczasz jej fragmenty dla autora, "
+    "który będzie pisał dalej: zachowaj fakty fabularne, decyzje i stan postaci, "
+    "zmiany relacji, ujawnione tajemnice, otwarte wątki i miejsce akcji. "
+    "Pomijaj styl, opisy i dialogi. Pisz zwięźle, w czasie przeszłym, po polsku."
+)
+
+
+class StoryCompactor:
+    """
+    Rolling scene -> chapter -> act summaries of a book.
+
+    Usage:
+        compactor = get_story_compactor()
+        digest = await compactor.digest_scene(content, chapter_number, scene_number)
+        summary = await compactor.summarize_chapter(chapter_number, digests)
+        recap = compactor.build_recap(chapter_number, chapter_summaries, acts, act_summaries)
+    """
+
+    def __init__(
+        self,
+        scene_tokens: int = 120,
+        chapter_tokens: int = 300,
+        act_tokens: int = 400,
+        recap_tokens: int = 1500,
+        act_chapters: int = 8
+    ):
+        """
+        Args:
+            scene_tokens: Budget of one scene digest
+            chapter_tokens: Budget of one chapter summary
+            act_tokens: Budget of one act summary
+            recap_tokens: Budget of the whole recap in a chapter prompt
+            act_chapters: Chapters per block when the plot has no usable acts
+        """
+        self.scene_tokens = scene_tokens
+        self.chapter_tokens = chapter_tokens
+        self.act_tokens = act_tokens
+        self.recap_tokens = recap_tokens
+        self.act_chapters = act_chapters
+        self.ai_service = get_ai_service()
+        self.name = "Story Compactor"
+
+    async def _compress(self, text: str, max_tokens: int, instruction: str, task: str) -> str:
+        """Summary of text within max_tokens (extractive cut when the model fails)"""
+        if count_tokens(text) <= max_tokens:
+            return text
+        try:
+            response = await self.ai_service.generate(
+                prompt=f"{instruction}\nLimit: około {int(max_tokens * 0.6)} słów.\n\n{text}",
+                system_prompt=COMPACTION_SYSTEM_PROMPT,
+                tier=ModelTier.TIER_1,
+                temperature=0.2,
+                max_tokens=max_tokens + 50,
+                metadata={"agent": self.name, "task": task}
+            )
+            summary = (response.content or "").strip()
+            if summary:
+                return truncate_to_tokens(summary, max_tokens)
+        except Exception as e:
+            logger.warning(f"Compaction ({task}) fell back to extraction: {e}")
+        return _extract(text, max_tokens)
+
+    # ---- Levels ----
+
+    async def digest_scene(self, content: str, chapter_number: int, scene_number: int) -> str:
+        """Digest of one scene"""
+        return await self._compress(
+            content,
+            self.scene_tokens,
+            f"Streść scenę {scene_number} rozdziału {chapter_number}: co się wydarzyło i co się zmieniło.",
+            "scene_digest"
+        )
+
+    async def summarize_chapter(self, chapter_number: int, digests: List[str]) -> str:
+        """Chapter summary from its scene digests (in scene order)"""
+        text = "\n".join(f"Scena {i}: {digest}" for i, digest in enumerate(digests, 1) if digest)
+        return await self._compress(
+            text,
+            self.chapter_tokens,
+            f"Połącz streszczenia scen rozdziału {chapter_number} w jedno streszczenie rozdziału.",
+            "chapter_summary"
+        )
+
+    async def summarize_act(self, act_name: str, chapter_summaries: Dict[int, str]) -> str:
+        """Act summary from the summaries of its chapters"""
+        text = "\n".join(f"R{n}: {chapter_summaries[n]}" for n in sorted(chapter_summaries))
+        return await self._compress(
+            text,
+            self.act_tokens,
+            f"Streść akt „{act_name}” na podstawie streszczeń jego rozdziałów.",
+            "act_summary"
+        )
+
+    # ---- Acts ----
+
+    def acts_of(self, plot_structure: Dict[str, Any], total_chapters: int) -> List[Tuple[str, List[int]]]:
+        """(act key, chapter numbers) from the plot structure, fixed-size blocks without usable acts"""
+        raw = (plot_structure or {}).get("acts") or []
+        # {"act_1": {...}, ...} as stored by the plot architect, or a plain list
+        named = list(raw.items()) if isinstance(raw, dict) else [(f"act_{i + 1}", act) for i, act in enumerate(raw)]
+
+        acts = []
+        covered = set()
+        for key, act in named:
+            if not isinstance(act, dict):
+                continue
+            chapters = sorted(n for n in act.get("chapters") or [] if isinstance(n, int) and n not in covered)
+            if chapters:
+                acts.append((str(act.get("name") or key), chapters))
+                covered.update(chapters)
+        acts.sort(key=lambda act: act[1][0])
+        if acts and len(covered) >= total_chapters:
+            return acts
+
+        size = max(1, self.act_chapters)
+        return [
+            (f"R{start}-{min(start + size - 1, total_chapters)}", list(range(start, min(start + size, total_chapters + 1))))
+            for start in range(1, total_chapters + 1, size)
+        ]
+
+    @staticmethod
+    def act_inputs(chapter_summaries: Dict[int, str], chapters: List[int]) -> str:
+        """Fingerprint of the chapter summaries an act summary is written from"""
+        return content_hash([chapter_summaries.get(n) for n in chapters])
+
+    # ---- Recap ----
+
+    def build_recap(
+        self,
+        chapter_number: int,
+        chapter_summaries: Dict[int, str],
+        acts: List[Tuple[str, List[int]]],
+        act_summaries: Dict[str, Dict[str, Any]]
+    ) -> str:
+        """
+        Story so far for chapter N within recap_tokens.
+
+        Finished acts with a current summary are represented by it; chapters
+        of the current act (and of acts without a usable summary) by their
+        chapter summaries. The newest chapters get room first, older acts
+        share the rest; what does not fit is cut, never the budget exceeded.
+        """
+        earlier = {n: s for n, s in chapter_summaries.items() if n < chapter_number and s}
+        if not earlier:
+            return "To jest pierwszy rozdział."
+
+        act_parts: List[str] = []
+        chapter_parts: List[Tuple[int, str]] = []
+        for act_key, chapters in acts:
+            before = [n for n in chapters if n < chapter_number]
+            if not before:
+                continue
+            stored = act_summaries.get(act_key) or {}
+            complete = before == chapters and all(n in earlier for n in chapters)
+            if complete and stored.get("summary") and stored.get("inputs") == self.act_inputs(earlier, chapters):
+                act_parts.append(f"{act_key}: {stored['summary']}")
+            else:
+                chapter_parts.extend((n, earlier[n]) for n in before if n in earlier)
+
+        # Newest chapters first, each within the chapter budget, until half of the recap is used
+        # (all of it when there are no act summaries)
+        chapter_budget = self.recap_tokens // 2 if act_parts else self.recap_tokens
+        recent: List[str] = []
+        used = 0
+        for number, summary in sorted(chapter_parts, reverse=True):
+            line = f"R{number}: {truncate_to_tokens(summary, self.chapter_tokens)}"
+            cost = count_tokens(line) + 1
+            if used + cost > chapter_budget:
+                break
+            recent.insert(0, line)
+            used += cost
+
+        # Act summaries share what is left equally
+        older: List[str] = []
+        if act_parts:
+            share = max(0, (self.recap_tokens - used) // len(act_parts) - 1)
+            older = [truncate_to_tokens(part, share) for part in act_parts]
+            older = [part for part in older if part]
+
+        return "\n".join(older + recent)
+
+
+# Singleton instance
+_story_compactor: Optional[StoryCompactor] = None
+
+
+def get_story_compactor() -> StoryCompactor:
+    """Get or create story compactor singleton"""
+    global _story_compactor
+    if _story_compactor is None:
+        _story_compactor = StoryCompactor(
+            scene_tokens=settings.COMPACTION_SCENE_DIGEST_TOKENS,
+            chapter_tokens=settings.COMPACTION_CHAPTER_SUMMARY_TOKENS,
+            act_tokens=settings.COMPACTION_ACT_SUMMARY_TOKENS,
+            recap_tokens=settings.COMPACTION_RECAP_TOKENS,
+            act_chapters=settings.COMPACTION_ACT_CHAPTERS,
+        )
+    return _story_compactor
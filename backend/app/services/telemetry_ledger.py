@@ -0,0 +1,307 @@
+"""
+Telemetry Ledger - per-call AI telemetry persisted to generation_logs
+
+Every AIService.generate()/generate_stream() call is recorded with the agent,
+task, chapter and scene from its `metadata`, the pipeline step and project
+from generation_context, plus model, tokens, cost, latency and cache usage.
+
+Recording never touches the database on the hot path: record() appends to an
+in-memory buffer and a background thread flushes it with one bulk INSERT per
+batch (every AI_LEDGER_FLUSH_INTERVAL seconds or AI_LEDGER_BATCH_SIZE rows).
+If the database is unreachable rows stay buffered up to AI_LEDGER_MAX_BUFFER,
+after which the oldest are dropped - telemetry must never block generation.
+
+summarize_project() aggregates the ledger per pipeline step / agent / task to
+show which step dominates wall-clock time and spend.
+"""
+
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.services.generation_context import get_project_id, get_pipeline_step
+
+logger = logging.getLogger(__name__)
+
+
+# generation_logs.model_tier is a string enum ("tier1".."tier3")
+_DB_TIERS = {1: "TIER1", 2: "TIER2", 3: "TIER3"}
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TelemetryLedger:
+    """
+    Buffered writer of AI call records.
+
+    Usage:
+        ledger = get_telemetry_ledger()
+        ledger.record(tier=2, model=..., provider="openai", tokens_used=..., cost=...,
+                      latency=..., metadata=metadata)
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 200,
+        flush_interval: float = 5.0,
+        max_buffer: int = 20000,
+        enabled: bool = True
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flush_errors = 0
+
+    # ---- Hot path ----
+
+    def record(
+        self,
+        tier: int,
+        model: str,
+        provider: Optional[str],
+        tokens_used: Optional[Dict[str, int]],
+        cost: float,
+        latency: float,
+        metadata: Optional[Dict[str, Any]],
+        success: bool = True,
+        error: Optional[str] = None
+    ) -> None:
+        """Queue one AI call (O(1), never raises)"""
+        if not self.enabled:
+            return
+        try:
+            from app.models.generation_log import ModelTier as DBModelTier
+
+            metadata = metadata or {}
+            tokens_used = tokens_used or {}
+            step, step_name = get_pipeline_step()
+            row = {
+                "project_id": get_project_id(),
+                "step": step,
+                "step_name": step_name,
+                "agent_name": str(metadata.get("agent", ""))[:100] or None,
+                "task": str(metadata.get("task", ""))[:100] or None,
+                "chapter_number": _int_or_none(metadata.get("chapter", metadata.get("chapter_number"))),
+                "scene_number": _int_or_none(metadata.get("scene", metadata.get("scene_number"))),
+                "model_tier": DBModelTier[_DB_TIERS.get(int(tier), "TIER1")],
+                "model_name": (model or "unknown")[:50],
+                "provider": provider,
+                "tokens_in": tokens_used.get("input", 0),
+                "tokens_out": tokens_used.get("output", 0),
+                "cache_read_tokens": tokens_used.get("cache_read", 0),
+                "cost": cost,
+                "cache_hit": 1 if metadata.get("response_cache_hit") else 0,
+                "coalesced": 1 if metadata.get("coalesced") else 0,
+                "streamed": 1 if metadata.get("streamed") else 0,
+                "success": 1 if success else 0,
+                "error_message": error[:2000] if error else None,
+                "timestamp": datetime.utcnow(),
+                "duration_seconds": round(latency, 3),
+            }
+        except Exception as e:
+            logger.debug(f"Telemetry ledger: could not build record: {e}")
+            return
+
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(row)
+            self.recorded += 1
+            pending = len(self._buffer)
+
+        self._ensure_worker()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    # ---- Background flushing ----
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name="ai-telemetry-ledger", daemon=True
+            )
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _requeue(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            free = self._buffer.maxlen - len(self._buffer)
+            keep = rows[:free]
+            self.dropped += len(rows) - len(keep)
+            self._buffer.extendleft(reversed(keep))
+
+    def flush(self) -> int:
+        """Write all buffered rows (bulk INSERT per batch); returns rows written"""
+        from app.database import SessionLocal
+        from app.models.generation_log import GenerationLog
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                rows = self._take_batch()
+                if not rows:
+                    break
+                db = SessionLocal()
+                try:
+                    db.execute(insert(GenerationLog), rows)
+                    db.commit()
+                    written += len(rows)
+                except Exception as e:
+                    db.rollback()
+                    self._requeue(rows)
+                    with self._lock:
+                        self.flush_errors += 1
+                    logger.warning(f"Telemetry ledger flush failed ({len(rows)} rows kept): {e}")
+                    break
+                finally:
+                    db.close()
+
+        if written:
+            with self._lock:
+                self.written += written
+        return written
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "recorded": self.recorded,
+                "written": self.written,
+                "pending": len(self._buffer),
+                "dropped": self.dropped,
+                "flush_errors": self.flush_errors,
+            }
+
+
+# Task name of calls that did not set metadata["task"] (summaries)
+UNTAGGED_TASK = "untagged"
+
+
+def summarize_project(db: Session, project_id: int) -> Dict[str, Any]:
+    """
+    Aggregate a project's AI calls per pipeline step, agent and task.
+
+    Rows are sorted by summed latency, so the step dominating wall-clock time
+    comes first (summed latency over-counts concurrent calls - it measures
+    time spent waiting on AI, not elapsed time). Calls without metadata["task"]
+    are grouped under UNTAGGED_TASK, so the totals cover every logged call.
+    """
+    from app.models.generation_log import GenerationLog
+
+    columns = (
+        GenerationLog.step,
+        GenerationLog.step_name,
+        GenerationLog.agent_name,
+        GenerationLog.task,
+    )
+    rows = (
+        db.query(
+            *columns,
+            func.count(GenerationLog.id),
+            func.sum(GenerationLog.tokens_in),
+            func.sum(GenerationLog.tokens_out),
+            func.sum(GenerationLog.cost),
+            func.sum(GenerationLog.duration_seconds),
+            func.sum(GenerationLog.cache_hit),
+            func.sum(GenerationLog.coalesced),
+            func.sum(1 - GenerationLog.success),
+        )
+        .filter(GenerationLog.project_id == project_id)
+        .group_by(*columns)
+        .all()
+    )
+
+    breakdown = [
+        {
+            "step": step,
+            "step_name": step_name,
+            "agent": agent,
+            "task": task or UNTAGGED_TASK,
+            "calls": calls,
+            "tokens_in": int(tokens_in or 0),
+            "tokens_out": int(tokens_out or 0),
+            "cost": round(float(cost or 0.0), 4),
+            "ai_seconds": round(float(seconds or 0.0), 1),
+            "cache_hits": int(cache_hits or 0),
+            "coalesced": int(coalesced or 0),
+            "failures": int(failures or 0),
+        }
+        for (step, step_name, agent, task, calls, tokens_in, tokens_out,
+             cost, seconds, cache_hits, coalesced, failures) in rows
+    ]
+    breakdown.sort(key=lambda r: r["ai_seconds"], reverse=True)
+
+    per_step: Dict[str, Dict[str, Any]] = {}
+    for row in breakdown:
+        step = per_step.setdefault(
+            f"{row['step']}:{row['step_name']}",
+            {"step": row["step"], "step_name": row["step_name"], "calls": 0, "cost": 0.0, "ai_seconds": 0.0}
+        )
+        step["calls"] += row["calls"]
+        step["cost"] = round(step["cost"] + row["cost"], 4)
+        step["ai_seconds"] = round(step["ai_seconds"] + row["ai_seconds"], 1)
+
+    return {
+        "project_id": project_id,
+        "total_calls": sum(r["calls"] for r in breakdown),
+        "total_cost": round(sum(r["cost"] for r in breakdown), 4),
+        "total_ai_seconds": round(sum(r["ai_seconds"] for r in breakdown), 1),
+        "steps": sorted(per_step.values(), key=lambda s: s["step"]),
+        "breakdown": breakdown,
+    }
+
+
+# Singleton instance
+_telemetry_ledger: Optional[TelemetryLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_telemetry_ledger() -> TelemetryLedger:
+    """Get or create telemetry ledger singleton"""
+    global _telemetry_ledger
+    with _ledger_lock:
+        if _telemetry_ledger is None:
+            _telemetry_ledger = TelemetryLedger(
+                batch_size=settings.AI_LEDGER_BATCH_SIZE,
+                flush_interval=settings.AI_LEDGER_FLUSH_INTERVAL,
+                max_buffer=settings.AI_LEDGER_MAX_BUFFER,
+                enabled=settings.AI_LEDGER_ENABLED,
+            )
+            # Rows buffered at interpreter exit (worker shutdown) are still written
+            atexit.register(_telemetry_ledger.flush)
+        return _telemetry_ledger
@@ -0,0 +1,239 @@
+"""
+Token Budget Predictor - adaptive max_tokens from observed output lengths
+
+Callers pass blunt ceilings (scene writer: max_tokens=target_words * 2, JSON
+analyses: fixed 2000-4000). Every token of max_tokens is reserved against
+the provider TPM limit (and the rate governor) before the first byte is
+generated, so oversized ceilings cost queueing latency on every call.
+
+The predictor learns how much of its ceiling each (agent, task, tier)
+actually uses. Samples are stored as the ratio tokens_out / max_tokens, which
+keeps them comparable when the ceiling scales with the request (target_words).
+Once a key has enough samples, the suggested budget is
+
+    ceiling * p95(ratio) * margin     (never above the caller's ceiling)
+
+A call that still hits the tightened limit is continued by AIService (see
+AIService._generate_upstream), so a tight budget never truncates output.
+
+Samples are kept per project and globally (Redis lists, trimmed to a window);
+a project's own history wins once it has enough samples. Without Redis the
+predictor keeps in-process windows. suggest/predict/record block on Redis;
+AIService calls them via asyncio.to_thread.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.redis_client import LazyRedis
+
+logger = logging.getLogger(__name__)
+
+
+# Suggestions are recomputed at most this often per key (avoids a Redis read per call)
+_SUGGESTION_TTL = 30.0
+
+# Per-project sample lists expire when a project goes quiet
+_PROJECT_TTL_SECONDS = 30 * 24 * 3600
+
+BudgetKey = Tuple[str, str, str]
+
+
+def budget_key(metadata: Optional[Dict], tier: str) -> Optional[BudgetKey]:
+    """(agent, task, tier) for a call, None if the caller did not name its task"""
+    if not metadata or not metadata.get("task"):
+        return None
+    return (str(metadata.get("agent", "-")), str(metadata["task"]), tier)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(math.ceil(q * len(ordered))) - 1))
+    return ordered[index]
+
+
+class TokenBudgetPredictor:
+    """
+    Learns the output-token distribution per (agent, task, tier).
+
+    Usage:
+        predictor = get_token_budget_predictor()
+        max_tokens = predictor.suggest(key, requested_max_tokens, project_id)
+        ...
+        predictor.record(key, max_tokens_requested, tokens_out, project_id)
+    """
+
+    KEY_PREFIX = "narraforge:tokbudget:"
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        margin: float = 1.15,
+        floor_tokens: int = 256,
+        quantile: float = 0.95
+    ):
+        """
+        Args:
+            window: Samples kept per key (global and per project)
+            min_samples: Samples required before a key tightens budgets
+            margin: Multiplier on the observed quantile
+            floor_tokens: Suggested budgets never go below this
+            quantile: Usage quantile the budget must cover
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.margin = margin
+        self.floor_tokens = floor_tokens
+        self.quantile = quantile
+
+        self._redis = LazyRedis("Token budget predictor", "using local windows")
+        self._local: Dict[str, Deque[float]] = {}
+        self._suggestions: Dict[str, Tuple[float, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+        self.tightened_calls = 0
+        self.saved_tokens = 0
+
+    # ---- Storage ----
+
+    def _storage_key(self, key: BudgetKey, project_id: Optional[int]) -> str:
+        scope = f"project:{project_id}" if project_id is not None else "global"
+        return f"{self.KEY_PREFIX}{scope}:" + ":".join(key)
+
+    def _push(self, storage_key: str, ratio: float, ttl: Optional[int]) -> None:
+        client = self._redis.get()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                pipe.lpush(storage_key, f"{ratio:.4f}")
+                pipe.ltrim(storage_key, 0, self.window - 1)
+                if ttl:
+                    pipe.expire(storage_key, ttl)
+                pipe.execute()
+                return
+            except Exception as e:
+                self._redis.mark_failed(e)
+        with self._lock:
+            self._local.setdefault(storage_key, deque(maxlen=self.window)).append(ratio)
+
+    def _samples(self, storage_key: str) -> List[float]:
+        client = self._redis.get()
+        if client is not None:
+            try:
+                return [float(v) for v in client.lrange(storage_key, 0, self.window - 1)]
+            except Exception as e:
+                self._redis.mark_failed(e)
+        with self._lock:
+            return list(self._local.get(storage_key, ()))
+
+    # ---- Prediction ----
+
+    def record(
+        self,
+        key: BudgetKey,
+        max_tokens: int,
+        tokens_out: int,
+        project_id: Optional[int] = None
+    ) -> None:
+        """
+        Record a completed call.
+
+        Args:
+            key: (agent, task, tier)
+            max_tokens: Ceiling the caller asked for (not the tightened budget)
+            tokens_out: Length of the final output in tokens (a continued text
+                counts both parts; a re-requested JSON only the last answer)
+            project_id: Project of the call, if any
+        """
+        if max_tokens <= 0:
+            return
+        ratio = min(tokens_out / max_tokens, 1.0)
+        self._push(self._storage_key(key, None), ratio, None)
+        if project_id is not None:
+            self._push(self._storage_key(key, project_id), ratio, _PROJECT_TTL_SECONDS)
+
+    def _usage_ratio(self, key: BudgetKey, project_id: Optional[int]) -> Optional[float]:
+        """Covered usage ratio (quantile * margin); project history first, then global"""
+        scopes = ([project_id] if project_id is not None else []) + [None]
+        for scope in scopes:
+            storage_key = self._storage_key(key, scope)
+            now = time.monotonic()
+            with self._lock:
+                cached = self._suggestions.get(storage_key)
+            if cached is not None and now - cached[0] < _SUGGESTION_TTL:
+                ratio = cached[1]
+            else:
+                samples = self._samples(storage_key)
+                ratio = (
+                    _percentile(samples, self.quantile) * self.margin
+                    if len(samples) >= self.min_samples else None
+                )
+                with self._lock:
+                    self._suggestions[storage_key] = (now, ratio)
+            if ratio is not None:
+                return ratio
+        return None
+
+    def predict(
+        self,
+        key: Optional[BudgetKey],
+        requested_max_tokens: int,
+        project_id: Optional[int] = None
+    ) -> int:
+        """Expected max_tokens for a call, without counting it (routing decisions)"""
+        if key is None:
+            return requested_max_tokens
+        ratio = self._usage_ratio(key, project_id)
+        if ratio is None or ratio >= 1.0:
+            return requested_max_tokens
+        return min(requested_max_tokens, max(self.floor_tokens, int(math.ceil(requested_max_tokens * ratio))))
+
+    def suggest(
+        self,
+        key: Optional[BudgetKey],
+        requested_max_tokens: int,
+        project_id: Optional[int] = None
+    ) -> int:
+        """Tight max_tokens for a call (the requested ceiling until enough history exists)"""
+        suggested = self.predict(key, requested_max_tokens, project_id)
+        if suggested >= requested_max_tokens:
+            return requested_max_tokens
+
+        with self._lock:
+            self.tightened_calls += 1
+            self.saved_tokens += requested_max_tokens - suggested
+        logger.debug(
+            f"Token budget: {'/'.join(key)} max_tokens {requested_max_tokens} -> {suggested}"
+        )
+        return suggested
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "tightened_calls": self.tightened_calls,
+                "reserved_tokens_saved": self.saved_tokens,
+                "backend": "redis" if self._redis.connected else "local",
+            }
+
+
+# Singleton instance
+_token_budget_predictor: Optional[TokenBudgetPredictor] = None
+
+
+def get_token_budget_predictor() -> TokenBudgetPredictor:
+    """Get or create token budget predictor singleton"""
+    global _token_budget_predictor
+    if _token_budget_predictor is None:
+        _token_budget_predictor = TokenBudgetPredictor(
+            window=settings.TOKEN_BUDGET_WINDOW,
+            min_samples=settings.TOKEN_BUDGET_MIN_SAMPLES,
+            margin=settings.TOKEN_BUDGET_MARGIN,
+            floor_tokens=settings.TOKEN_BUDGET_FLOOR,
+        )
+    return _token_budget_predictor
@@ -3,21 +3,44 @@ Celery tasks for book generation pipeline
 
 NOW WITH REAL AI AGENTS!
 Uses the complete multi-agent system for professional book generation.
+
+With GENERATION_FANOUT_ENABLED one book is spread over many workers:
+run_full_pipeline (world, characters, plot) -> generate_chapter_batch x N
+-> chord -> finalize_book (reconciliation, validation, finalization).
 """
 
-from celery import Task
+from celery import Task, chord, group
+from celery.signals import worker_process_shutdown
 from sqlalchemy.orm import Session
 import logging
 import asyncio
 from datetime import datetime
+from typing import Any, Dict, List
 
 from app.celery_app import celery_app
-from app.database import SessionLocal
+from app.config import settings
+from app.database import GenerationSessionLocal
 from app.models.project import Project, ProjectStatus
 from app.services.agent_orchestrator import AgentOrchestrator
+from app.services.context_pack_builder import get_context_pack_stats
+from app.services.db_executor import get_db_executor
+from app.services.generation_context import project_scope
+from app.services.generation_stream import StreamPublisher
+from app.services.llm_clients import close_loop_http_pool, close_sync_http_client
+from app.services.loop_monitor import LoopLagMonitor
+from app.services.telemetry_ledger import get_telemetry_ledger
 
 logger = logging.getLogger(__name__)
 
+# Fan-out mode (GENERATION_FANOUT_ENABLED): time limits of the head task
+# (world bible, characters, plot) and the chord callback (validation, finalization)
+FANOUT_FOUNDATION_TIMEOUT = 3600
+FANOUT_FINALIZE_TIMEOUT = 3600
+
+
+class ChapterBatchFailed(Exception):
+    """A fan-out chapter batch did not write its chapters (fails the chord)"""
+
 
 class DatabaseTask(Task):
     """Base task with database session"""
@@ -26,10 +49,131 @@ class DatabaseTask(Task):
     @property
     def db(self) -> Session:
         if self._db is None:
-            self._db = SessionLocal()
+            self._db = GenerationSessionLocal()
         return self._db
 
 
+def _is_orphaned_run(project: Project) -> bool:
+    """
+    True if the GENERATING run of a project belongs to a dead worker: it has
+    not reported progress (project.updated_at, touched after every scene) for
+    GENERATION_RESUME_STALE_SECONDS.
+
+    The broker's redelivered flag is no proof - Redis also redelivers messages
+    of tasks that are still running (visibility_timeout, see celery_app).
+    """
+    if project.updated_at is None:
+        return True
+    idle_seconds = (datetime.utcnow() - project.updated_at).total_seconds()
+    return idle_seconds > settings.GENERATION_RESUME_STALE_SECONDS
+
+
+async def _monitored(project_id: int, coroutine, timeout: float) -> Dict[str, Any]:
+    """Await a generation coroutine with a timeout, logging event loop lag of the run"""
+    if not settings.LOOP_LAG_MONITOR_ENABLED:
+        return await asyncio.wait_for(coroutine, timeout=timeout)
+
+    db_before = get_db_executor().get_stats()
+    packs_before = get_context_pack_stats()
+    monitor = LoopLagMonitor()
+    monitor.start()
+    try:
+        return await asyncio.wait_for(coroutine, timeout=timeout)
+    finally:
+        lag = await monitor.stop()
+        db_stats = get_db_executor().get_stats()
+        packs = get_context_pack_stats()
+        pack_builds = packs["builds"] - packs_before["builds"]
+        logger.info(
+            f"🐢 Project {project_id} event loop lag: mean {lag['mean_ms']} ms, "
+            f"p95 {lag['p95_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms "
+            f"({lag['samples']} samples) | DB: {db_stats['calls'] - db_before['calls']} calls, "
+            f"{db_stats['busy_seconds'] - db_before['busy_seconds']:.2f}s "
+            f"({'executor thread' if db_stats['enabled'] else 'on the loop'}) | "
+            f"context packs: {pack_builds}, "
+            f"{(packs['build_seconds'] - packs_before['build_seconds']) * 1000 / max(1, pack_builds):.1f} ms avg, "
+            f"token cache {packs['token_hits'] - packs_before['token_hits']} hits / "
+            f"{packs['token_misses'] - packs_before['token_misses']} misses"
+        )
+
+
+def _run_in_loop(project_id: int, coroutine, timeout: float) -> Dict[str, Any]:
+    """Run an orchestrator coroutine on a private event loop, attributed to the project"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        # Add timeout to prevent hanging indefinitely
+        # (project_scope attributes every AI call of the run to this project)
+        with project_scope(project_id):
+            return loop.run_until_complete(_monitored(project_id, coroutine, timeout))
+    finally:
+        try:
+            # The LLM connection pool of this loop cannot outlive it
+            loop.run_until_complete(close_loop_http_pool())
+        except Exception as e:
+            logger.warning(f"Failed to close LLM HTTP pool: {e}")
+        loop.close()
+        # Write this run's buffered AI call telemetry before reporting
+        get_telemetry_ledger().flush()
+
+
+@worker_process_shutdown.connect
+def _close_http_pools(**kwargs) -> None:
+    """Close the shared sync LLM HTTP pool when a worker process exits"""
+    close_sync_http_client()
+
+
+def _mark_failed(db: Session, project_id: int, activity: str, error_message: str) -> None:
+    """Mark a project FAILED (best effort - used outside the orchestrator's own error handling)"""
+    try:
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if project and project.status != ProjectStatus.FAILED:
+            project.status = ProjectStatus.FAILED
+            project.current_activity = activity
+            project.error_message = error_message
+            db.commit()
+            if settings.GENERATION_STREAM_ENABLED:
+                # Watchers (and /status) must not keep showing the run as generating
+                StreamPublisher(project_id).progress({
+                    "project_id": project_id,
+                    "status": ProjectStatus.FAILED.value,
+                    "current_activity": activity,
+                    "error_message": error_message,
+                })
+    except Exception as db_error:
+        db.rollback()
+        logger.error(f"Failed to update project status: {db_error}")
+
+
+def _dispatch_chapter_chord(project_id: int, chapter_count: int) -> Dict[str, Any]:
+    """
+    Fan out chapter writing: one generate_chapter_batch task per batch on the
+    generation queue, joined by a chord running finalize_book.
+    """
+    batch_size = max(1, settings.GENERATION_FANOUT_BATCH_SIZE)
+    numbers = list(range(1, chapter_count + 1))
+    batches = [numbers[i:i + batch_size] for i in range(0, chapter_count, batch_size)]
+
+    header = group(
+        generate_chapter_batch.s(project_id, batch).set(
+            soft_time_limit=settings.GENERATION_CHAPTER_TASK_TIME_LIMIT * len(batch),
+            time_limit=settings.GENERATION_CHAPTER_TASK_TIME_LIMIT * len(batch) + 300
+        )
+        for batch in batches
+    )
+    callback = finalize_book.s(project_id).set(
+        soft_time_limit=FANOUT_FINALIZE_TIMEOUT,
+        time_limit=FANOUT_FINALIZE_TIMEOUT + 300
+    ).on_error(fail_fanout_generation.s(project_id))
+
+    result = chord(header)(callback)
+    logger.info(
+        f"🧵 Project {project_id}: {chapter_count} chapters fanned out in {len(batches)} tasks "
+        f"(chord {result.id})"
+    )
+    return {"chapter_batches": len(batches), "chord_id": result.id}
+
+
 @celery_app.task(base=DatabaseTask, bind=True)
 def run_full_pipeline(self, project_id: int):
     """
@@ -60,13 +204,21 @@ def run_full_pipeline(self, project_id: int):
 
         # --- Idempotency guard ---
         # With acks_late enabled, a crashed worker causes the task to be
-        # redelivered.  If the project is already mid-generation or done,
-        # skip to avoid duplicate work.
+        # redelivered.  A GENERATING project whose run is still alive is a
+        # duplicate delivery and is skipped; one left behind by a dead worker
+        # is resumed from its persisted artifacts and scene checkpoints.
+        resume = False
         if project.status == ProjectStatus.GENERATING:
+            if not _is_orphaned_run(project):
+                logger.warning(
+                    f"Project {project_id} is already GENERATING (possible redelivery). Skipping."
+                )
+                return {"success": True, "skipped": True, "reason": "already_generating"}
             logger.warning(
-                f"Project {project_id} is already GENERATING (possible redelivery). Skipping."
+                f"Project {project_id} was left GENERATING by a lost worker - resuming "
+                f"(last progress at {project.updated_at})"
             )
-            return {"success": True, "skipped": True, "reason": "already_generating"}
+            resume = True
 
         if project.status == ProjectStatus.COMPLETED:
             logger.info(f"Project {project_id} is already COMPLETED. Skipping.")
@@ -74,31 +226,39 @@ def run_full_pipeline(self, project_id: int):
 
         logger.info(f"Starting AI-POWERED generation for project {project_id}: {project.name}")
 
+        if settings.GENERATION_FANOUT_ENABLED:
+            # Head task: world bible, characters, plot; chapters run as separate tasks
+            orchestrator = AgentOrchestrator(db, project, resume=resume, fanout=True)
+            try:
+                report = _run_in_loop(project_id, orchestrator.generate_foundation(), FANOUT_FOUNDATION_TIMEOUT)
+            except asyncio.TimeoutError:
+                _mark_failed(
+                    db, project_id, "Przekroczono limit czasu (przygotowanie książki)",
+                    f"TimeoutError: Foundation exceeded {FANOUT_FOUNDATION_TIMEOUT}s time limit"
+                )
+                raise Exception("Foundation generation timed out")
+            if not report['success']:
+                return report
+            return {**report, **_dispatch_chapter_chord(project_id, report['chapter_count'])}
+
         # Create orchestrator
-        orchestrator = AgentOrchestrator(db, project)
+        orchestrator = AgentOrchestrator(db, project, resume=resume)
 
         # Run async generation with timeout (6 hours max for Beat Sheet Architecture)
         # ~33 chapters × 5 scenes × ~2 min = ~5.5 hours max
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
         try:
-            # Add timeout to prevent hanging indefinitely
-            report = loop.run_until_complete(
-                asyncio.wait_for(
-                    orchestrator.generate_complete_book(),
-                    timeout=21600  # 6 hours = 21600 seconds
-                )
+            report = _run_in_loop(
+                project_id,
+                orchestrator.generate_complete_book(),
+                timeout=21600  # 6 hours = 21600 seconds
             )
         except asyncio.TimeoutError:
             logger.error(f"❌ Generation timed out for project {project_id} (exceeded 6 hours)")
-            project.status = ProjectStatus.FAILED
-            project.current_activity = "Przekroczono limit czasu (6 godzin)"
-            project.error_message = "TimeoutError: Generation exceeded 6 hour time limit"
-            db.commit()
+            _mark_failed(
+                db, project_id, "Przekroczono limit czasu (6 godzin)",
+                "TimeoutError: Generation exceeded 6 hour time limit"
+            )
             raise Exception("Generation timed out after 6 hours")
-        finally:
-            loop.close()
 
         if report['success']:
             logger.info(
@@ -117,16 +277,8 @@ def run_full_pipeline(self, project_id: int):
         error_details = f"{type(e).__name__}: {str(e)}"
         logger.error(f"❌ AI generation pipeline failed for project {project_id}: {error_details}", exc_info=True)
 
-        # Mark project as failed with detailed error message
-        try:
-            project = db.query(Project).filter(Project.id == project_id).first()
-            if project:
-                project.status = ProjectStatus.FAILED
-                project.current_activity = f"Błąd AI: {str(e)}"
-                project.error_message = error_details
-                db.commit()
-        except Exception as db_error:
-            logger.error(f"Failed to update project status: {db_error}")
+        # Mark project as failed with detailed error message (and tell live watchers)
+        _mark_failed(db, project_id, f"Błąd AI: {str(e)}", error_details)
 
         return {
             "success": False,
@@ -137,5 +289,150 @@ def run_full_pipeline(self, project_id: int):
         db.close()
 
 
+@celery_app.task(base=DatabaseTask, bind=True)
+def generate_chapter_batch(self, project_id: int, chapter_numbers: List[int]):
+    """
+    Fan-out worker: write a batch of chapters of one book.
+
+    Redelivery after a worker crash is safe - written chapters are kept and
+    a chapter in progress resumes from its scene checkpoints. Each chapter is
+    claimed before writing (ChapterLease), so a copy of a batch that is still
+    running elsewhere waits for its chapters instead of writing them again.
+
+    A batch that did not write its chapters fails the task, so the chord runs
+    fail_fanout_generation instead of finalize_book.
+    """
+    db = self.db
+
+    try:
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            return {"success": False, "error": "Project not found"}
+
+        orchestrator = AgentOrchestrator(db, project, resume=True, fanout=True)
+        timeout = settings.GENERATION_CHAPTER_TASK_TIME_LIMIT * len(chapter_numbers)
+        try:
+            report = _run_in_loop(project_id, orchestrator.generate_chapter_batch(chapter_numbers), timeout)
+        except asyncio.TimeoutError:
+            error = f"TimeoutError: Chapters {chapter_numbers} exceeded {timeout}s time limit"
+            logger.error(f"❌ Project {project_id}: {error}")
+            _mark_failed(db, project_id, f"Przekroczono limit czasu (rozdziały {chapter_numbers})", error)
+            raise ChapterBatchFailed(error)
+
+        if not report.get("success"):
+            raise ChapterBatchFailed(
+                report.get("error") or f"Project {project_id} stopped generating (chapters {chapter_numbers})"
+            )
+        return report
+
+    except ChapterBatchFailed:
+        raise
+    except Exception as e:
+        error_details = f"{type(e).__name__}: {str(e)}"
+        logger.error(f"❌ Chapter batch {chapter_numbers} failed for project {project_id}: {error_details}", exc_info=True)
+        _mark_failed(db, project_id, f"Błąd AI: {str(e)}", error_details)
+        raise ChapterBatchFailed(error_details) from e
+    finally:
+        db.close()
+
+
+@celery_app.task(base=DatabaseTask, bind=True)
+def finalize_book(self, batch_results: List[Dict[str, Any]], project_id: int):
+    """Fan-out chord callback: reconcile chapter openings, validate and finalize the book"""
+    db = self.db
+
+    try:
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            return {"success": False, "error": "Project not found"}
+        if project.status == ProjectStatus.COMPLETED:
+            return {"success": True, "skipped": True, "reason": "already_completed"}
+        if project.status != ProjectStatus.GENERATING:
+            return {"success": False, "skipped": True, "reason": project.status.value}
+
+        orchestrator = AgentOrchestrator(db, project, resume=True, fanout=True)
+        try:
+            report = _run_in_loop(project_id, orchestrator.finish_book(batch_results), FANOUT_FINALIZE_TIMEOUT)
+        except asyncio.TimeoutError:
+            _mark_failed(
+                db, project_id, "Przekroczono limit czasu (finalizacja)",
+                f"TimeoutError: Finalization exceeded {FANOUT_FINALIZE_TIMEOUT}s time limit"
+            )
+            raise Exception("Finalization timed out")
+
+        if report['success']:
+            logger.info(
+                f"✅ AI GENERATION COMPLETE for project {project_id} (fan-out)!\n"
+                f"   📚 Generated: {report['statistics']['chapters']} chapters, "
+                f"{report['statistics']['total_words']:,} words\n"
+                f"   💰 AI Cost: ${report['ai_metrics']['total_cost']:.2f}"
+            )
+        return report
+
+    except Exception as e:
+        error_details = f"{type(e).__name__}: {str(e)}"
+        logger.error(f"❌ Finalization failed for project {project_id}: {error_details}", exc_info=True)
+        _mark_failed(db, project_id, f"Błąd AI: {str(e)}", error_details)
+        return {"success": False, "error": error_details, "error_type": type(e).__name__}
+    finally:
+        db.close()
+
+
+@celery_app.task(base=DatabaseTask, bind=True)
+def fail_fanout_generation(self, request, exc, traceback, project_id: int):
+    """Chord error callback: a chapter task failed or died (e.g. hard time limit) - fail the project"""
+    try:
+        project = self.db.query(Project).filter(Project.id == project_id).first()
+        if project is None or project.status != ProjectStatus.GENERATING:
+            # Already failed by the batch, or stopped by the user - leave the status as it is
+            return
+        _mark_failed(self.db, project_id, f"Błąd generowania rozdziałów: {exc}", f"{type(exc).__name__}: {exc}")
+    finally:
+        self.db.close()
+
+
+@celery_app.task(base=DatabaseTask, bind=True)
+def regenerate_stale_chapters(self, project_id: int):
+    """
+    Incremental regeneration after edits: rewrite only the chapters and
+    scenes whose inputs changed (see AgentOrchestrator.regenerate_stale).
+    """
+    db = self.db
+
+    try:
+        project = db.query(Project).filter(Project.id == project_id).first()
+        if not project:
+            return {"success": False, "error": "Project not found"}
+        if project.status == ProjectStatus.GENERATING:
+            logger.warning(f"Project {project_id} is GENERATING - stale regeneration skipped")
+            return {"success": True, "skipped": True, "reason": "already_generating"}
+
+        orchestrator = AgentOrchestrator(db, project, resume=True)
+        try:
+            report = _run_in_loop(project_id, orchestrator.regenerate_stale(), timeout=21600)
+        except asyncio.TimeoutError:
+            _mark_failed(
+                db, project_id, "Przekroczono limit czasu (regeneracja)",
+                "TimeoutError: Stale regeneration exceeded 6 hour time limit"
+            )
+            raise Exception("Stale regeneration timed out")
+
+        if report['success']:
+            logger.info(
+                f"✅ Stale regeneration of project {project_id} done: "
+                f"chapters rewritten {report['rewritten_chapters']}, "
+                f"openings reconciled {report['reconciled_chapters']}"
+            )
+        return report
+
+    except Exception as e:
+        error_details = f"{type(e).__name__}: {str(e)}"
+        logger.error(f"❌ Stale regeneration failed for project {project_id}: {error_details}", exc_info=True)
+        _mark_failed(db, project_id, f"Błąd AI: {str(e)}", error_details)
+        return {"success": False, "error": error_details, "error_type": type(e).__name__}
+    finally:
+        db.close()
+
+
 # Legacy compatibility - old mock task removed
 # All generation now uses real AI agents!
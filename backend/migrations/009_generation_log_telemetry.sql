@@ -0,0 +1,22 @@
+-- Migration: Per-call AI telemetry columns on generation_logs
+-- Date: 2026-10-16
+-- Description: Every AIService call is recorded (agent, task, chapter, scene, cache usage);
+--              calls made outside a project run are stored with project_id NULL
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'generation_logs') THEN
+        ALTER TABLE generation_logs ALTER COLUMN project_id DROP NOT NULL;
+
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS task VARCHAR(100);
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS chapter_number INTEGER;
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS scene_number INTEGER;
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS provider VARCHAR(20);
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS cache_read_tokens INTEGER DEFAULT 0;
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS cache_hit INTEGER DEFAULT 0;
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS coalesced INTEGER DEFAULT 0;
+        ALTER TABLE generation_logs ADD COLUMN IF NOT EXISTS streamed INTEGER DEFAULT 0;
+
+        CREATE INDEX IF NOT EXISTS idx_generation_logs_timestamp ON generation_logs (timestamp);
+    END IF;
+END$$;
@@ -0,0 +1,11 @@
+-- Migration: Rolling act summaries for hierarchical context compaction
+-- Date: 2026-10-16
+-- Description: Act summaries written from chapter summaries (see services/story_compactor);
+--              scene digests and chapter summaries live in existing JSONB columns of chapters
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = 'plot_structures') THEN
+        ALTER TABLE plot_structures ADD COLUMN IF NOT EXISTS act_summaries JSONB DEFAULT '{}'::jsonb;
+    END IF;
+END$$;
@@ -0,0 +1,49 @@
+"""BudgetScheduler: scene plans against the project budget"""
+
+from app.services.ai_service import ModelTier
+from app.services.budget_scheduler import BudgetScheduler, ScenePlan, prior_cost
+
+DESIRED = ScenePlan(ModelTier.TIER_2, critique_passes=2, max_retries=2)
+TOTAL_SCENES = 20
+
+
+def _run_book(budget: float, cost_of) -> BudgetScheduler:
+    """Plan and record every scene of a book; cost_of(plan) is what a scene really costs"""
+    spent = [0.0]
+    scheduler = BudgetScheduler(budget, TOTAL_SCENES, spent=lambda: spent[0])
+    for index in range(TOTAL_SCENES):
+        chapter, scene = divmod(index, 5)
+        plan = scheduler.plan_scene(chapter + 1, scene + 1, DESIRED)
+        cost = cost_of(plan)
+        spent[0] += cost
+        scheduler.record_scene(chapter + 1, scene + 1, cost)
+    return scheduler
+
+
+def test_under_budget_run_keeps_desired_plan():
+    budget = prior_cost(DESIRED) * TOTAL_SCENES * 2
+    scheduler = _run_book(budget, prior_cost)
+
+    stats = scheduler.get_stats()
+    assert stats["scenes_degraded"] == 0
+    assert stats["calibration"] == 1.0
+    assert scheduler.plan_scene(99, 1, DESIRED) == DESIRED
+
+
+def test_cheap_scenes_never_upgrade_plan():
+    budget = prior_cost(DESIRED) * TOTAL_SCENES * 2
+    scheduler = _run_book(budget, lambda plan: prior_cost(plan) * 0.5)
+
+    assert scheduler.get_stats()["scenes_degraded"] == 0
+    assert scheduler.calibration < 1.0
+    assert scheduler.plan_scene(99, 1, DESIRED) == DESIRED
+
+
+def test_overspending_run_degrades_later_scenes():
+    budget = prior_cost(DESIRED) * TOTAL_SCENES * 2
+    scheduler = _run_book(budget, lambda plan: prior_cost(plan) * 3)
+
+    stats = scheduler.get_stats()
+    assert stats["scenes_degraded"] > 0
+    assert stats["calibration"] > 1.0
+    assert stats["observed_cost"] <= budget
@@ -0,0 +1,72 @@
+"""RepetitionIndex: book-wide near-duplicate passages and metaphors"""
+
+from app.services import repetition_index
+from app.services.repetition_index import PASSAGE, RepetitionIndex, _bands, _stems
+
+SENTENCE = "Stare drewniane drzwi skrzypiały cicho, gdy Marta weszła do ciemnej kuchni pełnej dymu."
+# Inflected forms share stems ("skrzypiały"/"skrzypiące"); only the last word differs
+VARIANT = "Stare drewniane drzwi skrzypiące cicho, gdy Marta weszła do ciemnej kuchni pełnej pary."
+
+
+def _filler(n: int) -> str:
+    return f"Scena numer {n} opowiada zupełnie inną historię o wędrówce przez góry numer {n}."
+
+
+def _assert_consistent(index: RepetitionIndex) -> None:
+    for key, ids in index._by_scene.items():
+        for item_id in ids:
+            item = index._items[item_id]
+            assert item is not None and item[1] == key
+            for band, bucket in enumerate(_bands(item[3])):
+                assert item_id in index._buckets[(item[0], band, bucket)]
+    for ids in index._buckets.values():
+        assert all(0 <= item_id < len(index._items) for item_id in ids)
+    live = sum(item is not None for item in index._items)
+    assert live == len(index)
+    assert len(index._items) - live == index._tombstones
+
+
+def test_near_duplicate_found_across_scenes():
+    index = RepetitionIndex()
+    index.add_scene(1, 2, f"{_filler(1)} {SENTENCE}")
+
+    hits = index.check(VARIANT, chapter=3, scene=1)
+
+    assert hits
+    assert hits[0].kind == PASSAGE
+    assert (hits[0].chapter, hits[0].scene) == (1, 2)
+    assert hits[0].earlier == SENTENCE
+
+
+def test_scene_own_items_excluded():
+    index = RepetitionIndex()
+    index.add_scene(1, 2, SENTENCE)
+
+    assert index.check(SENTENCE, chapter=1, scene=2) == []
+    assert index.check(SENTENCE, chapter=1, scene=3)
+
+
+def test_stems_fold_polish_l():
+    assert _stems("Łza spłynęła po łące") == ["lza", "splyne", "po", "lace"]
+
+
+def test_compaction_keeps_ids_consistent(monkeypatch):
+    monkeypatch.setattr(repetition_index, "COMPACT_MIN_TOMBSTONES", 4)
+    index = RepetitionIndex()
+    for scene in range(1, 4):
+        index.add_scene(1, scene, _filler(scene))
+    index.add_scene(2, 1, SENTENCE)
+
+    for version in range(20):
+        # Rewritten scenes of chapter 1, one of them dropped every other round
+        scenes = {1: _filler(100 + version), 2: _filler(200 + version)}
+        if version % 2:
+            scenes[3] = _filler(300 + version)
+        index.retain_scenes(1, scenes)
+        for scene, content in scenes.items():
+            index.add_scene(1, scene, content)
+        _assert_consistent(index)
+
+    assert index._tombstones <= max(4, len(index._items) * repetition_index.COMPACT_RATIO)
+    hits = index.check(VARIANT, chapter=3, scene=1)
+    assert hits and (hits[0].chapter, hits[0].scene) == (2, 1)